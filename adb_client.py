@@ -0,0 +1,588 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import uuid
+import socket
+import struct
+import itertools
+import threading
+import subprocess
+import traceback # For detailed error logging
+from collections import deque
+from concurrent.futures import Future
+
+from debug_log import log_to_file_debug_globally # Queued, rotating debug log shared by every module
+
+DEFAULT_SESSION_KEY = "default" # Session for commands without -s (adb picks the only device)
+
+ADB_SERVER_HOST = "127.0.0.1"
+ADB_SERVER_PORT = int(os.environ.get("ANDROID_ADB_SERVER_PORT", "5037")) # Same override the adb binary honours
+SYNC_DATA_MAX = 64 * 1024 # Largest DATA chunk the sync protocol accepts
+
+
+class ShellSessionClosed(Exception):
+    """The persistent shell ended (device dropped, adb killed or session cancelled) before the command finished."""
+
+
+def shell_args_for_command(command_list):
+    """For ["adb", ("-s", serial), "shell", args...] returns (serial or None, args). None for anything else.
+
+    Interactive shells (no args) are not eligible for the persistent session.
+    """
+    if not isinstance(command_list, (list, tuple)) or len(command_list) < 3:
+        return None
+    if os.path.splitext(os.path.basename(str(command_list[0])))[0].lower() != "adb":
+        return None
+    idx, serial = 1, None
+    if command_list[idx] == "-s" and len(command_list) > idx + 1:
+        serial = str(command_list[idx + 1])
+        idx += 2
+    if idx >= len(command_list) or command_list[idx] != "shell" or len(command_list) <= idx + 1:
+        return None
+    return serial, [str(arg) for arg in command_list[idx + 1:]]
+
+
+class _PendingShellCommand:
+    def __init__(self, seq, future):
+        self.seq = seq
+        self.future = future
+        self.stdout_parts = []
+        self.stderr_parts = []
+        self.return_code = None
+        self.stdout_done = False
+        self.stderr_done = False
+
+
+class AdbShellSession:
+    """One long-lived `adb [-s serial] shell` process that runs many commands.
+
+    Each command is written to the shell's stdin followed by sentinel lines on stdout
+    (carrying $?) and stderr, so the readers know where its output ends. Commands can be
+    pipelined; results come back in order as concurrent.futures.Future objects resolving to
+    {"stdout", "stderr", "return_code"}. If the shell dies, pending futures fail with
+    ShellSessionClosed and the next submit() starts a fresh shell.
+    """
+
+    def __init__(self, serial=None, adb_path="adb"):
+        self.serial = serial
+        self.adb_path = adb_path
+        self.process = None
+        self._lock = threading.Lock()
+        self._pending_stdout = deque()
+        self._pending_stderr = deque()
+        self._seq = itertools.count(1)
+        self._tag = f"__BFC_{uuid.uuid4().hex[:12]}"
+        self.spawn_count = 0
+
+    def _marker(self, seq, stream):
+        return f"{self._tag}:{seq}:{stream}"
+
+    def _ensure_started_locked(self):
+        if self.process is not None and self.process.poll() is None:
+            return
+        command = [self.adb_path] + (["-s", self.serial] if self.serial else []) + ["shell"]
+        startupinfo = None
+        creation_flags = 0
+        if os.name == 'nt':
+            startupinfo = subprocess.STARTUPINFO()
+            startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
+            startupinfo.wShowWindow = subprocess.SW_HIDE
+            creation_flags = subprocess.CREATE_NO_WINDOW
+        process = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                   text=True, encoding='utf-8', errors='replace', bufsize=1,
+                                   startupinfo=startupinfo, creationflags=creation_flags)
+        self.process = process
+        self.spawn_count += 1
+        for stream in ("stdout", "stderr"):
+            threading.Thread(target=self._reader_loop, args=(process, stream), daemon=True,
+                             name=f"AdbShellSession-{self.serial or DEFAULT_SESSION_KEY}-{stream}").start()
+        log_to_file_debug_globally(f"AdbShellSession: started shell for {self.serial or DEFAULT_SESSION_KEY} (spawn #{self.spawn_count}).")
+
+    def submit(self, args):
+        """Queues one command (list of shell words, joined like `adb shell` does) and returns a Future."""
+        future = Future()
+        command_line = " ".join(args) if isinstance(args, (list, tuple)) else str(args)
+        with self._lock:
+            self._ensure_started_locked()
+            seq = next(self._seq)
+            pending = _PendingShellCommand(seq, future)
+            # stdin is detached so the command can't swallow the commands queued after it;
+            # the leading \n keeps the sentinel on its own line when output has no trailing newline
+            framed = (f"{{ {command_line}\n}} </dev/null; __bfc_rc=$?; "
+                      f"printf '\\n%s %s\\n' '{self._marker(seq, 'O')}' \"$__bfc_rc\"; "
+                      f"printf '\\n%s\\n' '{self._marker(seq, 'E')}' >&2\n")
+            self._pending_stdout.append(pending)
+            self._pending_stderr.append(pending)
+            try:
+                self.process.stdin.write(framed)
+                self.process.stdin.flush()
+            except (OSError, ValueError) as e_write:
+                self._fail_pending_locked(self.process, f"write failed: {e_write}")
+        return future
+
+    def run(self, args, timeout=None):
+        """Blocking helper: submit(args).result(timeout)."""
+        return self.submit(args).result(timeout)
+
+    def _reader_loop(self, process, stream):
+        pipe = process.stdout if stream == "stdout" else process.stderr
+        out_prefix = f"{self._tag}:"
+        try:
+            for line in iter(pipe.readline, ''):
+                if line.startswith(out_prefix):
+                    self._handle_marker(process, stream, line.strip())
+                    continue
+                with self._lock:
+                    queue_for_stream = self._pending_stdout if stream == "stdout" else self._pending_stderr
+                    if queue_for_stream and self.process is process:
+                        pending = queue_for_stream[0]
+                        (pending.stdout_parts if stream == "stdout" else pending.stderr_parts).append(line)
+        except Exception as e_read:
+            log_to_file_debug_globally(f"AdbShellSession: {stream} reader error for {self.serial or DEFAULT_SESSION_KEY}: {e_read}", "WARNING")
+        finally:
+            with self._lock:
+                self._fail_pending_locked(process, "shell exited")
+
+    def _handle_marker(self, process, stream, marker_line):
+        parts = marker_line.split(" ", 1)
+        try:
+            _tag, seq_str, kind = parts[0].split(":")
+            seq = int(seq_str)
+        except ValueError:
+            return
+        finished = None
+        with self._lock:
+            if self.process is not process:
+                return
+            if kind == "O" and self._pending_stdout and self._pending_stdout[0].seq == seq:
+                pending = self._pending_stdout.popleft()
+                pending.stdout_done = True
+                try:
+                    pending.return_code = int(parts[1]) if len(parts) > 1 else -1
+                except ValueError:
+                    pending.return_code = -1
+            elif kind == "E" and self._pending_stderr and self._pending_stderr[0].seq == seq:
+                # Old devices without the shell protocol merge stderr into stdout, so the E sentinel can arrive on either pipe
+                pending = self._pending_stderr.popleft()
+                pending.stderr_done = True
+            else:
+                return
+            if pending.stdout_done and pending.stderr_done:
+                finished = pending
+        if finished is not None and not finished.future.done():
+            finished.future.set_result({"stdout": self._strip_frame("".join(finished.stdout_parts)),
+                                        "stderr": self._strip_frame("".join(finished.stderr_parts)),
+                                        "return_code": finished.return_code})
+
+    @staticmethod
+    def _strip_frame(text):
+        return text[:-1] if text.endswith("\n") else text # Drop the newline printed in front of the sentinel
+
+    def _fail_pending_locked(self, process, reason):
+        if self.process is not process:
+            return
+        failed = {id(p): p for p in list(self._pending_stdout) + list(self._pending_stderr)}
+        self._pending_stdout.clear()
+        self._pending_stderr.clear()
+        for pending in failed.values():
+            if not pending.future.done():
+                pending.future.set_exception(ShellSessionClosed(f"adb shell for {self.serial or DEFAULT_SESSION_KEY} ended ({reason})"))
+        if process.poll() is None:
+            try:
+                process.kill()
+            except Exception:
+                pass
+        self.process = None
+
+    def close(self):
+        """Ends the shell; pending commands fail with ShellSessionClosed. The next submit() respawns it."""
+        with self._lock:
+            process = self.process
+            if process is None:
+                return
+            try:
+                process.stdin.close()
+            except Exception:
+                pass
+            self._fail_pending_locked(process, "closed")
+
+
+class AdbShellSessionPool:
+    """One AdbShellSession per device serial, created on first use."""
+
+    def __init__(self, adb_path="adb"):
+        self.adb_path = adb_path
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def get(self, serial=None):
+        key = serial or DEFAULT_SESSION_KEY
+        with self._lock:
+            session = self._sessions.get(key)
+            if session is None:
+                session = AdbShellSession(serial, self.adb_path)
+                self._sessions[key] = session
+            return session
+
+    def submit(self, serial, args):
+        return self.get(serial).submit(args)
+
+    def close(self, serial=None):
+        """Drops the session of one serial (e.g. after a disconnect or reboot event)."""
+        with self._lock:
+            session = self._sessions.pop(serial or DEFAULT_SESSION_KEY, None)
+        if session:
+            session.close()
+
+    def close_all(self):
+        with self._lock:
+            sessions = list(self._sessions.values())
+            self._sessions.clear()
+        for session in sessions:
+            try:
+                session.close()
+            except Exception as e_close:
+                log_to_file_debug_globally(f"AdbShellSessionPool: close failed: {e_close}", "WARNING")
+                log_to_file_debug_globally(traceback.format_exc(), "ERROR_TRACE")
+
+
+# --- In-process ADB host protocol client (talks to the running adb server, no adb process per call) ---
+
+class AdbProtocolError(Exception):
+    """The adb server answered FAIL or broke the protocol."""
+
+
+def parse_devices_output(text):
+    """Parses host:devices / host:devices-l text into a list of dicts (serial, state, plus usb/product/model/device/transport_id)."""
+    devices = []
+    for line in text.splitlines():
+        line = line.strip()
+        if not line or line.startswith("List of devices") or line.startswith("*"):
+            continue
+        if "\t" in line and ":" not in line.split("\t", 1)[1]: # Short form: serial<TAB>state
+            serial, state = line.split("\t", 1)
+            devices.append({"serial": serial.strip(), "state": state.strip()})
+            continue
+        tokens = line.split()
+        if len(tokens) < 2:
+            continue
+        info = {"serial": tokens[0]}
+        state_words = []
+        for token in tokens[1:]:
+            key, sep, value = token.partition(":")
+            if sep and key in ("usb", "product", "model", "device", "transport_id"):
+                info[key] = value
+            else:
+                state_words.append(token) # "no permissions (...)" spans several words
+        info["state"] = " ".join(state_words)
+        devices.append(info)
+    return devices
+
+
+class AdbConnection:
+    """One socket to the adb server, speaking its length-prefixed request format."""
+
+    def __init__(self, host=ADB_SERVER_HOST, port=ADB_SERVER_PORT, timeout=5.0):
+        self.sock = socket.create_connection((host, port), timeout=timeout)
+
+    def send_request(self, payload):
+        data = payload.encode("utf-8")
+        self.sock.sendall(b"%04x" % len(data) + data)
+        self.read_status(payload)
+
+    def read_status(self, what=""):
+        status = self.read_exact(4)
+        if status == b"OKAY":
+            return
+        if status == b"FAIL":
+            raise AdbProtocolError(f"{what}: {self.read_length_prefixed().decode('utf-8', 'replace')}")
+        raise AdbProtocolError(f"{what}: unexpected status {status!r}")
+
+    def read_exact(self, size):
+        chunks = []
+        remaining = size
+        while remaining:
+            chunk = self.sock.recv(min(remaining, 1 << 20))
+            if not chunk:
+                raise AdbProtocolError("connection closed by adb server")
+            chunks.append(chunk)
+            remaining -= len(chunk)
+        return b"".join(chunks)
+
+    def read_length_prefixed(self):
+        return self.read_exact(int(self.read_exact(4), 16))
+
+    def read_all(self):
+        chunks = []
+        while True:
+            chunk = self.sock.recv(1 << 16)
+            if not chunk:
+                return b"".join(chunks)
+            chunks.append(chunk)
+
+    def close(self):
+        try:
+            self.sock.close()
+        except OSError:
+            pass
+
+
+class AdbSyncSession:
+    """A sync: service connection to one device. Several stat/list/pull/push calls can share it."""
+
+    def __init__(self, connection, serial):
+        self.connection = connection
+        self.serial = serial
+
+    def _send(self, sync_id, data=b""):
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        self.connection.sock.sendall(sync_id + struct.pack("<I", len(data)) + data)
+
+    def _read_header(self):
+        header = self.connection.read_exact(8)
+        return header[:4], struct.unpack("<I", header[4:])[0]
+
+    def _raise_fail(self, length, what):
+        raise AdbProtocolError(f"{what}: {self.connection.read_exact(length).decode('utf-8', 'replace')}")
+
+    def stat(self, remote_path):
+        """Returns {"mode", "size", "mtime"}, or None if the path does not exist."""
+        self._send(b"STAT", remote_path)
+        reply = self.connection.read_exact(16)
+        if reply[:4] != b"STAT":
+            raise AdbProtocolError(f"stat {remote_path}: unexpected reply {reply[:4]!r}")
+        mode, size, mtime = struct.unpack("<III", reply[4:])
+        if mode == 0 and size == 0 and mtime == 0:
+            return None
+        return {"mode": mode, "size": size, "mtime": mtime}
+
+    def list_dir(self, remote_path):
+        """Returns a list of {"name", "mode", "size", "mtime"} for one directory."""
+        self._send(b"LIST", remote_path)
+        entries = []
+        while True:
+            header = self.connection.read_exact(20)
+            sync_id = header[:4]
+            if sync_id == b"DONE":
+                return entries
+            if sync_id != b"DENT":
+                raise AdbProtocolError(f"list {remote_path}: unexpected reply {sync_id!r}")
+            mode, size, mtime, name_len = struct.unpack("<IIII", header[4:])
+            name = self.connection.read_exact(name_len).decode("utf-8", "replace")
+            if name not in (".", ".."):
+                entries.append({"name": name, "mode": mode, "size": size, "mtime": mtime})
+
+    def pull(self, remote_path, local_path, progress_callback=None):
+        """Copies remote_path to local_path, streaming; progress_callback(bytes_done) after each chunk. Returns bytes copied."""
+        self._send(b"RECV", remote_path)
+        bytes_done = 0
+        tmp_path = local_path + ".part"
+        try:
+            with open(tmp_path, "wb") as f_out:
+                while True:
+                    sync_id, length = self._read_header()
+                    if sync_id == b"DATA":
+                        f_out.write(self.connection.read_exact(length))
+                        bytes_done += length
+                        if progress_callback: progress_callback(bytes_done)
+                    elif sync_id == b"DONE":
+                        break
+                    elif sync_id == b"FAIL":
+                        self._raise_fail(length, f"pull {remote_path}")
+                    else:
+                        raise AdbProtocolError(f"pull {remote_path}: unexpected reply {sync_id!r}")
+            os.replace(tmp_path, local_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        return bytes_done
+
+    def push(self, local_path, remote_path, mode=0o644, progress_callback=None):
+        """Copies local_path to remote_path in SYNC_DATA_MAX chunks. Returns bytes copied."""
+        self._send(b"SEND", f"{remote_path},{mode | 0o100000}") # Regular-file bit, as adb push sends it
+        bytes_done = 0
+        with open(local_path, "rb") as f_in:
+            while True:
+                chunk = f_in.read(SYNC_DATA_MAX)
+                if not chunk:
+                    break
+                self._send(b"DATA", chunk)
+                bytes_done += len(chunk)
+                if progress_callback: progress_callback(bytes_done)
+        self.connection.sock.sendall(b"DONE" + struct.pack("<I", int(os.path.getmtime(local_path))))
+        sync_id, length = self._read_header()
+        if sync_id == b"FAIL":
+            self._raise_fail(length, f"push {remote_path}")
+        if sync_id != b"OKAY":
+            raise AdbProtocolError(f"push {remote_path}: unexpected reply {sync_id!r}")
+        return bytes_done
+
+    def close(self):
+        try:
+            self._send(b"QUIT")
+        except OSError:
+            pass
+        self.connection.close()
+
+
+class AdbHostClient:
+    """Pure-Python client for the adb server protocol on localhost:5037.
+
+    Host queries (devices, get-state) each use one short socket, which is how the server
+    expects them; sync connections are kept per serial and reused across stat/list/pull/push.
+    If no server is listening, `adb start-server` is run once and the request is retried.
+    """
+
+    def __init__(self, host=ADB_SERVER_HOST, port=ADB_SERVER_PORT, timeout=5.0, adb_path="adb"):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.adb_path = adb_path
+        self._idle_sync = {} # serial -> list of idle AdbSyncSession
+        self._lock = threading.Lock()
+        self._server_start_attempted = False
+
+    def _connect(self):
+        try:
+            return AdbConnection(self.host, self.port, self.timeout)
+        except ConnectionRefusedError:
+            if self._server_start_attempted or not self.adb_path:
+                raise
+            self._server_start_attempted = True # One spawn at most, not one per poll
+            log_to_file_debug_globally("AdbHostClient: adb server not running, starting it once.")
+            flags = subprocess.CREATE_NO_WINDOW if os.name == 'nt' else 0
+            subprocess.run([self.adb_path, "start-server"], capture_output=True, timeout=15, creationflags=flags)
+            return AdbConnection(self.host, self.port, self.timeout)
+
+    def _host_query(self, service):
+        connection = self._connect()
+        try:
+            connection.send_request(service)
+            return connection.read_length_prefixed().decode("utf-8", "replace")
+        finally:
+            connection.close()
+
+    def version(self):
+        return int(self._host_query("host:version"), 16)
+
+    def devices(self, long_format=True):
+        """Lists attached devices as dicts with at least serial and state."""
+        return parse_devices_output(self._host_query("host:devices-l" if long_format else "host:devices"))
+
+    def get_state(self, serial=None):
+        """Returns "device", "recovery", "sideload", "bootloader", "unauthorized", ... for one device."""
+        return self._host_query(f"host-serial:{serial}:get-state" if serial else "host:get-state")
+
+    def track_devices(self, on_devices, stop_event, long_format=True):
+        """Blocks, calling on_devices(device_list) each time the server reports a change, until stop_event is set.
+
+        The server pushes the full list on connect and on every change, so no polling is needed.
+        Connection errors are raised to the caller, which decides whether to reconnect.
+        """
+        connection = self._connect()
+        try:
+            connection.send_request("host:track-devices-l" if long_format else "host:track-devices")
+            connection.sock.settimeout(0.5) # Wake up regularly to notice stop_event
+            while not stop_event.is_set():
+                try:
+                    length_hex = connection.read_exact(4)
+                except socket.timeout:
+                    continue
+                connection.sock.settimeout(self.timeout)
+                payload = connection.read_exact(int(length_hex, 16)).decode("utf-8", "replace")
+                connection.sock.settimeout(0.5)
+                on_devices(parse_devices_output(payload))
+        finally:
+            connection.close()
+
+    def _open_device_service(self, serial, service):
+        connection = self._connect()
+        try:
+            connection.send_request(f"host:transport:{serial}" if serial else "host:transport-any")
+            connection.send_request(service)
+            return connection
+        except Exception:
+            connection.close()
+            raise
+
+    def shell(self, serial, command, timeout=None):
+        """Runs one shell command over the shell: service. Returns {"stdout", "stderr", "return_code"}; stderr is merged into stdout."""
+        command_line = " ".join(command) if isinstance(command, (list, tuple)) else str(command)
+        marker = f"__BFC_RC_{uuid.uuid4().hex[:8]}"
+        connection = self._open_device_service(serial, f"shell:( {command_line}\n); printf '\\n%s %s\\n' {marker} $?")
+        try:
+            connection.sock.settimeout(timeout)
+            output = connection.read_all().decode("utf-8", "replace").replace("\r\n", "\n")
+        finally:
+            connection.close()
+        return_code = -1
+        head, sep, tail = output.rpartition(f"\n{marker} ")
+        if sep:
+            output = head
+            try:
+                return_code = int(tail.strip())
+            except ValueError:
+                pass
+        return {"stdout": output, "stderr": "", "return_code": return_code}
+
+    def exec_out(self, serial, command, timeout=None):
+        """Runs a command over exec: and returns its raw stdout bytes (binary safe, no exit code)."""
+        command_line = " ".join(command) if isinstance(command, (list, tuple)) else str(command)
+        connection = self._open_device_service(serial, f"exec:{command_line}")
+        try:
+            connection.sock.settimeout(timeout)
+            return connection.read_all()
+        finally:
+            connection.close()
+
+    def _acquire_sync(self, serial):
+        with self._lock:
+            idle = self._idle_sync.get(serial or DEFAULT_SESSION_KEY)
+            if idle:
+                return idle.pop()
+        return AdbSyncSession(self._open_device_service(serial, "sync:"), serial)
+
+    def _release_sync(self, sync_session, reusable):
+        if not reusable:
+            sync_session.connection.close()
+            return
+        with self._lock:
+            self._idle_sync.setdefault(sync_session.serial or DEFAULT_SESSION_KEY, []).append(sync_session)
+
+    def _with_sync(self, serial, func):
+        sync_session = self._acquire_sync(serial)
+        reusable = False
+        try:
+            result = func(sync_session)
+            reusable = True
+            return result
+        finally:
+            self._release_sync(sync_session, reusable) # Broken or failed sessions are dropped, not reused
+
+    def stat(self, serial, remote_path):
+        return self._with_sync(serial, lambda sync: sync.stat(remote_path))
+
+    def list_dir(self, serial, remote_path):
+        return self._with_sync(serial, lambda sync: sync.list_dir(remote_path))
+
+    def pull(self, serial, remote_path, local_path, progress_callback=None):
+        return self._with_sync(serial, lambda sync: sync.pull(remote_path, local_path, progress_callback))
+
+    def push(self, serial, local_path, remote_path, mode=0o644, progress_callback=None):
+        return self._with_sync(serial, lambda sync: sync.push(local_path, remote_path, mode, progress_callback))
+
+    def drop_device(self, serial):
+        """Closes pooled sync connections of a device (call on disconnect)."""
+        with self._lock:
+            idle = self._idle_sync.pop(serial or DEFAULT_SESSION_KEY, [])
+        for sync_session in idle:
+            sync_session.close()
+
+    def close(self):
+        with self._lock:
+            all_idle = [s for sessions in self._idle_sync.values() for s in sessions]
+            self._idle_sync.clear()
+        for sync_session in all_idle:
+            sync_session.close()
@@ -0,0 +1,310 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Content-addressed, deduplicated store for partition backups.
+
+Partition images are cut into fixed-size chunks keyed by their SHA-256; a chunk is written
+once no matter how many backups contain it, so boot, preloader, lk, tee or modem images
+that are identical across units of one firmware cost one copy. Each backup is a small JSON
+manifest listing its files and their chunk hashes. store.db counts how many manifest
+entries reference every chunk; deleting a backup drops its references and
+collect_garbage() removes chunks nobody references any more.
+
+Fixed chunks rather than content-defined ones: partitions sit at fixed, block-aligned
+offsets, so identical content lands on identical chunk boundaries, and a per-byte rolling
+hash in Python would be far slower than the disk.
+
+Layout: <store>/chunks/ab/<sha256> | <store>/backups/<id>.json | <store>/store.db
+Command line: python backup_store.py <store dir> [gc]
+"""
+
+import os
+import sys
+import json
+import zlib
+import sqlite3
+import hashlib
+import threading
+import traceback # For detailed error logging
+from datetime import datetime
+from pathlib import Path # For path operations
+from concurrent.futures import ThreadPoolExecutor
+
+from debug_log import log_to_file_debug_globally # Queued, rotating debug log shared by every module
+
+STORE_CHUNK_SIZE = 1024 * 1024 # Raw bytes per chunk: the unit of deduplication
+STORE_WORKERS = os.cpu_count() or 2 # Chunks hashed and compressed in parallel (hashlib/zlib release the GIL)
+STORE_COMPRESSION_LEVEL = 6
+STORE_DIR_ENV = "ULTIMATE_BACKUP_STORE" # Overrides the default store location
+
+_CODEC_RAW = b"\x00"  # First byte of a chunk file: payload stored as is
+_CODEC_ZLIB = b"\x01" # First byte of a chunk file: payload is zlib-compressed
+_ZERO_CHUNK_DIGEST = hashlib.sha256(bytes(STORE_CHUNK_SIZE)).hexdigest() # Restores leave these as holes
+
+
+class BackupStoreError(Exception):
+    """Unknown backup, or a chunk is missing or damaged."""
+
+
+def default_store_dir():
+    """backup_store/ next to the running script, or $ULTIMATE_BACKUP_STORE."""
+    return os.environ.get(STORE_DIR_ENV) or str(Path(sys.argv[0]).resolve().parent / "backup_store")
+
+
+def _pack_chunk(data):
+    """Runs on the pool: (sha256 hex, bytes to store). Compression only pays off for chunks that shrink."""
+    compressed = zlib.compress(data, STORE_COMPRESSION_LEVEL)
+    payload = _CODEC_ZLIB + compressed if len(compressed) < len(data) else _CODEC_RAW + data
+    return hashlib.sha256(data).hexdigest(), payload
+
+
+class BackupStore:
+    """One store directory. Safe to share between threads; writes to store.db are serialized."""
+
+    def __init__(self, root=None):
+        self.root = os.path.abspath(root or default_store_dir())
+        self.chunks_dir = os.path.join(self.root, "chunks")
+        self.backups_dir = os.path.join(self.root, "backups")
+        os.makedirs(self.chunks_dir, exist_ok=True)
+        os.makedirs(self.backups_dir, exist_ok=True)
+        self._lock = threading.Lock()       # store.db connection
+        self._write_lock = threading.Lock() # An add and a garbage collection never overlap
+        self.conn = sqlite3.connect(os.path.join(self.root, "store.db"), check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS chunks (digest TEXT PRIMARY KEY, size INTEGER, stored_size INTEGER, refs INTEGER NOT NULL DEFAULT 0)")
+        self.conn.commit()
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+    def _chunk_path(self, digest):
+        return os.path.join(self.chunks_dir, digest[:2], digest)
+
+    def _manifest_path(self, backup_id):
+        if not backup_id or os.sep in backup_id or "/" in backup_id:
+            raise BackupStoreError(f"Invalid backup id: {backup_id!r}")
+        return os.path.join(self.backups_dir, f"{backup_id}.json")
+
+    def _write_chunk(self, digest, payload):
+        """Stores a chunk unless it already exists; returns the bytes written (0 for a known chunk)."""
+        chunk_path = self._chunk_path(digest)
+        if os.path.exists(chunk_path):
+            return 0
+        os.makedirs(os.path.dirname(chunk_path), exist_ok=True)
+        temp_path = f"{chunk_path}.{threading.get_ident()}.tmp"
+        with open(temp_path, "wb") as f_chunk:
+            f_chunk.write(payload)
+        os.replace(temp_path, chunk_path) # Atomic: readers never see half a chunk
+        return len(payload)
+
+    def _read_chunk(self, digest):
+        try:
+            with open(self._chunk_path(digest), "rb") as f_chunk:
+                payload = f_chunk.read()
+        except OSError as e_chunk:
+            raise BackupStoreError(f"Chunk {digest[:12]} is missing: {e_chunk}") from e_chunk
+        try:
+            data = zlib.decompress(payload[1:]) if payload[:1] == _CODEC_ZLIB else payload[1:]
+        except zlib.error as e_chunk:
+            raise BackupStoreError(f"Chunk {digest[:12]} is damaged ({e_chunk})") from e_chunk
+        if hashlib.sha256(data).hexdigest() != digest:
+            raise BackupStoreError(f"Chunk {digest[:12]} is damaged")
+        return data
+
+    def _add_file(self, pool, path, workers, sizes, stats, progress_callback, cancel_event):
+        """Chunks one file into the store, noting (size, stored size) per chunk in sizes. Returns its manifest entry, or None when cancelled."""
+        file_hash = hashlib.sha256()
+        digests = []
+        size = 0
+        total = os.path.getsize(path)
+        with open(path, "rb") as f_in:
+            pending = []
+            while True:
+                cancelled = cancel_event is not None and cancel_event.is_set()
+                data = b"" if cancelled else f_in.read(STORE_CHUNK_SIZE)
+                if data:
+                    file_hash.update(data)
+                    pending.append((len(data), pool.submit(_pack_chunk, data)))
+                while pending and (len(pending) >= 2 * workers or not data):
+                    length, future = pending.pop(0)
+                    digest, payload = future.result()
+                    written = self._write_chunk(digest, payload)
+                    stats["new_chunks"] += 1 if written else 0
+                    stats["stored_bytes"] += written
+                    sizes[digest] = (length, len(payload))
+                    digests.append(digest)
+                    size += length
+                    if progress_callback:
+                        progress_callback(path, size, total)
+                if not data:
+                    break
+        if cancel_event is not None and cancel_event.is_set():
+            return None
+        return {"size": size, "sha256": file_hash.hexdigest(), "chunk_size": STORE_CHUNK_SIZE, "chunks": digests}
+
+    def add_backup(self, files, label="", device=None, workers=STORE_WORKERS, progress_callback=None, cancel_event=None):
+        """Stores files ({path: partition name}) as one backup. Returns its manifest dict, or None when cancelled.
+
+        The manifest's "stats" says how many bytes were new to the store. progress_callback(path, done, total)
+        reports bytes within the current file.
+        """
+        created = datetime.now()
+        backup_id = created.strftime("%Y%m%d_%H%M%S_") + os.urandom(3).hex()
+        stats = {"logical_bytes": 0, "stored_bytes": 0, "chunks": 0, "new_chunks": 0}
+        entries = []
+        sizes = {} # digest -> (raw size, stored size)
+        with self._write_lock, ThreadPoolExecutor(max_workers=workers) as pool:
+            for path, partition in files.items():
+                entry = self._add_file(pool, path, workers, sizes, stats, progress_callback, cancel_event)
+                if entry is None:
+                    return None # Chunks written so far are unreferenced; collect_garbage() removes them
+                entries.append(dict(entry, name=os.path.basename(path), partition=partition))
+                stats["logical_bytes"] += entry["size"]
+                stats["chunks"] += len(entry["chunks"])
+            manifest = {"id": backup_id, "created": created.isoformat(timespec="seconds"), "label": label,
+                        "device": device or {}, "files": entries, "stats": stats}
+            temp_path = self._manifest_path(backup_id) + ".tmp"
+            with open(temp_path, "w", encoding="utf-8") as f_manifest:
+                json.dump(manifest, f_manifest, indent=1)
+            references = {}
+            for entry in entries:
+                for digest in entry["chunks"]:
+                    references[digest] = references.get(digest, 0) + 1
+            with self._lock, self.conn:
+                self.conn.executemany("INSERT INTO chunks (digest, size, stored_size, refs) VALUES (?, ?, ?, ?) "
+                                      "ON CONFLICT(digest) DO UPDATE SET refs = refs + excluded.refs",
+                                      [(digest, sizes[digest][0], sizes[digest][1], count) for digest, count in references.items()])
+                os.replace(temp_path, self._manifest_path(backup_id)) # Manifest and references appear together
+        log_to_file_debug_globally(f"Backup store: {backup_id} ({label}) {stats['logical_bytes']} bytes, "
+                                   f"{stats['new_chunks']}/{stats['chunks']} new chunks, {stats['stored_bytes']} bytes stored.")
+        return manifest
+
+    def get_backup(self, backup_id):
+        """Manifest dict of a backup. Raises BackupStoreError for unknown ids."""
+        try:
+            with open(self._manifest_path(backup_id), "r", encoding="utf-8") as f_manifest:
+                return json.load(f_manifest)
+        except (OSError, ValueError) as e_manifest:
+            raise BackupStoreError(f"Unknown or unreadable backup {backup_id}: {e_manifest}") from e_manifest
+
+    def list_backups(self):
+        """Manifest dicts of all backups, oldest first."""
+        backups = []
+        for name in sorted(os.listdir(self.backups_dir)):
+            if name.endswith(".json"):
+                try:
+                    backups.append(self.get_backup(name[:-len(".json")]))
+                except BackupStoreError as e_manifest:
+                    log_to_file_debug_globally(f"Backup store: skipping {name}: {e_manifest}", "WARNING")
+        return backups
+
+    def restore(self, backup_id, output_dir, partitions=None, progress_callback=None, cancel_event=None):
+        """Reassembles the files of a backup into output_dir by streaming their chunks in order.
+
+        partitions limits the restore to those names. Every chunk and every whole file is checked
+        against its SHA-256. Returns one dict per file: partition, path, ok, message.
+        """
+        manifest = self.get_backup(backup_id)
+        wanted = {name.lower() for name in partitions} if partitions else None
+        results = []
+        for entry in manifest["files"]:
+            if wanted is not None and str(entry.get("partition") or "").lower() not in wanted:
+                continue
+            output_path = os.path.join(output_dir, entry["name"])
+            result = {"partition": entry.get("partition"), "path": output_path, "ok": False, "message": ""}
+            results.append(result)
+            try:
+                if self._restore_file(entry, output_path, progress_callback, cancel_event):
+                    result.update(ok=True, message="Restored")
+                else:
+                    result["message"] = "Cancelled"
+            except (OSError, BackupStoreError) as e_restore:
+                result["message"] = str(e_restore)
+                log_to_file_debug_globally(f"Backup store: restoring {entry['name']} from {backup_id} failed: {e_restore}", "ERROR")
+                log_to_file_debug_globally(traceback.format_exc(), "ERROR_TRACE")
+        return results
+
+    def _restore_file(self, entry, output_path, progress_callback, cancel_event):
+        file_hash = hashlib.sha256()
+        done = 0
+        with open(output_path, "wb") as f_out:
+            for digest in entry["chunks"]:
+                if cancel_event is not None and cancel_event.is_set():
+                    break
+                data = self._read_chunk(digest)
+                file_hash.update(data)
+                if digest == _ZERO_CHUNK_DIGEST:
+                    f_out.seek(len(data), os.SEEK_CUR) # Hole; truncate() below sets the length
+                else:
+                    f_out.write(data)
+                done += len(data)
+                if progress_callback:
+                    progress_callback(output_path, done, entry["size"])
+            f_out.truncate(done)
+        if cancel_event is not None and cancel_event.is_set():
+            os.remove(output_path)
+            return False
+        if done != entry["size"] or file_hash.hexdigest() != entry["sha256"]:
+            raise BackupStoreError(f"{entry['name']}: reassembled file doesn't match its SHA-256")
+        return True
+
+    def delete_backup(self, backup_id):
+        """Removes a backup's manifest and drops its chunk references. Space comes back with collect_garbage()."""
+        manifest = self.get_backup(backup_id)
+        references = {}
+        for entry in manifest["files"]:
+            for digest in entry["chunks"]:
+                references[digest] = references.get(digest, 0) + 1
+        with self._lock, self.conn:
+            self.conn.executemany("UPDATE chunks SET refs = MAX(0, refs - ?) WHERE digest = ?",
+                                  [(count, digest) for digest, count in references.items()])
+            os.remove(self._manifest_path(backup_id))
+        log_to_file_debug_globally(f"Backup store: deleted backup {backup_id}.")
+
+    def collect_garbage(self):
+        """Deletes chunks no backup references, and chunk files store.db doesn't know (interrupted adds).
+
+        Returns (chunks removed, bytes freed).
+        """
+        removed = freed = 0
+        with self._write_lock, self._lock, self.conn:
+            dead = [row[0] for row in self.conn.execute("SELECT digest FROM chunks WHERE refs <= 0")]
+            known = {row[0] for row in self.conn.execute("SELECT digest FROM chunks WHERE refs > 0")}
+            self.conn.executemany("DELETE FROM chunks WHERE digest = ?", [(digest,) for digest in dead])
+            for dir_path, _dirs, names in os.walk(self.chunks_dir):
+                for name in names:
+                    if name in known:
+                        continue
+                    chunk_path = os.path.join(dir_path, name)
+                    try:
+                        freed += os.path.getsize(chunk_path)
+                        os.remove(chunk_path)
+                        removed += 1
+                    except OSError as e_remove:
+                        log_to_file_debug_globally(f"Backup store: cannot remove {chunk_path}: {e_remove}", "WARNING")
+        log_to_file_debug_globally(f"Backup store: garbage collection removed {removed} chunks, {freed} bytes.")
+        return removed, freed
+
+    def usage(self):
+        """{"backups", "chunks", "logical_bytes", "stored_bytes"}: what the backups hold vs. what the store takes on disk."""
+        backups = self.list_backups()
+        with self._lock:
+            chunks, stored_bytes = self.conn.execute("SELECT COUNT(*), COALESCE(SUM(stored_size), 0) FROM chunks WHERE refs > 0").fetchone()
+        return {"backups": len(backups), "chunks": chunks, "stored_bytes": stored_bytes,
+                "logical_bytes": sum(entry["size"] for backup in backups for entry in backup["files"])}
+
+
+if __name__ == "__main__": # python backup_store.py <store dir> [gc]
+    if len(sys.argv) not in (2, 3) or (len(sys.argv) == 3 and sys.argv[2] != "gc"):
+        print("Usage: python backup_store.py <store dir> [gc]")
+        sys.exit(2)
+    store = BackupStore(sys.argv[1])
+    if len(sys.argv) == 3:
+        chunks_removed, bytes_freed = store.collect_garbage()
+        print(f"Removed {chunks_removed} chunks, {bytes_freed / 1e6:.1f} MB freed")
+    for backup in store.list_backups():
+        print(f"{backup['id']}  {backup.get('label', '')}  {', '.join(entry['name'] for entry in backup['files'])}")
+    store_usage = store.usage()
+    print(f"{store_usage['backups']} backups, {store_usage['logical_bytes'] / 1e6:.1f} MB in {store_usage['stored_bytes'] / 1e6:.1f} MB of chunks")
+    store.close()
@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Seekable compressed container for partition and full-flash dumps (.cdump).
+
+The raw image is cut into fixed-size chunks that are compressed independently on a thread
+pool (zlib and lzma release the GIL while they work, so every core is busy). An index of
+chunk offsets at the end of the file lets ChunkedDumpReader seek anywhere and decompress only
+the chunks a read touches: one partition out of a compressed full dump costs that partition,
+not the whole file. All-zero chunks are stored as index entries only.
+
+Layout: header | compressed chunks | index (one entry per chunk) | trailer.
+"""
+
+import io
+import os
+import lzma
+import zlib
+import struct
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from debug_log import log_to_file_debug_globally # Queued, rotating debug log shared by every module
+
+CHUNKED_EXTENSION = ".cdump"
+CHUNK_SIZE = 4 * 1024 * 1024 # Raw bytes per chunk: the unit of random access
+CODEC_ZLIB = 1
+CODEC_LZMA = 2
+COMPRESSION_LEVEL = 6
+COMPRESS_WORKERS = os.cpu_count() or 2
+READER_CACHE_CHUNKS = 4 # Decompressed chunks kept by a reader for small sequential reads
+
+_MAGIC = b"MTKCDMP1"
+_TRAILER_MAGIC = b"MTKCIDX1"
+_HEADER = struct.Struct("<8sHBBI")       # magic, version, codec, reserved, chunk_size
+_INDEX_ENTRY = struct.Struct("<QIII")    # offset, compressed length (0 = all zeros), raw length, crc32 of the raw bytes
+_TRAILER = struct.Struct("<QQQ8s")       # index offset, chunk count, raw size, trailer magic
+
+
+class ChunkedDumpError(Exception):
+    """The file is not a chunked dump, or a chunk doesn't match its index entry."""
+
+
+def _compress(codec, data):
+    if codec == CODEC_LZMA:
+        return lzma.compress(data, preset=COMPRESSION_LEVEL)
+    return zlib.compress(data, COMPRESSION_LEVEL)
+
+
+def _decompress(codec, data):
+    if codec == CODEC_LZMA:
+        return lzma.decompress(data)
+    return zlib.decompress(data)
+
+
+def is_chunked_dump(path):
+    try:
+        with open(path, "rb") as f_dump:
+            return f_dump.read(len(_MAGIC)) == _MAGIC
+    except OSError:
+        return False
+
+
+def _pack_chunk(codec, data):
+    """Runs on the pool: (compressed bytes or b"" for an all-zero chunk, raw length, crc32)."""
+    if data.count(0) == len(data): # C-speed scan; zero chunks are common in partition dumps
+        return b"", len(data), zlib.crc32(data)
+    return _compress(codec, data), len(data), zlib.crc32(data)
+
+
+def compress_file(raw_path, container_path, codec=CODEC_ZLIB, chunk_size=CHUNK_SIZE, workers=COMPRESS_WORKERS,
+                  progress_callback=None, cancel_event=None):
+    """Writes raw_path as a chunked container. Returns a stats dict, or None when cancelled.
+
+    At most 2 * workers chunks are in memory at a time; they are written in order as they finish.
+    progress_callback(bytes_done, raw_size) is called per chunk.
+    """
+    raw_size = os.path.getsize(raw_path)
+    index = []
+    done = 0
+    with open(raw_path, "rb") as f_raw, open(container_path, "wb") as f_out, ThreadPoolExecutor(max_workers=workers) as pool:
+        f_out.write(_HEADER.pack(_MAGIC, 1, codec, 0, chunk_size))
+        pending = []
+        while True:
+            cancelled = cancel_event is not None and cancel_event.is_set()
+            data = b"" if cancelled else f_raw.read(chunk_size)
+            if data:
+                pending.append(pool.submit(_pack_chunk, codec, data))
+            while pending and (len(pending) >= 2 * workers or not data):
+                compressed, length, crc = pending.pop(0).result()
+                index.append((f_out.tell(), len(compressed), length, crc))
+                f_out.write(compressed)
+                done += length
+                if progress_callback:
+                    progress_callback(done, raw_size)
+            if not data:
+                break
+        index_offset = f_out.tell()
+        f_out.writelines(_INDEX_ENTRY.pack(*entry) for entry in index)
+        f_out.write(_TRAILER.pack(index_offset, len(index), done, _TRAILER_MAGIC))
+    if cancel_event is not None and cancel_event.is_set():
+        os.remove(container_path)
+        return None
+    stats = {"raw_size": raw_size, "compressed_size": os.path.getsize(container_path), "chunks": len(index),
+             "zero_chunks": sum(1 for entry in index if entry[1] == 0)}
+    log_to_file_debug_globally(f"Chunked dump: {os.path.basename(raw_path)} {raw_size} -> {stats['compressed_size']} bytes "
+                               f"({stats['chunks']} chunks, {stats['zero_chunks']} empty).")
+    return stats
+
+
+class ChunkedDumpReader(io.RawIOBase):
+    """Read-only, seekable file object over the raw bytes of a chunked dump.
+
+    Anything that reads an image through read()/seek() (gpt_index, dump_extract) works on the
+    container as it is. iter_range() decompresses large ranges in parallel.
+    """
+
+    def __init__(self, path):
+        super().__init__()
+        self.path = path
+        self._file = open(path, "rb")
+        try:
+            header = self._file.read(_HEADER.size)
+            if len(header) < _HEADER.size or header[:8] != _MAGIC:
+                raise ChunkedDumpError(f"{os.path.basename(path)}: not a chunked dump")
+            _magic, _version, self.codec, _reserved, self.chunk_size = _HEADER.unpack(header)
+            self._file.seek(-_TRAILER.size, os.SEEK_END)
+            index_offset, chunk_count, self.size, trailer_magic = _TRAILER.unpack(self._file.read(_TRAILER.size))
+            if trailer_magic != _TRAILER_MAGIC:
+                raise ChunkedDumpError(f"{os.path.basename(path)}: index missing (incomplete file?)")
+            self._file.seek(index_offset)
+            raw_index = self._file.read(chunk_count * _INDEX_ENTRY.size)
+            self.index = [_INDEX_ENTRY.unpack_from(raw_index, i * _INDEX_ENTRY.size) for i in range(chunk_count)]
+        except (OSError, struct.error) as e_open:
+            self._file.close()
+            raise ChunkedDumpError(f"{os.path.basename(path)}: {e_open}") from e_open
+        except ChunkedDumpError:
+            self._file.close()
+            raise
+        self._position = 0
+        self._cache = OrderedDict()
+        self._file_lock = threading.Lock() # iter_range reads chunks from pool threads
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._position
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        base = {os.SEEK_SET: 0, os.SEEK_CUR: self._position, os.SEEK_END: self.size}[whence]
+        self._position = max(0, base + offset)
+        return self._position
+
+    def close(self):
+        if not self.closed:
+            self._file.close()
+        super().close()
+
+    def _load_chunk(self, chunk_index):
+        """Raw bytes of one chunk, checked against the CRC in the index."""
+        offset, compressed_length, raw_length, crc = self.index[chunk_index]
+        if compressed_length == 0:
+            data = bytes(raw_length)
+        else:
+            with self._file_lock:
+                self._file.seek(offset)
+                compressed = self._file.read(compressed_length)
+            try:
+                data = _decompress(self.codec, compressed)
+            except (zlib.error, lzma.LZMAError) as e_chunk:
+                raise ChunkedDumpError(f"{os.path.basename(self.path)}: chunk {chunk_index} is damaged ({e_chunk})") from e_chunk
+        if len(data) != raw_length or zlib.crc32(data) != crc:
+            raise ChunkedDumpError(f"{os.path.basename(self.path)}: chunk {chunk_index} is damaged")
+        return data
+
+    def _cached_chunk(self, chunk_index):
+        data = self._cache.pop(chunk_index, None)
+        if data is None:
+            data = self._load_chunk(chunk_index)
+        self._cache[chunk_index] = data
+        while len(self._cache) > READER_CACHE_CHUNKS:
+            self._cache.popitem(last=False)
+        return data
+
+    def readinto(self, buffer):
+        view = memoryview(buffer).cast("B")
+        written = 0
+        while written < len(view) and self._position < self.size:
+            chunk_index, chunk_offset = divmod(self._position, self.chunk_size)
+            data = self._cached_chunk(chunk_index)
+            piece = min(len(view) - written, len(data) - chunk_offset)
+            view[written:written + piece] = data[chunk_offset:chunk_offset + piece]
+            written += piece
+            self._position += piece
+        return written
+
+    def is_zero_chunk(self, chunk_index):
+        return self.index[chunk_index][1] == 0
+
+    def iter_range(self, start, size, workers=COMPRESS_WORKERS):
+        """Yields (offset, length, data) covering [start, start + size); data is None for all-zero pieces.
+
+        Chunks are decompressed on a thread pool, a few ahead of the consumer, and yielded in order.
+        """
+        end = min(start + size, self.size)
+        if end <= start:
+            return
+        first, last = start // self.chunk_size, (end - 1) // self.chunk_size
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            pending = []
+            next_chunk = first
+            while next_chunk <= last or pending:
+                while next_chunk <= last and len(pending) < 2 * workers:
+                    future = None if self.is_zero_chunk(next_chunk) else pool.submit(self._load_chunk, next_chunk)
+                    pending.append((next_chunk, future))
+                    next_chunk += 1
+                chunk_index, future = pending.pop(0)
+                chunk_start = chunk_index * self.chunk_size
+                piece_start, piece_end = max(start, chunk_start), min(end, chunk_start + self.index[chunk_index][2])
+                data = future.result() if future is not None else None
+                yield piece_start, piece_end - piece_start, data[piece_start - chunk_start:piece_end - chunk_start] if data is not None else None
+
+
+def decompress_file(container_path, raw_path, progress_callback=None, cancel_event=None):
+    """Writes the raw image back out. Returns its size, or None when cancelled. Zero chunks become holes."""
+    with ChunkedDumpReader(container_path) as reader, open(raw_path, "wb") as f_raw:
+        for offset, length, data in reader.iter_range(0, reader.size):
+            if cancel_event is not None and cancel_event.is_set():
+                break
+            if data is not None:
+                f_raw.seek(offset)
+                f_raw.write(data)
+            if progress_callback:
+                progress_callback(offset + length, reader.size)
+        f_raw.truncate(reader.size)
+        size = reader.size
+    if cancel_event is not None and cancel_event.is_set():
+        os.remove(raw_path)
+        return None
+    return size
+
+
+def open_image(path):
+    """Binary file object over the raw bytes of path, decompressing transparently if it is a chunked dump."""
+    return ChunkedDumpReader(path) if is_chunked_dump(path) else open(path, "rb")
@@ -0,0 +1,426 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import time
+import threading
+import itertools
+import subprocess
+import traceback # For detailed error logging
+from collections import deque
+
+from debug_log import log_to_file_debug_globally # Queued, rotating debug log shared by every module
+
+# Priority classes, lower value runs first
+PRIORITY_INTERACTIVE = 0 # Short reads the user is waiting on (getprop, get-state, info)
+PRIORITY_NORMAL = 1      # Regular single-shot operations
+PRIORITY_BULK = 2        # Long dumps, flashes, backups
+
+DEFAULT_LANE = "default" # Lane for commands that do not target a specific serial
+DEFAULT_MAX_WORKERS = 8  # Enough for a bench of phones without spawning a thread per command
+
+DEFAULT_TAIL_LINES = 2000          # Lines per stream kept for the final result dict in streaming mode
+DEFAULT_LINE_BATCH_INTERVAL = 0.1  # Seconds between line batches handed to the GUI
+DISPATCH_BATCH_LIMIT = 50          # Results handled per idle callback before yielding back to Tk
+
+
+# adb/fastboot global options that take a value (adb -s/-t/-H/-P/-L, fastboot -s/-S/-i/-b/-n/-c/--slot)
+VALUE_OPTIONS = ("-s", "-t", "-H", "-P", "-L", "-S", "-i", "-b", "-n", "-c", "--slot")
+
+
+def global_options(command_list):
+    """The tool's own options, up to its first subcommand word.
+
+    ["adb", "-s", "X", "shell", "ls", "-s"] -> ["-s", "X"]: options of the shell command are not the tool's.
+    """
+    parts = [str(part) for part in command_list[1:]]
+    idx = 0
+    while idx < len(parts) and parts[idx].startswith("-"):
+        idx += 2 if parts[idx] in VALUE_OPTIONS else 1
+    return parts[:idx]
+
+
+def lane_for_command(command_list):
+    """Returns the device serial a command is addressed to (-s <serial>), or the default lane."""
+    if isinstance(command_list, (list, tuple)) and command_list:
+        options = global_options(command_list)
+        for idx, part in enumerate(options[:-1]):
+            if part == "-s" and options[idx + 1]:
+                return options[idx + 1]
+    return DEFAULT_LANE
+
+
+class JobHandle:
+    """Handle for one submitted job. Can be cancelled whether queued or running."""
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    CANCELLED = "cancelled"
+
+    def __init__(self, job_id, name, lane, priority, func, on_cancelled=None, executor=None):
+        self._executor = executor
+        self.job_id = job_id
+        self.name = name
+        self.lane = lane
+        self.priority = priority
+        self.func = func
+        self.on_cancelled = on_cancelled
+        self.state = JobHandle.QUEUED
+        self.process = None
+        self.cancel_requested = False
+        self._lock = threading.Lock()
+        self._done_event = threading.Event()
+
+    def attach_process(self, process):
+        """Called by the job once its subprocess exists, so cancel() can reach it."""
+        with self._lock:
+            self.process = process
+            terminate_now = self.cancel_requested
+        if terminate_now:
+            self._terminate_process()
+
+    def detach_process(self):
+        with self._lock:
+            self.process = None
+
+    def _terminate_process(self):
+        process = self.process
+        if process is not None and process.poll() is None:
+            try:
+                process.terminate()
+            except Exception as e_term:
+                log_to_file_debug_globally(f"JobHandle: terminate failed for job {self.job_id} ({self.name}): {e_term}", "WARNING")
+
+    def cancel(self):
+        """Requests cancellation. Returns True if the job had not finished yet."""
+        if self._executor is not None:
+            return self._executor.cancel(self)
+        return self._request_cancel()
+
+    def _request_cancel(self):
+        with self._lock:
+            if self.state in (JobHandle.DONE, JobHandle.CANCELLED):
+                return False
+            self.cancel_requested = True
+        self._terminate_process()
+        return True
+
+    def is_active(self):
+        return self.state in (JobHandle.QUEUED, JobHandle.RUNNING)
+
+    def wait(self, timeout=None):
+        return self._done_event.wait(timeout)
+
+
+class CommandExecutor:
+    """Fixed-size worker pool with one FIFO lane per device serial.
+
+    Jobs in the same lane never run concurrently, so two commands never collide
+    on one device, while different lanes (devices) run in parallel. Among the
+    lanes that are free, the job with the best (priority, submission order) runs first.
+    """
+
+    def __init__(self, max_workers=DEFAULT_MAX_WORKERS):
+        self.max_workers = max(1, int(max_workers))
+        self._cond = threading.Condition()
+        self._lanes = {} # lane -> list of queued JobHandle, kept sorted by (priority, job_id)
+        self._busy_lanes = set()
+        self._running = {} # job_id -> JobHandle
+        self._job_ids = itertools.count(1)
+        self._shutdown = False
+        self._workers = []
+        for idx in range(self.max_workers):
+            worker = threading.Thread(target=self._worker_loop, name=f"CommandExecutor-{idx}", daemon=True)
+            worker.start()
+            self._workers.append(worker)
+        log_to_file_debug_globally(f"CommandExecutor started with {self.max_workers} workers.")
+
+    def submit(self, func, name="Job", lane=None, priority=PRIORITY_NORMAL, on_cancelled=None):
+        """Queues func(handle) on the given lane and returns its JobHandle.
+
+        on_cancelled(handle) is called if the job is cancelled before a worker picks it up.
+        """
+        lane = lane or DEFAULT_LANE
+        with self._cond:
+            if self._shutdown:
+                raise RuntimeError("CommandExecutor has been shut down")
+            handle = JobHandle(next(self._job_ids), name, lane, priority, func, on_cancelled, executor=self)
+            queued = self._lanes.setdefault(lane, [])
+            queued.append(handle)
+            if len(queued) > 1 and (queued[-2].priority, queued[-2].job_id) > (priority, handle.job_id):
+                queued.sort(key=lambda h: (h.priority, h.job_id))
+            self._cond.notify()
+        return handle
+
+    def _next_job_locked(self):
+        best = None
+        for lane, queued in self._lanes.items():
+            if not queued or lane in self._busy_lanes:
+                continue
+            head = queued[0]
+            if best is None or (head.priority, head.job_id) < (best.priority, best.job_id):
+                best = head
+        if best is not None:
+            self._lanes[best.lane].pop(0)
+            if not self._lanes[best.lane]:
+                del self._lanes[best.lane]
+            self._busy_lanes.add(best.lane)
+            self._running[best.job_id] = best
+        return best
+
+    def _worker_loop(self):
+        while True:
+            with self._cond:
+                handle = self._next_job_locked()
+                while handle is None:
+                    if self._shutdown:
+                        return
+                    self._cond.wait()
+                    handle = self._next_job_locked()
+                with handle._lock:
+                    handle.state = JobHandle.RUNNING
+            try:
+                handle.func(handle)
+            except Exception as e_job:
+                log_to_file_debug_globally(f"CommandExecutor: job {handle.job_id} ({handle.name}) raised: {e_job}", "ERROR")
+                log_to_file_debug_globally(traceback.format_exc(), "ERROR_TRACE")
+            finally:
+                with handle._lock:
+                    handle.state = JobHandle.CANCELLED if handle.cancel_requested else JobHandle.DONE
+                    handle.process = None
+                handle._done_event.set()
+                with self._cond:
+                    self._running.pop(handle.job_id, None)
+                    self._busy_lanes.discard(handle.lane)
+                    self._cond.notify_all()
+
+    def _cancel_queued_locked(self, predicate):
+        cancelled = []
+        for lane in list(self._lanes.keys()):
+            keep = []
+            for handle in self._lanes[lane]:
+                if predicate(handle):
+                    with handle._lock:
+                        handle.cancel_requested = True
+                        handle.state = JobHandle.CANCELLED
+                    handle._done_event.set()
+                    cancelled.append(handle)
+                else:
+                    keep.append(handle)
+            if keep:
+                self._lanes[lane] = keep
+            else:
+                del self._lanes[lane]
+        return cancelled
+
+    def _notify_cancelled(self, handles):
+        for handle in handles:
+            if handle.on_cancelled:
+                try:
+                    handle.on_cancelled(handle)
+                except Exception as e_cb:
+                    log_to_file_debug_globally(f"CommandExecutor: on_cancelled failed for job {handle.job_id}: {e_cb}", "ERROR")
+
+    def cancel(self, handle):
+        """Cancels one job. Queued jobs are dropped, running jobs have their process terminated."""
+        with self._cond:
+            dropped = self._cancel_queued_locked(lambda h: h is handle)
+        if dropped:
+            self._notify_cancelled(dropped)
+            return True
+        return handle._request_cancel()
+
+    def cancel_lane(self, lane):
+        """Cancels every queued and running job addressed to one device serial."""
+        return self._cancel_where(lambda h: h.lane == (lane or DEFAULT_LANE))
+
+    def cancel_all(self):
+        """Cancels every queued and running job. Returns the number of jobs affected."""
+        return self._cancel_where(lambda h: True)
+
+    def _cancel_where(self, predicate):
+        with self._cond:
+            dropped = self._cancel_queued_locked(predicate)
+            running = [h for h in self._running.values() if predicate(h)]
+        self._notify_cancelled(dropped)
+        count = len(dropped)
+        for handle in running:
+            if handle._request_cancel():
+                count += 1
+        return count
+
+    def active_jobs(self):
+        """Snapshot of running and queued jobs, running first."""
+        with self._cond:
+            queued = [h for lane_jobs in self._lanes.values() for h in lane_jobs]
+            return list(self._running.values()) + sorted(queued, key=lambda h: (h.priority, h.job_id))
+
+    def has_active_jobs(self):
+        with self._cond:
+            return bool(self._running) or any(self._lanes.values())
+
+    def shutdown(self, cancel_pending=True):
+        """Stops the workers. Running processes are terminated when cancel_pending is set."""
+        if cancel_pending:
+            self.cancel_all()
+        with self._cond:
+            self._shutdown = True
+            self._cond.notify_all()
+        log_to_file_debug_globally("CommandExecutor shut down.")
+
+
+class StreamingOutput:
+    """Reads a running process's stdout/stderr line by line instead of buffering until exit.
+
+    Lines are handed to on_lines(batch) every batch_interval seconds from the thread that
+    called run(), batch being a list of (stream, line) with stream "stdout" or "stderr".
+    on_lines must hand off to the Tk thread itself. Only the last tail_lines of each stream
+    are kept, so memory stays bounded no matter how chatty the tool is.
+    The process must be started with text=True; stderr may be merged into stdout.
+    """
+
+    def __init__(self, process, on_lines=None, tail_lines=DEFAULT_TAIL_LINES, batch_interval=DEFAULT_LINE_BATCH_INTERVAL):
+        self.process = process
+        self.on_lines = on_lines
+        self.batch_interval = batch_interval
+        self.tails = {"stdout": deque(maxlen=tail_lines), "stderr": deque(maxlen=tail_lines)}
+        self.line_counts = {"stdout": 0, "stderr": 0}
+        self._pending = []
+        self._lock = threading.Lock()
+        self._readers = []
+
+    def _read_pipe(self, pipe, stream):
+        try:
+            with pipe:
+                for line in iter(pipe.readline, ''): # Universal newlines: mtkclient's \r progress updates arrive as lines too
+                    line = line.rstrip("\r\n")
+                    with self._lock:
+                        self.tails[stream].append(line)
+                        self.line_counts[stream] += 1
+                        if self.on_lines:
+                            self._pending.append((stream, line))
+        except Exception as e_read:
+            log_to_file_debug_globally(f"StreamingOutput: error reading {stream}: {e_read}", "ERROR")
+
+    def _flush(self):
+        with self._lock:
+            batch, self._pending = self._pending, []
+        if batch:
+            try:
+                self.on_lines(batch)
+            except Exception as e_cb:
+                log_to_file_debug_globally(f"StreamingOutput: on_lines callback failed: {e_cb}", "ERROR")
+
+    def run(self, timeout=None):
+        """Blocks until the process exits and its pipes are drained, returns (stdout_tail, stderr_tail).
+
+        Raises subprocess.TimeoutExpired like communicate() does; the caller kills the process.
+        """
+        for stream in ("stdout", "stderr"):
+            pipe = getattr(self.process, stream)
+            if pipe is not None:
+                reader = threading.Thread(target=self._read_pipe, args=(pipe, stream), name=f"StreamingOutput-{stream}", daemon=True)
+                reader.start()
+                self._readers.append(reader)
+
+        deadline = time.monotonic() + timeout if timeout else None
+        while True:
+            try:
+                self.process.wait(timeout=self.batch_interval)
+                break
+            except subprocess.TimeoutExpired:
+                self._flush()
+                if deadline is not None and time.monotonic() >= deadline:
+                    raise subprocess.TimeoutExpired(self.process.args, timeout)
+        for reader in self._readers:
+            while reader.is_alive(): # A forked daemon (adb start-server) can keep the pipe open after exit
+                reader.join(self.batch_interval)
+                self._flush()
+                if deadline is not None and time.monotonic() >= deadline:
+                    raise subprocess.TimeoutExpired(self.process.args, timeout)
+        self._flush()
+        return self.text("stdout"), self.text("stderr")
+
+    def text(self, stream):
+        with self._lock:
+            lines = list(self.tails[stream])
+        return "\n".join(lines) + "\n" if lines else ""
+
+    def truncated(self, stream):
+        """True if older lines of the stream were dropped from the tail buffer."""
+        return self.line_counts[stream] > len(self.tails[stream])
+
+
+class ResultDispatcher:
+    """Hands worker results to the Tk thread without a polling timer.
+
+    put() may be called from any thread, like queue.Queue.put(). The first put() after the
+    queue runs dry schedules one after_idle drain on the Tk widget; further puts only append
+    until that drain runs, so a burst of results costs a single wake-up. The time each result
+    waited between put() and its handler is measured and stored as result["dispatch_latency_ms"].
+    """
+
+    def __init__(self, tk_widget, handler, batch_limit=DISPATCH_BATCH_LIMIT):
+        self.tk_widget = tk_widget
+        self.handler = handler
+        self.batch_limit = max(1, int(batch_limit))
+        self._items = deque() # (put time, result)
+        self._lock = threading.Lock()
+        self._scheduled = False
+        self._closed = False
+        self.dispatched_count = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+
+    def put(self, result):
+        with self._lock:
+            if self._closed:
+                return
+            self._items.append((time.perf_counter(), result))
+            if self._scheduled:
+                return # A drain is already on its way and will pick this one up
+            self._scheduled = True
+        self._schedule_drain()
+
+    def _schedule_drain(self):
+        try:
+            self.tk_widget.after_idle(self._drain)
+        except Exception as e_sched: # Tk is gone (closing), nothing left to deliver to
+            with self._lock:
+                self._scheduled = False
+            log_to_file_debug_globally(f"ResultDispatcher: could not schedule drain: {e_sched}", "WARNING")
+
+    def _drain(self):
+        for _ in range(self.batch_limit):
+            with self._lock:
+                if not self._items:
+                    self._scheduled = False
+                    return
+                queued_at, result = self._items.popleft()
+            latency = time.perf_counter() - queued_at
+            self.dispatched_count += 1
+            self.total_latency += latency
+            self.max_latency = max(self.max_latency, latency)
+            if isinstance(result, dict):
+                result["dispatch_latency_ms"] = round(latency * 1000, 3)
+                log_to_file_debug_globally(f"Dispatched '{result.get('operation_name', 'result')}' after {result['dispatch_latency_ms']} ms", "DEBUG_DISPATCH")
+            try:
+                self.handler(result)
+            except Exception as e_handler:
+                log_to_file_debug_globally(f"ResultDispatcher: handler failed: {e_handler}", "ERROR")
+                log_to_file_debug_globally(traceback.format_exc(), "ERROR_TRACE")
+        self._schedule_drain() # Batch limit reached: let Tk redraw and process input, then continue
+
+    def latency_stats(self):
+        """Returns count, average and max put-to-handler latency in milliseconds."""
+        count = self.dispatched_count
+        return {"count": count,
+                "avg_ms": round(self.total_latency * 1000 / count, 3) if count else 0.0,
+                "max_ms": round(self.max_latency * 1000, 3)}
+
+    def close(self):
+        """Drops pending results and ignores later puts (used when the window closes)."""
+        with self._lock:
+            self._closed = True
+            self._items.clear()
+        stats = self.latency_stats()
+        log_to_file_debug_globally(f"ResultDispatcher closed: {stats['count']} results, avg dispatch latency {stats['avg_ms']} ms, max {stats['max_ms']} ms.")
@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""application_debug_log.txt writer shared by every module.
+
+log_to_file_debug_globally() only formats the line and queues it. One background thread keeps the
+file open, writes in batches, rotates it by size or age and gzips the rotated segments.
+"""
+
+import os
+import sys
+import gzip
+import time
+import queue
+import atexit
+import shutil
+import threading
+from datetime import datetime
+
+_DEBUG_LOG_PATH = "application_debug_log.txt"
+_DEBUG_LOG_FALLBACK_PATH = "application_debug_log_local.txt" # Used when the main file can't be opened
+
+DEBUG_LOG_MAX_BYTES = 10 * 1024 * 1024 # Rotate when the live file reaches this size
+DEBUG_LOG_MAX_AGE = 24 * 3600          # ... or when it has been written to for this long (seconds)
+DEBUG_LOG_BACKUP_COUNT = 5             # Gzipped segments kept: application_debug_log.txt.1.gz (newest) .. .5.gz
+DEBUG_LOG_FLUSH_INTERVAL = 0.5         # Seconds buffered lines may wait before they reach the file
+DEBUG_LOG_QUEUE_MAX = 100000           # Lines waiting for the writer; beyond that lines are dropped and counted
+DEBUG_LOG_LEVEL_ENV = "ULTIMATE_DEBUG_LOG_LEVEL" # e.g. WARNING to skip INFO/DEBUG lines
+
+# Levels are free-form at the call sites ("DEBUG_CMD", "ERROR_TRACE", ...); they are ranked by prefix
+_LEVEL_VALUES = (("CRITICAL", 50), ("ERROR", 40), ("WARN", 30), ("INFO", 20), ("DEBUG", 10))
+
+
+def level_value(level):
+    level_name = str(level).upper()
+    for prefix, value in _LEVEL_VALUES:
+        if level_name.startswith(prefix):
+            return value
+    return 20 # Unknown levels ("LOG_PANEL_UNAVAILABLE", ...) count as INFO
+
+
+class _FlushMarker:
+    def __init__(self):
+        self.done = threading.Event()
+
+
+class DebugFileLogger:
+    """Queue-backed, rotating, gzip-compressing debug log file."""
+
+    def __init__(self, path=_DEBUG_LOG_PATH, max_bytes=DEBUG_LOG_MAX_BYTES, max_age=DEBUG_LOG_MAX_AGE,
+                 backup_count=DEBUG_LOG_BACKUP_COUNT, min_level=None, flush_interval=DEBUG_LOG_FLUSH_INTERVAL):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.backup_count = backup_count
+        self.min_level = level_value(min_level or os.environ.get(DEBUG_LOG_LEVEL_ENV, "DEBUG"))
+        self.flush_interval = flush_interval
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=DEBUG_LOG_QUEUE_MAX)
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._file = None
+        self._size = 0
+        self._segment_started = 0.0
+        self._closed = False
+
+    def set_level(self, level):
+        self.min_level = level_value(level)
+
+    def log(self, message, level="INFO"):
+        if level_value(level) < self.min_level:
+            return
+        line = f"[{datetime.now()}] [{level}] {message}\n" # Timestamp of the call, not of the write
+        if self._closed: # After shutdown (atexit): write straight through
+            self._write_direct(line)
+            return
+        if self._thread is None:
+            self._start()
+        try:
+            self._queue.put_nowait(line)
+        except queue.Full:
+            self.dropped += 1
+
+    def flush(self, timeout=5.0):
+        """Blocks until every line queued so far is in the file."""
+        if self._thread is None or not self._thread.is_alive():
+            return
+        marker = _FlushMarker()
+        try:
+            self._queue.put(marker, timeout=timeout)
+            marker.done.wait(timeout)
+        except queue.Full:
+            pass
+
+    def close(self, timeout=5.0):
+        if self._closed:
+            return
+        self.flush(timeout)
+        self._closed = True
+        if self._thread is not None and self._thread.is_alive():
+            try:
+                self._queue.put(None, timeout=timeout)
+            except queue.Full:
+                pass
+            self._thread.join(timeout)
+
+    def _start(self):
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="DebugFileLogger", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                item = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                self._flush_file()
+                continue
+            batch = [item]
+            while len(batch) < 1000: # Drain what is already queued, one write call for all of it
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            lines = []
+            for entry in batch:
+                if isinstance(entry, str):
+                    lines.append(entry)
+                    continue
+                self._write_lines(lines)
+                lines = []
+                self._flush_file()
+                if entry is None:
+                    self._close_file()
+                    return
+                entry.done.set()
+            self._write_lines(lines)
+
+    def _write_lines(self, lines):
+        if not lines:
+            return
+        text = "".join(lines)
+        if self.dropped:
+            text = f"[{datetime.now()}] [WARNING] Debug log queue was full, {self.dropped} line(s) dropped.\n" + text
+            self.dropped = 0
+        if self._file is None and not self._open_file():
+            sys.stderr.write(text)
+            return
+        try:
+            self._file.write(text)
+            self._size += len(text) if text.isascii() else len(text.encode("utf-8", "replace"))
+        except Exception as e:
+            print(f"[CRITICAL_ERROR] Global static log failed: {e}", file=sys.stderr)
+            self._close_file()
+            return
+        if self._size >= self.max_bytes or (self.max_age and time.time() - self._segment_started >= self.max_age):
+            self._rotate()
+
+    def _open_file(self):
+        for candidate in (self.path, _DEBUG_LOG_FALLBACK_PATH):
+            try:
+                self._file = open(candidate, "a", encoding="utf-8", errors="replace", buffering=64 * 1024)
+                if candidate != self.path:
+                    print(f"[CRITICAL_ERROR] Cannot write to main debug log, using '{candidate}'.", file=sys.stderr)
+                    self.path = candidate
+                self._size = self._file.tell()
+                self._segment_started = time.time()
+                return True
+            except OSError:
+                continue
+        return False
+
+    def _flush_file(self):
+        if self._file is not None:
+            try:
+                self._file.flush()
+            except OSError:
+                pass
+
+    def _close_file(self):
+        if self._file is not None:
+            try:
+                self._file.close()
+            except OSError:
+                pass
+            self._file = None
+
+    def _rotate(self):
+        """path -> path.1.gz, path.1.gz -> path.2.gz, ...; the oldest beyond backup_count is deleted."""
+        self._close_file()
+        try:
+            oldest = f"{self.path}.{self.backup_count}.gz"
+            if os.path.exists(oldest):
+                os.remove(oldest)
+            for index in range(self.backup_count - 1, 0, -1):
+                segment = f"{self.path}.{index}.gz"
+                if os.path.exists(segment):
+                    os.replace(segment, f"{self.path}.{index + 1}.gz")
+            if self.backup_count > 0:
+                rotated = f"{self.path}.1"
+                os.replace(self.path, rotated)
+                with open(rotated, "rb") as f_in, gzip.open(rotated + ".gz", "wb", compresslevel=6) as f_out:
+                    shutil.copyfileobj(f_in, f_out, 1024 * 1024)
+                os.remove(rotated)
+            else:
+                os.remove(self.path)
+        except OSError as e_rotate:
+            print(f"[CRITICAL_ERROR] Debug log rotation failed: {e_rotate}", file=sys.stderr)
+        self._open_file()
+
+    def _write_direct(self, line):
+        try:
+            with open(self.path, "a", encoding="utf-8") as f_log:
+                f_log.write(line)
+        except Exception as e:
+            print(f"[CRITICAL_ERROR] Global static log failed: {e} for message: {line.rstrip()}", file=sys.stderr)
+
+
+_debug_logger = DebugFileLogger()
+atexit.register(_debug_logger.close) # Lines queued at exit still reach the file
+
+
+def log_to_file_debug_globally(message, level="INFO"):
+    _debug_logger.log(message, level)
+
+
+def flush_debug_log(timeout=5.0):
+    _debug_logger.flush(timeout)
+
+
+def set_debug_log_level(level):
+    """Lines below this level (DEBUG < INFO < WARNING < ERROR < CRITICAL) are not written."""
+    _debug_logger.set_level(level)
+
+
+def debug_log_path():
+    return _debug_logger.path
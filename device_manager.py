@@ -0,0 +1,318 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import time
+import glob
+import shutil
+import threading
+import subprocess
+import traceback # For detailed error logging
+
+from adb_client import AdbHostClient
+from command_engine import global_options
+
+try:
+    import usb.core # Optional: pyusb, only needed to see MTK BROM/preloader ports outside Linux
+    PYUSB_AVAILABLE = True
+except ImportError:
+    PYUSB_AVAILABLE = False
+
+from debug_log import log_to_file_debug_globally # Queued, rotating debug log shared by every module
+
+MODE_ADB = "adb"
+MODE_FASTBOOT = "fastboot"
+MODE_MTK = "mtk"
+
+SLOW_SCAN_INTERVAL = 5.0  # Seconds between `fastboot devices` / MTK USB scans (adb is push-based)
+ADB_RETRY_INTERVAL = 2.0  # Seconds before re-subscribing when the adb server is gone
+
+MTK_USB_VENDOR_ID = 0x0E8D
+MTK_USB_MODES = {0x0003: "brom", 0x2000: "preloader", 0x2001: "da"} # MediaTek product ids seen by mtkclient
+
+EVENT_CONNECTED = "connected"
+EVENT_DISCONNECTED = "disconnected"
+EVENT_STATE_CHANGED = "state_changed"
+
+MTK_SERIAL_PREFIX = "mtk:" # MTK USB ports have no serial number, they are keyed by USB path
+ADB_HOST_COMMANDS = ("devices", "start-server", "kill-server", "version", "connect", "disconnect", "pair", "mdns")
+
+
+def scan_fastboot_devices(fastboot_path="fastboot"):
+    """Runs `fastboot devices` once. Returns [] when fastboot isn't installed."""
+    if not shutil.which(fastboot_path):
+        return []
+    try:
+        flags = subprocess.CREATE_NO_WINDOW if os.name == 'nt' else 0
+        output = subprocess.run([fastboot_path, "devices"], capture_output=True, text=True, timeout=5, creationflags=flags).stdout
+    except (OSError, subprocess.SubprocessError):
+        return []
+    devices = []
+    for line in output.splitlines():
+        parts = line.split()
+        if len(parts) >= 2:
+            devices.append({"serial": parts[0], "state": parts[1]})
+    return devices
+
+
+def scan_mtk_usb_devices():
+    """Lists MediaTek BROM/preloader/DA USB ports. Uses sysfs on Linux, pyusb elsewhere when installed."""
+    devices = []
+    sysfs_entries = glob.glob("/sys/bus/usb/devices/*/idVendor")
+    if sysfs_entries:
+        for vendor_file in sysfs_entries:
+            device_dir = os.path.dirname(vendor_file)
+            try:
+                with open(vendor_file) as f_vid, open(os.path.join(device_dir, "idProduct")) as f_pid:
+                    vendor_id, product_id = int(f_vid.read().strip(), 16), int(f_pid.read().strip(), 16)
+            except (OSError, ValueError):
+                continue
+            if vendor_id == MTK_USB_VENDOR_ID and product_id in MTK_USB_MODES:
+                usb_path = os.path.basename(device_dir)
+                devices.append({"serial": f"{MTK_SERIAL_PREFIX}{usb_path}", "state": MTK_USB_MODES[product_id], "usb": usb_path})
+    elif PYUSB_AVAILABLE:
+        try:
+            for dev in usb.core.find(find_all=True, idVendor=MTK_USB_VENDOR_ID):
+                if dev.idProduct in MTK_USB_MODES:
+                    usb_path = f"{dev.bus}-" + ".".join(str(p) for p in (getattr(dev, "port_numbers", None) or [dev.address]))
+                    devices.append({"serial": f"{MTK_SERIAL_PREFIX}{usb_path}", "state": MTK_USB_MODES[dev.idProduct], "usb": usb_path})
+        except Exception as e_usb: # No backend (libusb) installed, permissions, ...
+            log_to_file_debug_globally(f"MTK USB scan failed: {e_usb}", "DEBUG")
+    return devices
+
+
+class DeviceWatcher:
+    """Long-lived watcher that publishes device connect/disconnect/state-change events.
+
+    adb devices come from the adb server's track-devices stream, so plug events arrive as
+    soon as the server sees them; fastboot and MTK USB ports are scanned at a low cadence.
+    Subscribers are called from the watcher threads with one event dict:
+    {"event", "mode", "serial", "state", "previous_state", "info", "time"}.
+    """
+
+    def __init__(self, adb_client=None, fastboot_path="fastboot", slow_interval=SLOW_SCAN_INTERVAL):
+        self.adb_client = adb_client or AdbHostClient()
+        self.fastboot_path = fastboot_path
+        self.slow_interval = slow_interval
+        self._devices = {} # (mode, serial) -> info dict
+        self._subscribers = []
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._threads = []
+
+    def subscribe(self, callback):
+        with self._lock:
+            if callback not in self._subscribers:
+                self._subscribers.append(callback)
+
+    def unsubscribe(self, callback):
+        with self._lock:
+            if callback in self._subscribers:
+                self._subscribers.remove(callback)
+
+    def devices(self, mode=None):
+        """Current devices (info dicts with mode, serial, state, ...), optionally of one mode."""
+        with self._lock:
+            return sorted((dict(info) for (dev_mode, _), info in self._devices.items() if mode is None or dev_mode == mode),
+                          key=lambda info: (info["mode"], info["serial"]))
+
+    def start(self):
+        if self._threads:
+            return
+        self._stop_event.clear()
+        for target, name in ((self._adb_loop, "DeviceWatcher-adb"), (self._slow_scan_loop, "DeviceWatcher-slow")):
+            thread = threading.Thread(target=target, name=name, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        log_to_file_debug_globally("DeviceWatcher started.")
+
+    def stop(self):
+        self._stop_event.set()
+        self._threads = []
+
+    def _adb_loop(self):
+        failures = 0
+        while not self._stop_event.is_set():
+            try:
+                self.adb_client.track_devices(lambda devices: self._apply_scan(MODE_ADB, devices), self._stop_event)
+                failures = 0
+            except Exception as e_track:
+                if failures == 0: # Log the first failure of a streak, not every retry
+                    log_to_file_debug_globally(f"DeviceWatcher: adb track-devices unavailable: {e_track}", "WARNING")
+                failures += 1
+                self._apply_scan(MODE_ADB, []) # Server gone: no adb device is reachable
+                self._stop_event.wait(ADB_RETRY_INTERVAL)
+
+    def _slow_scan_loop(self):
+        while not self._stop_event.is_set():
+            try:
+                self._apply_scan(MODE_FASTBOOT, scan_fastboot_devices(self.fastboot_path))
+                self._apply_scan(MODE_MTK, scan_mtk_usb_devices())
+            except Exception as e_scan:
+                log_to_file_debug_globally(f"DeviceWatcher: slow scan failed: {e_scan}", "ERROR")
+                log_to_file_debug_globally(traceback.format_exc(), "ERROR_TRACE")
+            self._stop_event.wait(self.slow_interval)
+
+    def _apply_scan(self, mode, scanned_devices):
+        """Diffs one mode's device list against the previous one and publishes the differences."""
+        events = []
+        now = time.time()
+        with self._lock:
+            previous = {serial: info for (dev_mode, serial), info in self._devices.items() if dev_mode == mode}
+            current = {}
+            for device in scanned_devices:
+                info = dict(device, mode=mode)
+                current[info["serial"]] = info
+            for serial, info in current.items():
+                old_info = previous.get(serial)
+                if old_info is None:
+                    events.append({"event": EVENT_CONNECTED, "mode": mode, "serial": serial, "state": info.get("state"),
+                                   "previous_state": None, "info": info, "time": now})
+                elif old_info.get("state") != info.get("state"):
+                    events.append({"event": EVENT_STATE_CHANGED, "mode": mode, "serial": serial, "state": info.get("state"),
+                                   "previous_state": old_info.get("state"), "info": info, "time": now})
+                self._devices[(mode, serial)] = info
+            for serial, old_info in previous.items():
+                if serial not in current:
+                    del self._devices[(mode, serial)]
+                    events.append({"event": EVENT_DISCONNECTED, "mode": mode, "serial": serial, "state": None,
+                                   "previous_state": old_info.get("state"), "info": old_info, "time": now})
+            subscribers = list(self._subscribers)
+        for event in events:
+            log_to_file_debug_globally(f"Device {event['event']}: {event['mode']} {event['serial']} ({event['previous_state']} -> {event['state']})")
+            for callback in subscribers:
+                try:
+                    callback(event)
+                except Exception as e_cb:
+                    log_to_file_debug_globally(f"DeviceWatcher: subscriber failed: {e_cb}", "ERROR")
+
+
+def mode_for_command(command_list):
+    """Returns MODE_ADB, MODE_FASTBOOT or MODE_MTK from the command's executable, or None."""
+    if not isinstance(command_list, (list, tuple)) or not command_list:
+        return None
+    tool_name = os.path.basename(str(command_list[0])).lower()
+    if tool_name.startswith("adb"):
+        return MODE_ADB
+    if tool_name.startswith("fastboot"):
+        return MODE_FASTBOOT
+    if tool_name.startswith("mtk"):
+        return MODE_MTK
+    return None
+
+
+def address_command(command_list, serial):
+    """Adds `-s <serial>` to an adb/fastboot command that doesn't pick a device yet.
+
+    mtkclient commands are returned unchanged: mtkclient opens the first BROM/preloader port it finds.
+    """
+    mode = mode_for_command(command_list)
+    if not serial or mode not in (MODE_ADB, MODE_FASTBOOT) or serial.startswith(MTK_SERIAL_PREFIX):
+        return command_list
+    options = global_options(command_list) # Only the tool's own options: `shell pm list packages -s` picks no device
+    if any(flag in options for flag in ("-s", "-d", "-e", "-t")):
+        return command_list
+    args = [str(part) for part in command_list[1 + len(options):]]
+    if mode == MODE_ADB and args and args[0] in ADB_HOST_COMMANDS:
+        return command_list
+    return [command_list[0], "-s", serial] + list(command_list[1:])
+
+
+class DeviceManager:
+    """Registry of every adb, fastboot and MTK BROM/preloader device, plus the user's device selection.
+
+    Devices come from a DeviceWatcher. The selection is a list of serials, so a phone stays selected
+    while it reboots from adb to fastboot (same serial). Listeners are called with the device list
+    after every change, from the watcher threads.
+    """
+
+    def __init__(self, watcher):
+        self.watcher = watcher
+        self._selected = [] # Serials in the order the user picked them
+        self._listeners = []
+        self._lock = threading.Lock()
+        watcher.subscribe(self._on_device_event)
+
+    def devices(self, mode=None):
+        return self.watcher.devices(mode)
+
+    def get(self, serial, mode=None):
+        """Info dict (mode, serial, state, usb, model, ...) of one connected device, or None."""
+        for info in self.watcher.devices(mode):
+            if info["serial"] == serial:
+                return info
+        return None
+
+    def add_listener(self, callback):
+        with self._lock:
+            if callback not in self._listeners:
+                self._listeners.append(callback)
+
+    def remove_listener(self, callback):
+        with self._lock:
+            if callback in self._listeners:
+                self._listeners.remove(callback)
+
+    def select(self, serials):
+        with self._lock:
+            self._selected = list(dict.fromkeys(serials))
+        log_to_file_debug_globally(f"Device selection: {', '.join(self._selected) or 'none'}")
+
+    def selection(self):
+        with self._lock:
+            return list(self._selected)
+
+    def selected_serials(self, mode):
+        """Connected devices of one mode that are selected. With nothing selected, the only device of that mode."""
+        connected = [info["serial"] for info in self.watcher.devices(mode)]
+        selected = [serial for serial in self.selection() if serial in connected]
+        if not selected and len(connected) == 1:
+            return connected
+        return selected
+
+    def target_serial(self, mode, preferred=None):
+        """Serial a single-device command of this mode goes to.
+
+        preferred (the device a running sequence started on) wins when it fits the mode, so a
+        multi-step operation stays on its phone even if the selection changes meanwhile.
+        None means "let the tool pick", which is what the one-device case always did.
+        """
+        if mode is None:
+            return None
+        if preferred and (mode == MODE_MTK) == preferred.startswith(MTK_SERIAL_PREFIX):
+            return preferred
+        serials = self.selected_serials(mode)
+        return serials[0] if serials else None
+
+    def _on_device_event(self, event):
+        with self._lock:
+            listeners = list(self._listeners)
+        devices = self.watcher.devices()
+        for callback in listeners:
+            try:
+                callback(devices)
+            except Exception as e_cb:
+                log_to_file_debug_globally(f"DeviceManager: listener failed: {e_cb}", "ERROR")
+
+
+def _self_check():
+    from command_engine import lane_for_command # Imported here, only the check needs it
+
+    system_apps = ["adb", "shell", "pm", "list", "packages", "-f", "-s"]
+    addressed = address_command(system_apps, "SER1")
+    assert addressed == ["adb", "-s", "SER1"] + system_apps[1:], addressed
+    assert lane_for_command(addressed) == "SER1" and lane_for_command(system_apps) != "-f"
+    open_url = ["adb", "shell", "am", "start", "-a", "android.intent.action.VIEW", "-d", "https://example.com"]
+    addressed = address_command(open_url, "SER2")
+    assert addressed == ["adb", "-s", "SER2"] + open_url[1:], addressed
+    assert lane_for_command(addressed) == "SER2"
+    assert address_command(["adb", "-s", "OTHER", "shell", "ls"], "SER1") == ["adb", "-s", "OTHER", "shell", "ls"]
+    assert address_command(["adb", "-d", "reboot"], "SER1") == ["adb", "-d", "reboot"]
+    assert address_command(["adb", "devices"], "SER1") == ["adb", "devices"]
+    assert address_command(["fastboot", "flash", "boot", "-s.img"], "SER3") == ["fastboot", "-s", "SER3", "flash", "boot", "-s.img"]
+    assert address_command(["fastboot", "-S", "256M", "flash", "super", "super.img"], "SER3")[:3] == ["fastboot", "-s", "SER3"]
+    print("device_manager self-check OK")
+
+
+if __name__ == "__main__": # Addressing rules for adb/fastboot commands: python device_manager.py
+    _self_check()
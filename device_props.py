@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import re
+import time
+import threading
+
+PROPERTY_CACHE_TTL = 30.0 # Seconds a snapshot is trusted when no reboot/disconnect was seen
+DEFAULT_DEVICE_KEY = "default" # Cache key when the serial is unknown (adb/fastboot pick the only device)
+
+_GETPROP_LINE_RE = re.compile(r"^\[([^\]]+)\]: \[(.*)$")
+_GETVAR_SKIP_PREFIXES = ("all:", "finished.", "getvar:all", "okay", "< waiting", "waiting for")
+
+
+def iter_getprop_pairs(lines):
+    """Yields (key, value) from `getprop` output one line at a time. Multi-line values are joined with newlines."""
+    key, value_parts = None, []
+    for raw_line in lines:
+        line = raw_line.rstrip("\r\n")
+        if key is None:
+            match = _GETPROP_LINE_RE.match(line)
+            if not match:
+                continue
+            key, rest = match.group(1), match.group(2)
+            value_parts = [rest]
+        else:
+            value_parts.append(line)
+        if value_parts[-1].endswith("]"):
+            value_parts[-1] = value_parts[-1][:-1]
+            yield key, "\n".join(value_parts)
+            key, value_parts = None, []
+
+
+def iter_getvar_pairs(lines):
+    """Yields (key, value) from `fastboot getvar all` output ("(bootloader) key: value")."""
+    for raw_line in lines:
+        line = raw_line.strip()
+        if not line or line.lower().startswith(_GETVAR_SKIP_PREFIXES):
+            continue
+        if line.startswith("(bootloader)"):
+            line = line[len("(bootloader)"):].strip()
+        # "partition-size:boot: 0x4000000" -> key up to ": ", older bootloaders print "version:0.5"
+        key, sep, value = line.partition(": ")
+        if not sep or " " in key:
+            key, sep, value = line.rpartition(":")
+        if sep and key and " " not in key:
+            yield key, value.strip()
+
+
+class DevicePropertySnapshot:
+    """Every property of one device captured at one point in time, with typed accessors for the common ones."""
+
+    def __init__(self, serial, props, source="adb"):
+        self.serial = serial
+        self.props = props
+        self.source = source # "adb" (getprop) or "fastboot" (getvar all)
+        self.captured_at = time.monotonic()
+
+    @classmethod
+    def from_getprop_output(cls, serial, text):
+        return cls(serial, dict(iter_getprop_pairs(text.splitlines())), "adb")
+
+    @classmethod
+    def from_getvar_output(cls, serial, text):
+        return cls(serial, dict(iter_getvar_pairs(text.splitlines())), "fastboot")
+
+    def get(self, key, default=""):
+        return self.props.get(key, default)
+
+    def age(self):
+        return time.monotonic() - self.captured_at
+
+    @property
+    def model(self):
+        return self.get("ro.product.model")
+
+    @property
+    def brand(self):
+        return self.get("ro.product.brand")
+
+    @property
+    def manufacturer(self):
+        return self.get("ro.product.manufacturer")
+
+    @property
+    def android_version(self):
+        return self.get("ro.build.version.release")
+
+    @property
+    def sdk_level(self):
+        try:
+            return int(self.get("ro.build.version.sdk"))
+        except ValueError:
+            return None
+
+    @property
+    def security_patch(self):
+        return self.get("ro.build.version.security_patch")
+
+    @property
+    def is_secure(self):
+        return self.get("ro.secure", "1") != "0"
+
+    @property
+    def is_encrypted(self):
+        return self.get("ro.crypto.state") == "encrypted"
+
+    def display_dict(self, label_key_pairs, missing="N/A"):
+        """Maps [(display label, property key), ...] (e.g. DEVICE_INFO_PROPERTIES) to {label: value}."""
+        return {label: self.props.get(key, missing) for label, key in label_key_pairs}
+
+
+class DevicePropertyCache:
+    """Property snapshots per (serial, source) with a TTL. Invalidate on reboot or disconnect."""
+
+    def __init__(self, ttl=PROPERTY_CACHE_TTL):
+        self.ttl = ttl
+        self._snapshots = {}
+        self._lock = threading.Lock()
+
+    def get(self, serial, source="adb"):
+        """Returns a still-fresh snapshot or None."""
+        key = (serial or DEFAULT_DEVICE_KEY, source)
+        with self._lock:
+            snapshot = self._snapshots.get(key)
+            if snapshot is not None and snapshot.age() > self.ttl:
+                del self._snapshots[key]
+                snapshot = None
+            return snapshot
+
+    def put(self, snapshot):
+        with self._lock:
+            self._snapshots[(snapshot.serial or DEFAULT_DEVICE_KEY, snapshot.source)] = snapshot
+
+    def invalidate(self, serial=None):
+        """Drops every snapshot of one serial, or of all devices when serial is None."""
+        with self._lock:
+            if serial is None:
+                self._snapshots.clear()
+            else:
+                for key in [k for k in self._snapshots if k[0] in (serial, DEFAULT_DEVICE_KEY)]:
+                    del self._snapshots[key]
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Pulls single partitions out of a full flash dump (`mtk rf`) without going back to the device.
+
+Partitions are located through the dump's own GPT (gpt_index). Copies stay in the kernel:
+os.copy_file_range (which can share blocks on btrfs/XFS), then os.sendfile, and only then
+plain writes from an mmap of the dump. In-process readers (hashing, conversion) get
+memoryview windows over the mmap instead of reading the partition into memory. Compressed
+dumps (.cdump) work too; only the chunks of the wanted partitions are decompressed.
+"""
+
+import os
+import mmap
+import time
+import traceback # For detailed error logging
+
+from gpt_index import read_gpt
+from chunked_dump import ChunkedDumpReader, ChunkedDumpError, is_chunked_dump
+from debug_log import log_to_file_debug_globally # Queued, rotating debug log shared by every module
+
+EXTRACT_STEP_BYTES = 64 * 1024 * 1024 # Bytes per copy call, so progress and cancel are checked regularly
+MMAP_WINDOW_BYTES = 256 * 1024 * 1024 # Largest mapping held at once by iter_partition_chunks
+
+
+def _aligned(offset):
+    """Offset rounded down to what mmap accepts."""
+    return offset - offset % mmap.ALLOCATIONGRANULARITY
+
+
+def iter_partition_chunks(dump_path, start, size, chunk_size=EXTRACT_STEP_BYTES):
+    """Yields memoryviews over [start, start + size) of the dump, mapped one window at a time.
+
+    The views are only valid until the next one is requested; copy what has to be kept.
+    """
+    chunk_size = max(mmap.ALLOCATIONGRANULARITY, min(chunk_size, MMAP_WINDOW_BYTES))
+    with open(dump_path, "rb") as f_dump:
+        position, end = start, start + size
+        while position < end:
+            map_offset = _aligned(position)
+            length = min(end, position + chunk_size) - map_offset
+            with mmap.mmap(f_dump.fileno(), length, access=mmap.ACCESS_READ, offset=map_offset) as mapped:
+                with memoryview(mapped) as view, view[position - map_offset:] as window: # Released before the map closes
+                    yield window
+            position = map_offset + length
+
+
+def _copy_range(src_fd, dst_fd, offset, count):
+    """Copies count bytes from src_fd at offset to dst_fd's current position; returns bytes copied (0 at EOF)."""
+    if hasattr(os, "copy_file_range"):
+        try:
+            return os.copy_file_range(src_fd, dst_fd, count, offset)
+        except OSError: # Cross-filesystem on older kernels, unsupported filesystem...
+            pass
+    if hasattr(os, "sendfile"):
+        try:
+            return os.sendfile(dst_fd, src_fd, offset, count)
+        except OSError: # macOS only sends to sockets
+            pass
+    return -1
+
+
+def copy_byte_range(dump_path, start, size, output_path, progress_callback=None, cancel_event=None):
+    """Writes [start, start + size) of the dump to output_path. Returns the number of bytes written.
+
+    progress_callback(bytes_done, size) is called after every step. Stops early when cancel_event is set.
+    """
+    done = 0
+    use_kernel_copy = True
+    with open(dump_path, "rb") as f_dump, open(output_path, "wb") as f_out:
+        src_fd, dst_fd = f_dump.fileno(), f_out.fileno()
+        while done < size:
+            if cancel_event is not None and cancel_event.is_set():
+                break
+            step = min(EXTRACT_STEP_BYTES, size - done)
+            copied = _copy_range(src_fd, dst_fd, start + done, step) if use_kernel_copy else -1
+            if copied < 0: # No kernel copy here: write straight from the mapped dump
+                use_kernel_copy = False
+                copied = 0
+                for view in iter_partition_chunks(dump_path, start + done, step):
+                    f_out.write(view)
+                    copied += len(view)
+            if copied == 0:
+                break # Dump is shorter than the partition table says
+            done += copied
+            if progress_callback:
+                progress_callback(done, size)
+    return done
+
+
+def copy_chunked_range(reader, start, size, output_path, progress_callback=None, cancel_event=None):
+    """copy_byte_range() for a ChunkedDumpReader: chunks are decompressed in parallel, zero chunks left as holes."""
+    done = 0
+    with open(output_path, "wb") as f_out:
+        for offset, length, data in reader.iter_range(start, size):
+            if cancel_event is not None and cancel_event.is_set():
+                break
+            if data is not None:
+                f_out.seek(offset - start)
+                f_out.write(data)
+            done += length
+            if progress_callback:
+                progress_callback(done, size)
+        f_out.truncate(done)
+    return done
+
+
+def extract_partitions(dump_path, partition_names, output_dir, gpt=None, progress_callback=None, cancel_event=None):
+    """Extracts each named partition of a full dump to <output_dir>/<name>.bin.
+
+    gpt is a GptIndex for the dump (read from the dump itself when None). Returns one dict per
+    partition: partition, path, ok, message, size, seconds. progress_callback(name, done, total)
+    reports bytes within the current partition.
+    """
+    gpt = gpt or read_gpt(dump_path)
+    reader = ChunkedDumpReader(dump_path) if is_chunked_dump(dump_path) else None
+    dump_size = reader.size if reader is not None else os.path.getsize(dump_path)
+    results = []
+    for name in partition_names:
+        partition = gpt.get(name)
+        output_path = os.path.join(output_dir, f"{partition.name if partition else name}.bin")
+        result = {"partition": name, "path": output_path, "ok": False, "message": "", "size": 0, "seconds": 0.0}
+        results.append(result)
+        if cancel_event is not None and cancel_event.is_set():
+            result["message"] = "Cancelled"
+            continue
+        if partition is None:
+            result["message"] = "Not in the dump's partition table"
+            continue
+        if partition.end > dump_size:
+            result["message"] = f"Dump ends at 0x{dump_size:X}, partition needs up to 0x{partition.end:X} (partial dump?)"
+            continue
+        started = time.monotonic()
+        try:
+            partition_progress = (lambda done, total, name=name: progress_callback(name, done, total)) if progress_callback else None
+            if reader is not None:
+                written = copy_chunked_range(reader, partition.start, partition.size, output_path, partition_progress, cancel_event)
+            else:
+                written = copy_byte_range(dump_path, partition.start, partition.size, output_path, partition_progress, cancel_event)
+        except (OSError, ChunkedDumpError) as e_copy:
+            result["message"] = str(e_copy)
+            log_to_file_debug_globally(f"Extracting {name} from {dump_path} failed: {e_copy}", "ERROR")
+            log_to_file_debug_globally(traceback.format_exc(), "ERROR_TRACE")
+            continue
+        result.update(size=written, seconds=time.monotonic() - started)
+        if written == partition.size:
+            result.update(ok=True, message="Extracted")
+        else:
+            result["message"] = "Cancelled" if cancel_event is not None and cancel_event.is_set() else f"Only {written} of {partition.size} bytes copied"
+    if reader is not None:
+        reader.close()
+    log_to_file_debug_globally(f"Extracted {sum(1 for result in results if result['ok'])}/{len(results)} partitions from {dump_path}.")
+    return results
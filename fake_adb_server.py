@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Minimal stand-in for the adb server, used to check adb_client.AdbHostClient without hardware.
+
+Run it directly for a self-check:  python fake_adb_server.py
+"""
+
+import os
+import sys
+import struct
+import shutil
+import tempfile
+import threading
+import subprocess
+import socketserver
+
+SYNC_DATA_MAX = 64 * 1024
+FAKE_SERVER_VERSION = 41
+
+
+class _FakeAdbHandler(socketserver.BaseRequestHandler):
+
+    def _read_exact(self, size):
+        data = b""
+        while len(data) < size:
+            chunk = self.request.recv(size - len(data))
+            if not chunk:
+                raise ConnectionError("client closed")
+            data += chunk
+        return data
+
+    def _read_request(self):
+        return self._read_exact(int(self._read_exact(4), 16)).decode("utf-8")
+
+    def _okay(self, payload=None):
+        self.request.sendall(b"OKAY" + (self._lp(payload) if payload is not None else b""))
+
+    def _fail(self, message):
+        self.request.sendall(b"FAIL" + self._lp(message))
+
+    @staticmethod
+    def _lp(text):
+        data = text.encode("utf-8") if isinstance(text, str) else text
+        return b"%04x" % len(data) + data
+
+    def handle(self):
+        server = self.server.fake
+        device = None
+        try:
+            while True:
+                service = self._read_request()
+                server.requests.append(service)
+                if service == "host:version":
+                    return self._okay("%04x" % FAKE_SERVER_VERSION)
+                if service in ("host:devices", "host:devices-l"):
+                    return self._okay(server.devices_text(service.endswith("-l")))
+                if service in ("host:track-devices", "host:track-devices-l"):
+                    return self._track(server, service.endswith("-l"))
+                if service.startswith("host-serial:") and service.endswith(":get-state"):
+                    found = server.find(service[len("host-serial:"):-len(":get-state")])
+                    return self._okay(found["state"]) if found else self._fail("device not found")
+                if service == "host:get-state":
+                    found = server.find(None)
+                    return self._okay(found["state"]) if found else self._fail("no devices/emulators found")
+                if service.startswith("host:transport"):
+                    device = server.find(service.split(":", 2)[2] if service.startswith("host:transport:") else None)
+                    if not device:
+                        return self._fail("device not found")
+                    self._okay()
+                    continue
+                if device is None:
+                    return self._fail(f"unknown host service: {service}")
+                if service.startswith("shell:") or service.startswith("exec:"):
+                    return self._run(device, service.split(":", 1)[1], merge_stderr=service.startswith("shell:"))
+                if service == "sync:":
+                    self._okay()
+                    return self._sync(device)
+                return self._fail(f"unknown device service: {service}")
+        except (ConnectionError, OSError):
+            return
+
+    def _track(self, server, long_format):
+        with server.changed:
+            seen = server.generation
+            text = server.devices_text(long_format)
+        self._okay(text)
+        while not server.stopping:
+            with server.changed:
+                server.changed.wait(0.2)
+                if server.generation == seen:
+                    continue
+                seen = server.generation
+                text = server.devices_text(long_format)
+            self.request.sendall(self._lp(text))
+
+    def _run(self, device, command, merge_stderr):
+        self._okay()
+        completed = subprocess.run(["/bin/sh", "-c", command], cwd=device["root"], stdin=subprocess.DEVNULL,
+                                   stdout=subprocess.PIPE, stderr=subprocess.STDOUT if merge_stderr else subprocess.DEVNULL)
+        self.request.sendall(completed.stdout)
+
+    def _sync(self, device):
+        root = device["root"]
+        def local(path):
+            return os.path.join(root, path.lstrip("/"))
+        while True:
+            sync_id = self._read_exact(4)
+            length = struct.unpack("<I", self._read_exact(4))[0]
+            if sync_id == b"QUIT":
+                return
+            path = self._read_exact(length).decode("utf-8")
+            self.server.fake.sync_requests.append(sync_id.decode())
+            if sync_id == b"STAT":
+                try:
+                    st = os.stat(local(path))
+                    self.request.sendall(b"STAT" + struct.pack("<III", st.st_mode, st.st_size, int(st.st_mtime)))
+                except OSError:
+                    self.request.sendall(b"STAT" + struct.pack("<III", 0, 0, 0))
+            elif sync_id == b"LIST":
+                directory = local(path)
+                for name in sorted(os.listdir(directory)) if os.path.isdir(directory) else []:
+                    st = os.stat(os.path.join(directory, name))
+                    encoded = name.encode("utf-8")
+                    self.request.sendall(b"DENT" + struct.pack("<IIII", st.st_mode, st.st_size, int(st.st_mtime), len(encoded)) + encoded)
+                self.request.sendall(b"DONE" + struct.pack("<IIII", 0, 0, 0, 0))
+            elif sync_id == b"RECV":
+                try:
+                    with open(local(path), "rb") as f_in:
+                        while True:
+                            chunk = f_in.read(SYNC_DATA_MAX)
+                            if not chunk:
+                                break
+                            self.request.sendall(b"DATA" + struct.pack("<I", len(chunk)) + chunk)
+                    self.request.sendall(b"DONE" + struct.pack("<I", 0))
+                except OSError as e_open:
+                    message = str(e_open).encode("utf-8")
+                    self.request.sendall(b"FAIL" + struct.pack("<I", len(message)) + message)
+            elif sync_id == b"SEND":
+                remote_path = path.rsplit(",", 1)[0]
+                os.makedirs(os.path.dirname(local(remote_path)), exist_ok=True)
+                with open(local(remote_path), "wb") as f_out:
+                    while True:
+                        chunk_id = self._read_exact(4)
+                        value = struct.unpack("<I", self._read_exact(4))[0]
+                        if chunk_id == b"DONE":
+                            break
+                        f_out.write(self._read_exact(value))
+                self.request.sendall(b"OKAY" + struct.pack("<I", 0))
+            else:
+                message = b"unsupported sync request"
+                self.request.sendall(b"FAIL" + struct.pack("<I", len(message)) + message)
+
+
+class _ThreadingServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class FakeAdbServer:
+    """Serves the adb host protocol on localhost for a list of fake devices.
+
+    Each device is a dict with serial, state, model and root; root is a local directory that
+    sync: reads and writes and where shell:/exec: commands run (through the local /bin/sh).
+    """
+
+    def __init__(self, devices=None, host="127.0.0.1", port=0):
+        self._devices = list(devices or [])
+        self.generation = 0
+        self.changed = threading.Condition()
+        self.stopping = False
+        self.requests = []
+        self.sync_requests = []
+        self._server = _ThreadingServer((host, port), _FakeAdbHandler)
+        self._server.fake = self
+        self.host, self.port = self._server.server_address
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True, name="FakeAdbServer")
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.stopping = True
+        with self.changed:
+            self.changed.notify_all()
+        self._server.shutdown()
+        self._server.server_close()
+
+    def set_devices(self, devices):
+        """Replaces the device list and wakes track-devices clients."""
+        with self.changed:
+            self._devices = list(devices)
+            self.generation += 1
+            self.changed.notify_all()
+
+    def find(self, serial):
+        ready = [d for d in self._devices if serial is None or d["serial"] == serial]
+        return ready[0] if len(ready) == 1 else None
+
+    def devices_text(self, long_format):
+        lines = []
+        for idx, dev in enumerate(self._devices, start=1):
+            if long_format:
+                lines.append(f"{dev['serial']:<22} {dev['state']} usb:1-{idx} product:{dev.get('model', 'fake')} "
+                             f"model:{dev.get('model', 'fake')} device:{dev.get('model', 'fake')} transport_id:{idx}")
+            else:
+                lines.append(f"{dev['serial']}\t{dev['state']}")
+        return "".join(line + "\n" for line in lines)
+
+
+def _self_check():
+    from adb_client import AdbHostClient, AdbProtocolError # Imported here so the fake server has no hard dependency
+
+    work_dir = tempfile.mkdtemp(prefix="fake_adb_")
+    try:
+        root = os.path.join(work_dir, "device")
+        os.makedirs(os.path.join(root, "sdcard"))
+        server = FakeAdbServer([{"serial": "FAKE001", "state": "device", "model": "Pixel", "root": root}]).start()
+        client = AdbHostClient(port=server.port, adb_path=None)
+
+        assert client.version() == FAKE_SERVER_VERSION
+        devices = client.devices()
+        assert devices[0]["serial"] == "FAKE001" and devices[0]["state"] == "device" and devices[0]["model"] == "Pixel", devices
+        assert client.get_state("FAKE001") == "device"
+        try:
+            client.get_state("MISSING")
+            raise AssertionError("get-state of a missing device should fail")
+        except AdbProtocolError:
+            pass
+
+        result = client.shell("FAKE001", ["echo", "hello;", "exit", "3"])
+        assert result == {"stdout": "hello\n", "stderr": "", "return_code": 3}, result
+        assert client.exec_out("FAKE001", "printf abc") == b"abc"
+
+        payload = os.urandom(200 * 1024 + 7) # Several DATA chunks
+        local_in = os.path.join(work_dir, "in.bin")
+        local_out = os.path.join(work_dir, "out.bin")
+        with open(local_in, "wb") as f_in:
+            f_in.write(payload)
+        assert client.push("FAKE001", local_in, "/sdcard/test.bin") == len(payload)
+        assert client.stat("FAKE001", "/sdcard/test.bin")["size"] == len(payload)
+        assert client.stat("FAKE001", "/sdcard/nope") is None
+        assert [e["name"] for e in client.list_dir("FAKE001", "/sdcard")] == ["test.bin"]
+        assert client.pull("FAKE001", "/sdcard/test.bin", local_out) == len(payload)
+        with open(local_out, "rb") as f_out:
+            assert f_out.read() == payload
+        assert server.requests.count("sync:") == 1, "sync connection should be reused"
+
+        updates = []
+        stop_event = threading.Event()
+        tracker = threading.Thread(target=client.track_devices, args=(lambda devs: updates.append(devs), stop_event), daemon=True)
+        tracker.start()
+        for _ in range(50): # Initial list first, then the change
+            if updates:
+                break
+            threading.Event().wait(0.05)
+        server.set_devices([])
+        for _ in range(50):
+            if len(updates) >= 2:
+                break
+            threading.Event().wait(0.05)
+        stop_event.set()
+        tracker.join(2)
+        assert updates[0][0]["serial"] == "FAKE001" and updates[-1] == [], updates
+
+        client.close()
+        server.stop()
+        print("FakeAdbServer self-check OK")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    sys.exit(_self_check())
@@ -7,13 +7,19 @@ import tkinter as tk
 from tkinter import ttk, messagebox, filedialog, simpledialog
 import subprocess
 import threading
-import sqlite3
 from datetime import datetime
-import queue # For passing results from thread to main
+from collections import deque
 import traceback # For detailed error logging
 import webbrowser # For opening URL
 import csv
 import re # For parsing App Manager output
+from command_engine import CommandExecutor, ResultDispatcher, StreamingOutput, lane_for_command, DEFAULT_LANE, PRIORITY_INTERACTIVE, PRIORITY_NORMAL, PRIORITY_BULK # Pooled per-device command lanes
+from adb_client import AdbHostClient, AdbProtocolError, AdbShellSessionPool, shell_args_for_command # adb server protocol + persistent shells
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from device_props import DevicePropertyCache, DevicePropertySnapshot # getprop/getvar snapshots cached per serial
+from progress_parsers import parser_for_command, format_rate, format_eta # Bytes/rate/ETA from streamed tool output
+from oplog_db import DBLogger, operation_status_for_result, EXPORT_FORMAT_CSV, EXPORT_FORMAT_JSONL # operation_log.db, written by a batching background thread
+from device_manager import DeviceWatcher, DeviceManager, MODE_ADB, MODE_FASTBOOT, EVENT_CONNECTED, mode_for_command, address_command # Push-based device tracking, multi-device registry
 
 try:
     from PIL import Image, ImageTk
@@ -22,15 +28,8 @@ except ImportError:
     PIL_AVAILABLE = False
     print("Pillow library not found. Please install it: pip install Pillow. Image features will be limited.")
 
-# Static debug log path and function, defined early for global use
-_DEBUG_LOG_PATH = "application_debug_log.txt"
-
-def log_to_file_debug_globally(message, level="INFO"):
-    try:
-        with open(_DEBUG_LOG_PATH, "a", encoding="utf-8") as f_log:
-            f_log.write(f"[{datetime.now()}] [{level}] {message}\n")
-    except Exception as e:
-        print(f"[CRITICAL_ERROR] Global static log failed: {e} for message: {message}", file=sys.stderr)
+# Debug log: queued, rotated and gzipped by debug_log's background writer, same call signature as before
+from debug_log import log_to_file_debug_globally, debug_log_path
 
 log_to_file_debug_globally("Script execution started. Global logger active.")
 
@@ -86,11 +85,24 @@ LABELS = {
         "adb_status_connected": "ADB: Connected",
         "adb_status_not_connected": "ADB: Not Connected",
         "adb_status_device_id_prefix": "Device ID: ",
+        "devices_label": "Devices (Ctrl/Shift-click to select several):",
+        "device_col_mode": "Mode", "device_col_serial": "Serial", "device_col_state": "State", "device_col_usb": "USB", "device_col_model": "Model",
+        "adb_status_more_devices": "more",
         "search_log_label": "Search Log:",
         "find_button": "Find",
         "all_button": "All",
         "export_button": "Export to TXT",
         "btn_export_csv": "Export to CSV",
+        "btn_export_jsonl": "Export to JSONL",
+        "btn_log_history": "Log History",
+        "log_history_title": "Operation Log History",
+        "log_history_device_label": "Device:",
+        "log_history_col_timestamp": "Time", "log_history_col_tag": "Type", "log_history_col_device": "Device", "log_history_col_message": "Message",
+        "log_history_rows_shown": "{count} rows shown",
+        "export_progress": "Exporting... {count} rows",
+        "export_done_title": "Export Complete",
+        "export_done_message": "{count} rows written to:\n{path}",
+        "export_failed_title": "Export Failed",
         "btn_cancel_operation": "Cancel Operation",
         "cancel_operation_warning_title": "Cancel Operation Warning",
         "cancel_operation_warning_message": "Stopping an operation abruptly might leave the device in an unstable state or cause issues. Are you sure you want to attempt to cancel?",
@@ -260,11 +272,24 @@ LABELS = {
         "adb_status_connected": "ADB: متصل",
         "adb_status_not_connected": "ADB: غير متصل",
         "adb_status_device_id_prefix": "معرف الجهاز: ",
+        "devices_label": "الأجهزة (Ctrl/Shift للنقر لتحديد أكثر من جهاز):",
+        "device_col_mode": "الوضع", "device_col_serial": "الرقم التسلسلي", "device_col_state": "الحالة", "device_col_usb": "USB", "device_col_model": "الطراز",
+        "adb_status_more_devices": "أجهزة أخرى",
         "search_log_label": "بحث في السجل:",
         "find_button": "بحث",
         "all_button": "الكل",
         "export_button": "تصدير إلى TXT",
         "btn_export_csv": "تصدير إلى CSV",
+        "btn_export_jsonl": "تصدير إلى JSONL",
+        "btn_log_history": "سجل العمليات",
+        "log_history_title": "سجل العمليات السابقة",
+        "log_history_device_label": "الجهاز:",
+        "log_history_col_timestamp": "الوقت", "log_history_col_tag": "النوع", "log_history_col_device": "الجهاز", "log_history_col_message": "الرسالة",
+        "log_history_rows_shown": "تم عرض {count} سطر",
+        "export_progress": "جاري التصدير... {count} سطر",
+        "export_done_title": "اكتمل التصدير",
+        "export_done_message": "تمت كتابة {count} سطر إلى:\n{path}",
+        "export_failed_title": "فشل التصدير",
         "btn_cancel_operation": "إلغاء العملية",
         "cancel_operation_warning_title": "تحذير إلغاء العملية",
         "cancel_operation_warning_message": "إيقاف العملية بشكل مفاجئ قد يترك الجهاز في حالة غير مستقرة أو يسبب مشاكل. هل أنت متأكد أنك تريد محاولة الإلغاء؟",
@@ -451,6 +476,9 @@ DEVICE_STATUS_FONT_VALUE = ("Segoe UI", 9)
 LABEL_FONT = ("Segoe UI", 9, "bold")
 BTN_FONT = ("Segoe UI", 10, "bold") # Increased button font size slightly for "inflated" look
 LOG_FONT = ("Consolas", 11)
+LOG_PANEL_MAX_LINES = 5000 # Lines kept in the log widget, the full history is in operation_log.db
+LOG_PANEL_FLUSH_MS = 50    # Lines logged within this window are inserted together
+LOG_HISTORY_PAGE_ROWS = 500 # Rows the log history window fetches per page
 log_to_file_debug_globally("FONTS defined.")
 
 app_images = {}
@@ -547,101 +575,6 @@ class ModernButton(tk.Button):
                         fg=kwargs.get('disabledforeground', theme.get("NOTEBOOK_TAB_FG", "#AAB8C5")))
 
 
-class DBLogger:
-    def __init__(self, dbfile=None, tk_root=None):
-        log_to_file_debug_globally("DBLogger __init__ started.")
-        if dbfile is None:
-            try:
-                base_dir = os.path.dirname(os.path.abspath(sys.argv[0]))
-                dbfile = os.path.join(base_dir, "operation_log.db")
-                os.makedirs(os.path.dirname(dbfile), exist_ok=True)
-                with open(dbfile, "a") as f_db_check:
-                    os.utime(dbfile, None)
-                log_to_file_debug_globally(f"DBLogger: DB file path set to: {dbfile}")
-            except Exception as e_db_path1:
-                log_to_file_debug_globally(f"DBLogger: Failed to create DB at primary path {dbfile}: {e_db_path1}", "WARNING")
-                try:
-                    user_dir = os.path.expanduser("~")
-                    dbfile_fallback = os.path.join(user_dir, ".UltimatUnlockTool", "operation_log.db")
-                    os.makedirs(os.path.dirname(dbfile_fallback), exist_ok=True)
-                    with open(dbfile_fallback, "a") as f_db_check_fb:
-                         os.utime(dbfile_fallback, None)
-                    dbfile = dbfile_fallback
-                    log_to_file_debug_globally(f"DBLogger: DB file path set to fallback: {dbfile}")
-                except Exception as e_db_path2:
-                    log_to_file_debug_globally(f"DBLogger: Failed to create DB at fallback path {dbfile_fallback}: {e_db_path2}", "ERROR")
-                    dbfile = ":memory:"
-                    log_to_file_debug_globally("DBLogger: Using in-memory database as last resort.")
-
-        self.dbfile = dbfile
-        self.tk_root = tk_root
-        self.conn = None
-        self.cursor = None
-
-        try:
-            self.conn = sqlite3.connect(self.dbfile, check_same_thread=False)
-            self.cursor = self.conn.cursor()
-            self.cursor.execute('''CREATE TABLE IF NOT EXISTS logs
-                                (id INTEGER PRIMARY KEY AUTOINCREMENT,
-                                 timestamp TEXT,
-                                 tag TEXT,
-                                 message TEXT)''')
-            self.conn.commit()
-            log_to_file_debug_globally("DBLogger: Database initialized/checked.")
-        except Exception as e_db_init:
-            log_to_file_debug_globally(f"DBLogger: Database initialization error: {e_db_init}", "ERROR")
-            if self.conn:
-                self.conn.close()
-            self.conn = None
-            self.cursor = None
-        log_to_file_debug_globally("DBLogger __init__ finished.")
-
-    def add(self, message, tag="info"):
-        if not self.conn or not self.cursor:
-            log_to_file_debug_globally(f"DBLogger: Cannot add log, database not initialized. Message: {message}", "WARNING")
-            return
-
-        try:
-            timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            self.cursor.execute("INSERT INTO logs (timestamp, tag, message) VALUES (?, ?, ?)",
-                               (timestamp, tag, message))
-            self.conn.commit()
-        except Exception as e_add:
-            log_to_file_debug_globally(f"DBLogger: Error adding log: {e_add}. Message: {message}", "ERROR")
-
-    def search(self, term):
-        if not self.conn or not self.cursor:
-            log_to_file_debug_globally(f"DBLogger: Cannot search, database not initialized. Term: {term}", "WARNING")
-            return []
-
-        try:
-            self.cursor.execute("SELECT timestamp, tag, message FROM logs WHERE message LIKE ? ORDER BY id DESC LIMIT 1000",
-                               (f"%{term}%",))
-            return self.cursor.fetchall()
-        except Exception as e_search:
-            log_to_file_debug_globally(f"DBLogger: Error searching logs: {e_search}. Term: {term}", "ERROR")
-            return []
-
-    def all(self, limit=1000):
-        if not self.conn or not self.cursor:
-            log_to_file_debug_globally("DBLogger: Cannot fetch all, database not initialized.", "WARNING")
-            return []
-
-        try:
-            self.cursor.execute("SELECT timestamp, tag, message FROM logs ORDER BY id DESC LIMIT ?", (limit,))
-            return self.cursor.fetchall()
-        except Exception as e_all:
-            log_to_file_debug_globally(f"DBLogger: Error fetching all logs: {e_all}", "ERROR")
-            return []
-
-    def close(self):
-        if self.conn:
-            try:
-                self.conn.close()
-                log_to_file_debug_globally("DBLogger: Database connection closed.")
-            except Exception as e_close:
-                log_to_file_debug_globally(f"DBLogger: Error closing database: {e_close}", "ERROR")
-
 class TextContextMenu:
     def __init__(self, widget, tk_root, labels):
         self.widget = widget
@@ -819,8 +752,14 @@ class LogPanel(tk.Frame):
             self.text.tag_configure(tag_name, foreground=theme[color_key], font=font_config)
 
         self.db_logger = db_logger
+        self._pending = deque(maxlen=LOG_PANEL_MAX_LINES) # Ring buffer: lines waiting for the next flush
+        self._pending_lock = threading.Lock()
+        self._flush_scheduled = False
+        self._clear_requested = False
         self.progress_bar = ProgressBarManager(self, theme)
         self.progress_bar.pack(fill=tk.X, padx=6)
+        self.progress_status = tk.Label(self, text="", anchor=tk.W, font=LOG_FONT, bg=theme["BG"], fg=theme.get("FG", "#263238"))
+        self.progress_status.pack(fill=tk.X, padx=16) # Bytes done, rate and ETA of the running transfer
 
         controls_frame = tk.Frame(self, bg=theme["BG"])
         controls_frame.pack(fill=tk.X, padx=6, pady=(6,10))
@@ -830,75 +769,102 @@ class LogPanel(tk.Frame):
                                            theme=theme, width=20, height=1, icon_path=None, state=tk.DISABLED,
                                            bg=theme.get("GROUP_BG"), fg=theme.get("NOTEBOOK_TAB_FG")) # Default disabled colors
         self.cancel_button.pack(side=tk.LEFT, padx=(0, 4))
+        self.history_button = ModernButton(controls_frame, labels.get("btn_log_history", "Log History"), command=self.open_log_history,
+                                           theme=theme, width=14, height=1, state=tk.NORMAL if db_logger else tk.DISABLED)
+        self.history_button.pack(side=tk.LEFT, padx=(0, 4))
         if self.app_controller:
             self.app_controller.set_cancel_button_reference(self.cancel_button)
 
-    def clear_log(self):
-        if not self.winfo_exists(): return
-        def __clear():
-            if not self.text.winfo_exists(): return
-            self.text.config(state=tk.NORMAL)
-            self.text.delete("1.0", tk.END)
-            self.text.config(state=tk.DISABLED)
-
-        if self.tk_root and hasattr(self.tk_root, 'after') and self.tk_root.winfo_exists():
-            if threading.current_thread() is not threading.main_thread():
-                self.tk_root.after(0, __clear)
-            else:
-                __clear()
-        else:
-            __clear()
-
+    def open_log_history(self, device_serial=None):
+        if not self.db_logger: return
+        LogHistoryWindow(self.tk_root or self, self.db_logger, self.theme, self.labels, device_serial=device_serial)
 
-    def log(self, message, tag="info", indent=0, include_timestamp=False):
+    def set_progress_status(self, text):
         if not self.winfo_exists(): return
+        self.progress_status.config(text=text)
 
-        def __log_to_widget():
-            if not self.text.winfo_exists(): return
-            self.text.config(state=tk.NORMAL)
+    def clear_log(self):
+        if not self.winfo_exists(): return
+        with self._pending_lock: # Lines queued before the clear are dropped, later ones are kept
+            self._pending.clear()
+            self._clear_requested = True
+        self._schedule_flush()
+
+    def _queue_lines(self, lines):
+        """Queues lines, each a list of (text, tag) segments, for the next flush. Safe from any thread."""
+        with self._pending_lock:
+            self._pending.extend(lines)
+        self._schedule_flush()
+
+    def _schedule_flush(self):
+        with self._pending_lock:
+            if self._flush_scheduled:
+                return
+            self._flush_scheduled = True
+        try:
+            (self.tk_root or self).after(LOG_PANEL_FLUSH_MS, self._flush_pending)
+        except (tk.TclError, RuntimeError): # Window is being destroyed
+            pass
 
-            timestamp_prefix = f"[{datetime.now().strftime('%H:%M:%S')}] " if include_timestamp else ""
+    def _flush_pending(self):
+        """Writes everything queued since the last flush with one Text.insert, then trims the oldest lines."""
+        with self._pending_lock:
+            lines = list(self._pending)
+            self._pending.clear()
+            clear_first, self._clear_requested = self._clear_requested, False
+            self._flush_scheduled = False
+        if not self.text.winfo_exists(): return
 
-            prefix_map = {"cmd": "[CMD]", "success": "[OK]", "error": "[ERR]", "fail": "[FAIL]", "warning": "[WARN]", "info": "[INFO]"}
-            log_prefix_tag = prefix_map.get(tag, "[LOG]")
+        self.text.config(state=tk.NORMAL)
+        if clear_first:
+            self.text.delete("1.0", tk.END)
+        if lines:
+            insert_args = [] # text1, tags1, text2, tags2, ... with neighbouring segments of one tag merged
+            run_parts, run_tag = [], None
+            for segments in lines:
+                for segment_text, segment_tag in segments:
+                    if segment_tag != run_tag and run_parts:
+                        insert_args.extend(("".join(run_parts), run_tag or ()))
+                        run_parts = []
+                    run_tag = segment_tag
+                    run_parts.append(segment_text)
+            if run_parts:
+                insert_args.extend(("".join(run_parts), run_tag or ()))
+            self.text.insert(tk.END, *insert_args)
+
+            line_count = int(self.text.index("end-1c").split(".")[0]) - 1
+            if line_count > LOG_PANEL_MAX_LINES: # Older lines stay in operation_log.db
+                self.text.delete("1.0", f"{line_count - LOG_PANEL_MAX_LINES + 1}.0")
+            self.text.see(tk.END)
+        self.text.config(state=tk.DISABLED)
 
-            actual_log_prefix = ""
-            if not tag.startswith("device_info_") and tag != "connect_server_success_tag":
-                 actual_log_prefix = f"{log_prefix_tag} "
 
-            indent_space = "  " * indent
+    def log(self, message, tag="info", indent=0, include_timestamp=False, operation=None):
+        if not self.winfo_exists(): return
 
-            if message == self.labels.get("log_connect_server_success", "Connect to server...successful") and tag == "info":
-                 full_log_message = f"{indent_space}{message}\n"
-            else:
-                 full_log_message = f"{timestamp_prefix}{indent_space}{actual_log_prefix}{message}\n"
+        timestamp_prefix = f"[{datetime.now().strftime('%H:%M:%S')}] " if include_timestamp else ""
 
-            idx = self.text.index(tk.END + "-1c linestart")
-            self.text.insert(tk.END, full_log_message)
-            self.text.tag_add(tag, idx, f"{idx} + {len(full_log_message)-1}c")
+        prefix_map = {"cmd": "[CMD]", "success": "[OK]", "error": "[ERR]", "fail": "[FAIL]", "warning": "[WARN]", "info": "[INFO]"}
+        log_prefix_tag = prefix_map.get(tag, "[LOG]")
 
-            self.text.see(tk.END)
-            self.text.config(state=tk.DISABLED)
+        actual_log_prefix = ""
+        if not tag.startswith("device_info_") and tag != "connect_server_success_tag":
+             actual_log_prefix = f"{log_prefix_tag} "
 
-            if self.db_logger: self.db_logger.add(message, tag)
+        indent_space = "  " * indent
 
-        if self.tk_root and hasattr(self.tk_root, 'after') and self.tk_root.winfo_exists():
-            if threading.current_thread() is not threading.main_thread():
-                self.tk_root.after(0, __log_to_widget)
-            else:
-                __log_to_widget()
+        if message == self.labels.get("log_connect_server_success", "Connect to server...successful") and tag == "info":
+             full_log_message = f"{indent_space}{message}\n"
         else:
-             __log_to_widget()
+             full_log_message = f"{timestamp_prefix}{indent_space}{actual_log_prefix}{message}\n"
+
+        self._queue_lines([[(full_log_message, tag)]]) # Shown with the next coalesced flush, not one after() per line
+        if self.db_logger: self.db_logger.add(message, tag, operation) # operation: the OperationRecord this line belongs to
 
     def log_device_info_block(self, device_info_dict):
         if not self.winfo_exists() or not self.text.winfo_exists(): return
 
-        self.text.config(state=tk.NORMAL)
-
-        connect_msg = f"{self.labels.get('log_connect_server_success', 'Connect to server...successful')}\n"
-        idx_connect = self.text.index(tk.END + "-1c linestart")
-        self.text.insert(tk.END, connect_msg)
-        self.text.tag_add("info", idx_connect, f"{idx_connect} + {len(connect_msg)-1}c")
+        lines = [[(f"{self.labels.get('log_connect_server_success', 'Connect to server...successful')}\n", "info")]]
 
         max_label_len = 0
         if device_info_dict:
@@ -920,22 +886,134 @@ class LogPanel(tk.Frame):
                 elif "Rooted!" in value_text_display: value_tag = "success"
 
             formatted_label = f"{label_text}:".ljust(max_label_len if max_label_len > 0 else len(label_text) + 2)
-            line_content = f"  {formatted_label} {value_text_display}\n"
+            lines.append([("  ", None), (formatted_label, "device_info_label"), (" ", None),
+                          (value_text_display, value_tag), ("\n", None)])
 
-            line_start_idx = self.text.index(tk.END + "-1c linestart")
-            self.text.insert(tk.END, line_content)
+        self._queue_lines(lines) # Same queue as log(), so the block stays in order with the lines around it
 
-            label_part_start = self.text.index(f"{line_start_idx} + 2c")
-            label_part_end = self.text.index(f"{label_part_start} + {len(formatted_label)}c")
-            self.text.tag_add("device_info_label", label_part_start, label_part_end)
 
-            value_part_start = self.text.index(f"{label_part_end} + 1c")
-            value_part_end = self.text.index(f"{value_part_start} + {len(value_text_display)}c")
-            self.text.tag_add(value_tag, value_part_start, value_part_end)
+class LogHistoryWindow(tk.Toplevel):
+    """Browses operation_log.db newest first. Older rows are fetched by id as the list is scrolled to its end."""
 
-        if self.text.winfo_exists():
-            self.text.see(tk.END)
-            self.text.config(state=tk.DISABLED)
+    def __init__(self, parent, db_logger, theme, labels, device_serial=None):
+        super().__init__(parent)
+        self.db_logger = db_logger
+        self.theme = theme
+        self.labels = labels
+        self._filters = {}
+        self._last_id = None # Id of the oldest row shown; the next page starts below it
+        self._exhausted = False
+        self._row_count = 0
+        self._page_scheduled = False
+        self._export_cancel = threading.Event()
+
+        self.title(labels.get("log_history_title", "Operation Log History"))
+        self.geometry("920x540")
+        self.configure(bg=theme["BG"])
+        self.protocol("WM_DELETE_WINDOW", self._on_close)
+
+        search_frame = tk.Frame(self, bg=theme["BG"])
+        search_frame.pack(fill=tk.X, padx=8, pady=(8,4))
+        tk.Label(search_frame, text=labels.get("search_log_label", "Search Log:"), font=LABEL_FONT, bg=theme["BG"], fg=theme["FG"]).pack(side=tk.LEFT)
+        self.search_var = tk.StringVar()
+        search_entry = tk.Entry(search_frame, textvariable=self.search_var, width=28)
+        search_entry.pack(side=tk.LEFT, padx=(4,10))
+        search_entry.bind("<Return>", lambda event: self.apply_filters())
+        tk.Label(search_frame, text=labels.get("log_history_device_label", "Device:"), font=LABEL_FONT, bg=theme["BG"], fg=theme["FG"]).pack(side=tk.LEFT)
+        self.device_var = tk.StringVar(value=device_serial or "")
+        device_entry = tk.Entry(search_frame, textvariable=self.device_var, width=18)
+        device_entry.pack(side=tk.LEFT, padx=(4,10))
+        device_entry.bind("<Return>", lambda event: self.apply_filters())
+        ModernButton(search_frame, labels.get("find_button", "Find"), command=self.apply_filters, theme=theme, width=8).pack(side=tk.LEFT, padx=2)
+        ModernButton(search_frame, labels.get("all_button", "All"), command=self.show_all, theme=theme, width=8).pack(side=tk.LEFT, padx=2)
+        ModernButton(search_frame, labels.get("btn_export_jsonl", "Export to JSONL"), command=lambda: self.export(EXPORT_FORMAT_JSONL), theme=theme, width=16).pack(side=tk.RIGHT, padx=2)
+        ModernButton(search_frame, labels.get("btn_export_csv", "Export to CSV"), command=lambda: self.export(EXPORT_FORMAT_CSV), theme=theme, width=16).pack(side=tk.RIGHT, padx=2)
+
+        tree_frame = tk.Frame(self, bg=theme["BG"])
+        tree_frame.pack(fill=tk.BOTH, expand=True, padx=8)
+        columns = ("timestamp", "tag", "device", "message")
+        self.tree = ttk.Treeview(tree_frame, columns=columns, show="headings", selectmode="browse")
+        for column, width in zip(columns, (150, 70, 150, 520)):
+            self.tree.heading(column, text=labels.get(f"log_history_col_{column}", column.title()))
+            self.tree.column(column, width=width, stretch=(column == "message"))
+        scrollbar = ttk.Scrollbar(tree_frame, orient=tk.VERTICAL, command=self.tree.yview)
+        self.tree.configure(yscrollcommand=lambda first, last: self._on_tree_scrolled(scrollbar, first, last))
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+
+        self.status_label = tk.Label(self, text="", anchor=tk.W, font=LABEL_FONT, bg=theme["BG"], fg=theme["FG"])
+        self.status_label.pack(fill=tk.X, padx=8, pady=(4,8))
+        self.apply_filters()
+
+    def apply_filters(self):
+        self._filters = {}
+        if self.search_var.get().strip():
+            self._filters["term"] = self.search_var.get().strip()
+        if self.device_var.get().strip():
+            self._filters["device_serial"] = self.device_var.get().strip()
+        self.tree.delete(*self.tree.get_children())
+        self._last_id, self._exhausted, self._row_count = None, False, 0
+        self.load_next_page()
+
+    def show_all(self):
+        self.search_var.set("")
+        self.device_var.set("")
+        self.apply_filters()
+
+    def load_next_page(self):
+        self._page_scheduled = False
+        if self._exhausted or not self.winfo_exists():
+            return
+        rows = self.db_logger.log_page(before_id=self._last_id, limit=LOG_HISTORY_PAGE_ROWS, **self._filters)
+        for row_id, timestamp, tag, message, operation_id, operation_name, device_serial, model in rows:
+            self.tree.insert("", tk.END, values=(timestamp, tag, device_serial or "", (message or "").replace("\n", " ")))
+        if rows:
+            self._last_id = rows[-1][0]
+        self._exhausted = len(rows) < LOG_HISTORY_PAGE_ROWS
+        self._row_count += len(rows)
+        self.status_label.config(text=self.labels.get("log_history_rows_shown", "{count} rows shown").format(count=self._row_count))
+
+    def _on_tree_scrolled(self, scrollbar, first, last):
+        scrollbar.set(first, last)
+        if float(last) >= 0.98 and not self._exhausted and self._row_count and not self._page_scheduled: # Near the bottom: fetch the next page
+            self._page_scheduled = True
+            self.after_idle(self.load_next_page)
+
+    def export(self, export_format):
+        path = filedialog.asksaveasfilename(parent=self, defaultextension=f".{export_format}",
+                                            filetypes=[(export_format.upper(), f"*.{export_format}"), ("All files", "*.*")],
+                                            initialfile=f"operation_log_{datetime.now():%Y%m%d_%H%M%S}.{export_format}")
+        if not path:
+            return
+        filters = dict(self._filters) # The export matches what the list shows, not edits made while it runs
+        threading.Thread(target=self._export_worker, args=(path, export_format, filters), daemon=True).start()
+
+    def _export_worker(self, path, export_format, filters):
+        progress_text = self.labels.get("export_progress", "Exporting... {count} rows")
+        try:
+            row_count = self.db_logger.export_logs(path, export_format, cancel_event=self._export_cancel,
+                                                   progress_callback=lambda count: self._after_if_open(
+                                                       lambda: self.status_label.config(text=progress_text.format(count=count))),
+                                                   **filters)
+            self._after_if_open(lambda: messagebox.showinfo(
+                self.labels.get("export_done_title", "Export Complete"),
+                self.labels.get("export_done_message", "{count} rows written to:\n{path}").format(count=row_count, path=path), parent=self))
+        except Exception as e_export:
+            log_to_file_debug_globally(f"Log export to {path} failed: {e_export}", "ERROR")
+            log_to_file_debug_globally(traceback.format_exc(), "ERROR_TRACE")
+            error_text = str(e_export) # e_export is unbound once the except block ends
+            self._after_if_open(lambda: messagebox.showerror(self.labels.get("export_failed_title", "Export Failed"), error_text, parent=self))
+
+    def _after_if_open(self, func):
+        try:
+            if self.winfo_exists():
+                self.after(0, func)
+        except tk.TclError: # Window closed while the export was running
+            pass
+
+    def _on_close(self):
+        self._export_cancel.set()
+        self.destroy()
 
 
 class StatusBar(tk.Label):
@@ -947,50 +1025,109 @@ class StatusBar(tk.Label):
         self.theme = theme
         self.labels = labels
         self._check_adb_after_id = None
+        self.adb_client = AdbHostClient() # Talks to the adb server socket, no adb process per check
+        self.device_watcher = getattr(master, 'device_watcher', None) # Push-based updates when the app runs a watcher
         self.set_status(self.labels["adb_status_not_connected"], theme.get("LOG_FG_ERROR", "#F44336"))
-        self._check_adb()
+        if self.device_watcher is not None:
+            self.device_watcher.subscribe(self._on_device_event)
+            self._show_devices(self.device_watcher.devices())
+        else:
+            self._check_adb() # No watcher: fall back to polling every 3 s
 
     def set_status(self, text, color):
         if self.winfo_exists(): self.config(text=text, fg=color)
 
+    def _check_adb_with_binary(self):
+        # Old path, only used when the adb server socket can't be reached
+        stat = self.labels["adb_status_not_connected"]
+        color = self.theme.get("LOG_FG_ERROR", "#F44336")
+        device_id = None
+        try:
+            flags = subprocess.CREATE_NO_WINDOW if os.name == 'nt' else 0
+            out_state = subprocess.check_output(['adb', 'get-state'], stderr=subprocess.STDOUT, text=True, timeout=2, creationflags=flags)
+            if "device" in out_state:
+                out_devices = subprocess.check_output(['adb', 'devices'], stderr=subprocess.STDOUT, text=True, timeout=2, creationflags=flags)
+                lines = out_devices.strip().split('\n')
+                if len(lines) > 1 and "List of devices attached" in lines[0]:
+                    parts = lines[1].split('\t')
+                    if len(parts) > 0 and parts[0].strip():
+                        device_id = parts[0].strip()
+                        stat = f"{self.labels['adb_status_connected']} ({self.labels.get('adb_status_device_id_prefix','ID: ')}{device_id})"
+                else: # Fallback if parsing devices fails but state is 'device'
+                     stat = self.labels["adb_status_connected"]
+                color = self.theme.get("LOG_FG_SUCCESS", "#4CAF50")
+        except Exception: pass
+        return stat, color, device_id
+
     def _check_adb(self):
         def check_thread_func():
             stat = self.labels["adb_status_not_connected"]
             color = self.theme.get("LOG_FG_ERROR", "#F44336")
             device_id = None
             try:
-                flags = subprocess.CREATE_NO_WINDOW if os.name == 'nt' else 0
-                out_state = subprocess.check_output(['adb', 'get-state'], stderr=subprocess.STDOUT, text=True, timeout=2, creationflags=flags)
-                if "device" in out_state:
-                    out_devices = subprocess.check_output(['adb', 'devices'], stderr=subprocess.STDOUT, text=True, timeout=2, creationflags=flags)
-                    lines = out_devices.strip().split('\n')
-                    if len(lines) > 1 and "List of devices attached" in lines[0]:
-                        parts = lines[1].split('\t')
-                        if len(parts) > 0 and parts[0].strip():
-                            device_id = parts[0].strip()
-                            stat = f"{self.labels['adb_status_connected']} ({self.labels.get('adb_status_device_id_prefix','ID: ')}{device_id})"
-                    else: # Fallback if parsing devices fails but state is 'device'
-                         stat = self.labels["adb_status_connected"]
+                ready_devices = [d for d in self.adb_client.devices() if d.get("state") == "device"]
+                if ready_devices:
+                    device_id = ready_devices[0]["serial"]
+                    stat = f"{self.labels['adb_status_connected']} ({self.labels.get('adb_status_device_id_prefix','ID: ')}{device_id})"
                     color = self.theme.get("LOG_FG_SUCCESS", "#4CAF50")
+            except (OSError, AdbProtocolError, subprocess.SubprocessError):
+                stat, color, device_id = self._check_adb_with_binary()
             except Exception: pass
 
             if self.winfo_exists() and self.master.winfo_exists():
                  final_stat = stat
-                 self.master.after(0, lambda s=final_stat, c=color, did=device_id: (
-                     self.set_status(s, c),
-                     self.master.master._update_top_adb_status_bar(s, c, did) if hasattr(self.master.master, '_update_top_adb_status_bar') else None
-                 ))
+                 self.master.after(0, lambda s=final_stat, c=color, did=device_id: self._publish_status(s, c, did))
 
 
-            if self.winfo_exists():
+            if self.winfo_exists() and self.device_watcher is None: # With a watcher this is a one-off check
                  self._check_adb_after_id = self.after(3000, self._check_adb) # Check more frequently
 
         threading.Thread(target=check_thread_func, daemon=True).start()
 
+    def _publish_status(self, stat, color, device_id):
+        self.set_status(stat, color)
+        app = self.master if hasattr(self.master, '_update_top_adb_status_bar') else self.master.master
+        if hasattr(app, '_update_top_adb_status_bar'):
+            app._update_top_adb_status_bar(stat, color, device_id)
+
+    def _on_device_event(self, event):
+        # Called on a watcher thread, the widget update happens on the Tk thread
+        try:
+            if self.winfo_exists():
+                self.after(0, lambda: self._show_devices(self.device_watcher.devices()))
+        except (tk.TclError, RuntimeError): # Window is being destroyed
+            pass
+
+    def _show_devices(self, devices):
+        if not self.winfo_exists(): return
+        stat = self.labels["adb_status_not_connected"]
+        color = self.theme.get("LOG_FG_ERROR", "#F44336")
+        device_id = None
+        ready_devices = [d for d in devices if d["mode"] == MODE_ADB and d.get("state") == "device"]
+        if ready_devices:
+            manager = getattr(self.master, 'device_manager', None)
+            target_serial = manager.target_serial(MODE_ADB) if manager else None # The device single-device actions go to
+            ready_serials = [d["serial"] for d in ready_devices]
+            device_id = target_serial if target_serial in ready_serials else ready_serials[0]
+            stat = f"{self.labels['adb_status_connected']} ({self.labels.get('adb_status_device_id_prefix','ID: ')}{device_id})"
+            if len(ready_serials) > 1:
+                stat += f" +{len(ready_serials) - 1} {self.labels.get('adb_status_more_devices', 'more')}"
+            color = self.theme.get("LOG_FG_SUCCESS", "#4CAF50")
+        other_devices = [f"{d['mode'].upper()} {d['serial']} ({d.get('state', '?')})" for d in devices if d["mode"] != MODE_ADB]
+        if other_devices:
+            stat += "  |  " + ", ".join(other_devices)
+        self._publish_status(stat, color, device_id)
+
     def cancel_adb_check(self):
         if self._check_adb_after_id:
             self.after_cancel(self._check_adb_after_id)
             self._check_adb_after_id = None
+        if self.device_watcher is not None:
+            self.device_watcher.unsubscribe(self._on_device_event)
+
+    def destroy(self):
+        self.cancel_adb_check() # _rebuild_ui destroys the bar, its watcher subscription must go with it
+        super().destroy()
 
 class LoginWindow(tk.Toplevel):
     def __init__(self, parent, app_controller):
@@ -1272,12 +1409,19 @@ class UltimateDeviceTool(tk.Frame):
 
         self.pack(fill=tk.BOTH, expand=True)
 
+        self.device_property_cache = DevicePropertyCache() # Invalidated on reboot, flash and disconnect
+        self.last_known_device_id = None # Set before _build_ui, the status bars read it while being built
+        self.device_watcher = DeviceWatcher() # adb track-devices stream + low-cadence fastboot/MTK USB scans
+        self.device_watcher.subscribe(self._on_device_event)
+        self.device_manager = DeviceManager(self.device_watcher) # Every adb/fastboot/MTK device and the user's selection
+        self._callback_device_serial = None # Device of the result whose callback is running, follow-up commands stay on it
+
         self._apply_styles()
         self._build_ui()
-        self.command_queue = queue.Queue()
-        self.current_popen_process = None
-        self.after_id_process_command_queue = self.after(100, self._process_command_queue)
-        self.last_known_device_id = None
+        self.command_queue = ResultDispatcher(self, self._handle_command_result) # Workers wake the Tk loop directly, no polling timer
+        self.command_executor = CommandExecutor() # Fixed worker pool, one FIFO lane per device serial
+        self.adb_shell_sessions = AdbShellSessionPool() # Short `adb shell` commands reuse one shell per serial
+        self.device_watcher.start()
         log_to_file_debug_globally("UltimateDeviceTool __init__ finished successfully.")
 
     def _apply_styles(self):
@@ -1425,6 +1569,19 @@ class UltimateDeviceTool(tk.Frame):
 
         self._update_top_adb_status_bar(self.labels.get("adb_status_not_connected"), self.theme.get("LOG_FG_ERROR"), None) # Initial update
 
+        devices_frame = tk.Frame(left_area_container, bg=self.theme["BG"])
+        devices_frame.pack(fill=tk.X, padx=15, pady=(0,10))
+        tk.Label(devices_frame, text=self.labels.get("devices_label", "Devices:"), font=LABEL_FONT, bg=self.theme["BG"], fg=self.theme["FG"]).pack(anchor=tk.W)
+        device_columns = ("mode", "serial", "state", "usb", "model")
+        self.device_tree = ttk.Treeview(devices_frame, columns=device_columns, show="headings", selectmode="extended", height=3)
+        for column, width in zip(device_columns, (80, 200, 110, 90, 160)):
+            self.device_tree.heading(column, text=self.labels.get(f"device_col_{column}", column.title()))
+            self.device_tree.column(column, width=width, stretch=(column == "model"))
+        self.device_tree.pack(fill=tk.X)
+        self.device_tree.bind("<<TreeviewSelect>>", self._on_device_tree_select)
+        self.device_manager.add_listener(self._on_device_list_changed)
+        self._refresh_device_tree(self.device_manager.devices())
+
 
         self.notebook = ttk.Notebook(left_area_container, style="TNotebook")
         self.notebook.pack(expand=True, fill=tk.BOTH, padx=15, pady=(0,15))
@@ -1435,7 +1592,7 @@ class UltimateDeviceTool(tk.Frame):
             log_to_file_debug_globally("Log panel created.")
         except Exception as e_log_panel:
             log_to_file_debug_globally(f"Error creating LogPanel: {e_log_panel}", "CRITICAL")
-            traceback.print_exc(file=open(_DEBUG_LOG_PATH, "a"))
+            log_to_file_debug_globally(traceback.format_exc(), "ERROR_TRACE")
 
         tabs_to_add = [
             (SamsungTab, "tab_samsung"),
@@ -1452,7 +1609,7 @@ class UltimateDeviceTool(tk.Frame):
                 log_to_file_debug_globally(f"{TabClass.__name__} added to notebook.")
             except Exception as e_tab_creation:
                 log_to_file_debug_globally(f"Error creating or adding {TabClass.__name__}: {e_tab_creation}", "ERROR")
-                traceback.print_exc(file=open(_DEBUG_LOG_PATH, "a"))
+                log_to_file_debug_globally(traceback.format_exc(), "ERROR_TRACE")
                 messagebox.showerror("UI Build Error", f"Failed to build {self.labels[label_key]} tab: {e_tab_creation}", parent=self.master)
 
         log_to_file_debug_globally("UI Building finished.")
@@ -1465,6 +1622,8 @@ class UltimateDeviceTool(tk.Frame):
         new_text = self.labels.get("adb_status_not_connected") # Default
         new_color = self.theme.get("LOG_FG_ERROR") # Default
 
+        if device_id != self.last_known_device_id: # Device changed or dropped: its snapshot is stale
+            self.device_property_cache.invalidate(self.last_known_device_id)
         if device_id: # If we have a device ID, it's connected
             new_text = f"{self.labels.get('adb_status_connected')} ({self.labels.get('adb_status_device_id_prefix', 'ID: ')}{device_id})"
             new_color = self.theme.get("LOG_FG_SUCCESS")
@@ -1569,22 +1728,57 @@ class UltimateDeviceTool(tk.Frame):
                                    activebackground=self.theme.get("GROUP_BG")) # Ensure hover matches disabled bg
 
 
-    def execute_command_async(self, command_list, operation_name="Operation", callback_on_finish=None, is_part_of_sequence=False, is_info_gathering=False):
+    def execute_command_async(self, command_list, operation_name="Operation", callback_on_finish=None, is_part_of_sequence=False, is_info_gathering=False, device_serial=None, priority=None, stream_output=False, on_output_lines=None, use_shell_session=False, output_line_prefix=""):
         log_panel_available = hasattr(self, 'log_panel') and self.log_panel is not None and self.log_panel.winfo_exists()
 
+        command_mode = mode_for_command(command_list)
+        if device_serial is None: # Stay on the device the calling sequence runs on, else use the selected device
+            device_serial = self.device_manager.target_serial(command_mode, preferred=self._callback_device_serial)
+        command_list = address_command(command_list, device_serial) # adb/fastboot get `-s <serial>`
+        operation_record = None
+        if not is_info_gathering: # One row in operations per command the user started, background reads are left out
+            operation_record = self.db_logger.begin_operation(operation_name, command_list, device_serial, command_mode, self._device_model(device_serial))
+
         if log_panel_available and not is_part_of_sequence and not is_info_gathering:
             self.log_panel.clear_log()
-            self.log_panel.log(self.labels.get("log_operation_started", "Operation Started: ") + operation_name, "info", include_timestamp=True)
+            self.log_panel.log(self.labels.get("log_operation_started", "Operation Started: ") + operation_name, "info", include_timestamp=True, operation=operation_record)
             self.log_panel.progress_bar.start()
+            self.log_panel.set_progress_status("")
             self._update_cancel_button_state(enable=True)
 
         command_str_for_debug = " ".join(map(str,command_list)) if isinstance(command_list, list) else str(command_list)
         if not is_info_gathering:
             log_to_file_debug_globally(f"Executing ASYNC ({operation_name}): {command_str_for_debug}", "DEBUG_CMD")
 
-        def _command_thread():
+        self._invalidate_property_cache_for_command(command_list)
+        if priority is None: # Interactive reads jump ahead of long transfers queued on other lanes
+            priority = PRIORITY_INTERACTIVE if is_info_gathering else PRIORITY_NORMAL
+        lane = device_serial or lane_for_command(command_list)
+        result_base = {"operation_name": operation_name, "command": command_list,
+                       "callback": callback_on_finish, "is_part_of_sequence": is_part_of_sequence,
+                       "is_info_gathering": is_info_gathering, "device_serial": device_serial,
+                       "operation_record": operation_record, "output_line_prefix": output_line_prefix}
+
+        def _command_thread(job_handle):
             process = None
             try:
+                shell_target = shell_args_for_command(command_list) if use_shell_session and not stream_output else None
+                if shell_target: # No adb spawn: the command runs in the device's persistent shell
+                    shell_serial, shell_args = shell_target
+                    session = self.adb_shell_sessions.get(shell_serial)
+                    shell_future = session.submit(shell_args)
+                    job_handle.attach_process(session.process) # Cancel ends the session, it respawns on next use
+                    try:
+                        shell_result = shell_future.result(timeout=120)
+                    except FutureTimeoutError:
+                        session.close() # The shell is stuck on this command, start clean next time
+                        raise subprocess.TimeoutExpired(command_list, 120)
+                    if job_handle.cancel_requested:
+                        self.command_queue.put(dict(result_base, error="Cancelled"))
+                    else:
+                        self.command_queue.put(dict(result_base, **shell_result))
+                    return
+
                 startupinfo = None
                 if os.name == 'nt':
                     startupinfo = subprocess.STARTUPINFO()
@@ -1595,49 +1789,175 @@ class UltimateDeviceTool(tk.Frame):
                                            text=True, encoding='utf-8', errors='replace',
                                            startupinfo=startupinfo,
                                            creationflags=subprocess.CREATE_NO_WINDOW if os.name == 'nt' else 0)
-                self.current_popen_process = process
-                stdout, stderr = process.communicate(timeout=120) 
+                job_handle.attach_process(process) # Cancel now reaches this exact process
+                if stream_output: # Lines reach the log while the tool runs, only a bounded tail is kept
+                    line_sink = on_output_lines or self._log_streamed_output_lines # Called on the Tk thread as (batch, operation, line_prefix)
+                    progress_parser = parser_for_command(command_list) # None for tools that print no progress
+                    def _on_lines(batch):
+                        sample = None
+                        if progress_parser is not None:
+                            for _stream, line in batch:
+                                sample = progress_parser.feed(line) or sample
+                        self.after(0, line_sink, batch, operation_record, output_line_prefix)
+                        if sample is not None and not is_info_gathering: # Latest sample of the batch only
+                            self.after(0, self._show_progress_sample, sample, output_line_prefix)
+                    streamer = StreamingOutput(process, on_lines=_on_lines)
+                    stdout, stderr = streamer.run(timeout=120)
+                    stream_info = {"streamed": True, "stdout_truncated": streamer.truncated("stdout"), "stderr_truncated": streamer.truncated("stderr"),
+                                   "transfer": progress_parser.summary() if progress_parser is not None else None}
+                else:
+                    stdout, stderr = process.communicate(timeout=120)
+                    stream_info = {}
                 return_code = process.returncode
-                result_data = {"stdout": stdout, "stderr": stderr, "return_code": return_code,
-                               "operation_name": operation_name, "command": command_list,
-                               "callback": callback_on_finish, "is_part_of_sequence": is_part_of_sequence,
-                               "is_info_gathering": is_info_gathering}
-                self.command_queue.put(result_data)
+                if job_handle.cancel_requested:
+                    self.command_queue.put(dict(result_base, error="Cancelled"))
+                else:
+                    self.command_queue.put(dict(result_base, stdout=stdout, stderr=stderr, return_code=return_code, **stream_info))
             except subprocess.TimeoutExpired:
                 if process: process.kill()
                 log_to_file_debug_globally(f"Timeout for {operation_name}: {command_str_for_debug}", "ERROR")
-                self.command_queue.put({"error": "TimeoutExpired", "operation_name": operation_name, "command": command_list, "callback": callback_on_finish, "is_part_of_sequence": is_part_of_sequence, "is_info_gathering": is_info_gathering})
+                self.command_queue.put(dict(result_base, error="TimeoutExpired"))
             except FileNotFoundError:
                 log_to_file_debug_globally(f"FileNotFound for {operation_name}: {command_list[0]}", "ERROR")
-                self.command_queue.put({"error": "FileNotFound", "command_name": command_list[0], "operation_name": operation_name, "command": command_list, "callback": callback_on_finish, "is_part_of_sequence": is_part_of_sequence, "is_info_gathering": is_info_gathering})
+                self.command_queue.put(dict(result_base, error="FileNotFound", command_name=command_list[0]))
             except Exception as e:
-                if process and process.returncode is not None and process.returncode < 0 : 
-                     self.command_queue.put({"error": "Cancelled", "operation_name": operation_name, "command": command_list, "callback": callback_on_finish, "is_part_of_sequence": is_part_of_sequence, "is_info_gathering": is_info_gathering})
+                if job_handle.cancel_requested or (process and process.returncode is not None and process.returncode < 0): 
+                     self.command_queue.put(dict(result_base, error="Cancelled"))
                 else:
                      log_to_file_debug_globally(f"Exception for {operation_name} ({command_str_for_debug}): {e}", "ERROR")
-                     traceback.print_exc(file=open(_DEBUG_LOG_PATH, "a"))
-                     self.command_queue.put({"error": str(e), "operation_name": operation_name, "command": command_list, "callback": callback_on_finish, "is_part_of_sequence": is_part_of_sequence, "is_info_gathering": is_info_gathering})
+                     log_to_file_debug_globally(traceback.format_exc(), "ERROR_TRACE")
+                     self.command_queue.put(dict(result_base, error=str(e)))
             finally:
-                self.current_popen_process = None
+                job_handle.detach_process()
+
+        # Cancelled while still queued: report it like a cancelled run so sequences stop cleanly
+        return self.command_executor.submit(_command_thread, name=operation_name, lane=lane, priority=priority,
+                                            on_cancelled=lambda job_handle: self.command_queue.put(dict(result_base, error="Cancelled")))
+
+    def _show_progress_sample(self, sample, line_prefix=""):
+        """Drives the progress bar and the status line from a progress_parsers.ProgressSample."""
+        if not (hasattr(self, 'log_panel') and self.log_panel is not None and self.log_panel.winfo_exists()):
+            return
+        if sample.percent is not None:
+            self.log_panel.progress_bar.set_value(sample.percent)
+        self.log_panel.set_progress_status(f"{line_prefix}{sample.status_text()}")
+
+    def _log_streamed_output_lines(self, batch, operation=None, line_prefix=""):
+        """Default sink for stream_output: shows each batch of (stream, line) in the log panel."""
+        if not (hasattr(self, 'log_panel') and self.log_panel is not None and self.log_panel.winfo_exists()):
+            return
+        for stream, line in batch:
+            if line.strip():
+                self.log_panel.log(f"{line_prefix}{line}", "info" if stream == "stdout" else "warning", indent=1, include_timestamp=False, operation=operation)
+
+    def _device_model(self, serial):
+        """Model of a device for the operations table, from the device list or its cached properties."""
+        if not serial:
+            return None
+        info = self.device_manager.get(serial)
+        if info and info.get("model"):
+            return info["model"]
+        snapshot = self.device_property_cache.get(serial)
+        return snapshot.model if snapshot is not None and snapshot.model else None
+
+    def execute_command_on_devices(self, command_list, operation_name="Operation", serials=None, callback_on_finish=None, on_all_finished=None, **kwargs):
+        """Runs one command on several devices at once, each on its own lane, and logs per-device results.
+
+        serials defaults to the selected devices of the command's mode. callback_on_finish gets each
+        device's result (its "device_serial" says which); on_all_finished gets {serial: result} at the end.
+        """
+        if serials is None:
+            serials = self.device_manager.selected_serials(mode_for_command(command_list))
+        if len(serials) <= 1: # Zero or one device: the normal single-device path
+            def _single_finished(result):
+                if callback_on_finish: callback_on_finish(result)
+                if on_all_finished: on_all_finished({result.get("device_serial"): result})
+            return [self.execute_command_async(command_list, operation_name, callback_on_finish=_single_finished,
+                                               device_serial=serials[0] if serials else None, **kwargs)]
 
-        threading.Thread(target=_command_thread, daemon=True).start()
+        log_panel_available = hasattr(self, 'log_panel') and self.log_panel is not None and self.log_panel.winfo_exists()
+        if log_panel_available:
+            self.log_panel.clear_log()
+            self.log_panel.log(self.labels.get("log_operation_started", "Operation Started: ") + f"{operation_name} ({len(serials)} devices: {', '.join(serials)})", "info", include_timestamp=True)
+            self.log_panel.progress_bar.start()
+            self._update_cancel_button_state(enable=True)
+
+        results = {}
+        def _device_finished(result):
+            results[result.get("device_serial")] = result
+            if callback_on_finish: callback_on_finish(result)
+            if len(results) == len(serials):
+                self._finish_multi_device_operation(operation_name, serials, results, on_all_finished)
+
+        handles = []
+        for serial in serials:
+            handles.append(self.execute_command_async(command_list, operation_name=f"{operation_name} [{serial}]",
+                                                      callback_on_finish=_device_finished, is_part_of_sequence=True,
+                                                      device_serial=serial, output_line_prefix=f"[{serial}] ", **kwargs)) # Tell the devices' streamed lines apart
+        return handles
+
+    def _finish_multi_device_operation(self, operation_name, serials, results, on_all_finished):
+        succeeded = [s for s in serials if "error" not in results[s] and results[s].get("return_code") == 0]
+        if hasattr(self, 'log_panel') and self.log_panel is not None and self.log_panel.winfo_exists():
+            all_ok = len(succeeded) == len(serials)
+            self.log_panel.log(f"{operation_name}: {len(succeeded)}/{len(serials)} devices succeeded.", "success" if all_ok else "fail", include_timestamp=True)
+            for serial in serials:
+                result = results[serial]
+                if serial in succeeded:
+                    self.log_panel.log(f"{serial}: OK", "success", indent=1)
+                elif "error" in result:
+                    self.log_panel.log(f"{serial}: {result['error']}", "error", indent=1)
+                else:
+                    self.log_panel.log(f"{serial}: Failed (Code: {result.get('return_code')})", "error", indent=1)
+            if self.log_panel.progress_bar.running: self.log_panel.progress_bar.stop()
+            self._update_cancel_button_state(enable=False)
+        if on_all_finished:
+            try:
+                on_all_finished(results)
+            except Exception as e_callback:
+                log_to_file_debug_globally(f"Error in multi-device callback for {operation_name}: {e_callback}", "ERROR")
+                log_to_file_debug_globally(traceback.format_exc(), "ERROR_TRACE")
 
-    def _process_command_queue(self):
+    def _on_device_list_changed(self, devices):
+        """DeviceManager listener (watcher thread)."""
         try:
-            while not self.command_queue.empty():
-                result = self.command_queue.get_nowait()
-                self._handle_command_result(result)
-        except Exception as e:
-            log_to_file_debug_globally(f"Error in _process_command_queue: {e}", "ERROR")
-            traceback.print_exc(file=open(_DEBUG_LOG_PATH, "a"))
-        finally:
-            if self.winfo_exists(): 
-                self.after_id_process_command_queue = self.after(100, self._process_command_queue)
+            if self.winfo_exists():
+                self.after(0, lambda: self._refresh_device_tree(self.device_manager.devices()))
+        except (tk.TclError, RuntimeError): # Window is being destroyed
+            pass
 
+    def _refresh_device_tree(self, devices):
+        if not hasattr(self, 'device_tree') or not self.device_tree.winfo_exists(): return
+        selection = self.device_manager.selection()
+        self.device_tree.delete(*self.device_tree.get_children())
+        for info in devices:
+            item_id = f"{info['mode']}|{info['serial']}"
+            self.device_tree.insert("", tk.END, iid=item_id, values=(info["mode"].upper(), info["serial"], info.get("state", ""),
+                                                                     info.get("usb", ""), info.get("model", "")))
+            if info["serial"] in selection:
+                self.device_tree.selection_add(item_id)
+
+    def _on_device_tree_select(self, event=None):
+        visible_serials = [item_id.split("|", 1)[1] for item_id in self.device_tree.get_children()]
+        selected_serials = [item_id.split("|", 1)[1] for item_id in self.device_tree.selection()]
+        # Selected devices that are unplugged right now (rebooting) stay selected
+        kept_serials = [serial for serial in self.device_manager.selection() if serial not in visible_serials]
+        self.device_manager.select(kept_serials + selected_serials)
+        if hasattr(self, 'status_bar') and self.status_bar.winfo_exists() and self.status_bar.device_watcher is not None:
+            self.status_bar._show_devices(self.device_watcher.devices())
 
     def _handle_command_result(self, result):
+        operation_record = result.get("operation_record")
+        transfer = result.get("transfer") # Progress parser summary of a streamed transfer: bytes, seconds, rate
+        if transfer and operation_record is not None: # Stored per operation, so slow cables and hubs show in the stats
+            operation_record.bytes_transferred, operation_record.throughput = transfer["bytes"], transfer["rate"]
+        self.db_logger.end_operation(operation_record, result.get("return_code"), operation_status_for_result(result), result.get("error"))
         log_panel_available = hasattr(self, 'log_panel') and self.log_panel is not None and self.log_panel.winfo_exists()
-        log_method = self.log_panel.log if log_panel_available else log_to_file_debug_globally
+        if log_panel_available:
+            def log_method(msg, tag="info", **kwargs): # Result lines are stored against their operation
+                self.log_panel.log(msg, tag, operation=operation_record, **kwargs)
+        else:
+            log_method = log_to_file_debug_globally
 
         operation_name = result.get("operation_name", "Unknown Operation")
         is_part_of_sequence = result.get("is_part_of_sequence", False)
@@ -1670,39 +1990,51 @@ class UltimateDeviceTool(tk.Frame):
                 stdout = result.get("stdout", "")
                 stderr = result.get("stderr", "")
                 return_code = result.get("return_code", -1)
+                streamed = result.get("streamed", False) # Output was already shown live, don't repeat it
 
                 if not operation_name.startswith("Get Property"): 
                     if return_code == 0:
                         log_method(f"{operation_name}: Completed successfully.", "success", include_timestamp=True)
-                        if stdout.strip() and not any(kw in stdout.lower() for kw in ["success", "already", "performed", "daemon started successfully"]):
+                        if not streamed and stdout.strip() and not any(kw in stdout.lower() for kw in ["success", "already", "performed", "daemon started successfully"]):
                             summary_stdout = stdout.strip().splitlines()[0]
                             if len(summary_stdout) > 100: summary_stdout = summary_stdout[:100] + "..."
                             log_method(f"Detail: {summary_stdout}", "info", indent=1, include_timestamp=False)
-                        if stderr.strip():
+                        if not streamed and stderr.strip():
                             summary_stderr = stderr.strip().splitlines()[0]
                             if len(summary_stderr) > 100: summary_stderr = summary_stderr[:100] + "..."
                             log_method(f"Output (stderr): {summary_stderr}", "warning", indent=1, include_timestamp=False)
                     else: 
                         log_method(f"{operation_name}: Failed (Code: {return_code}).", "fail", include_timestamp=True)
                         details = stderr.strip() if stderr.strip() else stdout.strip()
-                        if details:
+                        if streamed:
+                            log_method("See the streamed output above for details.", "error", indent=1, include_timestamp=False)
+                        elif details:
                             summary_details = details.splitlines()[0]
                             if len(summary_details) > 120: summary_details = summary_details[:120] + "..."
                             log_method(f"Error Details: {summary_details}", "error", indent=1, include_timestamp=False)
                         else:
                             log_method("No specific error message from command.", "error", indent=1, include_timestamp=False)
 
+        if transfer and log_panel_available and not is_info_gathering:
+            line_prefix = result.get("output_line_prefix", "")
+            transfer_text = f"{transfer['bytes'] / 1e6:.1f} MB in {format_eta(transfer['seconds'])} ({format_rate(transfer['rate'])})"
+            log_method(f"{line_prefix}Transferred {transfer_text}", "info", indent=1, include_timestamp=False)
+            self.log_panel.set_progress_status(f"{line_prefix}{transfer_text}")
+
         if log_panel_available and not is_part_of_sequence and not is_info_gathering:
             if self.log_panel.progress_bar.running: self.log_panel.progress_bar.stop()
             self._update_cancel_button_state(enable=False)
 
         callback = result.get("callback")
         if callback and callable(callback):
+            self._callback_device_serial = result.get("device_serial") # Commands the callback starts go to the same device
             try:
                 callback(result)
             except Exception as e_callback:
                 log_to_file_debug_globally(f"Error in command callback for {operation_name}: {e_callback}", "ERROR")
-                traceback.print_exc(file=open(_DEBUG_LOG_PATH, "a"))
+                log_to_file_debug_globally(traceback.format_exc(), "ERROR_TRACE")
+            finally:
+                self._callback_device_serial = None
 
 
     def action_cancel_operation(self):
@@ -1714,10 +2046,10 @@ class UltimateDeviceTool(tk.Frame):
             if self.log_panel: self.log_panel.log("Operation cancellation aborted by user.", "info", include_timestamp=False)
             return
 
-        if self.current_popen_process and self.current_popen_process.poll() is None:
+        if self.command_executor.has_active_jobs():
             try:
-                self.current_popen_process.terminate() 
-                log_msg = "Attempting to cancel current operation..."
+                cancelled_count = self.command_executor.cancel_all() # Terminates running processes, drops queued jobs
+                log_msg = f"Attempting to cancel current operation ({cancelled_count} running/queued command(s))..."
                 if hasattr(self, 'log_panel') and self.log_panel and self.log_panel.winfo_exists():
                     self.log_panel.log(log_msg, "warning", include_timestamp=False)
                 else:
@@ -1792,35 +2124,77 @@ class UltimateDeviceTool(tk.Frame):
 
 
     def get_detailed_adb_info_props(self, callback_after_all_props=None):
-        collected_props_internal_keys = {}
-        remaining_props_count = len(DEVICE_INFO_PROPERTIES)
-
-        def _after_single_prop_fetch(result_single_prop):
-            nonlocal remaining_props_count
-            prop_key_fetched = "unknown_prop"
-            if result_single_prop.get("command") and len(result_single_prop["command"]) > 3:
-                prop_key_fetched = result_single_prop["command"][3]
-
-            if result_single_prop.get("return_code") == 0:
-                stdout_val = result_single_prop.get("stdout", "").strip()
-                collected_props_internal_keys[prop_key_fetched] = stdout_val if stdout_val else ""
+        # One `adb shell getprop` for every property, answered from the per-serial cache while it is fresh
+        if not callback_after_all_props or not callable(callback_after_all_props):
+            callback_after_all_props = lambda props: None
+        serial = self.device_manager.target_serial(MODE_ADB, preferred=self._callback_device_serial)
+        cached_snapshot = self.device_property_cache.get(serial)
+        if cached_snapshot is not None:
+            log_to_file_debug_globally(f"Device properties for {serial or 'default device'} served from cache ({cached_snapshot.age():.1f}s old).", "DEBUG")
+            callback_after_all_props(dict(cached_snapshot.props))
+            return
+
+        def _after_getprop_snapshot(result_snapshot):
+            if result_snapshot.get("return_code") == 0:
+                snapshot = DevicePropertySnapshot.from_getprop_output(serial, result_snapshot.get("stdout", ""))
+                self.device_property_cache.put(snapshot)
+                callback_after_all_props(dict(snapshot.props))
             else:
-                collected_props_internal_keys[prop_key_fetched] = "Error fetching"
+                callback_after_all_props({prop_key: "Error fetching" for _, prop_key in DEVICE_INFO_PROPERTIES})
+
+        self.execute_command_async(
+            ["adb", "shell", "getprop"],
+            operation_name="Get Property Snapshot", # "Get Property" prefix keeps it out of the summary log
+            callback_on_finish=_after_getprop_snapshot,
+            is_part_of_sequence=True,
+            is_info_gathering=True,
+            device_serial=serial,
+            use_shell_session=True
+        )
 
-            remaining_props_count -= 1
+    def read_fastboot_vars(self, operation_name):
+        """`fastboot getvar all`, answered from the cache when the device hasn't been rebooted or flashed since."""
+        serial = self.device_manager.target_serial(MODE_FASTBOOT, preferred=self._callback_device_serial)
+        cached_snapshot = self.device_property_cache.get(serial, source="fastboot")
+        if cached_snapshot is not None:
+            if hasattr(self, 'log_panel') and self.log_panel and self.log_panel.winfo_exists():
+                self.log_panel.clear_log()
+                self.log_panel.log(self.labels.get("log_operation_started", "Operation Started: ") + operation_name, "info", include_timestamp=True)
+                self.log_panel.log(f"Bootloader variables (cached {cached_snapshot.age():.0f}s ago):", "info", indent=1)
+                for var_name, var_value in cached_snapshot.props.items():
+                    self.log_panel.log(f"{var_name}: {var_value}", "info", indent=2)
+                self.log_panel.log(f"{operation_name}: Completed successfully.", "success", include_timestamp=True)
+            return
 
-            if remaining_props_count <= 0:
-                if callback_after_all_props and callable(callback_after_all_props):
-                    callback_after_all_props(collected_props_internal_keys)
+        def _cache_fastboot_vars(result_vars):
+            if result_vars.get("return_code") == 0:
+                # getvar prints on stderr; stdout is included for fastboot builds that don't
+                output_text = result_vars.get("stderr", "") + "\n" + result_vars.get("stdout", "")
+                snapshot = DevicePropertySnapshot.from_getvar_output(serial, output_text)
+                if snapshot.props:
+                    self.device_property_cache.put(snapshot)
 
-        for _, prop_to_fetch_key in DEVICE_INFO_PROPERTIES:
-            self.execute_command_async(
-                ["adb", "shell", "getprop", prop_to_fetch_key],
-                operation_name=f"Get Property ({prop_to_fetch_key})",
-                callback_on_finish=_after_single_prop_fetch,
-                is_part_of_sequence=True,
-                is_info_gathering=True
-            )
+        self.execute_command_async(["fastboot", "getvar", "all"], operation_name=operation_name, device_serial=serial,
+                                   callback_on_finish=_cache_fastboot_vars, stream_output=True) # getvar all is long and arrives on stderr
+
+    def _on_device_event(self, event):
+        """Watcher callback (watcher thread): drops per-device state an unplug, reboot or mode change makes stale."""
+        if event["event"] == EVENT_CONNECTED and event["state"] == "device":
+            return
+        if event["mode"] in (MODE_ADB, MODE_FASTBOOT):
+            self.device_property_cache.invalidate(event["serial"])
+        if event["mode"] == MODE_ADB:
+            self.adb_shell_sessions.close(event["serial"])
+
+    def _invalidate_property_cache_for_command(self, command_list):
+        """Reboots and state-changing fastboot commands make cached property snapshots stale."""
+        if not isinstance(command_list, (list, tuple)) or not command_list:
+            return
+        args = [str(part) for part in command_list[1:]]
+        tool_name = os.path.basename(str(command_list[0])).lower()
+        if any(arg.startswith("reboot") for arg in args) or (tool_name.startswith("fastboot") and "getvar" not in args):
+            serial = lane_for_command(command_list)
+            self.device_property_cache.invalidate(None if serial == DEFAULT_LANE else serial)
 
 
     def set_language(self, lang):
@@ -1882,12 +2256,19 @@ class UltimateDeviceTool(tk.Frame):
                                  parent=self.master):
             if hasattr(self, 'status_bar') and self.status_bar.winfo_exists():
                 self.status_bar.cancel_adb_check()
+            if hasattr(self, 'device_manager'):
+                self.device_manager.remove_listener(self._on_device_list_changed)
             if hasattr(self, 'db_logger') and self.db_logger:
-                self.db_logger.close()
+                self.db_logger.close() # Commits the lines still queued for the writer
 
-            if hasattr(self, 'after_id_process_command_queue') and self.after_id_process_command_queue:
-                self.after_cancel(self.after_id_process_command_queue)
-                self.after_id_process_command_queue = None
+            if hasattr(self, 'command_executor'):
+                self.command_executor.shutdown()
+            if hasattr(self, 'command_queue'):
+                self.command_queue.close() # Also logs the measured dispatch latency
+            if hasattr(self, 'adb_shell_sessions'):
+                self.adb_shell_sessions.close_all()
+            if hasattr(self, 'device_watcher'):
+                self.device_watcher.stop()
 
             log_to_file_debug_globally("Application closed by user.")
             self.master.destroy()
@@ -1957,15 +2338,15 @@ class SamsungTab(ttk.Frame):
 
     def action_reboot_recovery(self):
         command = ["adb", "reboot", "recovery"]
-        self.master_app.execute_command_async(command, operation_name="Reboot to Recovery")
+        self.master_app.execute_command_on_devices(command, operation_name="Reboot to Recovery")
 
     def action_reboot_download(self):
         command = ["adb", "reboot", "download"]
-        self.master_app.execute_command_async(command, operation_name="Reboot to Download Mode")
+        self.master_app.execute_command_on_devices(command, operation_name="Reboot to Download Mode")
 
     def action_reboot_bootloader(self):
         command = ["adb", "reboot", "bootloader"]
-        self.master_app.execute_command_async(command, operation_name="Reboot to Bootloader")
+        self.master_app.execute_command_on_devices(command, operation_name="Reboot to Bootloader")
 
     def _start_package_disable_sequence(self, packages_to_disable, operation_name_key, success_log_key, failure_log_key):
         self.package_list_for_disable = packages_to_disable
@@ -1996,7 +2377,8 @@ class SamsungTab(ttk.Frame):
                 ["adb", "shell", "pm", "disable-user", "--user", "0", package_name],
                 operation_name=op_desc,
                 callback_on_finish=self._package_disable_step_callback,
-                is_part_of_sequence=True
+                is_part_of_sequence=True,
+                use_shell_session=True
             )
         else: 
             if self.master_app.log_panel and self.master_app.log_panel.winfo_exists():
@@ -2303,6 +2685,7 @@ class SamsungTab(ttk.Frame):
                     cmd_arabize,
                     operation_name=desc_arabize,
                     is_part_of_sequence=True,
+                    use_shell_session=True,
                     callback_on_finish=lambda res_arabize: _arabize_callback_chained(res_arabize, step_idx_arabize + 1)
                 )
             _execute_next_arabize_step(0)
@@ -2374,17 +2757,15 @@ class HonorTab(ttk.Frame):
         log_to_file_debug_globally("HonorTab __init__ finished.")
 
     def action_honor_info(self):
-        op_name = "Honor Get Info (Fastboot)"
-        command = ["fastboot", "getvar", "all"]
-        self.master_app.execute_command_async(command, operation_name=op_name)
+        self.master_app.read_fastboot_vars("Honor Get Info (Fastboot)")
 
     def action_honor_reboot_bootloader(self):
         command = ["fastboot", "reboot-bootloader"]
-        self.master_app.execute_command_async(command, operation_name="Honor Reboot Bootloader")
+        self.master_app.execute_command_on_devices(command, operation_name="Honor Reboot Bootloader")
 
     def action_honor_reboot_edl(self):
         command = ["fastboot", "oem", "edl"] 
-        self.master_app.execute_command_async(command, operation_name="Honor Reboot EDL")
+        self.master_app.execute_command_on_devices(command, operation_name="Honor Reboot EDL")
         if self.master_app.log_panel: self.master_app.log_panel.log("Note: 'fastboot oem edl' command effectiveness varies by device.", "warning", include_timestamp=False)
 
 
@@ -2502,7 +2883,7 @@ class XiaomiTab(ttk.Frame):
         fb_col2.pack(side=tk.LEFT, fill=tk.Y, padx=(10,0), anchor=tk.N, expand=True)
 
         ModernButton(fb_col1, text=self.labels.get("btn_xiaomi_fastboot_info", "Read Info (Fastboot)"),
-                                   command=lambda: self.master_app.execute_command_async(["fastboot", "getvar", "all"], "Xiaomi Read Info (Fastboot)"), theme=self.theme, width=32).pack(pady=5, anchor=tk.W)
+                                   command=lambda: self.master_app.read_fastboot_vars("Xiaomi Read Info (Fastboot)"), theme=self.theme, width=32).pack(pady=5, anchor=tk.W)
         ModernButton(fb_col1, text=self.labels.get("btn_xiaomi_fastboot_read_security", "Read Security (Fastboot)"),
                                    command=lambda: self.master_app.execute_command_async(["fastboot", "oem", "device-info"], "Xiaomi Read Security (Fastboot)"), theme=self.theme, width=32).pack(pady=5, anchor=tk.W)
         ModernButton(fb_col1, text=self.labels.get("btn_xiaomi_fastboot_unlock", "Unlock Bootloader (Fastboot)"),
@@ -2531,20 +2912,20 @@ class XiaomiTab(ttk.Frame):
 
     def action_xiaomi_fastboot_unlock(self):
         if messagebox.askyesno("Confirm Unlock", "Are you sure you want to unlock the bootloader? This will erase all user data and may void warranty. For Xiaomi, this often requires Mi Unlock Tool and an authorized account.", parent=self.master_app.master):
-            self.master_app.execute_command_async(["fastboot", "oem", "unlock"], operation_name="Xiaomi Unlock Bootloader (Attempt)")
+            self.master_app.execute_command_on_devices(["fastboot", "oem", "unlock"], operation_name="Xiaomi Unlock Bootloader (Attempt)")
             if self.master_app.log_panel: self.master_app.log_panel.log("Note: Xiaomi bootloader unlock often requires official Mi Unlock Tool and account authorization. This command attempts the generic unlock.", "warning", include_timestamp=False)
         else:
             if self.master_app.log_panel: self.master_app.log_panel.log("Xiaomi Unlock Bootloader cancelled by user.", "info", include_timestamp=True)
 
     def action_xiaomi_fastboot_lock(self):
         if messagebox.askyesno("Confirm Lock", "Are you sure you want to lock the bootloader? This will erase all user data if the device is not already formatted for a locked state.", parent=self.master_app.master):
-            self.master_app.execute_command_async(["fastboot", "oem", "lock"], operation_name="Xiaomi Lock Bootloader")
+            self.master_app.execute_command_on_devices(["fastboot", "oem", "lock"], operation_name="Xiaomi Lock Bootloader")
         else:
             if self.master_app.log_panel: self.master_app.log_panel.log("Xiaomi Lock Bootloader cancelled by user.", "info", include_timestamp=True)
 
     def action_xiaomi_fastboot_wipe_data(self):
         if messagebox.askyesno("Confirm Wipe", "Are you sure you want to wipe all user data? This cannot be undone.", parent=self.master_app.master):
-            self.master_app.execute_command_async(["fastboot", "erase", "userdata"], operation_name="Xiaomi Wipe Data (Fastboot)")
+            self.master_app.execute_command_on_devices(["fastboot", "erase", "userdata"], operation_name="Xiaomi Wipe Data (Fastboot)")
         else:
             if self.master_app.log_panel: self.master_app.log_panel.log("Xiaomi Wipe Data cancelled by user.", "info", include_timestamp=True)
 
@@ -2625,7 +3006,7 @@ class FileAdvancedTab(ttk.Frame):
             return
 
         self.master_app.execute_command_async(["adb", "pull", device_path.strip(), local_path],
-                                             operation_name=f"Pull File: {os.path.basename(device_path.strip())}")
+                                             operation_name=f"Pull File: {os.path.basename(device_path.strip())}", priority=PRIORITY_BULK, stream_output=True)
 
     def action_push_file(self):
         local_path = filedialog.askopenfilename(parent=self.master_app.master, title="Select File to Push")
@@ -2641,7 +3022,7 @@ class FileAdvancedTab(ttk.Frame):
             return
 
         self.master_app.execute_command_async(["adb", "push", local_path, device_path.strip()],
-                                             operation_name=f"Push File: {os.path.basename(local_path)}")
+                                             operation_name=f"Push File: {os.path.basename(local_path)}", priority=PRIORITY_BULK, stream_output=True)
 
     def action_install_apk(self):
         apk_path = filedialog.askopenfilename(title=self.labels.get("install_apk_title", "Select APK to Install"),
@@ -2680,7 +3061,7 @@ class FileAdvancedTab(ttk.Frame):
 
         if self.master_app.log_panel:
             self.master_app.log_panel.log("ADB Backup requires confirmation on the device. The operation will wait.", "warning", include_timestamp=False)
-        self.master_app.execute_command_async(command, operation_name=operation_name)
+        self.master_app.execute_command_async(command, operation_name=operation_name, priority=PRIORITY_BULK, stream_output=True)
 
 
     def action_restore_user_data(self):
@@ -2698,7 +3079,7 @@ class FileAdvancedTab(ttk.Frame):
         if self.master_app.log_panel:
             self.master_app.log_panel.log("ADB Restore requires confirmation on the device. The operation will wait.", "warning", include_timestamp=False)
 
-        self.master_app.execute_command_async(command, operation_name=operation_name)
+        self.master_app.execute_command_async(command, operation_name=operation_name, priority=PRIORITY_BULK, stream_output=True)
 
     def action_pull_contacts_vcf(self):
         if not messagebox.askokcancel(
@@ -2960,24 +3341,14 @@ class AppManagerTab(ttk.Frame):
                         err_msg = result.get("stderr","") or result.get("stdout","") or "Unknown error"
                         self.master_app.log_panel.log(f"Failed to uninstall {package_name}: {err_msg.strip()}", "error")
             
-            self.master_app.execute_command_async(cmd, operation_name=op_name, callback_on_finish=_uninstall_callback)
+            self.master_app.execute_command_async(cmd, operation_name=op_name, callback_on_finish=_uninstall_callback, use_shell_session=True)
 
 
 if __name__ == "__main__":
     if not PIL_AVAILABLE:
         log_to_file_debug_globally("Pillow not installed. UI may not display images correctly.", "CRITICAL")
 
-    try:
-        with open(_DEBUG_LOG_PATH, "a", encoding="utf-8") as f_log_check:
-            f_log_check.write(f"[{datetime.now()}] [INFO] Main execution block started.\n")
-    except Exception as e_log_main_check:
-        print(f"[CRITICAL_ERROR] Cannot write to main debug log '{_DEBUG_LOG_PATH}': {e_log_main_check}", file=sys.stderr)
-        _DEBUG_LOG_PATH = "application_debug_log_local.txt" 
-        try:
-            with open(_DEBUG_LOG_PATH, "a", encoding="utf-8") as f_log_fallback:
-                f_log_fallback.write(f"[{datetime.now()}] [INFO] Using fallback debug log: '{_DEBUG_LOG_PATH}'.\n")
-        except Exception as e_log_fallback_create:
-            print(f"[CRITICAL_ERROR] Cannot write to fallback debug log '{_DEBUG_LOG_PATH}': {e_log_fallback_create}", file=sys.stderr)
+    log_to_file_debug_globally("Main execution block started.") # debug_log falls back to application_debug_log_local.txt itself
 
     try:
         try:
@@ -2997,11 +3368,11 @@ if __name__ == "__main__":
 
     except Exception as e:
         log_to_file_debug_globally(f"Fatal error in main execution: {e}", "CRITICAL")
-        traceback.print_exc(file=open(_DEBUG_LOG_PATH, "a")) 
+        log_to_file_debug_globally(traceback.format_exc(), "CRITICAL_TRACE")
         try:
             root_err = tk.Tk()
             root_err.withdraw() 
-            messagebox.showerror("Fatal Error", f"A critical error occurred: {e}\n\nPlease check '{_DEBUG_LOG_PATH}' for details.", parent=None)
+            messagebox.showerror("Fatal Error", f"A critical error occurred: {e}\n\nPlease check '{debug_log_path()}' for details.", parent=None)
             root_err.destroy()
         except Exception as e_tk_fatal:
-            print(f"A critical error occurred: {e}. Check '{_DEBUG_LOG_PATH}'. Tkinter error dialog also failed: {e_tk_fatal}", file=sys.stderr)
+            print(f"A critical error occurred: {e}. Check '{debug_log_path()}'. Tkinter error dialog also failed: {e_tk_fatal}", file=sys.stderr)
@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""GPT partition tables read straight from disk images, without asking the device again.
+
+Works on anything that holds a primary or backup GPT: a full `rf` dump (raw or .cdump), its
+first few MB, mtkclient's `gpt` output, or pgpt.bin / sgpt.bin partition dumps. Header and entry CRCs are
+checked; when the primary table is damaged the backup one at the end of the image is used.
+The result is a GptIndex with the exact byte range of every partition.
+"""
+
+import os
+import json
+import uuid
+import zlib
+import struct
+
+from chunked_dump import open_image
+from debug_log import log_to_file_debug_globally # Queued, rotating debug log shared by every module
+
+GPT_SIGNATURE = b"EFI PART"
+SECTOR_SIZES = (512, 4096) # eMMC uses 512-byte LBAs, UFS 4096
+MAX_GPT_ENTRIES = 1024     # Sanity limit for num_entries in a header
+
+# signature, revision, header_size, header_crc32, (reserved), current_lba, backup_lba,
+# first_usable_lba, last_usable_lba, disk_guid, entries_lba, num_entries, entry_size, entries_crc32
+_HEADER = struct.Struct("<8s4sII4xQQQQ16sQIII")
+# type_guid, unique_guid, first_lba, last_lba, attributes, name (UTF-16LE)
+_ENTRY = struct.Struct("<16s16sQQQ72s")
+_EMPTY_GUID = b"\x00" * 16
+
+
+class GptError(Exception):
+    """No usable GPT in the file."""
+
+
+def _guid(raw):
+    return str(uuid.UUID(bytes_le=raw)).upper()
+
+
+def format_size(size):
+    """1536 -> "1.5 KiB"; sizes as mtkclient prints them."""
+    for unit in ("B", "KiB", "MiB", "GiB"):
+        if size < 1024 or unit == "GiB":
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024.0
+
+
+class GptPartition:
+    """One GPT entry. start, size and end are byte offsets on the disk (end is exclusive)."""
+
+    def __init__(self, index, name, first_lba, last_lba, sector_size, type_guid="", unique_guid="", attributes=0):
+        self.index = index
+        self.name = name
+        self.first_lba = first_lba
+        self.last_lba = last_lba
+        self.sector_size = sector_size
+        self.type_guid = type_guid
+        self.unique_guid = unique_guid
+        self.attributes = attributes
+
+    @property
+    def start(self):
+        return self.first_lba * self.sector_size
+
+    @property
+    def size(self):
+        return (self.last_lba - self.first_lba + 1) * self.sector_size
+
+    @property
+    def end(self):
+        return self.start + self.size
+
+    def as_dict(self):
+        return {"index": self.index, "name": self.name, "first_lba": self.first_lba, "last_lba": self.last_lba,
+                "start": self.start, "size": self.size, "type_guid": self.type_guid, "unique_guid": self.unique_guid,
+                "attributes": self.attributes}
+
+    def __repr__(self):
+        return f"GptPartition({self.name!r}, start=0x{self.start:X}, size=0x{self.size:X})"
+
+
+class GptIndex:
+    """Partition table of one disk image. source says which copy it came from: "primary" or "backup"."""
+
+    def __init__(self, partitions, sector_size, disk_guid="", source="primary", primary_ok=False, backup_ok=None,
+                 last_usable_lba=None, problems=None, path=""):
+        self.partitions = partitions
+        self.sector_size = sector_size
+        self.disk_guid = disk_guid
+        self.source = source
+        self.primary_ok = primary_ok
+        self.backup_ok = backup_ok # None when the image has no backup GPT (not a full dump)
+        self.last_usable_lba = last_usable_lba
+        self.problems = problems or []
+        self.path = path
+        self._by_name = {}
+        for partition in partitions:
+            self._by_name.setdefault(partition.name.lower(), partition)
+
+    def get(self, name):
+        """The partition called name (case-insensitive), or None."""
+        return self._by_name.get(str(name).lower())
+
+    def names(self):
+        return [partition.name for partition in self.partitions]
+
+    def byte_range(self, name):
+        """(start, size) in bytes of the partition on the disk. Raises KeyError for unknown names."""
+        partition = self.get(name)
+        if partition is None:
+            raise KeyError(name)
+        return partition.start, partition.size
+
+    def as_dict(self):
+        return {"path": self.path, "sector_size": self.sector_size, "disk_guid": self.disk_guid, "source": self.source,
+                "primary_ok": self.primary_ok, "backup_ok": self.backup_ok, "last_usable_lba": self.last_usable_lba,
+                "problems": self.problems, "partitions": [partition.as_dict() for partition in self.partitions]}
+
+    @classmethod
+    def from_dict(cls, data):
+        sector_size = data["sector_size"]
+        partitions = [GptPartition(entry["index"], entry["name"], entry["first_lba"], entry["last_lba"], sector_size,
+                                   entry.get("type_guid", ""), entry.get("unique_guid", ""), entry.get("attributes", 0))
+                      for entry in data["partitions"]]
+        return cls(partitions, sector_size, data.get("disk_guid", ""), data.get("source", "primary"), data.get("primary_ok", False),
+                   data.get("backup_ok"), data.get("last_usable_lba"), data.get("problems"), data.get("path", ""))
+
+    def save(self, json_path):
+        with open(json_path, "w", encoding="utf-8") as f_json:
+            json.dump(self.as_dict(), f_json, indent=2)
+
+    @classmethod
+    def load(cls, json_path):
+        with open(json_path, "r", encoding="utf-8") as f_json:
+            return cls.from_dict(json.load(f_json))
+
+
+def _read_at(f_image, offset, size):
+    if offset < 0:
+        return b""
+    f_image.seek(offset)
+    return f_image.read(size)
+
+
+def _read_table(f_image, header_offset, sector_size):
+    """Parses the GPT whose header sits at header_offset in the file.
+
+    Returns (header fields dict, [GptPartition], [problems]) or None when there is no GPT header there.
+    Entry LBAs are disk-relative; header_offset - current_lba * sector_size maps them into the file,
+    so a standalone sgpt.bin (entries then header) reads as well as a full dump.
+    """
+    raw = _read_at(f_image, header_offset, sector_size)
+    if len(raw) < _HEADER.size or raw[:8] != GPT_SIGNATURE:
+        return None
+    (_signature, _revision, header_size, header_crc, current_lba, backup_lba, first_usable, last_usable,
+     disk_guid, entries_lba, num_entries, entry_size, entries_crc) = _HEADER.unpack_from(raw)
+    problems = []
+    if not _HEADER.size <= header_size <= sector_size:
+        return None
+    check = bytearray(raw[:header_size])
+    check[16:20] = b"\x00\x00\x00\x00"
+    if zlib.crc32(check) & 0xFFFFFFFF != header_crc:
+        problems.append("header CRC mismatch")
+    if num_entries > MAX_GPT_ENTRIES or entry_size < _ENTRY.size or entry_size % 8:
+        problems.append(f"implausible entry array ({num_entries} x {entry_size} bytes)")
+        return {"current_lba": current_lba, "backup_lba": backup_lba}, [], problems
+
+    disk_offset = header_offset - current_lba * sector_size # Where LBA 0 would be in this file
+    entries = _read_at(f_image, disk_offset + entries_lba * sector_size, num_entries * entry_size)
+    if len(entries) < num_entries * entry_size:
+        problems.append("entry array is cut off")
+    elif zlib.crc32(entries) & 0xFFFFFFFF != entries_crc:
+        problems.append("entry array CRC mismatch")
+
+    partitions = []
+    for index in range(len(entries) // entry_size):
+        type_guid, unique_guid, first_lba, last_lba, attributes, raw_name = _ENTRY.unpack_from(entries, index * entry_size)
+        if type_guid == _EMPTY_GUID:
+            continue
+        name = raw_name.decode("utf-16-le", errors="ignore").split("\x00", 1)[0]
+        partitions.append(GptPartition(index + 1, name, first_lba, last_lba, sector_size, _guid(type_guid), _guid(unique_guid), attributes))
+    header = {"current_lba": current_lba, "backup_lba": backup_lba, "first_usable_lba": first_usable,
+              "last_usable_lba": last_usable, "disk_guid": _guid(disk_guid), "entries_crc32": entries_crc}
+    return header, partitions, problems
+
+
+def read_gpt(path):
+    """GptIndex for the image at path: the primary GPT when its CRCs check out, else the backup GPT.
+
+    path may also be a chunked dump (.cdump); only the chunks holding the tables are decompressed.
+    Raises GptError when neither copy is usable.
+    """
+    primary = backup = None
+    with open_image(path) as f_image:
+        file_size = f_image.seek(0, os.SEEK_END)
+        for sector_size in SECTOR_SIZES: # Primary header is LBA 1
+            primary = _read_table(f_image, sector_size, sector_size)
+            if primary is not None:
+                primary_sector_size = sector_size
+                break
+        for sector_size in SECTOR_SIZES: # Backup header is the last LBA of the disk
+            if file_size >= 2 * sector_size:
+                backup = _read_table(f_image, file_size - sector_size, sector_size)
+            if backup is not None:
+                backup_sector_size = sector_size
+                break
+
+    primary_ok = primary is not None and not primary[2]
+    backup_ok = (not backup[2]) if backup is not None else None
+    problems = [f"primary GPT: {problem}" for problem in (primary[2] if primary else ["not found"])]
+    problems += [f"backup GPT: {problem}" for problem in backup[2]] if backup is not None else []
+    if primary_ok and backup_ok and primary[0]["entries_crc32"] != backup[0]["entries_crc32"]:
+        problems.append("primary and backup GPT list different partitions")
+
+    if primary_ok:
+        header, partitions, _problems = primary
+        source, sector_size = "primary", primary_sector_size
+    elif backup_ok:
+        header, partitions, _problems = backup
+        source, sector_size = "backup", backup_sector_size
+    else:
+        raise GptError(f"No valid GPT in {os.path.basename(path)}: {'; '.join(problems)}")
+    if source == "backup":
+        log_to_file_debug_globally(f"GPT: primary table of {path} unusable, using the backup ({'; '.join(problems)}).", "WARNING")
+    return GptIndex(partitions, sector_size, header["disk_guid"], source, primary_ok, backup_ok, header["last_usable_lba"], problems, path)
+
+
+def find_gpt_files(directory):
+    """The GPT file mtkclient's `gpt` command wrote into directory (gpt.bin, gpt_main.bin...), backup copies last."""
+    candidates = sorted((name for name in os.listdir(directory) if "gpt" in name.lower() and name.lower().endswith(".bin")),
+                        key=lambda name: ("backup" in name.lower() or "sgpt" in name.lower(), name))
+    return [os.path.join(directory, name) for name in candidates]
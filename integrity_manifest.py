@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""SHA-256 / MD5 manifests for dump folders and forensic projects.
+
+Every file a read produced is hashed once, both digests from the same pass over the data,
+and recorded in <folder>/manifest.json with its size, source partition, the device it came
+from and timing. Files are hashed in parallel on a thread pool: hashlib releases the GIL
+while it digests large buffers, so one thread per core keeps every core and the disk busy.
+verify_manifest() re-hashes a folder the same way and reports what no longer matches.
+
+Command line: python integrity_manifest.py <folder or manifest.json>
+"""
+
+import os
+import sys
+import re
+import json
+import hashlib
+import time
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+from debug_log import log_to_file_debug_globally # Queued, rotating debug log shared by every module
+
+MANIFEST_NAME = "manifest.json"
+MANIFEST_FORMAT = 1
+HASH_WORKERS = os.cpu_count() or 2
+HASH_BUFFER_BYTES = 4 * 1024 * 1024 # Read per step; large enough that hashlib drops the GIL
+
+_DEVICE_ID_PATTERN = re.compile(r"\b(CPU|HW code|HW subcode|HW version|SW version|ME_ID|SOC_ID|Serial|Chipset)\s*:\s*(\S.*)$", re.IGNORECASE)
+
+
+class ManifestError(Exception):
+    """The manifest is missing or can't be parsed."""
+
+
+def parse_device_id_line(line):
+    """(key, value) for an mtkclient line that identifies the device ("HW code:", "ME_ID:", "SOC_ID:"...), else None."""
+    match = _DEVICE_ID_PATTERN.search(line)
+    if not match:
+        return None
+    return match.group(1).lower().replace(" ", "_"), match.group(2).strip()
+
+
+def hash_file(path, cancel_event=None):
+    """{"size", "sha256", "md5"} of the file, both digests from one read pass. None when cancelled."""
+    sha256, md5 = hashlib.sha256(), hashlib.md5()
+    buffer = bytearray(HASH_BUFFER_BYTES)
+    view = memoryview(buffer)
+    size = 0
+    with open(path, "rb", buffering=0) as f_in:
+        while True:
+            if cancel_event is not None and cancel_event.is_set():
+                return None
+            count = f_in.readinto(buffer)
+            if not count:
+                break
+            sha256.update(view[:count])
+            md5.update(view[:count])
+            size += count
+    return {"size": size, "sha256": sha256.hexdigest(), "md5": md5.hexdigest()}
+
+
+def hash_files(paths, workers=HASH_WORKERS, progress_callback=None, cancel_event=None):
+    """Hashes paths in parallel. Returns {path: hash_file() dict or the OSError it raised}.
+
+    progress_callback(path, files_done, files_total) is called as each file finishes, from the calling thread.
+    """
+    results = {}
+    if not paths:
+        return results
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(paths)))) as pool:
+        futures = [(path, pool.submit(hash_file, path, cancel_event)) for path in paths]
+        for done, (path, future) in enumerate(futures, 1):
+            try:
+                results[path] = future.result()
+            except OSError as e_hash:
+                results[path] = e_hash
+            if progress_callback:
+                progress_callback(path, done, len(paths))
+    return results
+
+
+def manifest_path_for(location):
+    """manifest.json inside a folder, or location itself when it already is a manifest file."""
+    return os.path.join(location, MANIFEST_NAME) if os.path.isdir(location) else location
+
+
+def load_manifest(location):
+    """The manifest dict of a folder (or manifest file). Raises ManifestError."""
+    path = manifest_path_for(location)
+    try:
+        with open(path, "r", encoding="utf-8") as f_manifest:
+            manifest = json.load(f_manifest)
+    except (OSError, ValueError) as e_load:
+        raise ManifestError(f"Cannot read {path}: {e_load}") from e_load
+    if not isinstance(manifest, dict) or not isinstance(manifest.get("files"), list):
+        raise ManifestError(f"{path} is not a dump manifest")
+    return manifest
+
+
+def write_manifest(root_dir, paths, partitions=None, device=None, started=None, workers=HASH_WORKERS,
+                   progress_callback=None, cancel_event=None):
+    """Hashes paths (files under root_dir) and records them in <root_dir>/manifest.json.
+
+    partitions maps a path to the partition it was read from; device is a dict of identifiers
+    (serial, chipset, socid...). Entries of an existing manifest for other files are kept, so
+    several reads into one folder share a manifest. started is the epoch time the read began.
+    Returns the manifest dict, or None when cancelled.
+    """
+    partitions = partitions or {}
+    manifest_path = os.path.join(root_dir, MANIFEST_NAME)
+    try:
+        manifest = load_manifest(manifest_path)
+    except ManifestError:
+        manifest = {"format": MANIFEST_FORMAT, "created": datetime.now().isoformat(timespec="seconds"), "files": []}
+    hash_started = time.time()
+    hashes = hash_files(paths, workers, progress_callback, cancel_event)
+    if cancel_event is not None and cancel_event.is_set():
+        return None
+    finished = time.time()
+
+    entries = {entry["name"]: entry for entry in manifest["files"]}
+    for path in paths:
+        name = os.path.relpath(path, root_dir).replace(os.sep, "/")
+        digest = hashes.get(path)
+        if not isinstance(digest, dict):
+            log_to_file_debug_globally(f"Manifest: cannot hash {path}: {digest}", "ERROR")
+            continue
+        entries[name] = {"name": name, "size": digest["size"], "sha256": digest["sha256"], "md5": digest["md5"],
+                         "partition": partitions.get(path), "modified": datetime.fromtimestamp(os.path.getmtime(path)).isoformat(timespec="seconds"),
+                         "hashed": datetime.fromtimestamp(finished).isoformat(timespec="seconds")}
+    manifest["files"] = sorted(entries.values(), key=lambda entry: entry["name"])
+    manifest["updated"] = datetime.fromtimestamp(finished).isoformat(timespec="seconds")
+    if device:
+        manifest["device"] = dict(manifest.get("device") or {}, **device)
+    manifest.setdefault("runs", []).append({"started": datetime.fromtimestamp(started or hash_started).isoformat(timespec="seconds"),
+                                            "read_seconds": round(hash_started - started, 1) if started else None,
+                                            "hash_seconds": round(finished - hash_started, 1), "files": len(paths)})
+    temp_path = manifest_path + ".tmp"
+    with open(temp_path, "w", encoding="utf-8") as f_manifest:
+        json.dump(manifest, f_manifest, indent=2)
+    os.replace(temp_path, manifest_path) # An interrupted write leaves the previous manifest intact
+    log_to_file_debug_globally(f"Manifest: {len(paths)} files hashed in {finished - hash_started:.1f}s, {manifest_path}.")
+    return manifest
+
+
+def verify_manifest(location, workers=HASH_WORKERS, progress_callback=None, cancel_event=None):
+    """Re-hashes every file listed in a folder's manifest. Returns one dict per entry: name, path, ok, message.
+
+    Raises ManifestError when there is no usable manifest. Files are hashed on all cores.
+    """
+    manifest_path = manifest_path_for(location)
+    manifest = load_manifest(manifest_path)
+    root_dir = os.path.dirname(os.path.abspath(manifest_path))
+    entries = manifest["files"]
+    paths = [os.path.join(root_dir, *entry["name"].split("/")) for entry in entries]
+    present = [path for path in paths if os.path.isfile(path)]
+    hashes = hash_files(present, workers, progress_callback, cancel_event)
+    results = []
+    for entry, path in zip(entries, paths):
+        result = {"name": entry["name"], "path": path, "ok": False, "message": ""}
+        results.append(result)
+        digest = hashes.get(path)
+        if path not in hashes:
+            result["message"] = "Missing"
+        elif digest is None:
+            result["message"] = "Cancelled"
+        elif not isinstance(digest, dict):
+            result["message"] = f"Cannot read: {digest}"
+        elif digest["size"] != entry["size"]:
+            result["message"] = f"Size changed: {entry['size']} -> {digest['size']} bytes"
+        elif digest["sha256"] != entry["sha256"] or (entry.get("md5") and digest["md5"] != entry["md5"]):
+            result["message"] = "Hash mismatch (content changed)"
+        else:
+            result.update(ok=True, message="OK")
+    failed = [result for result in results if not result["ok"]]
+    log_to_file_debug_globally(f"Manifest verify: {len(results) - len(failed)}/{len(results)} files OK in {root_dir}.",
+                               "WARNING" if failed else "INFO")
+    return results
+
+
+if __name__ == "__main__": # python integrity_manifest.py <folder or manifest.json>
+    if len(sys.argv) != 2:
+        print("Usage: python integrity_manifest.py <folder or manifest.json>")
+        sys.exit(2)
+    try:
+        verify_results = verify_manifest(sys.argv[1], progress_callback=lambda path, done, total: print(f"[{done}/{total}] {os.path.basename(path)}"))
+    except ManifestError as e_manifest:
+        print(e_manifest)
+        sys.exit(2)
+    for verify_result in verify_results:
+        print(f"{'OK  ' if verify_result['ok'] else 'FAIL'} {verify_result['name']}: {verify_result['message']}")
+    sys.exit(0 if all(verify_result["ok"] for verify_result in verify_results) else 1)
@@ -9,7 +9,7 @@ import subprocess
 import threading
 import sqlite3
 from datetime import datetime
-import queue # For passing results from thread to main
+from collections import deque
 import traceback # For detailed error logging
 import webbrowser # For opening URL
 import csv
@@ -17,6 +17,19 @@ import re # For parsing App Manager output
 import shutil # For shutil.which
 import tempfile # For temporary files in MTK operations
 from pathlib import Path # For path operations
+from command_engine import CommandExecutor, ResultDispatcher, StreamingOutput, lane_for_command, DEFAULT_LANE, PRIORITY_INTERACTIVE, PRIORITY_NORMAL, PRIORITY_BULK # Pooled per-device command lanes
+from adb_client import AdbHostClient, AdbProtocolError, AdbShellSessionPool, shell_args_for_command # adb server protocol + persistent shells
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from device_props import DevicePropertyCache, DevicePropertySnapshot # getprop/getvar snapshots cached per serial
+from progress_parsers import parser_for_command, format_rate, format_eta # Bytes/rate/ETA from streamed tool output
+from gpt_index import read_gpt, find_gpt_files, format_size, GptError # GPT partition tables read from dumps, no device round-trip
+from dump_extract import extract_partitions # Kernel-side copies of single partitions out of a full dump
+from sparse_image import raw_to_sparse, sparse_to_raw, is_sparse_image, SPARSE_EXTENSION # Android sparse images for backups/restores
+from chunked_dump import compress_file, decompress_file, is_chunked_dump, CHUNKED_EXTENSION # Seekable compressed dumps
+from integrity_manifest import write_manifest, verify_manifest, parse_device_id_line, ManifestError, MANIFEST_NAME # SHA-256/MD5 manifests of dumps and projects
+from backup_store import BackupStore, BackupStoreError # Deduplicated, content-addressed store for partition backups
+from oplog_db import DBLogger, operation_status_for_result, EXPORT_FORMAT_CSV, EXPORT_FORMAT_JSONL # operation_log.db, written by a batching background thread
+from device_manager import DeviceWatcher, DeviceManager, MODE_ADB, MODE_FASTBOOT, EVENT_CONNECTED, mode_for_command, address_command # Push-based device tracking, multi-device registry
 
 try:
     from PIL import Image, ImageTk
@@ -25,15 +38,8 @@ except ImportError:
     PIL_AVAILABLE = False
     print("Pillow library not found. Please install it: pip install Pillow. Image features will be limited.")
 
-# Static debug log path and function, defined early for global use
-_DEBUG_LOG_PATH = "application_debug_log.txt"
-
-def log_to_file_debug_globally(message, level="INFO"):
-    try:
-        with open(_DEBUG_LOG_PATH, "a", encoding="utf-8") as f_log:
-            f_log.write(f"[{datetime.now()}] [{level}] {message}\n")
-    except Exception as e:
-        print(f"[CRITICAL_ERROR] Global static log failed: {e} for message: {message}", file=sys.stderr)
+# Debug log: queued, rotated and gzipped by debug_log's background writer, same call signature as before
+from debug_log import log_to_file_debug_globally
 
 log_to_file_debug_globally("Script execution started. Global logger active.")
 
@@ -69,17 +75,28 @@ LABELS = {
         "label_da_file": "DA File:",
         "label_auth_file": "Auth File:",
         "label_preloader_file": "Preloader File:",
+        "label_sparse_backups": "Save partition backups as sparse images (.simg)",
+        "label_compress_backups": "Compress partition backups and full dumps (.cdump, seekable)",
+        "label_backup_store": "Move partition backups into the deduplicated backup store",
         "btn_browse": "Browse",
         "btn_mtk_read_full_dump": "Read Full Dump (Userarea)",
         "btn_mtk_read_userdata": "Read Userdata",
         "btn_mtk_read_custom_dump": "Read Custom Dump (Select Partitions)",
         "btn_mtk_auto_boot_repair_dump": "Auto Boot Repair Dump",
         "btn_mtk_write_dump": "Write Full/Custom Dump",
+        "btn_mtk_extract_from_dump": "Extract Partitions from Full Dump (Offline)",
+        "mtk_select_full_dump_file": "Select Full Dump File",
+        "btn_mtk_verify_manifest": "Verify Dump/Project Folder (Hashes)",
+        "mtk_select_verify_folder": "Select Folder with manifest.json",
         "btn_mtk_list_partitions": "List Partitions",
+        "btn_mtk_load_gpt_from_dump": "Partition Table from Dump File (Offline)",
+        "mtk_select_gpt_source_file": "Select Full Dump, pgpt.bin or GPT File",
         "btn_mtk_backup_selected_partitions": "Backup Selected/All Partitions",
         "btn_mtk_backup_security_partitions": "Backup Security Partitions",
         "btn_mtk_format_selected_partitions": "Format Selected Partitions",
         "btn_mtk_restore_selected_partitions": "Restore Selected Partitions",
+        "btn_mtk_restore_from_store": "Reassemble Backup from Backup Store",
+        "mtk_store_backup_id_prompt": "Backup ID to reassemble (newest is filled in):",
         "btn_mtk_reset_nv_data": "Reset NV Data (nvram, nvdata, nvcfg)",
         "btn_mtk_erase_frp": "Erase FRP",
         "btn_mtk_samsung_frp": "Samsung MTK FRP",
@@ -139,11 +156,24 @@ LABELS = {
         "adb_status_connected": "ADB: Connected",
         "adb_status_not_connected": "ADB: Not Connected",
         "adb_status_device_id_prefix": "Device ID: ",
+        "devices_label": "Devices (Ctrl/Shift-click to select several):",
+        "device_col_mode": "Mode", "device_col_serial": "Serial", "device_col_state": "State", "device_col_usb": "USB", "device_col_model": "Model",
+        "adb_status_more_devices": "more",
         "search_log_label": "Search Log:",
         "find_button": "Find",
         "all_button": "All",
         "export_button": "Export to TXT",
         "btn_export_csv": "Export to CSV",
+        "btn_export_jsonl": "Export to JSONL",
+        "btn_log_history": "Log History",
+        "log_history_title": "Operation Log History",
+        "log_history_device_label": "Device:",
+        "log_history_col_timestamp": "Time", "log_history_col_tag": "Type", "log_history_col_device": "Device", "log_history_col_message": "Message",
+        "log_history_rows_shown": "{count} rows shown",
+        "export_progress": "Exporting... {count} rows",
+        "export_done_title": "Export Complete",
+        "export_done_message": "{count} rows written to:\n{path}",
+        "export_failed_title": "Export Failed",
         "btn_cancel_operation": "Cancel Operation",
         "cancel_operation_warning_title": "Cancel Operation Warning",
         "cancel_operation_warning_message": "Stopping an operation abruptly might leave the device in an unstable state or cause issues. Are you sure you want to attempt to cancel?",
@@ -293,17 +323,28 @@ LABELS = {
         "label_da_file": "ملف DA:",
         "label_auth_file": "ملف Auth:",
         "label_preloader_file": "ملف Preloader:",
+        "label_sparse_backups": "حفظ النسخ الاحتياطية للأقسام كصور sparse (.simg)",
+        "label_compress_backups": "ضغط النسخ الاحتياطية والـ Full Dump (.cdump، قابل للقراءة الجزئية)",
+        "label_backup_store": "نقل النسخ الاحتياطية للأقسام إلى مخزن النسخ بدون تكرار",
         "btn_browse": "استعراض",
         "btn_mtk_read_full_dump": "قراءة Full Dump (Userarea)",
         "btn_mtk_read_userdata": "قراءة Userdata",
         "btn_mtk_read_custom_dump": "قراءة Dump مخصص (اختر الأقسام)",
         "btn_mtk_auto_boot_repair_dump": "سحب Dump تلقائي لإصلاح الإقلاع",
         "btn_mtk_write_dump": "كتابة Full/Custom Dump",
+        "btn_mtk_extract_from_dump": "استخراج أقسام من Full Dump (بدون جهاز)",
+        "mtk_select_full_dump_file": "اختر ملف Full Dump",
+        "btn_mtk_verify_manifest": "التحقق من مجلد Dump/مشروع (Hashes)",
+        "mtk_select_verify_folder": "اختر مجلداً يحتوي manifest.json",
         "btn_mtk_list_partitions": "عرض الأقسام",
+        "btn_mtk_load_gpt_from_dump": "جدول الأقسام من ملف Dump (بدون جهاز)",
+        "mtk_select_gpt_source_file": "اختر Full Dump أو pgpt.bin أو ملف GPT",
         "btn_mtk_backup_selected_partitions": "نسخ احتياطي للأقسام المحددة/الكل",
         "btn_mtk_backup_security_partitions": "نسخ احتياطي لأقسام الأمان",
         "btn_mtk_format_selected_partitions": "تهيئة الأقسام المحددة",
         "btn_mtk_restore_selected_partitions": "استعادة الأقسام المحددة",
+        "btn_mtk_restore_from_store": "تجميع نسخة احتياطية من مخزن النسخ",
+        "mtk_store_backup_id_prompt": "معرّف النسخة المراد تجميعها (الأحدث مُدخل مسبقاً):",
         "btn_mtk_reset_nv_data": "إعادة ضبط بيانات NV",
         "btn_mtk_erase_frp": "مسح FRP",
         "btn_mtk_samsung_frp": "Samsung MTK FRP",
@@ -363,11 +404,24 @@ LABELS = {
         "adb_status_connected": "ADB: متصل",
         "adb_status_not_connected": "ADB: غير متصل",
         "adb_status_device_id_prefix": "معرف الجهاز: ",
+        "devices_label": "الأجهزة (Ctrl/Shift للنقر لتحديد أكثر من جهاز):",
+        "device_col_mode": "الوضع", "device_col_serial": "الرقم التسلسلي", "device_col_state": "الحالة", "device_col_usb": "USB", "device_col_model": "الطراز",
+        "adb_status_more_devices": "أجهزة أخرى",
         "search_log_label": "بحث في السجل:",
         "find_button": "بحث",
         "all_button": "الكل",
         "export_button": "تصدير إلى TXT",
         "btn_export_csv": "تصدير إلى CSV",
+        "btn_export_jsonl": "تصدير إلى JSONL",
+        "btn_log_history": "سجل العمليات",
+        "log_history_title": "سجل العمليات السابقة",
+        "log_history_device_label": "الجهاز:",
+        "log_history_col_timestamp": "الوقت", "log_history_col_tag": "النوع", "log_history_col_device": "الجهاز", "log_history_col_message": "الرسالة",
+        "log_history_rows_shown": "تم عرض {count} سطر",
+        "export_progress": "جاري التصدير... {count} سطر",
+        "export_done_title": "اكتمل التصدير",
+        "export_done_message": "تمت كتابة {count} سطر إلى:\n{path}",
+        "export_failed_title": "فشل التصدير",
         "btn_cancel_operation": "إلغاء العملية",
         "cancel_operation_warning_title": "تحذير إلغاء العملية",
         "cancel_operation_warning_message": "إيقاف العملية بشكل مفاجئ قد يترك الجهاز في حالة غير مستقرة أو يسبب مشاكل. هل أنت متأكد[...]
@@ -554,6 +608,9 @@ DEVICE_STATUS_FONT_VALUE = ("Segoe UI", 9)
 LABEL_FONT = ("Segoe UI", 9, "bold")
 BTN_FONT = ("Segoe UI", 10, "bold") # Increased button font size slightly for "inflated" look
 LOG_FONT = ("Consolas", 11)
+LOG_PANEL_MAX_LINES = 5000 # Lines kept in the log widget, the full history is in operation_log.db
+LOG_PANEL_FLUSH_MS = 50    # Lines logged within this window are inserted together
+LOG_HISTORY_PAGE_ROWS = 500 # Rows the log history window fetches per page
 log_to_file_debug_globally("FONTS defined.")
 
 app_images = {}
@@ -661,101 +718,6 @@ class ModernButton(tk.Button):
                         fg=kwargs.get('disabledforeground', theme.get("NOTEBOOK_TAB_FG", "#AAB8C5")))
 
 
-class DBLogger:
-    def __init__(self, dbfile=None, tk_root=None):
-        log_to_file_debug_globally("DBLogger __init__ started.")
-        if dbfile is None:
-            try:
-                # Use Path for robust path creation
-                base_dir = Path(sys.argv[0]).resolve().parent
-                dbfile_path = base_dir / "operation_log.db"
-                dbfile_path.parent.mkdir(parents=True, exist_ok=True)
-                dbfile_path.touch(exist_ok=True) # Creates if not exists, updates timestamp
-                dbfile = str(dbfile_path)
-                log_to_file_debug_globally(f"DBLogger: DB file path set to: {dbfile}")
-            except Exception as e_db_path1:
-                log_to_file_debug_globally(f"DBLogger: Failed to create DB at primary path {dbfile}: {e_db_path1}", "WARNING")
-                try:
-                    user_dir = Path.home()
-                    dbfile_fallback_path = user_dir / ".UltimatUnlockTool" / "operation_log.db"
-                    dbfile_fallback_path.parent.mkdir(parents=True, exist_ok=True)
-                    dbfile_fallback_path.touch(exist_ok=True)
-                    dbfile = str(dbfile_fallback_path)
-                    log_to_file_debug_globally(f"DBLogger: DB file path set to fallback: {dbfile}")
-                except Exception as e_db_path2:
-                    log_to_file_debug_globally(f"DBLogger: Failed to create DB at fallback path {dbfile_fallback_path}: {e_db_path2}", "ERROR")
-                    dbfile = ":memory:"
-                    log_to_file_debug_globally("DBLogger: Using in-memory database as last resort.")
-
-        self.dbfile = dbfile
-        self.tk_root = tk_root
-        self.conn = None
-        self.cursor = None
-
-        try:
-            self.conn = sqlite3.connect(self.dbfile, check_same_thread=False)
-            self.cursor = self.conn.cursor()
-            self.cursor.execute('''CREATE TABLE IF NOT EXISTS logs
-                                (id INTEGER PRIMARY KEY AUTOINCREMENT,
-                                 timestamp TEXT,
-                                 tag TEXT,
-                                 message TEXT)''')
-            self.conn.commit()
-            log_to_file_debug_globally("DBLogger: Database initialized/checked.")
-        except Exception as e_db_init:
-            log_to_file_debug_globally(f"DBLogger: Database initialization error: {e_db_init}", "ERROR")
-            if self.conn:
-                self.conn.close()
-            self.conn = None
-            self.cursor = None
-        log_to_file_debug_globally("DBLogger __init__ finished.")
-
-    def add(self, message, tag="info"):
-        if not self.conn or not self.cursor:
-            log_to_file_debug_globally(f"DBLogger: Cannot add log, database not initialized. Message: {message}", "WARNING")
-            return
-
-        try:
-            timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            self.cursor.execute("INSERT INTO logs (timestamp, tag, message) VALUES (?, ?, ?)",
-                               (timestamp, tag, message))
-            self.conn.commit()
-        except Exception as e_add:
-            log_to_file_debug_globally(f"DBLogger: Error adding log: {e_add}. Message: {message}", "ERROR")
-
-    def search(self, term):
-        if not self.conn or not self.cursor:
-            log_to_file_debug_globally(f"DBLogger: Cannot search, database not initialized. Term: {term}", "WARNING")
-            return []
-
-        try:
-            self.cursor.execute("SELECT timestamp, tag, message FROM logs WHERE message LIKE ? ORDER BY id DESC LIMIT 1000",
-                               (f"%{term}%",))
-            return self.cursor.fetchall()
-        except Exception as e_search:
-            log_to_file_debug_globally(f"DBLogger: Error searching logs: {e_search}. Term: {term}", "ERROR")
-            return []
-
-    def all(self, limit=1000):
-        if not self.conn or not self.cursor:
-            log_to_file_debug_globally("DBLogger: Cannot fetch all, database not initialized.", "WARNING")
-            return []
-
-        try:
-            self.cursor.execute("SELECT timestamp, tag, message FROM logs ORDER BY id DESC LIMIT ?", (limit,))
-            return self.cursor.fetchall()
-        except Exception as e_all:
-            log_to_file_debug_globally(f"DBLogger: Error fetching all logs: {e_all}", "ERROR")
-            return []
-
-    def close(self):
-        if self.conn:
-            try:
-                self.conn.close()
-                log_to_file_debug_globally("DBLogger: Database connection closed.")
-            except Exception as e_close:
-                log_to_file_debug_globally(f"DBLogger: Error closing database: {e_close}", "ERROR")
-
 class TextContextMenu:
     def __init__(self, widget, tk_root, labels):
         self.widget = widget
@@ -933,8 +895,14 @@ class LogPanel(tk.Frame):
             self.text.tag_configure(tag_name, foreground=theme[color_key], font=font_config)
 
         self.db_logger = db_logger
+        self._pending = deque(maxlen=LOG_PANEL_MAX_LINES) # Ring buffer: lines waiting for the next flush
+        self._pending_lock = threading.Lock()
+        self._flush_scheduled = False
+        self._clear_requested = False
         self.progress_bar = ProgressBarManager(self, theme)
         self.progress_bar.pack(fill=tk.X, padx=6)
+        self.progress_status = tk.Label(self, text="", anchor=tk.W, font=LOG_FONT, bg=theme["BG"], fg=theme.get("FG", "#263238"))
+        self.progress_status.pack(fill=tk.X, padx=16) # Bytes done, rate and ETA of the running transfer
 
         controls_frame = tk.Frame(self, bg=theme["BG"])
         controls_frame.pack(fill=tk.X, padx=6, pady=(6,10))
@@ -944,75 +912,102 @@ class LogPanel(tk.Frame):
                                            theme=theme, width=20, height=1, icon_path=None, state=tk.DISABLED,
                                            bg=theme.get("GROUP_BG"), fg=theme.get("NOTEBOOK_TAB_FG")) # Default disabled colors
         self.cancel_button.pack(side=tk.LEFT, padx=(0, 4))
+        self.history_button = ModernButton(controls_frame, labels.get("btn_log_history", "Log History"), command=self.open_log_history,
+                                           theme=theme, width=14, height=1, state=tk.NORMAL if db_logger else tk.DISABLED)
+        self.history_button.pack(side=tk.LEFT, padx=(0, 4))
         if self.app_controller:
             self.app_controller.set_cancel_button_reference(self.cancel_button)
 
-    def clear_log(self):
-        if not self.winfo_exists(): return
-        def __clear():
-            if not self.text.winfo_exists(): return
-            self.text.config(state=tk.NORMAL)
-            self.text.delete("1.0", tk.END)
-            self.text.config(state=tk.DISABLED)
-
-        if self.tk_root and hasattr(self.tk_root, 'after') and self.tk_root.winfo_exists():
-            if threading.current_thread() is not threading.main_thread():
-                self.tk_root.after(0, __clear)
-            else:
-                __clear()
-        else:
-            __clear()
+    def open_log_history(self, device_serial=None):
+        if not self.db_logger: return
+        LogHistoryWindow(self.tk_root or self, self.db_logger, self.theme, self.labels, device_serial=device_serial)
 
-
-    def log(self, message, tag="info", indent=0, include_timestamp=False):
+    def set_progress_status(self, text):
         if not self.winfo_exists(): return
+        self.progress_status.config(text=text)
 
-        def __log_to_widget():
-            if not self.text.winfo_exists(): return
-            self.text.config(state=tk.NORMAL)
+    def clear_log(self):
+        if not self.winfo_exists(): return
+        with self._pending_lock: # Lines queued before the clear are dropped, later ones are kept
+            self._pending.clear()
+            self._clear_requested = True
+        self._schedule_flush()
+
+    def _queue_lines(self, lines):
+        """Queues lines, each a list of (text, tag) segments, for the next flush. Safe from any thread."""
+        with self._pending_lock:
+            self._pending.extend(lines)
+        self._schedule_flush()
+
+    def _schedule_flush(self):
+        with self._pending_lock:
+            if self._flush_scheduled:
+                return
+            self._flush_scheduled = True
+        try:
+            (self.tk_root or self).after(LOG_PANEL_FLUSH_MS, self._flush_pending)
+        except (tk.TclError, RuntimeError): # Window is being destroyed
+            pass
 
-            timestamp_prefix = f"[{datetime.now().strftime('%H:%M:%S')}] " if include_timestamp else ""
+    def _flush_pending(self):
+        """Writes everything queued since the last flush with one Text.insert, then trims the oldest lines."""
+        with self._pending_lock:
+            lines = list(self._pending)
+            self._pending.clear()
+            clear_first, self._clear_requested = self._clear_requested, False
+            self._flush_scheduled = False
+        if not self.text.winfo_exists(): return
 
-            prefix_map = {"cmd": "[CMD]", "success": "[OK]", "error": "[ERR]", "fail": "[FAIL]", "warning": "[WARN]", "info": "[INFO]"}
-            log_prefix_tag = prefix_map.get(tag, "[LOG]")
+        self.text.config(state=tk.NORMAL)
+        if clear_first:
+            self.text.delete("1.0", tk.END)
+        if lines:
+            insert_args = [] # text1, tags1, text2, tags2, ... with neighbouring segments of one tag merged
+            run_parts, run_tag = [], None
+            for segments in lines:
+                for segment_text, segment_tag in segments:
+                    if segment_tag != run_tag and run_parts:
+                        insert_args.extend(("".join(run_parts), run_tag or ()))
+                        run_parts = []
+                    run_tag = segment_tag
+                    run_parts.append(segment_text)
+            if run_parts:
+                insert_args.extend(("".join(run_parts), run_tag or ()))
+            self.text.insert(tk.END, *insert_args)
+
+            line_count = int(self.text.index("end-1c").split(".")[0]) - 1
+            if line_count > LOG_PANEL_MAX_LINES: # Older lines stay in operation_log.db
+                self.text.delete("1.0", f"{line_count - LOG_PANEL_MAX_LINES + 1}.0")
+            self.text.see(tk.END)
+        self.text.config(state=tk.DISABLED)
 
-            actual_log_prefix = ""
-            if not tag.startswith("device_info_") and tag != "connect_server_success_tag":
-                 actual_log_prefix = f"{log_prefix_tag} "
 
-            indent_space = "  " * indent
+    def log(self, message, tag="info", indent=0, include_timestamp=False, operation=None):
+        if not self.winfo_exists(): return
 
-            if message == self.labels.get("log_connect_server_success", "Connect to server...successful") and tag == "info":
-                 full_log_message = f"{indent_space}{message}\n"
-            else:
-                 full_log_message = f"{timestamp_prefix}{indent_space}{actual_log_prefix}{message}\n"
+        timestamp_prefix = f"[{datetime.now().strftime('%H:%M:%S')}] " if include_timestamp else ""
 
-            idx = self.text.index(tk.END + "-1c linestart")
-            self.text.insert(tk.END, full_log_message)
-            self.text.tag_add(tag, idx, f"{idx} + {len(full_log_message)-1}c")
+        prefix_map = {"cmd": "[CMD]", "success": "[OK]", "error": "[ERR]", "fail": "[FAIL]", "warning": "[WARN]", "info": "[INFO]"}
+        log_prefix_tag = prefix_map.get(tag, "[LOG]")
 
-            self.text.see(tk.END)
-            self.text.config(state=tk.DISABLED)
+        actual_log_prefix = ""
+        if not tag.startswith("device_info_") and tag != "connect_server_success_tag":
+             actual_log_prefix = f"{log_prefix_tag} "
 
-            if self.db_logger: self.db_logger.add(message, tag)
+        indent_space = "  " * indent
 
-        if self.tk_root and hasattr(self.tk_root, 'after') and self.tk_root.winfo_exists():
-            if threading.current_thread() is not threading.main_thread():
-                self.tk_root.after(0, __log_to_widget)
-            else:
-                __log_to_widget()
+        if message == self.labels.get("log_connect_server_success", "Connect to server...successful") and tag == "info":
+             full_log_message = f"{indent_space}{message}\n"
         else:
-             __log_to_widget()
+             full_log_message = f"{timestamp_prefix}{indent_space}{actual_log_prefix}{message}\n"
+
+        self._queue_lines([[(full_log_message, tag)]]) # Shown with the next coalesced flush, not one after() per line
+        if self.db_logger: self.db_logger.add(message, tag, operation) # operation: the OperationRecord this line belongs to
 
     def log_device_info_block(self, device_info_dict):
         if not self.winfo_exists() or not self.text.winfo_exists(): return
 
-        self.text.config(state=tk.NORMAL)
-
-        connect_msg = f"{self.labels.get('log_connect_server_success', 'Connect to server...successful')}\n"
-        idx_connect = self.text.index(tk.END + "-1c linestart")
-        self.text.insert(tk.END, connect_msg)
-        self.text.tag_add("info", idx_connect, f"{idx_connect} + {len(connect_msg)-1}c")
+        lines = [[(f"{self.labels.get('log_connect_server_success', 'Connect to server...successful')}\n", "info")]]
 
         max_label_len = 0
         if device_info_dict:
@@ -1034,22 +1029,134 @@ class LogPanel(tk.Frame):
                 elif "Rooted!" in value_text_display: value_tag = "success"
 
             formatted_label = f"{label_text}:".ljust(max_label_len if max_label_len > 0 else len(label_text) + 2)
-            line_content = f"  {formatted_label} {value_text_display}\n"
+            lines.append([("  ", None), (formatted_label, "device_info_label"), (" ", None),
+                          (value_text_display, value_tag), ("\n", None)])
 
-            line_start_idx = self.text.index(tk.END + "-1c linestart")
-            self.text.insert(tk.END, line_content)
+        self._queue_lines(lines) # Same queue as log(), so the block stays in order with the lines around it
 
-            label_part_start = self.text.index(f"{line_start_idx} + 2c")
-            label_part_end = self.text.index(f"{label_part_start} + {len(formatted_label)}c")
-            self.text.tag_add("device_info_label", label_part_start, label_part_end)
 
-            value_part_start = self.text.index(f"{label_part_end} + 1c")
-            value_part_end = self.text.index(f"{value_part_start} + {len(value_text_display)}c")
-            self.text.tag_add(value_tag, value_part_start, value_part_end)
+class LogHistoryWindow(tk.Toplevel):
+    """Browses operation_log.db newest first. Older rows are fetched by id as the list is scrolled to its end."""
 
-        if self.text.winfo_exists():
-            self.text.see(tk.END)
-            self.text.config(state=tk.DISABLED)
+    def __init__(self, parent, db_logger, theme, labels, device_serial=None):
+        super().__init__(parent)
+        self.db_logger = db_logger
+        self.theme = theme
+        self.labels = labels
+        self._filters = {}
+        self._last_id = None # Id of the oldest row shown; the next page starts below it
+        self._exhausted = False
+        self._row_count = 0
+        self._page_scheduled = False
+        self._export_cancel = threading.Event()
+
+        self.title(labels.get("log_history_title", "Operation Log History"))
+        self.geometry("920x540")
+        self.configure(bg=theme["BG"])
+        self.protocol("WM_DELETE_WINDOW", self._on_close)
+
+        search_frame = tk.Frame(self, bg=theme["BG"])
+        search_frame.pack(fill=tk.X, padx=8, pady=(8,4))
+        tk.Label(search_frame, text=labels.get("search_log_label", "Search Log:"), font=LABEL_FONT, bg=theme["BG"], fg=theme["FG"]).pack(side=tk.LEFT)
+        self.search_var = tk.StringVar()
+        search_entry = tk.Entry(search_frame, textvariable=self.search_var, width=28)
+        search_entry.pack(side=tk.LEFT, padx=(4,10))
+        search_entry.bind("<Return>", lambda event: self.apply_filters())
+        tk.Label(search_frame, text=labels.get("log_history_device_label", "Device:"), font=LABEL_FONT, bg=theme["BG"], fg=theme["FG"]).pack(side=tk.LEFT)
+        self.device_var = tk.StringVar(value=device_serial or "")
+        device_entry = tk.Entry(search_frame, textvariable=self.device_var, width=18)
+        device_entry.pack(side=tk.LEFT, padx=(4,10))
+        device_entry.bind("<Return>", lambda event: self.apply_filters())
+        ModernButton(search_frame, labels.get("find_button", "Find"), command=self.apply_filters, theme=theme, width=8).pack(side=tk.LEFT, padx=2)
+        ModernButton(search_frame, labels.get("all_button", "All"), command=self.show_all, theme=theme, width=8).pack(side=tk.LEFT, padx=2)
+        ModernButton(search_frame, labels.get("btn_export_jsonl", "Export to JSONL"), command=lambda: self.export(EXPORT_FORMAT_JSONL), theme=theme, width=16).pack(side=tk.RIGHT, padx=2)
+        ModernButton(search_frame, labels.get("btn_export_csv", "Export to CSV"), command=lambda: self.export(EXPORT_FORMAT_CSV), theme=theme, width=16).pack(side=tk.RIGHT, padx=2)
+
+        tree_frame = tk.Frame(self, bg=theme["BG"])
+        tree_frame.pack(fill=tk.BOTH, expand=True, padx=8)
+        columns = ("timestamp", "tag", "device", "message")
+        self.tree = ttk.Treeview(tree_frame, columns=columns, show="headings", selectmode="browse")
+        for column, width in zip(columns, (150, 70, 150, 520)):
+            self.tree.heading(column, text=labels.get(f"log_history_col_{column}", column.title()))
+            self.tree.column(column, width=width, stretch=(column == "message"))
+        scrollbar = ttk.Scrollbar(tree_frame, orient=tk.VERTICAL, command=self.tree.yview)
+        self.tree.configure(yscrollcommand=lambda first, last: self._on_tree_scrolled(scrollbar, first, last))
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+
+        self.status_label = tk.Label(self, text="", anchor=tk.W, font=LABEL_FONT, bg=theme["BG"], fg=theme["FG"])
+        self.status_label.pack(fill=tk.X, padx=8, pady=(4,8))
+        self.apply_filters()
+
+    def apply_filters(self):
+        self._filters = {}
+        if self.search_var.get().strip():
+            self._filters["term"] = self.search_var.get().strip()
+        if self.device_var.get().strip():
+            self._filters["device_serial"] = self.device_var.get().strip()
+        self.tree.delete(*self.tree.get_children())
+        self._last_id, self._exhausted, self._row_count = None, False, 0
+        self.load_next_page()
+
+    def show_all(self):
+        self.search_var.set("")
+        self.device_var.set("")
+        self.apply_filters()
+
+    def load_next_page(self):
+        self._page_scheduled = False
+        if self._exhausted or not self.winfo_exists():
+            return
+        rows = self.db_logger.log_page(before_id=self._last_id, limit=LOG_HISTORY_PAGE_ROWS, **self._filters)
+        for row_id, timestamp, tag, message, operation_id, operation_name, device_serial, model in rows:
+            self.tree.insert("", tk.END, values=(timestamp, tag, device_serial or "", (message or "").replace("\n", " ")))
+        if rows:
+            self._last_id = rows[-1][0]
+        self._exhausted = len(rows) < LOG_HISTORY_PAGE_ROWS
+        self._row_count += len(rows)
+        self.status_label.config(text=self.labels.get("log_history_rows_shown", "{count} rows shown").format(count=self._row_count))
+
+    def _on_tree_scrolled(self, scrollbar, first, last):
+        scrollbar.set(first, last)
+        if float(last) >= 0.98 and not self._exhausted and self._row_count and not self._page_scheduled: # Near the bottom: fetch the next page
+            self._page_scheduled = True
+            self.after_idle(self.load_next_page)
+
+    def export(self, export_format):
+        path = filedialog.asksaveasfilename(parent=self, defaultextension=f".{export_format}",
+                                            filetypes=[(export_format.upper(), f"*.{export_format}"), ("All files", "*.*")],
+                                            initialfile=f"operation_log_{datetime.now():%Y%m%d_%H%M%S}.{export_format}")
+        if not path:
+            return
+        filters = dict(self._filters) # The export matches what the list shows, not edits made while it runs
+        threading.Thread(target=self._export_worker, args=(path, export_format, filters), daemon=True).start()
+
+    def _export_worker(self, path, export_format, filters):
+        progress_text = self.labels.get("export_progress", "Exporting... {count} rows")
+        try:
+            row_count = self.db_logger.export_logs(path, export_format, cancel_event=self._export_cancel,
+                                                   progress_callback=lambda count: self._after_if_open(
+                                                       lambda: self.status_label.config(text=progress_text.format(count=count))),
+                                                   **filters)
+            self._after_if_open(lambda: messagebox.showinfo(
+                self.labels.get("export_done_title", "Export Complete"),
+                self.labels.get("export_done_message", "{count} rows written to:\n{path}").format(count=row_count, path=path), parent=self))
+        except Exception as e_export:
+            log_to_file_debug_globally(f"Log export to {path} failed: {e_export}", "ERROR")
+            log_to_file_debug_globally(traceback.format_exc(), "ERROR_TRACE")
+            error_text = str(e_export) # e_export is unbound once the except block ends
+            self._after_if_open(lambda: messagebox.showerror(self.labels.get("export_failed_title", "Export Failed"), error_text, parent=self))
+
+    def _after_if_open(self, func):
+        try:
+            if self.winfo_exists():
+                self.after(0, func)
+        except tk.TclError: # Window closed while the export was running
+            pass
+
+    def _on_close(self):
+        self._export_cancel.set()
+        self.destroy()
 
 
 class StatusBar(tk.Label):
@@ -1061,50 +1168,109 @@ class StatusBar(tk.Label):
         self.theme = theme
         self.labels = labels
         self._check_adb_after_id = None
+        self.adb_client = AdbHostClient() # Talks to the adb server socket, no adb process per check
+        self.device_watcher = getattr(master, 'device_watcher', None) # Push-based updates when the app runs a watcher
         self.set_status(self.labels["adb_status_not_connected"], theme.get("LOG_FG_ERROR", "#F44336"))
-        self._check_adb()
+        if self.device_watcher is not None:
+            self.device_watcher.subscribe(self._on_device_event)
+            self._show_devices(self.device_watcher.devices())
+        else:
+            self._check_adb() # No watcher: fall back to polling every 3 s
 
     def set_status(self, text, color):
         if self.winfo_exists(): self.config(text=text, fg=color)
 
+    def _check_adb_with_binary(self):
+        # Old path, only used when the adb server socket can't be reached
+        stat = self.labels["adb_status_not_connected"]
+        color = self.theme.get("LOG_FG_ERROR", "#F44336")
+        device_id = None
+        try:
+            flags = subprocess.CREATE_NO_WINDOW if os.name == 'nt' else 0
+            out_state = subprocess.check_output(['adb', 'get-state'], stderr=subprocess.STDOUT, text=True, timeout=2, creationflags=flags)
+            if "device" in out_state:
+                out_devices = subprocess.check_output(['adb', 'devices'], stderr=subprocess.STDOUT, text=True, timeout=2, creationflags=flags)
+                lines = out_devices.strip().split('\n')
+                if len(lines) > 1 and "List of devices attached" in lines[0]:
+                    parts = lines[1].split('\t')
+                    if len(parts) > 0 and parts[0].strip():
+                        device_id = parts[0].strip()
+                        stat = f"{self.labels['adb_status_connected']} ({self.labels.get('adb_status_device_id_prefix','ID: ')}{device_id})"
+                else: # Fallback if parsing devices fails but state is 'device'
+                     stat = self.labels["adb_status_connected"]
+                color = self.theme.get("LOG_FG_SUCCESS", "#4CAF50")
+        except Exception: pass
+        return stat, color, device_id
+
     def _check_adb(self):
         def check_thread_func():
             stat = self.labels["adb_status_not_connected"]
             color = self.theme.get("LOG_FG_ERROR", "#F44336")
             device_id = None
             try:
-                flags = subprocess.CREATE_NO_WINDOW if os.name == 'nt' else 0
-                out_state = subprocess.check_output(['adb', 'get-state'], stderr=subprocess.STDOUT, text=True, timeout=2, creationflags=flags)
-                if "device" in out_state:
-                    out_devices = subprocess.check_output(['adb', 'devices'], stderr=subprocess.STDOUT, text=True, timeout=2, creationflags=flags)
-                    lines = out_devices.strip().split('\n')
-                    if len(lines) > 1 and "List of devices attached" in lines[0]:
-                        parts = lines[1].split('\t')
-                        if len(parts) > 0 and parts[0].strip():
-                            device_id = parts[0].strip()
-                            stat = f"{self.labels['adb_status_connected']} ({self.labels.get('adb_status_device_id_prefix','ID: ')}{device_id})"
-                    else: # Fallback if parsing devices fails but state is 'device'
-                         stat = self.labels["adb_status_connected"]
+                ready_devices = [d for d in self.adb_client.devices() if d.get("state") == "device"]
+                if ready_devices:
+                    device_id = ready_devices[0]["serial"]
+                    stat = f"{self.labels['adb_status_connected']} ({self.labels.get('adb_status_device_id_prefix','ID: ')}{device_id})"
                     color = self.theme.get("LOG_FG_SUCCESS", "#4CAF50")
+            except (OSError, AdbProtocolError, subprocess.SubprocessError):
+                stat, color, device_id = self._check_adb_with_binary()
             except Exception: pass
 
             if self.winfo_exists() and self.master.winfo_exists():
                  final_stat = stat
-                 self.master.after(0, lambda s=final_stat, c=color, did=device_id: (
-                     self.set_status(s, c),
-                     self.master.master._update_top_adb_status_bar(s, c, did) if hasattr(self.master.master, '_update_top_adb_status_bar') else None
-                 ))
+                 self.master.after(0, lambda s=final_stat, c=color, did=device_id: self._publish_status(s, c, did))
 
 
-            if self.winfo_exists():
+            if self.winfo_exists() and self.device_watcher is None: # With a watcher this is a one-off check
                  self._check_adb_after_id = self.after(3000, self._check_adb) # Check more frequently
 
         threading.Thread(target=check_thread_func, daemon=True).start()
 
+    def _publish_status(self, stat, color, device_id):
+        self.set_status(stat, color)
+        app = self.master if hasattr(self.master, '_update_top_adb_status_bar') else self.master.master
+        if hasattr(app, '_update_top_adb_status_bar'):
+            app._update_top_adb_status_bar(stat, color, device_id)
+
+    def _on_device_event(self, event):
+        # Called on a watcher thread, the widget update happens on the Tk thread
+        try:
+            if self.winfo_exists():
+                self.after(0, lambda: self._show_devices(self.device_watcher.devices()))
+        except (tk.TclError, RuntimeError): # Window is being destroyed
+            pass
+
+    def _show_devices(self, devices):
+        if not self.winfo_exists(): return
+        stat = self.labels["adb_status_not_connected"]
+        color = self.theme.get("LOG_FG_ERROR", "#F44336")
+        device_id = None
+        ready_devices = [d for d in devices if d["mode"] == MODE_ADB and d.get("state") == "device"]
+        if ready_devices:
+            manager = getattr(self.master, 'device_manager', None)
+            target_serial = manager.target_serial(MODE_ADB) if manager else None # The device single-device actions go to
+            ready_serials = [d["serial"] for d in ready_devices]
+            device_id = target_serial if target_serial in ready_serials else ready_serials[0]
+            stat = f"{self.labels['adb_status_connected']} ({self.labels.get('adb_status_device_id_prefix','ID: ')}{device_id})"
+            if len(ready_serials) > 1:
+                stat += f" +{len(ready_serials) - 1} {self.labels.get('adb_status_more_devices', 'more')}"
+            color = self.theme.get("LOG_FG_SUCCESS", "#4CAF50")
+        other_devices = [f"{d['mode'].upper()} {d['serial']} ({d.get('state', '?')})" for d in devices if d["mode"] != MODE_ADB]
+        if other_devices:
+            stat += "  |  " + ", ".join(other_devices)
+        self._publish_status(stat, color, device_id)
+
     def cancel_adb_check(self):
         if self._check_adb_after_id:
             self.after_cancel(self._check_adb_after_id)
             self._check_adb_after_id = None
+        if self.device_watcher is not None:
+            self.device_watcher.unsubscribe(self._on_device_event)
+
+    def destroy(self):
+        self.cancel_adb_check() # _rebuild_ui destroys the bar, its watcher subscription must go with it
+        super().destroy()
 
 class LoginWindow(tk.Toplevel):
     def __init__(self, parent, app_controller):
@@ -1418,13 +1584,19 @@ class UltimateDeviceTool(tk.Frame):
         self._setup_mtkclient_path() # Try to set up mtkclient path
         self.app_controller.mtk_client_path = self._check_mtkclient() # Check and store path
 
+        self.device_property_cache = DevicePropertyCache() # Invalidated on reboot, flash and disconnect
+        self.last_known_device_id = None # Set before _build_ui, the status bars read it while being built
+        self.device_watcher = DeviceWatcher() # adb track-devices stream + low-cadence fastboot/MTK USB scans
+        self.device_watcher.subscribe(self._on_device_event)
+        self.device_manager = DeviceManager(self.device_watcher) # Every adb/fastboot/MTK device and the user's selection
+        self._callback_device_serial = None # Device of the result whose callback is running, follow-up commands stay on it
+
         self._apply_styles()
         self._build_ui()
-        self.command_queue = queue.Queue()
-        self.current_popen_process = None
-        # Ensure after_id_process_command_queue is cancelled on close
-        self.after_id_process_command_queue = self.after(100, self._process_command_queue)
-        self.last_known_device_id = None
+        self.command_queue = ResultDispatcher(self, self._handle_command_result) # Workers wake the Tk loop directly, no polling timer
+        self.command_executor = CommandExecutor() # Fixed worker pool, one FIFO lane per device serial
+        self.adb_shell_sessions = AdbShellSessionPool() # Short `adb shell` commands reuse one shell per serial
+        self.device_watcher.start()
         log_to_file_debug_globally("UltimateDeviceTool __init__ finished successfully.")
 
     def _setup_mtkclient_path(self):
@@ -1635,6 +1807,19 @@ class UltimateDeviceTool(tk.Frame):
 
         self._update_top_adb_status_bar(self.labels.get("adb_status_not_connected"), self.theme.get("LOG_FG_ERROR"), None) # Initial update
 
+        devices_frame = tk.Frame(left_area_container, bg=self.theme["BG"])
+        devices_frame.pack(fill=tk.X, padx=15, pady=(0,10))
+        tk.Label(devices_frame, text=self.labels.get("devices_label", "Devices:"), font=LABEL_FONT, bg=self.theme["BG"], fg=self.theme["FG"]).pack(anchor=tk.W)
+        device_columns = ("mode", "serial", "state", "usb", "model")
+        self.device_tree = ttk.Treeview(devices_frame, columns=device_columns, show="headings", selectmode="extended", height=3)
+        for column, width in zip(device_columns, (80, 200, 110, 90, 160)):
+            self.device_tree.heading(column, text=self.labels.get(f"device_col_{column}", column.title()))
+            self.device_tree.column(column, width=width, stretch=(column == "model"))
+        self.device_tree.pack(fill=tk.X)
+        self.device_tree.bind("<<TreeviewSelect>>", self._on_device_tree_select)
+        self.device_manager.add_listener(self._on_device_list_changed)
+        self._refresh_device_tree(self.device_manager.devices())
+
 
         self.notebook = ttk.Notebook(left_area_container, style="TNotebook")
         self.notebook.pack(expand=True, fill=tk.BOTH, padx=15, pady=(0,15))
@@ -1677,6 +1862,8 @@ class UltimateDeviceTool(tk.Frame):
         new_text = self.labels.get("adb_status_not_connected") # Default
         new_color = self.theme.get("LOG_FG_ERROR") # Default
 
+        if device_id != self.last_known_device_id: # Device changed or dropped: its snapshot is stale
+            self.device_property_cache.invalidate(self.last_known_device_id)
         if device_id: # If we have a device ID, it's connected
             new_text = f"{self.labels.get('adb_status_connected')} ({self.labels.get('adb_status_device_id_prefix', 'ID: ')}{device_id})"
             new_color = self.theme.get("LOG_FG_SUCCESS")
@@ -1781,22 +1968,57 @@ class UltimateDeviceTool(tk.Frame):
                                    activebackground=self.theme.get("GROUP_BG")) # Ensure hover matches disabled bg
 
 
-    def execute_command_async(self, command_list, operation_name="Operation", callback_on_finish=None, is_part_of_sequence=False, is_info_gathering=False):
+    def execute_command_async(self, command_list, operation_name="Operation", callback_on_finish=None, is_part_of_sequence=False, is_info_gathering=False, device_serial=None, priority=None, stream_output=False, on_output_lines=None, use_shell_session=False, output_line_prefix=""):
         log_panel_available = hasattr(self, 'log_panel') and self.log_panel is not None and self.log_panel.winfo_exists()
 
+        command_mode = mode_for_command(command_list)
+        if device_serial is None: # Stay on the device the calling sequence runs on, else use the selected device
+            device_serial = self.device_manager.target_serial(command_mode, preferred=self._callback_device_serial)
+        command_list = address_command(command_list, device_serial) # adb/fastboot get `-s <serial>`
+        operation_record = None
+        if not is_info_gathering: # One row in operations per command the user started, background reads are left out
+            operation_record = self.db_logger.begin_operation(operation_name, command_list, device_serial, command_mode, self._device_model(device_serial))
+
         if log_panel_available and not is_part_of_sequence and not is_info_gathering:
             self.log_panel.clear_log()
-            self.log_panel.log(self.labels.get("log_operation_started", "Operation Started: ") + operation_name, "info", include_timestamp=True)
+            self.log_panel.log(self.labels.get("log_operation_started", "Operation Started: ") + operation_name, "info", include_timestamp=True, operation=operation_record)
             self.log_panel.progress_bar.start()
+            self.log_panel.set_progress_status("")
             self._update_cancel_button_state(enable=True)
 
         command_str_for_debug = " ".join(map(str,command_list)) if isinstance(command_list, list) else str(command_list)
         if not is_info_gathering:
             log_to_file_debug_globally(f"Executing ASYNC ({operation_name}): {command_str_for_debug}", "DEBUG_CMD")
 
-        def _command_thread():
+        self._invalidate_property_cache_for_command(command_list)
+        if priority is None: # Interactive reads jump ahead of long dumps queued on other lanes
+            priority = PRIORITY_INTERACTIVE if is_info_gathering else PRIORITY_NORMAL
+        lane = device_serial or lane_for_command(command_list)
+        result_base = {"operation_name": operation_name, "command": command_list,
+                       "callback": callback_on_finish, "is_part_of_sequence": is_part_of_sequence,
+                       "is_info_gathering": is_info_gathering, "device_serial": device_serial,
+                       "operation_record": operation_record, "output_line_prefix": output_line_prefix}
+
+        def _command_thread(job_handle):
             process = None
             try:
+                shell_target = shell_args_for_command(command_list) if use_shell_session and not stream_output else None
+                if shell_target: # No adb spawn: the command runs in the device's persistent shell
+                    shell_serial, shell_args = shell_target
+                    session = self.adb_shell_sessions.get(shell_serial)
+                    shell_future = session.submit(shell_args)
+                    job_handle.attach_process(session.process) # Cancel ends the session, it respawns on next use
+                    try:
+                        shell_result = shell_future.result(timeout=300)
+                    except FutureTimeoutError:
+                        session.close() # The shell is stuck on this command, start clean next time
+                        raise subprocess.TimeoutExpired(command_list, 300)
+                    if job_handle.cancel_requested:
+                        self.command_queue.put(dict(result_base, error="Cancelled"))
+                    else:
+                        self.command_queue.put(dict(result_base, **shell_result))
+                    return
+
                 startupinfo = None
                 creation_flags = 0
                 if os.name == 'nt':
@@ -1810,53 +2032,174 @@ class UltimateDeviceTool(tk.Frame):
                                            text=True, encoding='utf-8', errors='replace',
                                            startupinfo=startupinfo,
                                            creationflags=creation_flags)
-                self.current_popen_process = process
-                stdout, stderr = process.communicate(timeout=300) # Increased timeout for mtk operations
+                job_handle.attach_process(process) # Cancel now reaches this exact process
+                if stream_output: # Lines reach the log while the tool runs, only a bounded tail is kept
+                    line_sink = on_output_lines or self._log_streamed_output_lines # Called on the Tk thread as (batch, operation, line_prefix)
+                    progress_parser = parser_for_command(command_list) # None for tools that print no progress
+                    def _on_lines(batch):
+                        sample = None
+                        if progress_parser is not None:
+                            for _stream, line in batch:
+                                sample = progress_parser.feed(line) or sample
+                        self.after(0, line_sink, batch, operation_record, output_line_prefix)
+                        if sample is not None and not is_info_gathering: # Latest sample of the batch only
+                            self.after(0, self._show_progress_sample, sample, output_line_prefix)
+                    streamer = StreamingOutput(process, on_lines=_on_lines)
+                    stdout, stderr = streamer.run(timeout=300)
+                    stream_info = {"streamed": True, "stdout_truncated": streamer.truncated("stdout"), "stderr_truncated": streamer.truncated("stderr"),
+                                   "transfer": progress_parser.summary() if progress_parser is not None else None}
+                else:
+                    stdout, stderr = process.communicate(timeout=300) # Increased timeout for mtk operations
+                    stream_info = {}
                 return_code = process.returncode
-                result_data = {"stdout": stdout, "stderr": stderr, "return_code": return_code,
-                               "operation_name": operation_name, "command": command_list,
-                               "callback": callback_on_finish, "is_part_of_sequence": is_part_of_sequence,
-                               "is_info_gathering": is_info_gathering}
-                self.command_queue.put(result_data)
+                if job_handle.cancel_requested:
+                    self.command_queue.put(dict(result_base, error="Cancelled"))
+                else:
+                    self.command_queue.put(dict(result_base, stdout=stdout, stderr=stderr, return_code=return_code, **stream_info))
             except subprocess.TimeoutExpired:
                 if process: process.kill()
                 log_to_file_debug_globally(f"Timeout for {operation_name}: {command_str_for_debug}", "ERROR")
-                self.command_queue.put({"error": "TimeoutExpired", "operation_name": operation_name, "command": command_list, "callback": callback_on_finish, "is_part_of_sequence": is_part_of_sequence, "is_info_gathering": is_info_gathering})
+                self.command_queue.put(dict(result_base, error="TimeoutExpired"))
             except FileNotFoundError:
                 log_to_file_debug_globally(f"FileNotFound for {operation_name}: {command_list[0]}", "ERROR")
-                self.command_queue.put({"error": "FileNotFound", "command_name": command_list[0], "operation_name": operation_name, "command": command_list, "callback": callback_on_finish, "is_part_of_sequence": is_part_of_sequence, "is_info_gathering": is_info_gathering})
+                self.command_queue.put(dict(result_base, error="FileNotFound", command_name=command_list[0]))
             except Exception as e:
-                if process and process.returncode is not None and process.returncode < 0 : # Negative return codes might indicate termination
-                     self.command_queue.put({"error": "Cancelled", "operation_name": operation_name, "command": command_list, "callback": callback_on_finish, "is_part_of_sequence": is_part_of_sequence, "is_info_gathering": is_info_gathering})
+                if job_handle.cancel_requested or (process and process.returncode is not None and process.returncode < 0): # Negative return codes might indicate termination
+                     self.command_queue.put(dict(result_base, error="Cancelled"))
                 else:
                      log_to_file_debug_globally(f"Exception for {operation_name} ({command_str_for_debug}): {e}", "ERROR")
                      log_to_file_debug_globally(traceback.format_exc(), "ERROR_TRACE")
-                     self.command_queue.put({"error": str(e), "operation_name": operation_name, "command": command_list, "callback": callback_on_finish, "is_part_of_sequence": is_part_of_sequence, "is_info_gathering": is_info_gathering})
+                     self.command_queue.put(dict(result_base, error=str(e)))
             finally:
-                self.current_popen_process = None
+                job_handle.detach_process()
 
-        threading.Thread(target=_command_thread, daemon=True).start()
+        # Cancelled while still queued: report it like a cancelled run so sequences stop cleanly
+        return self.command_executor.submit(_command_thread, name=operation_name, lane=lane, priority=priority,
+                                            on_cancelled=lambda job_handle: self.command_queue.put(dict(result_base, error="Cancelled")))
+
+    def _show_progress_sample(self, sample, line_prefix=""):
+        """Drives the progress bar and the status line from a progress_parsers.ProgressSample."""
+        if not (hasattr(self, 'log_panel') and self.log_panel is not None and self.log_panel.winfo_exists()):
+            return
+        if sample.percent is not None:
+            self.log_panel.progress_bar.set_value(sample.percent)
+        self.log_panel.set_progress_status(f"{line_prefix}{sample.status_text()}")
+
+    def _log_streamed_output_lines(self, batch, operation=None, line_prefix=""):
+        """Default sink for stream_output: shows each batch of (stream, line) in the log panel."""
+        if not (hasattr(self, 'log_panel') and self.log_panel is not None and self.log_panel.winfo_exists()):
+            return
+        for stream, line in batch:
+            if line.strip():
+                self.log_panel.log(f"{line_prefix}{line}", "info" if stream == "stdout" else "warning", indent=1, include_timestamp=False, operation=operation)
+
+    def _device_model(self, serial):
+        """Model of a device for the operations table, from the device list or its cached properties."""
+        if not serial:
+            return None
+        info = self.device_manager.get(serial)
+        if info and info.get("model"):
+            return info["model"]
+        snapshot = self.device_property_cache.get(serial)
+        return snapshot.model if snapshot is not None and snapshot.model else None
+
+    def execute_command_on_devices(self, command_list, operation_name="Operation", serials=None, callback_on_finish=None, on_all_finished=None, **kwargs):
+        """Runs one command on several devices at once, each on its own lane, and logs per-device results.
+
+        serials defaults to the selected devices of the command's mode. callback_on_finish gets each
+        device's result (its "device_serial" says which); on_all_finished gets {serial: result} at the end.
+        """
+        if serials is None:
+            serials = self.device_manager.selected_serials(mode_for_command(command_list))
+        if len(serials) <= 1: # Zero or one device: the normal single-device path
+            def _single_finished(result):
+                if callback_on_finish: callback_on_finish(result)
+                if on_all_finished: on_all_finished({result.get("device_serial"): result})
+            return [self.execute_command_async(command_list, operation_name, callback_on_finish=_single_finished,
+                                               device_serial=serials[0] if serials else None, **kwargs)]
 
-    def _process_command_queue(self):
+        log_panel_available = hasattr(self, 'log_panel') and self.log_panel is not None and self.log_panel.winfo_exists()
+        if log_panel_available:
+            self.log_panel.clear_log()
+            self.log_panel.log(self.labels.get("log_operation_started", "Operation Started: ") + f"{operation_name} ({len(serials)} devices: {', '.join(serials)})", "info", include_timestamp=True)
+            self.log_panel.progress_bar.start()
+            self._update_cancel_button_state(enable=True)
+
+        results = {}
+        def _device_finished(result):
+            results[result.get("device_serial")] = result
+            if callback_on_finish: callback_on_finish(result)
+            if len(results) == len(serials):
+                self._finish_multi_device_operation(operation_name, serials, results, on_all_finished)
+
+        handles = []
+        for serial in serials:
+            handles.append(self.execute_command_async(command_list, operation_name=f"{operation_name} [{serial}]",
+                                                      callback_on_finish=_device_finished, is_part_of_sequence=True,
+                                                      device_serial=serial, output_line_prefix=f"[{serial}] ", **kwargs)) # Tell the devices' streamed lines apart
+        return handles
+
+    def _finish_multi_device_operation(self, operation_name, serials, results, on_all_finished):
+        succeeded = [s for s in serials if "error" not in results[s] and results[s].get("return_code") == 0]
+        if hasattr(self, 'log_panel') and self.log_panel is not None and self.log_panel.winfo_exists():
+            all_ok = len(succeeded) == len(serials)
+            self.log_panel.log(f"{operation_name}: {len(succeeded)}/{len(serials)} devices succeeded.", "success" if all_ok else "fail", include_timestamp=True)
+            for serial in serials:
+                result = results[serial]
+                if serial in succeeded:
+                    self.log_panel.log(f"{serial}: OK", "success", indent=1)
+                elif "error" in result:
+                    self.log_panel.log(f"{serial}: {result['error']}", "error", indent=1)
+                else:
+                    self.log_panel.log(f"{serial}: Failed (Code: {result.get('return_code')})", "error", indent=1)
+            if self.log_panel.progress_bar.running: self.log_panel.progress_bar.stop()
+            self._update_cancel_button_state(enable=False)
+        if on_all_finished:
+            try:
+                on_all_finished(results)
+            except Exception as e_callback:
+                log_to_file_debug_globally(f"Error in multi-device callback for {operation_name}: {e_callback}", "ERROR")
+                log_to_file_debug_globally(traceback.format_exc(), "ERROR_TRACE")
+
+    def _on_device_list_changed(self, devices):
+        """DeviceManager listener (watcher thread)."""
         try:
-            while not self.command_queue.empty():
-                result = self.command_queue.get_nowait()
-                self._handle_command_result(result)
-        except queue.Empty: # Expected if queue is empty
+            if self.winfo_exists():
+                self.after(0, lambda: self._refresh_device_tree(self.device_manager.devices()))
+        except (tk.TclError, RuntimeError): # Window is being destroyed
             pass
-        except Exception as e:
-            log_to_file_debug_globally(f"Error in _process_command_queue: {e}", "ERROR")
-            log_to_file_debug_globally(traceback.format_exc(), "ERROR_TRACE")
-        finally:
-            if self.winfo_exists(): # Ensure widget still exists before scheduling next call
-                self.after_id_process_command_queue = self.after(100, self._process_command_queue)
 
+    def _refresh_device_tree(self, devices):
+        if not hasattr(self, 'device_tree') or not self.device_tree.winfo_exists(): return
+        selection = self.device_manager.selection()
+        self.device_tree.delete(*self.device_tree.get_children())
+        for info in devices:
+            item_id = f"{info['mode']}|{info['serial']}"
+            self.device_tree.insert("", tk.END, iid=item_id, values=(info["mode"].upper(), info["serial"], info.get("state", ""),
+                                                                     info.get("usb", ""), info.get("model", "")))
+            if info["serial"] in selection:
+                self.device_tree.selection_add(item_id)
+
+    def _on_device_tree_select(self, event=None):
+        visible_serials = [item_id.split("|", 1)[1] for item_id in self.device_tree.get_children()]
+        selected_serials = [item_id.split("|", 1)[1] for item_id in self.device_tree.selection()]
+        # Selected devices that are unplugged right now (rebooting) stay selected
+        kept_serials = [serial for serial in self.device_manager.selection() if serial not in visible_serials]
+        self.device_manager.select(kept_serials + selected_serials)
+        if hasattr(self, 'status_bar') and self.status_bar.winfo_exists() and self.status_bar.device_watcher is not None:
+            self.status_bar._show_devices(self.device_watcher.devices())
 
     def _handle_command_result(self, result):
+        operation_record = result.get("operation_record")
+        transfer = result.get("transfer") # Progress parser summary of a streamed transfer: bytes, seconds, rate
+        if transfer and operation_record is not None: # Stored per operation, so slow cables and hubs show in the stats
+            operation_record.bytes_transferred, operation_record.throughput = transfer["bytes"], transfer["rate"]
+        self.db_logger.end_operation(operation_record, result.get("return_code"), operation_status_for_result(result), result.get("error"))
         log_panel_available = hasattr(self, 'log_panel') and self.log_panel is not None and self.log_panel.winfo_exists()
         # Use a local log_method to avoid repeated checks; default to global logger if panel not ready
         if log_panel_available:
-            log_method = self.log_panel.log
+            def log_method(msg, tag="info", **kwargs): # Result lines are stored against their operation
+                self.log_panel.log(msg, tag, operation=operation_record, **kwargs)
         else:
             def fallback_logger(msg, tag="info", **kwargs): # Match signature of LogPanel.log
                 log_to_file_debug_globally(f"[{tag.upper()}] {msg}", "LOG_PANEL_UNAVAILABLE")
@@ -1902,11 +2245,12 @@ class UltimateDeviceTool(tk.Frame):
                 stdout = result.get("stdout", "")
                 stderr = result.get("stderr", "")
                 return_code = result.get("return_code", -1)
+                streamed = result.get("streamed", False) # Output was already shown live, don't repeat it
 
                 if not operation_name.startswith("Get Property"): # Avoid spamming for getprop
                     if return_code == 0:
                         log_method(f"{operation_name}: Completed successfully.", "success", include_timestamp=True)
-                        if stdout.strip() and not any(kw in stdout.lower() for kw in ["success", "already", "performed", "daemon started successfully", "waiting for brom...", "payload sent successfully"]):
+                        if not streamed and stdout.strip() and not any(kw in stdout.lower() for kw in ["success", "already", "performed", "daemon started successfully", "waiting for brom...", "payload sent successfully"]):
                             log_method("Output (stdout):", "info", indent=1, include_timestamp=False)
                             for line_idx, line_content in enumerate(stdout.strip().splitlines()):
                                 if line_idx < 15: # Limit lines
@@ -1914,7 +2258,7 @@ class UltimateDeviceTool(tk.Frame):
                                 elif line_idx == 15:
                                     log_method("... (further output truncated in summary)", "info", indent=2)
                                     break
-                        if stderr.strip(): # Log stderr even on success for mtkclient, as it might contain warnings
+                        if not streamed and stderr.strip(): # Log stderr even on success for mtkclient, as it might contain warnings
                             log_method("Output (stderr):", "warning", indent=1, include_timestamp=False)
                             for line_idx, line_content in enumerate(stderr.strip().splitlines()):
                                 if line_idx < 10:
@@ -1925,7 +2269,9 @@ class UltimateDeviceTool(tk.Frame):
                     else:
                         log_method(f"{operation_name}: Failed (Code: {return_code}).", "fail", include_timestamp=True)
                         details = stderr.strip() if stderr.strip() else stdout.strip()
-                        if details:
+                        if streamed:
+                            log_method("See the streamed output above for details.", "error", indent=1, include_timestamp=False)
+                        elif details:
                             log_method("Error Details:", "error", indent=1, include_timestamp=False)
                             for line_idx, line_content in enumerate(details.strip().splitlines()):
                                 if line_idx < 20: # Limit error detail lines
@@ -1937,17 +2283,26 @@ class UltimateDeviceTool(tk.Frame):
                             log_method("No specific error message from command.", "error", indent=1, include_timestamp=False)
 
         # Stop progress bar and disable cancel button ONLY if it's NOT part of a sequence AND NOT info gathering
+        if transfer and log_panel_available and not is_info_gathering:
+            line_prefix = result.get("output_line_prefix", "")
+            transfer_text = f"{transfer['bytes'] / 1e6:.1f} MB in {format_eta(transfer['seconds'])} ({format_rate(transfer['rate'])})"
+            log_method(f"{line_prefix}Transferred {transfer_text}", "info", indent=1, include_timestamp=False)
+            self.log_panel.set_progress_status(f"{line_prefix}{transfer_text}")
+
         if log_panel_available and not is_part_of_sequence and not is_info_gathering:
             if self.log_panel.progress_bar.running: self.log_panel.progress_bar.stop()
             self._update_cancel_button_state(enable=False)
 
         callback = result.get("callback")
         if callback and callable(callback):
+            self._callback_device_serial = result.get("device_serial") # Commands the callback starts go to the same device
             try:
                 callback(result)
             except Exception as e_callback:
                 log_to_file_debug_globally(f"Error in command callback for {operation_name}: {e_callback}", "ERROR")
                 log_to_file_debug_globally(traceback.format_exc(), "ERROR_TRACE")
+            finally:
+                self._callback_device_serial = None
 
 
     def action_cancel_operation(self):
@@ -1959,11 +2314,11 @@ class UltimateDeviceTool(tk.Frame):
             if self.log_panel: self.log_panel.log("Operation cancellation aborted by user.", "info", include_timestamp=False)
             return
 
-        if self.current_popen_process and self.current_popen_process.poll() is None:
+        if self.command_executor.has_active_jobs():
             try:
-                self.current_popen_process.terminate() # Terminate the process
-                # Note: The _command_thread will handle the "Cancelled" error state
-                log_msg = "Attempting to cancel current operation..."
+                cancelled_count = self.command_executor.cancel_all() # Terminates running processes, drops queued jobs
+                # Note: Each job reports its own "Cancelled" result to its callback
+                log_msg = f"Attempting to cancel current operation ({cancelled_count} running/queued command(s))..."
                 if hasattr(self, 'log_panel') and self.log_panel and self.log_panel.winfo_exists():
                     self.log_panel.log(log_msg, "warning", include_timestamp=False)
                 else:
@@ -2040,42 +2395,77 @@ class UltimateDeviceTool(tk.Frame):
 
 
     def get_detailed_adb_info_props(self, callback_after_all_props=None):
-        collected_props_internal_keys = {}
-        # Use a list for remaining_props_count to modify it within nested functions (Python 2 workaround, good practice)
-        remaining_props_count_list = [len(DEVICE_INFO_PROPERTIES)]
+        # One `adb shell getprop` for every property, answered from the per-serial cache while it is fresh
+        if not callback_after_all_props or not callable(callback_after_all_props):
+            callback_after_all_props = lambda props: None
+        serial = self.device_manager.target_serial(MODE_ADB, preferred=self._callback_device_serial)
+        cached_snapshot = self.device_property_cache.get(serial)
+        if cached_snapshot is not None:
+            log_to_file_debug_globally(f"Device properties for {serial or 'default device'} served from cache ({cached_snapshot.age():.1f}s old).", "DEBUG")
+            callback_after_all_props(dict(cached_snapshot.props))
+            return
 
+        def _after_getprop_snapshot(result_snapshot):
+            if result_snapshot.get("return_code") == 0:
+                snapshot = DevicePropertySnapshot.from_getprop_output(serial, result_snapshot.get("stdout", ""))
+                self.device_property_cache.put(snapshot)
+                callback_after_all_props(dict(snapshot.props))
+            else:
+                callback_after_all_props({prop_key: "Error fetching" for _, prop_key in DEVICE_INFO_PROPERTIES})
 
-        def _after_single_prop_fetch(result_single_prop):
-            prop_key_fetched = "unknown_prop"
-            # Extract the property key from the command in the result
-            if result_single_prop.get("command") and len(result_single_prop["command"]) >= 4 and result_single_prop["command"][2] == "getprop":
-                prop_key_fetched = result_single_prop["command"][3]
+        self.execute_command_async(
+            ["adb", "shell", "getprop"],
+            operation_name="Get Property Snapshot", # "Get Property" prefix keeps it out of the summary log
+            callback_on_finish=_after_getprop_snapshot,
+            is_part_of_sequence=True,
+            is_info_gathering=True,
+            device_serial=serial,
+            use_shell_session=True
+        )
 
-            if result_single_prop.get("return_code") == 0:
-                stdout_val = result_single_prop.get("stdout", "").strip()
-                collected_props_internal_keys[prop_key_fetched] = stdout_val if stdout_val else "" # Store empty if prop exists but no value
-            else:
-                collected_props_internal_keys[prop_key_fetched] = "Error fetching" # Or "N/A"
+    def read_fastboot_vars(self, operation_name):
+        """`fastboot getvar all`, answered from the cache when the device hasn't been rebooted or flashed since."""
+        serial = self.device_manager.target_serial(MODE_FASTBOOT, preferred=self._callback_device_serial)
+        cached_snapshot = self.device_property_cache.get(serial, source="fastboot")
+        if cached_snapshot is not None:
+            if hasattr(self, 'log_panel') and self.log_panel and self.log_panel.winfo_exists():
+                self.log_panel.clear_log()
+                self.log_panel.log(self.labels.get("log_operation_started", "Operation Started: ") + operation_name, "info", include_timestamp=True)
+                self.log_panel.log(f"Bootloader variables (cached {cached_snapshot.age():.0f}s ago):", "info", indent=1)
+                for var_name, var_value in cached_snapshot.props.items():
+                    self.log_panel.log(f"{var_name}: {var_value}", "info", indent=2)
+                self.log_panel.log(f"{operation_name}: Completed successfully.", "success", include_timestamp=True)
+            return
 
-            remaining_props_count_list[0] -= 1
+        def _cache_fastboot_vars(result_vars):
+            if result_vars.get("return_code") == 0:
+                # getvar prints on stderr; stdout is included for fastboot builds that don't
+                output_text = result_vars.get("stderr", "") + "\n" + result_vars.get("stdout", "")
+                snapshot = DevicePropertySnapshot.from_getvar_output(serial, output_text)
+                if snapshot.props:
+                    self.device_property_cache.put(snapshot)
 
-            if remaining_props_count_list[0] <= 0:
-                if callback_after_all_props and callable(callback_after_all_props):
-                    callback_after_all_props(collected_props_internal_keys)
+        self.execute_command_async(["fastboot", "getvar", "all"], operation_name=operation_name, device_serial=serial,
+                                   callback_on_finish=_cache_fastboot_vars, stream_output=True) # getvar all is long and arrives on stderr
 
-        if not DEVICE_INFO_PROPERTIES: # Handle empty list case
-            if callback_after_all_props and callable(callback_after_all_props):
-                callback_after_all_props({})
+    def _on_device_event(self, event):
+        """Watcher callback (watcher thread): drops per-device state an unplug, reboot or mode change makes stale."""
+        if event["event"] == EVENT_CONNECTED and event["state"] == "device":
             return
-
-        for _, prop_to_fetch_key in DEVICE_INFO_PROPERTIES:
-            self.execute_command_async(
-                ["adb", "shell", "getprop", prop_to_fetch_key],
-                operation_name=f"Get Property ({prop_to_fetch_key})", # For debugging logs
-                callback_on_finish=_after_single_prop_fetch,
-                is_part_of_sequence=True, # These are sub-steps of fetching all info
-                is_info_gathering=True # Prevents verbose logging for each getprop
-            )
+        if event["mode"] in (MODE_ADB, MODE_FASTBOOT):
+            self.device_property_cache.invalidate(event["serial"])
+        if event["mode"] == MODE_ADB:
+            self.adb_shell_sessions.close(event["serial"])
+
+    def _invalidate_property_cache_for_command(self, command_list):
+        """Reboots and state-changing fastboot commands make cached property snapshots stale."""
+        if not isinstance(command_list, (list, tuple)) or not command_list:
+            return
+        args = [str(part) for part in command_list[1:]]
+        tool_name = os.path.basename(str(command_list[0])).lower()
+        if any(arg.startswith("reboot") for arg in args) or (tool_name.startswith("fastboot") and "getvar" not in args):
+            serial = lane_for_command(command_list)
+            self.device_property_cache.invalidate(None if serial == DEFAULT_LANE else serial)
 
 
     def set_language(self, lang):
@@ -2143,12 +2533,19 @@ class UltimateDeviceTool(tk.Frame):
                                  parent=self.master):
             if hasattr(self, 'status_bar') and self.status_bar.winfo_exists():
                 self.status_bar.cancel_adb_check()
+            if hasattr(self, 'device_manager'):
+                self.device_manager.remove_listener(self._on_device_list_changed)
             if hasattr(self, 'db_logger') and self.db_logger:
-                self.db_logger.close()
+                self.db_logger.close() # Commits the lines still queued for the writer
 
-            if hasattr(self, 'after_id_process_command_queue') and self.after_id_process_command_queue:
-                self.after_cancel(self.after_id_process_command_queue)
-                self.after_id_process_command_queue = None
+            if hasattr(self, 'command_executor'):
+                self.command_executor.shutdown()
+            if hasattr(self, 'command_queue'):
+                self.command_queue.close() # Also logs the measured dispatch latency
+            if hasattr(self, 'adb_shell_sessions'):
+                self.adb_shell_sessions.close_all()
+            if hasattr(self, 'device_watcher'):
+                self.device_watcher.stop()
 
             log_to_file_debug_globally("Application closed by user.")
             self.master.destroy() # This will terminate the Tk main loop
@@ -2221,15 +2618,15 @@ class SamsungTab(ttk.Frame):
 
     def action_reboot_recovery(self):
         command = ["adb", "reboot", "recovery"]
-        self.master_app.execute_command_async(command, operation_name="Reboot to Recovery")
+        self.master_app.execute_command_on_devices(command, operation_name="Reboot to Recovery")
 
     def action_reboot_download(self):
         command = ["adb", "reboot", "download"]
-        self.master_app.execute_command_async(command, operation_name="Reboot to Download Mode")
+        self.master_app.execute_command_on_devices(command, operation_name="Reboot to Download Mode")
 
     def action_reboot_bootloader(self):
         command = ["adb", "reboot", "bootloader"]
-        self.master_app.execute_command_async(command, operation_name="Reboot to Bootloader")
+        self.master_app.execute_command_on_devices(command, operation_name="Reboot to Bootloader")
 
     def _start_package_disable_sequence(self, packages_to_disable, operation_name_key, success_log_key, failure_log_key):
         self.package_list_for_disable = packages_to_disable
@@ -2260,7 +2657,8 @@ class SamsungTab(ttk.Frame):
                 ["adb", "shell", "pm", "disable-user", "--user", "0", package_name],
                 operation_name=op_desc,
                 callback_on_finish=self._package_disable_step_callback,
-                is_part_of_sequence=True
+                is_part_of_sequence=True,
+                use_shell_session=True
             )
         else: # All steps completed
             if self.master_app.log_panel and self.master_app.log_panel.winfo_exists():
@@ -2581,6 +2979,7 @@ class SamsungTab(ttk.Frame):
                     cmd_arabize,
                     operation_name=desc_arabize,
                     is_part_of_sequence=True,
+                    use_shell_session=True,
                     callback_on_finish=lambda res_arabize: _arabize_callback_chained(res_arabize, step_idx_arabize + 1)
                 )
             _execute_next_arabize_step(0)
@@ -2653,17 +3052,15 @@ class HonorTab(ttk.Frame):
         log_to_file_debug_globally("HonorTab __init__ finished.")
 
     def action_honor_info(self):
-        op_name = "Honor Get Info (Fastboot)"
-        command = ["fastboot", "getvar", "all"]
-        self.master_app.execute_command_async(command, operation_name=op_name)
+        self.master_app.read_fastboot_vars("Honor Get Info (Fastboot)")
 
     def action_honor_reboot_bootloader(self):
         command = ["fastboot", "reboot-bootloader"]
-        self.master_app.execute_command_async(command, operation_name="Honor Reboot Bootloader")
+        self.master_app.execute_command_on_devices(command, operation_name="Honor Reboot Bootloader")
 
     def action_honor_reboot_edl(self):
         command = ["fastboot", "oem", "edl"]
-        self.master_app.execute_command_async(command, operation_name="Honor Reboot EDL")
+        self.master_app.execute_command_on_devices(command, operation_name="Honor Reboot EDL")
         if self.master_app.log_panel: self.master_app.log_panel.log("Note: 'fastboot oem edl' command effectiveness varies by device.", "warning", include_timestamp=False)
 
 
@@ -2780,7 +3177,7 @@ class XiaomiTab(ttk.Frame):
         fb_col2.pack(side=tk.LEFT, fill=tk.Y, padx=(10,0), anchor=tk.N, expand=True)
 
         ModernButton(fb_col1, text=self.labels.get("btn_xiaomi_fastboot_info", "Read Info (Fastboot)"),
-                                   command=lambda: self.master_app.execute_command_async(["fastboot", "getvar", "all"], "Xiaomi Read Info (Fastboot)"), theme=self.theme, width=32).pack(pady=5, anchor=tk.W)
+                                   command=lambda: self.master_app.read_fastboot_vars("Xiaomi Read Info (Fastboot)"), theme=self.theme, width=32).pack(pady=5, anchor=tk.W)
         ModernButton(fb_col1, text=self.labels.get("btn_xiaomi_fastboot_read_security", "Read Security (Fastboot)"),
                                    command=lambda: self.master_app.execute_command_async(["fastboot", "oem", "device-info"], "Xiaomi Read Security (Fastboot)"), theme=self.theme, width=32).pack(pady=5, anchor=tk.W)
         ModernButton(fb_col1, text=self.labels.get("btn_xiaomi_fastboot_unlock", "Unlock Bootloader (Fastboot)"),
@@ -2809,20 +3206,20 @@ class XiaomiTab(ttk.Frame):
 
     def action_xiaomi_fastboot_unlock(self):
         if messagebox.askyesno("Confirm Unlock", "Are you sure you want to unlock the bootloader? This will erase all user data and may void warranty. For Xiaomi, this often requires Mi Unlock Tool and an authorized account.", parent=self.master_app.master):
-            self.master_app.execute_command_async(["fastboot", "oem", "unlock"], operation_name="Xiaomi Unlock Bootloader (Attempt)")
+            self.master_app.execute_command_on_devices(["fastboot", "oem", "unlock"], operation_name="Xiaomi Unlock Bootloader (Attempt)")
             if self.master_app.log_panel: self.master_app.log_panel.log("Note: Xiaomi bootloader unlock often requires official Mi Unlock Tool and account authorization. This command attempts the generic method.", "warning", include_timestamp=False)
         else:
             if self.master_app.log_panel: self.master_app.log_panel.log("Xiaomi Unlock Bootloader cancelled by user.", "info", include_timestamp=True)
 
     def action_xiaomi_fastboot_lock(self):
         if messagebox.askyesno("Confirm Lock", "Are you sure you want to lock the bootloader? This will erase all user data if the device is not already formatted for a locked state.", parent=self.master_app.master):
-            self.master_app.execute_command_async(["fastboot", "oem", "lock"], operation_name="Xiaomi Lock Bootloader")
+            self.master_app.execute_command_on_devices(["fastboot", "oem", "lock"], operation_name="Xiaomi Lock Bootloader")
         else:
             if self.master_app.log_panel: self.master_app.log_panel.log("Xiaomi Lock Bootloader cancelled by user.", "info", include_timestamp=True)
 
     def action_xiaomi_fastboot_wipe_data(self):
         if messagebox.askyesno("Confirm Wipe", "Are you sure you want to wipe all user data? This cannot be undone.", parent=self.master_app.master):
-            self.master_app.execute_command_async(["fastboot", "erase", "userdata"], operation_name="Xiaomi Wipe Data (Fastboot)")
+            self.master_app.execute_command_on_devices(["fastboot", "erase", "userdata"], operation_name="Xiaomi Wipe Data (Fastboot)")
         else:
             if self.master_app.log_panel: self.master_app.log_panel.log("Xiaomi Wipe Data cancelled by user.", "info", include_timestamp=True)
 
@@ -2842,6 +3239,11 @@ class MTKTab(ttk.Frame):
         self.preloader_file_var = tk.StringVar()
 
         self.mtk_action_sequences = {} # For chained MTK operations like forensic project
+        self.gpt_index = None # gpt_index.GptIndex from the last List Partitions / dump file, used to check partition names
+        self.sparse_backup_var = tk.BooleanVar(value=False) # Convert partition backups to sparse images after the read
+        self.compress_backup_var = tk.BooleanVar(value=False) # Compress backups and full dumps to .cdump after the read; wins over sparse
+        self.backup_store_var = tk.BooleanVar(value=False) # Partition backups go into the deduplicated store instead of staying in the -o folder
+        self._backup_store = None # backup_store.BackupStore, opened on first use
 
         # --- Main container for scrolling ---
         canvas = tk.Canvas(self, bg=self.theme.get("BG", "#ECEFF1"), highlightthickness=0)
@@ -2888,6 +3290,12 @@ class MTKTab(ttk.Frame):
         self._create_file_selector(group_files, self.labels.get("label_da_file"), self.da_file_var)
         self._create_file_selector(group_files, self.labels.get("label_auth_file"), self.auth_file_var)
         self._create_file_selector(group_files, self.labels.get("label_preloader_file"), self.preloader_file_var)
+        tk.Checkbutton(group_files, text=self.labels.get("label_sparse_backups"), variable=self.sparse_backup_var, font=FONT,
+                       bg=self.theme.get("GROUP_BG"), fg=self.theme.get("FG"), selectcolor=self.theme.get("LOG_BG"), anchor="w").pack(fill=tk.X)
+        tk.Checkbutton(group_files, text=self.labels.get("label_compress_backups"), variable=self.compress_backup_var, font=FONT,
+                       bg=self.theme.get("GROUP_BG"), fg=self.theme.get("FG"), selectcolor=self.theme.get("LOG_BG"), anchor="w").pack(fill=tk.X)
+        tk.Checkbutton(group_files, text=self.labels.get("label_backup_store"), variable=self.backup_store_var, font=FONT,
+                       bg=self.theme.get("GROUP_BG"), fg=self.theme.get("FG"), selectcolor=self.theme.get("LOG_BG"), anchor="w").pack(fill=tk.X)
 
         # --- Operations Groups ---
         btn_width = 38 # Standardized button width for MTK tab
@@ -2902,6 +3310,8 @@ class MTKTab(ttk.Frame):
         ModernButton(group_dump, text=self.labels.get("btn_mtk_read_custom_dump"), command=self.action_mtk_read_custom_dump, theme=self.theme, width=btn_width).pack(pady=3, anchor=tk.W)
         ModernButton(group_dump, text=self.labels.get("btn_mtk_auto_boot_repair_dump"), command=self.action_mtk_auto_boot_repair_dump, theme=self.theme, width=btn_width).pack(pady=3, anchor=tk.W)
         ModernButton(group_dump, text=self.labels.get("btn_mtk_write_dump"), command=self.action_mtk_write_dump, theme=self.theme, width=btn_width).pack(pady=3, anchor=tk.W)
+        ModernButton(group_dump, text=self.labels.get("btn_mtk_extract_from_dump"), command=self.action_mtk_extract_from_dump, theme=self.theme, width=btn_width).pack(pady=3, anchor=tk.W)
+        ModernButton(group_dump, text=self.labels.get("btn_mtk_verify_manifest"), command=self.action_mtk_verify_manifest, theme=self.theme, width=btn_width).pack(pady=3, anchor=tk.W)
 
         # Partitions Manager
         group_partitions = tk.LabelFrame(scrollable_frame, text=self.labels.get("group_mtk_partitions"),
@@ -2909,10 +3319,12 @@ class MTKTab(ttk.Frame):
                                          padx=10, pady=10, relief="groove", bd=2)
         group_partitions.pack(pady=5, padx=5, fill=tk.X)
         ModernButton(group_partitions, text=self.labels.get("btn_mtk_list_partitions"), command=self.action_mtk_list_partitions, theme=self.theme, width=btn_width).pack(pady=3, anchor=tk.W)
+        ModernButton(group_partitions, text=self.labels.get("btn_mtk_load_gpt_from_dump"), command=self.action_mtk_load_gpt_from_dump, theme=self.theme, width=btn_width).pack(pady=3, anchor=tk.W)
         ModernButton(group_partitions, text=self.labels.get("btn_mtk_backup_selected_partitions"), command=self.action_mtk_backup_selected_partitions, theme=self.theme, width=btn_width).pack(pady=3, anchor=tk.W)
         ModernButton(group_partitions, text=self.labels.get("btn_mtk_backup_security_partitions"), command=self.action_mtk_backup_security_partitions, theme=self.theme, width=btn_width).pack(pady=3, anchor=tk.W)
         ModernButton(group_partitions, text=self.labels.get("btn_mtk_format_selected_partitions"), command=self.action_mtk_format_selected_partitions, theme=self.theme, width=btn_width).pack(pady=3, anchor=tk.W)
         ModernButton(group_partitions, text=self.labels.get("btn_mtk_restore_selected_partitions"), command=self.action_mtk_restore_selected_partitions, theme=self.theme, width=btn_width).pack(pady=3, anchor=tk.W)
+        ModernButton(group_partitions, text=self.labels.get("btn_mtk_restore_from_store"), command=self.action_mtk_restore_from_store, theme=self.theme, width=btn_width).pack(pady=3, anchor=tk.W)
         ModernButton(group_partitions, text=self.labels.get("btn_mtk_reset_nv_data"), command=self.action_mtk_reset_nv_data, theme=self.theme, width=btn_width).pack(pady=3, anchor=tk.W)
 
         # FRP & Data
@@ -3085,14 +3497,136 @@ class MTKTab(ttk.Frame):
             if cfg_file: self.master_app.log_panel.log(f"  CFG File: {cfg_file}", "info", indent=1)
 
 
-        self.master_app.execute_command_async(command_parts, operation_name=op_display_name, callback_on_finish=final_callback)
+        device_ids = {} # HW code, ME_ID, SOC_ID... as mtkclient prints them, handed to the callback as result["device_ids"]
+        def _on_output_lines(batch, operation=None, line_prefix=""):
+            for _stream, line in batch:
+                device_id = parse_device_id_line(line)
+                if device_id: device_ids.setdefault(*device_id)
+            self.master_app._log_streamed_output_lines(batch, operation, line_prefix)
+        def _callback_with_device_ids(result):
+            result["device_ids"] = device_ids
+            final_callback(result)
+
+        self.master_app.execute_command_async(command_parts, operation_name=op_display_name, callback_on_finish=_callback_with_device_ids, priority=PRIORITY_BULK,
+                                              stream_output=True, on_output_lines=_on_output_lines) # mtkclient runs for minutes, show its progress as it comes
+        return True # Submitted; callback_func runs when the command finishes
 
     # --- Dump Operations ---
     def action_mtk_read_full_dump(self):
-        self._execute_mtk_action("btn_mtk_read_full_dump", ["rf"], requires_output_dir=True)
+        self._execute_mtk_action("btn_mtk_read_full_dump", ["rf"], requires_output_dir=True,
+                                 callback_func=self._backup_finished_callback("btn_mtk_read_full_dump", None))
 
     def action_mtk_read_userdata(self):
-        self._execute_mtk_action("btn_mtk_read_userdata", ["r", "userdata"], requires_output_dir=True)
+        self._execute_mtk_action("btn_mtk_read_userdata", ["r", "userdata"], requires_output_dir=True,
+                                 callback_func=self._backup_finished_callback("btn_mtk_read_userdata", ["userdata"]))
+
+    def _backup_finished_callback(self, action_name_key, partitions, use_store=False):
+        """Callback for reads into an -o folder: reports the folder, optionally compresses the dumps or converts them to
+        sparse images, then hashes the resulting files into the folder's manifest.json.
+
+        partitions=None (full dump) means every .bin the read wrote into the folder. With use_store and
+        the store option on, the dumps are moved into the deduplicated backup store instead.
+        """
+        op_display_name = self.labels.get(action_name_key, action_name_key)
+        started = datetime.now().timestamp()
+        def callback(result):
+            if result.get("return_code") != 0: return # Failure is logged by _handle_command_result
+            command = result.get("command", [])
+            output_dir = command[command.index("-o") + 1] if "-o" in command[:-1] else None
+            if self.master_app.log_panel:
+                self.master_app.log_panel.log(f"{op_display_name}: Successfully completed." + (f" Files in: {output_dir}" if output_dir else ""), "success")
+            if not output_dir: return
+            if partitions is None:
+                raw_files = [entry.path for entry in os.scandir(output_dir)
+                             if entry.is_file() and entry.name.lower().endswith(".bin") and entry.stat().st_mtime >= started]
+            else:
+                raw_files = [os.path.join(output_dir, f"{name}.bin") for name in partitions if os.path.isfile(os.path.join(output_dir, f"{name}.bin"))]
+            compress = self.compress_backup_var.get()
+            store_label = op_display_name if use_store and self.backup_store_var.get() else None
+            threading.Thread(target=self._finish_backup_files, name="MtkBackupFiles", daemon=True,
+                             args=(output_dir, raw_files, compress or self.sparse_backup_var.get(), compress, partitions is not None,
+                                   result.get("device_ids"), started, store_label)).start()
+        return callback
+
+    def _finish_backup_files(self, output_dir, raw_files, pack, compress, named_by_partition, device_ids, started, store_label=None):
+        """Background thread: the dumps go into the backup store (store_label set), or get the optional
+        compression / sparse conversion and a manifest of the files that remain."""
+        if store_label and raw_files and self._move_backups_to_store(raw_files, store_label, device_ids):
+            return
+        files = self._convert_backups(raw_files, compress) if pack else raw_files
+        partitions = {path: os.path.splitext(os.path.basename(path))[0] for path in files} if named_by_partition else None
+        self._record_manifest(output_dir, files, partitions, device_ids, started)
+
+    def _get_backup_store(self):
+        if self._backup_store is None:
+            self._backup_store = BackupStore()
+        return self._backup_store
+
+    def _move_backups_to_store(self, raw_files, label, device_ids):
+        """Background thread: adds the dumps to the backup store as one backup and deletes them from the -o folder.
+
+        Returns False (files untouched) when the store can't take them.
+        """
+        log_panel = self.master_app.log_panel
+        try:
+            manifest = self._get_backup_store().add_backup({path: os.path.splitext(os.path.basename(path))[0] for path in raw_files},
+                                                           label=label, device=device_ids)
+        except (OSError, BackupStoreError, sqlite3.Error) as e_store:
+            log_to_file_debug_globally(f"Backup store: adding {len(raw_files)} files failed: {e_store}", "ERROR")
+            log_to_file_debug_globally(traceback.format_exc(), "ERROR_TRACE")
+            message = f"Backup store unavailable, dumps kept in the folder: {e_store}"
+            if log_panel: self.master_app.after(0, lambda: log_panel.log(message, "warning", indent=1))
+            return False
+        for raw_file in raw_files:
+            try:
+                os.remove(raw_file)
+            except OSError as e_remove: # The backup is complete in the store; only the copy in the folder is left behind
+                log_to_file_debug_globally(f"Backup store: {raw_file} stored but not removed: {e_remove}", "WARNING")
+                message = f"{os.path.basename(raw_file)} is in the backup store, but the raw file was kept: {e_remove}"
+                if log_panel: self.master_app.after(0, lambda message=message: log_panel.log(message, "warning", indent=1))
+        stats = manifest["stats"]
+        message = (f"Backup store: {manifest['id']} ({len(raw_files)} file(s), {stats['logical_bytes'] / 1e6:.1f} MB, "
+                   f"{stats['stored_bytes'] / 1e6:.1f} MB new in {self._get_backup_store().root})")
+        if log_panel: self.master_app.after(0, lambda: log_panel.log(message, "success", indent=1))
+        return True
+
+    def _record_manifest(self, root_dir, files, partitions=None, device_ids=None, started=None):
+        """Background thread: hashes files (all cores) into <root_dir>/manifest.json and logs the outcome."""
+        log_panel = self.master_app.log_panel
+        try:
+            write_manifest(root_dir, files, partitions, device_ids, started)
+            message, tag = f"Manifest: {os.path.join(root_dir, MANIFEST_NAME)} ({len(files)} file(s), SHA-256 + MD5)", "info"
+        except OSError as e_manifest:
+            message, tag = f"Could not write {MANIFEST_NAME} in {root_dir}: {e_manifest}", "warning"
+            log_to_file_debug_globally(traceback.format_exc(), "ERROR_TRACE")
+        if log_panel: self.master_app.after(0, lambda: log_panel.log(message, tag, indent=1))
+
+    def _convert_backups(self, raw_files, compress=False):
+        """Background thread: <name>.bin -> <name>.cdump (compress) or <name>.simg; the raw file is removed once the new one is complete.
+
+        Returns the files that hold the dumps afterwards (converted or, on failure, raw).
+        """
+        log_panel = self.master_app.log_panel
+        files = []
+        for raw_file in raw_files:
+            try:
+                if compress:
+                    packed_file = os.path.splitext(raw_file)[0] + CHUNKED_EXTENSION
+                    stats = compress_file(raw_file, packed_file)
+                    message = f"Compressed: {os.path.basename(packed_file)} ({stats['raw_size'] / 1e6:.1f} MB -> {stats['compressed_size'] / 1e6:.1f} MB)"
+                else:
+                    packed_file = os.path.splitext(raw_file)[0] + SPARSE_EXTENSION
+                    stats = raw_to_sparse(raw_file, packed_file)
+                    message = f"Sparse image: {os.path.basename(packed_file)} ({stats['raw_size'] / 1e6:.1f} MB -> {stats['sparse_size'] / 1e6:.1f} MB)"
+                os.remove(raw_file)
+                files.append(packed_file)
+                tag = "info"
+            except OSError as e_pack:
+                message, tag = f"Converting {os.path.basename(raw_file)} failed, raw dump kept: {e_pack}", "warning"
+                log_to_file_debug_globally(traceback.format_exc(), "ERROR_TRACE")
+                files.append(raw_file)
+            if log_panel: self.master_app.after(0, lambda m=message, t=tag: log_panel.log(m, t, indent=1))
+        return files
 
     def _get_partitions_from_user(self, op_display_name):
         partitions_str = simpledialog.askstring(
@@ -3104,7 +3638,12 @@ class MTKTab(ttk.Frame):
             if self.master_app.log_panel:
                 self.master_app.log_panel.log(f"{op_display_name}: {self.labels.get('mtk_no_partitions_selected', 'No partitions.')}", "warning")
             return None
-        return [p.strip() for p in partitions_str.split(',') if p.strip()]
+        partitions = [p.strip() for p in partitions_str.split(',') if p.strip()]
+        if self.gpt_index is not None and self.master_app.log_panel: # Catch typos before the device round-trip
+            unknown = [name for name in partitions if self.gpt_index.get(name) is None]
+            if unknown:
+                self.master_app.log_panel.log(f"{op_display_name}: not in the last partition table read: {', '.join(unknown)}", "warning")
+        return partitions
 
     def action_mtk_read_custom_dump(self):
         op_name = self.labels.get("btn_mtk_read_custom_dump")
@@ -3117,6 +3656,7 @@ class MTKTab(ttk.Frame):
 
     def action_mtk_auto_boot_repair_dump(self):
         boot_partitions = ["preloader", "preloader_raw", "lk", "lk2", "boot", "recovery", "para", "logo", "tee1", "tee2", "scp1", "scp2", "sspm_1", "sspm_2", "md1img", "spmfw"] # Expanded list
+        started = datetime.now().timestamp()
         def extra_parts(inp, cfg, out_dir):
             return boot_partitions
 
@@ -3140,6 +3680,7 @@ class MTKTab(ttk.Frame):
                         self.master_app.log_panel.log(f"Boot Repair Dump files should be in: {output_dir_from_cmd}", "info", indent=1)
                     
                     cfg_file_path = os.path.join(output_dir_from_cmd, "mtk_boot_repair_dump.cfg")
+                    dumped = {} # Path -> partition, hashed into the folder's manifest
                     try:
                         with open(cfg_file_path, 'w', encoding='utf-8') as f:
                             f.write("# Auto Boot Repair Dump Configuration\n")
@@ -3147,11 +3688,15 @@ class MTKTab(ttk.Frame):
                                 part_bin_name = f"{part_name}.bin" # mtkclient typically saves as {partition}.bin
                                 if os.path.exists(os.path.join(output_dir_from_cmd, part_bin_name)):
                                     f.write(f"{part_name}={part_bin_name}\n") # Relative path for CFG
+                                    dumped[os.path.join(output_dir_from_cmd, part_bin_name)] = part_name
                         if self.master_app.log_panel:
                             self.master_app.log_panel.log(f"Generated boot repair CFG: {cfg_file_path}", "info", indent=1)
                     except Exception as e_cfg:
                         if self.master_app.log_panel:
                             self.master_app.log_panel.log(f"Error generating CFG for boot repair: {e_cfg}", "error", indent=1)
+                    if dumped:
+                        threading.Thread(target=self._record_manifest, name="MtkBootRepairManifest", daemon=True,
+                                         args=(output_dir_from_cmd, list(dumped), dumped, result.get("device_ids"), started)).start()
                 else:
                     if self.master_app.log_panel:
                          self.master_app.log_panel.log(f"Could not determine output directory for Boot Repair CFG generation.", "warning", indent=1)
@@ -3175,33 +3720,155 @@ class MTKTab(ttk.Frame):
                                  requires_cfg_file_title_key="mtk_select_cfg_file",
                                  extra_cmd_parts_func=extra_parts)
 
+    def action_mtk_extract_from_dump(self):
+        """Copies partitions out of an existing full dump using its GPT, instead of reading them from the device again."""
+        op_name = self.labels.get("btn_mtk_extract_from_dump", "Extract Partitions from Full Dump")
+        log_panel = self.master_app.log_panel
+        dump_file = filedialog.askopenfilename(title=self.labels.get("mtk_select_full_dump_file", "Select Full Dump File"),
+                                               filetypes=[("Dump files", "*.bin *.img *.cdump"), ("All files", "*.*")], parent=self.master_app.master)
+        if not dump_file:
+            return
+        if log_panel:
+            log_panel.clear_log()
+            log_panel.log(f"Starting: {op_name}...", "info", include_timestamp=True)
+            log_panel.log(f"  Dump: {dump_file}", "info", indent=1)
+        try:
+            index = read_gpt(dump_file)
+        except (GptError, OSError) as e_gpt:
+            if log_panel: log_panel.log(f"Cannot read the dump's partition table: {e_gpt}", "error", indent=1)
+            return
+        self._show_gpt_index(index)
+        partitions = self._get_partitions_from_user(op_name)
+        if not partitions: return
+        output_dir = filedialog.askdirectory(title=f"{op_name} - {self.labels.get('mtk_output_dir_prompt_title', 'Select Output Dir')}",
+                                             parent=self.master_app.master)
+        if not output_dir:
+            if log_panel: log_panel.log(f"{op_name}: Cancelled, no output directory.", "info")
+            return
+
+        def _progress(name, done, total):
+            self.master_app.after(0, lambda: log_panel.progress_bar.set_value(int(done * 100 / total)) if log_panel else None)
+
+        def _worker():
+            try:
+                results = extract_partitions(dump_file, partitions, output_dir, gpt=index, progress_callback=_progress)
+            except Exception as e_extract:
+                log_to_file_debug_globally(f"{op_name} failed: {e_extract}", "ERROR")
+                log_to_file_debug_globally(traceback.format_exc(), "ERROR_TRACE")
+                results = [{"partition": name, "ok": False, "message": str(e_extract)} for name in partitions]
+            self.master_app.after(0, lambda: _finished(results))
+
+        def _finished(results):
+            if not log_panel: return
+            log_panel.progress_bar.stop() # Also resets a determinate bar left at the last percentage
+            for result in results:
+                if result["ok"]:
+                    log_panel.log(f"  {result['partition']}: {format_size(result['size'])} -> {result['path']} ({result['seconds']:.2f}s)", "success", indent=1)
+                else:
+                    log_panel.log(f"  {result['partition']}: {result['message']}", "error", indent=1)
+            done_count = sum(1 for result in results if result["ok"])
+            log_panel.log(f"{op_name}: {done_count}/{len(results)} partitions extracted to {output_dir}",
+                          "success" if done_count == len(results) else "warning", include_timestamp=True)
+
+        if log_panel: log_panel.progress_bar.start()
+        threading.Thread(target=_worker, name="MtkDumpExtract", daemon=True).start()
+
+    def action_mtk_verify_manifest(self):
+        """Re-hashes a dump or forensic project folder on all cores and reports files that no longer match its manifest.json."""
+        op_name = self.labels.get("btn_mtk_verify_manifest", "Verify Dump/Project Folder")
+        log_panel = self.master_app.log_panel
+        folder = filedialog.askdirectory(title=self.labels.get("mtk_select_verify_folder", "Select Folder with manifest.json"),
+                                         parent=self.master_app.master)
+        if not folder:
+            return
+        if log_panel:
+            log_panel.clear_log()
+            log_panel.log(f"Starting: {op_name}...", "info", include_timestamp=True)
+            log_panel.log(f"  Folder: {folder}", "info", indent=1)
+
+        def _progress(path, done, total):
+            self.master_app.after(0, lambda: log_panel.progress_bar.set_value(int(done * 100 / total)) if log_panel else None)
+
+        def _worker():
+            try:
+                results, error = verify_manifest(folder, progress_callback=_progress), None
+            except ManifestError as e_manifest:
+                results, error = [], str(e_manifest)
+            self.master_app.after(0, lambda: _finished(results, error))
+
+        def _finished(results, error):
+            if not log_panel: return
+            log_panel.progress_bar.stop()
+            if error:
+                log_panel.log(f"{op_name}: {error}", "error", include_timestamp=True)
+                return
+            for result in results:
+                if not result["ok"]:
+                    log_panel.log(f"  {result['name']}: {result['message']}", "error", indent=1)
+            ok_count = sum(1 for result in results if result["ok"])
+            log_panel.log(f"{op_name}: {ok_count}/{len(results)} files match the manifest",
+                          "success" if ok_count == len(results) else "error", include_timestamp=True)
+
+        if log_panel: log_panel.progress_bar.start()
+        threading.Thread(target=_worker, name="MtkVerifyManifest", daemon=True).start()
+
     # --- Partitions Manager ---
     def action_mtk_list_partitions(self):
+        gpt_dir_holder = [None] # Temp folder mtkclient's `gpt` writes the raw table files to
+
+        def extra_parts(inp, cfg, out_dir):
+            gpt_dir_holder[0] = tempfile.mkdtemp(prefix="mtk_gpt_")
+            return [gpt_dir_holder[0]]
+
         def callback(result):
-            if result.get("return_code") == 0 and self.master_app.log_panel:
-                self.master_app.log_panel.log("Partitions list retrieved:", "success") # Main success
-                stdout = result.get("stdout", "")
-                found_partitions = []
-                # Regex to capture partition name more reliably from mtkclient output
-                # Example lines: "0. preloader: 0x0 - 0x80000 (512 KiB)" or "preloader (512 KiB)"
-                # or "preloader" from simpler listings.
-                for line in stdout.splitlines():
-                    line = line.strip()
-                    match = re.match(r"^\s*(?:\d+\.\s*)?([a-zA-Z0-9_-]+)\s*(?:[:(]|$)", line)
-                    if match:
-                        part_name = match.group(1)
-                        # Filter out common headers or non-partition names
-                        if part_name.lower() not in ["gpt", "idx", "name", "partition_name", "sgpt", "size", "start", "end", "addr", "type", "guid", "attributes"]:
-                            found_partitions.append(part_name)
-                            self.master_app.log_panel.log(f"  - {part_name}", "info", indent=1) # Log each found partition
-                
-                if not found_partitions:
-                    if "GPT header not found" in stdout or "No partitions found" in stdout:
-                         self.master_app.log_panel.log("GPT header not found or no partitions reported by mtkclient.", "warning", indent=1)
-                    else:
-                         self.master_app.log_panel.log("No partitions parsed from output, or output was empty. Check full mtkclient output if available in debug logs.", "warning", indent=1)
+            gpt_dir = gpt_dir_holder[0]
+            try:
+                if result.get("return_code") != 0 or not gpt_dir:
+                    return # Failure is logged by _handle_command_result
+                gpt_files = find_gpt_files(gpt_dir)
+                if not gpt_files:
+                    if self.master_app.log_panel:
+                        self.master_app.log_panel.log("mtkclient wrote no GPT file. Check full mtkclient output in debug logs.", "warning", indent=1)
+                    return
+                for gpt_file in gpt_files: # Primary copy first, then the backup
+                    try:
+                        self._show_gpt_index(read_gpt(gpt_file))
+                        return
+                    except (GptError, OSError) as e_gpt:
+                        if self.master_app.log_panel: self.master_app.log_panel.log(f"{os.path.basename(gpt_file)}: {e_gpt}", "warning", indent=1)
+            finally:
+                if gpt_dir: shutil.rmtree(gpt_dir, ignore_errors=True)
+
+        self._execute_mtk_action("btn_mtk_list_partitions", ["gpt"], extra_cmd_parts_func=extra_parts, callback_func=callback, confirm=False) # List is generally safe
 
-        self._execute_mtk_action("btn_mtk_list_partitions", ["gpt"], callback_func=callback, confirm=False) # List is generally safe
+    def action_mtk_load_gpt_from_dump(self):
+        """Reads the partition table from a full dump, pgpt.bin/sgpt.bin or a saved GPT file, without the device."""
+        source_file = filedialog.askopenfilename(title=self.labels.get("mtk_select_gpt_source_file", "Select Dump or GPT File"),
+                                                 filetypes=[("Binary files", "*.bin *.img"), ("All files", "*.*")], parent=self.master_app.master)
+        if not source_file:
+            return
+        if self.master_app.log_panel:
+            self.master_app.log_panel.clear_log()
+            self.master_app.log_panel.log(f"Reading partition table from: {source_file}", "info", include_timestamp=True)
+        try:
+            self._show_gpt_index(read_gpt(source_file)) # Only the GPT sectors are read, even from a full dump
+        except (GptError, OSError) as e_gpt:
+            if self.master_app.log_panel: self.master_app.log_panel.log(str(e_gpt), "error", indent=1)
+            log_to_file_debug_globally(f"GPT read from {source_file} failed: {e_gpt}", "ERROR")
+
+    def _show_gpt_index(self, index):
+        """Logs the partitions of a GptIndex with their byte ranges and keeps it for later partition prompts."""
+        self.gpt_index = index
+        if not self.master_app.log_panel:
+            return
+        log_panel = self.master_app.log_panel
+        log_panel.log(f"Partitions list retrieved ({len(index.partitions)} partitions, {index.sector_size}-byte sectors, {index.source} GPT):", "success")
+        for problem in index.problems:
+            log_panel.log(f"GPT warning: {problem}", "warning", indent=1)
+        for partition in index.partitions:
+            log_panel.log(f"  - {partition.name}: 0x{partition.start:X} - 0x{partition.end:X} ({format_size(partition.size)})", "info", indent=1)
+        if not index.partitions:
+            log_panel.log("The GPT lists no partitions.", "warning", indent=1)
 
     def action_mtk_backup_selected_partitions(self):
         op_name = self.labels.get("btn_mtk_backup_selected_partitions")
@@ -3209,13 +3876,15 @@ class MTKTab(ttk.Frame):
         if not partitions: return
         def extra_parts(inp, cfg, out_dir): return partitions # Partitions are main args for 'r'
         self._execute_mtk_action("btn_mtk_backup_selected_partitions", ["r"],
-                                 requires_output_dir=True, extra_cmd_parts_func=extra_parts)
+                                 requires_output_dir=True, extra_cmd_parts_func=extra_parts,
+                                 callback_func=self._backup_finished_callback("btn_mtk_backup_selected_partitions", partitions, use_store=True))
 
     def action_mtk_backup_security_partitions(self):
         security_partitions = ["proinfo", "nvram", "nvdata", "nvcfg", "protect1", "protect2", "seccfg", "secro", "metadata", "oemkeystore", "keystore", "frp", "otp"]
         def extra_parts(inp, cfg, out_dir): return security_partitions
         self._execute_mtk_action("btn_mtk_backup_security_partitions", ["r"],
-                                 requires_output_dir=True, extra_cmd_parts_func=extra_parts)
+                                 requires_output_dir=True, extra_cmd_parts_func=extra_parts,
+                                 callback_func=self._backup_finished_callback("btn_mtk_backup_security_partitions", security_partitions, use_store=True))
 
     def action_mtk_format_selected_partitions(self):
         op_name = self.labels.get("btn_mtk_format_selected_partitions")
@@ -3225,19 +3894,145 @@ class MTKTab(ttk.Frame):
         self._execute_mtk_action("btn_mtk_format_selected_partitions", ["e"], extra_cmd_parts_func=extra_parts)
 
     def action_mtk_restore_selected_partitions(self):
+        op_display_name = self.labels.get("btn_mtk_restore_selected_partitions")
+        log_panel = self.master_app.log_panel
+        if not messagebox.askokcancel(
+            self.labels.get("mtk_confirm_action_title"),
+            self.labels.get("mtk_confirm_action_msg").format(action_name=op_display_name),
+            icon=messagebox.WARNING, parent=self.master_app.master):
+            if log_panel: log_panel.log(f"MTK Action '{op_display_name}' cancelled by user.", "info", include_timestamp=True)
+            return
         # mtkclient uses -cfg for writing partitions from files specified in the CFG
-        def extra_parts(main_input_file_ignored, cfg_file, out_dir_ignored): # input_file and out_dir are not directly used here
-            if not cfg_file:
-                messagebox.showerror("CFG File Missing", "A CFG file specifying partitions and their image files is required for restore.", parent=self.master_app.master)
-                return None # Abort
-            # For restoring partitions from files, the CFG *is* the primary argument after 'w' and DA/Auth/PL
-            # The mtkclient command structure is `mtk w -cfg your_config.cfg`
-            # So, the base command is 'w', and this function provides ['-cfg', cfg_file]
-            return ["-cfg", cfg_file]
-
-        self._execute_mtk_action("btn_mtk_restore_selected_partitions", ["w"], # Base command is 'w'
-                                 requires_cfg_file_title_key="mtk_select_cfg_file", # Only CFG file is needed
-                                 extra_cmd_parts_func=extra_parts)
+        cfg_file = filedialog.askopenfilename(title=self.labels.get("mtk_select_cfg_file", "Select CFG File"), parent=self.master_app.master)
+        if not cfg_file:
+            messagebox.showerror("CFG File Missing", "A CFG file specifying partitions and their image files is required for restore.", parent=self.master_app.master)
+            return
+
+        def _report(message):
+            if log_panel: self.master_app.after(0, lambda: log_panel.log(message, "info", indent=1))
+
+        def _worker(): # Sparse/compressed images can be gigabytes; expanding them must not block the Tk thread
+            try:
+                expanded_cfg, expanded_dir = self._expand_sparse_images_in_cfg(cfg_file, _report)
+                self.master_app.after(0, lambda: _start_write(expanded_cfg, expanded_dir))
+            except Exception as e_expand: # The helper has already removed its temp folder
+                log_to_file_debug_globally(f"{op_display_name}: expanding images of {cfg_file} failed: {e_expand}", "ERROR")
+                log_to_file_debug_globally(traceback.format_exc(), "ERROR_TRACE")
+                message = f"Cannot expand image for restore: {e_expand}"
+                self.master_app.after(0, lambda: _expand_failed(message))
+
+        def _expand_failed(message):
+            if not log_panel: return
+            log_panel.progress_bar.stop()
+            log_panel.log(message, "error")
+
+        def _start_write(expanded_cfg, expanded_dir):
+            if log_panel: log_panel.progress_bar.stop()
+            def callback(result):
+                if expanded_dir: shutil.rmtree(expanded_dir, ignore_errors=True)
+            # The mtkclient command structure is `mtk w -cfg your_config.cfg`: base command 'w', the CFG as extra parts
+            submitted = self._execute_mtk_action("btn_mtk_restore_selected_partitions", ["w"], confirm=False,
+                                                 extra_cmd_parts_func=lambda inp, cfg, out_dir: ["-cfg", expanded_cfg], callback_func=callback)
+            if not submitted and expanded_dir: # mtkclient not found: the callback will never run
+                shutil.rmtree(expanded_dir, ignore_errors=True)
+
+        if log_panel:
+            log_panel.clear_log()
+            log_panel.log(f"Starting: {op_display_name}...", "info", include_timestamp=True)
+            log_panel.log(f"  CFG File: {cfg_file}", "info", indent=1)
+            log_panel.progress_bar.start()
+        threading.Thread(target=_worker, name="MtkRestoreExpand", daemon=True).start()
+
+    def action_mtk_restore_from_store(self):
+        """Streams a backup out of the backup store into a folder, with a CFG for Restore Selected Partitions."""
+        op_name = self.labels.get("btn_mtk_restore_from_store", "Reassemble Backup from Backup Store")
+        log_panel = self.master_app.log_panel
+        try:
+            store = self._get_backup_store()
+            backups = store.list_backups()
+        except (OSError, sqlite3.Error) as e_store:
+            messagebox.showerror(op_name, f"Cannot open the backup store: {e_store}", parent=self.master_app.master)
+            return
+        if not backups:
+            messagebox.showinfo(op_name, f"The backup store is empty ({store.root}).", parent=self.master_app.master)
+            return
+        if log_panel:
+            log_panel.clear_log()
+            log_panel.log(f"{op_name}: {len(backups)} backup(s) in {store.root}", "info", include_timestamp=True)
+            for backup in backups[-20:]:
+                log_panel.log(f"  {backup['id']}  {backup.get('label', '')}  {', '.join(entry['name'] for entry in backup['files'])}", "info", indent=1)
+        backup_id = simpledialog.askstring(op_name, self.labels.get("mtk_store_backup_id_prompt", "Backup ID to reassemble:"),
+                                           initialvalue=backups[-1]["id"], parent=self.master_app.master)
+        if not backup_id or not backup_id.strip(): return
+        output_dir = filedialog.askdirectory(title=f"{op_name} - {self.labels.get('mtk_output_dir_prompt_title', 'Select Output Dir')}",
+                                             parent=self.master_app.master)
+        if not output_dir: return
+
+        def _progress(path, done, total):
+            self.master_app.after(0, lambda: log_panel.progress_bar.set_value(int(done * 100 / total)) if log_panel and total else None)
+
+        def _worker():
+            cfg_file = None
+            try:
+                results = store.restore(backup_id.strip(), output_dir, progress_callback=_progress)
+                restored = [result for result in results if result["ok"]]
+                if restored:
+                    cfg_file = os.path.join(output_dir, "store_restore.cfg")
+                    with open(cfg_file, "w", encoding="utf-8") as f_cfg:
+                        f_cfg.write(f"# Reassembled from backup store {backup_id.strip()}\n")
+                        f_cfg.writelines(f"{result['partition']}={os.path.basename(result['path'])}\n" for result in restored)
+            except (BackupStoreError, OSError) as e_restore:
+                results, cfg_file = [{"partition": backup_id, "ok": False, "message": str(e_restore)}], None
+            self.master_app.after(0, lambda: _finished(results, cfg_file))
+
+        def _finished(results, cfg_file):
+            if not log_panel: return
+            log_panel.progress_bar.stop()
+            for result in results:
+                log_panel.log(f"  {result['partition']}: {result['message']}", "success" if result["ok"] else "error", indent=1)
+            if cfg_file:
+                log_panel.log(f"{op_name}: CFG for Restore Selected Partitions: {cfg_file}", "success", include_timestamp=True)
+
+        if log_panel: log_panel.progress_bar.start()
+        threading.Thread(target=_worker, name="MtkStoreRestore", daemon=True).start()
+
+    def _expand_sparse_images_in_cfg(self, cfg_file, report=None):
+        """mtkclient writes image files byte for byte, so sparse and compressed images named in a "partition=file" CFG are expanded first.
+
+        Runs on a worker thread; report(message) is told about each image. Returns (cfg to use, temp
+        folder to delete afterwards or None). Zero runs become holes, so mostly empty images expand
+        quickly and take little space.
+        """
+        cfg_dir = os.path.dirname(os.path.abspath(cfg_file))
+        with open(cfg_file, "r", encoding="utf-8", errors="ignore") as f_cfg:
+            lines = f_cfg.read().splitlines()
+        temp_dir = None
+        try:
+            for i, line in enumerate(lines):
+                name, sep, image = line.partition("=")
+                if not sep or line.lstrip().startswith("#"): continue
+                image_path = os.path.join(cfg_dir, image.strip()) # Relative entries are relative to the CFG
+                if is_sparse_image(image_path):
+                    expand = sparse_to_raw
+                elif is_chunked_dump(image_path):
+                    expand = decompress_file
+                else:
+                    lines[i] = f"{name.strip()}={image_path}" # Absolute, in case the CFG is rewritten to the temp folder
+                    continue
+                if temp_dir is None: temp_dir = tempfile.mkdtemp(prefix="mtk_restore_")
+                raw_path = os.path.join(temp_dir, f"{name.strip()}.bin")
+                if report: report(f"Expanding {os.path.basename(image_path)}...")
+                expand(image_path, raw_path)
+                lines[i] = f"{name.strip()}={raw_path}"
+            if temp_dir is None:
+                return cfg_file, None
+            expanded_cfg = os.path.join(temp_dir, os.path.basename(cfg_file))
+            with open(expanded_cfg, "w", encoding="utf-8") as f_cfg:
+                f_cfg.write("\n".join(lines) + "\n")
+        except Exception:
+            if temp_dir: shutil.rmtree(temp_dir, ignore_errors=True)
+            raise
+        return expanded_cfg, temp_dir
 
 
     def action_mtk_reset_nv_data(self):
@@ -3441,7 +4236,7 @@ class MTKTab(ttk.Frame):
 
         self.mtk_action_sequences['forensic_project'] = {
             'project_dir': project_dir, 'keys_dir': keys_dir, 'dumps_dir': dumps_dir, 'metadata_dir': metadata_dir,
-            'current_step': 0,
+            'current_step': 0, 'started': datetime.now().timestamp(),
             'steps': [
                 {'name': 'Extract Keys', 'func': self._fp_step_extract_keys, 'op_name_log': "FP: Extract Keys"},
                 {'name': 'List Partitions', 'func': self._fp_step_list_partitions, 'op_name_log': "FP: List Partitions"},
@@ -3449,11 +4244,30 @@ class MTKTab(ttk.Frame):
                 # Optional: Read Full Userarea Dump (can be very large and time-consuming)
                 # {'name': 'Read Full Userarea Dump (Optional)', 'func': self._fp_step_read_full_dump_optional, 'op_name_log': "FP: Read Full Dump"},
                 {'name': 'Generate EWC', 'func': self._fp_step_generate_ewc_for_project, 'op_name_log': "FP: Generate EWC"}, # EWC generation is local
-                {'name': 'Finalize Project', 'func': self._fp_step_finalize, 'op_name_log': "FP: Finalize"} # Local file writing
+                {'name': 'Finalize Project', 'func': self._fp_step_finalize, 'op_name_log': "FP: Finalize"}, # Local file writing
+                {'name': 'Hash Project Files', 'func': self._fp_step_write_manifest, 'op_name_log': "FP: Manifest"} # Local, after metadata is written
             ]
         }
         self._run_next_forensic_project_step()
 
+    def _fp_step_write_manifest(self):
+        """Hashes every file of the project (keys, dumps, metadata) into <project>/manifest.json, then continues the sequence."""
+        sequence = self.mtk_action_sequences['forensic_project']
+        project_dir, dumps_dir = sequence['project_dir'], sequence['dumps_dir']
+        files = [os.path.join(dir_path, name) for dir_path, _dirs, names in os.walk(project_dir) for name in names if name != MANIFEST_NAME]
+        partitions = {path: os.path.splitext(os.path.basename(path))[0] for path in files if os.path.dirname(path) == dumps_dir}
+
+        def _next_step():
+            if self.mtk_action_sequences.get('forensic_project') is not sequence: return # Aborted meanwhile
+            sequence['current_step'] += 1
+            self._run_next_forensic_project_step()
+
+        def _worker():
+            self._record_manifest(project_dir, files, partitions, None, sequence['started'])
+            self.master_app.after(0, _next_step)
+
+        threading.Thread(target=_worker, name="MtkProjectManifest", daemon=True).start()
+
     def _fp_abort(self):
         """Helper to abort forensic project sequence."""
         if self.master_app.log_panel:
@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""One mtkclient run for a whole batch of partition reads, writes or erases.
+
+Every mtkclient start redoes the BROM/preloader handshake, the DA upload and the storage init,
+which takes 10-20 s before the first byte moves. mtkclient's multi-partition form
+(`r boot,lk boot.bin,lk.bin`, `w ...`, `e nvram,nvdata`) does all of that once and then
+works through the list, so a batch here is one process per action instead of one per partition.
+Per-partition results are recovered from mtkclient's output as they are printed.
+"""
+
+import os
+import re
+import sys
+import time
+import threading
+import subprocess
+import traceback # For detailed error logging
+
+from command_engine import StreamingOutput
+from debug_log import log_to_file_debug_globally # Queued, rotating debug log shared by every module
+
+ACTION_READ = "r"
+ACTION_WRITE = "w"
+ACTION_ERASE = "e"
+
+MTK_SESSION_TAIL_LINES = 5000 # Output lines kept for the final summary
+
+# What mtkclient prints when it finishes (or gives up on) one partition of a batch
+_READ_DONE_RE = re.compile(r"Dumped sector \d+ with sector count \S+ as (.+?)\.?$")
+_WRITE_DONE_RE = re.compile(r"Wrote (.+?) to sector \d+")
+_WRITE_FAILED_RE = re.compile(r"Failed to write (.+?) to sector \d+")
+_ERASE_DONE_RE = re.compile(r"Formatted sector \d+ with sector count")
+_ERASE_FAILED_RE = re.compile(r"Failed to format sector")
+_PARTITION_MISSING_RE = re.compile(r"Couldn't (?:detect|find) partition:?\s*(\S+)", re.IGNORECASE)
+
+
+class PartitionTask:
+    """One partition of a batch. path is the output file (read) or the image to write; unused for erase."""
+
+    def __init__(self, partition, path=None):
+        self.partition = partition
+        self.path = path
+        self.ok = None # None until mtkclient reported on it
+        self.message = ""
+
+    def result(self):
+        return {"partition": self.partition, "path": self.path, "ok": bool(self.ok), "message": self.message}
+
+
+class MtkSession:
+    """Runs partition batches through one mtkclient process per batch.
+
+    base_command is how mtkclient is started ([python, mtk.py] or [mtk]); options are the
+    loader/auth/preloader arguments appended to every run. on_line(line) sees every output line,
+    on_result(result_dict, done_count, total) fires as soon as a partition is finished.
+    Both are called from the thread that called run_batch().
+    """
+
+    def __init__(self, base_command, options=()):
+        self.base_command = list(base_command)
+        self.options = list(options)
+        self.process = None
+        self.cancelled = False
+        self._lock = threading.Lock()
+
+    def build_command(self, action, tasks):
+        partitions = ",".join(task.partition for task in tasks)
+        command = self.base_command + [action, partitions]
+        if action in (ACTION_READ, ACTION_WRITE):
+            command.append(",".join(task.path for task in tasks))
+        return command + self.options
+
+    def run_batch(self, action, tasks, on_line=None, on_result=None, timeout=None):
+        """Reads, writes or erases every task's partition in one mtkclient run.
+
+        Returns (return_code, [result dict per task]) in task order. Tasks mtkclient never reported on
+        are decided at the end: a read counts when its file exists and isn't empty, writes and erases
+        follow the exit code.
+        """
+        if action not in (ACTION_READ, ACTION_WRITE, ACTION_ERASE):
+            raise ValueError(f"Unsupported mtkclient batch action: {action}")
+        tasks = list(tasks)
+        if not tasks:
+            return 0, []
+        for task in tasks: # mtkclient splits both lists on commas
+            if "," in task.partition or (action != ACTION_ERASE and (not task.path or "," in task.path)):
+                raise ValueError(f"Partition or file name can't be used in an mtkclient batch: {task.partition} {task.path}")
+
+        command = self.build_command(action, tasks)
+        log_to_file_debug_globally(f"MtkSession: {len(tasks)} partition(s) in one run: {' '.join(command)}", "DEBUG_CMD")
+        tracker = _BatchTracker(action, tasks, on_result)
+        flags = subprocess.CREATE_NO_WINDOW if os.name == 'nt' else 0
+        started = time.monotonic()
+        with self._lock:
+            if self.cancelled:
+                return -1, [task.result() for task in tasks]
+            self.process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True,
+                                            encoding='utf-8', errors='ignore', creationflags=flags)
+
+        def _on_lines(batch):
+            for _stream, line in batch:
+                line = line.strip()
+                if not line:
+                    continue
+                if on_line:
+                    on_line(line)
+                tracker.feed(line)
+
+        try:
+            StreamingOutput(self.process, on_lines=_on_lines, tail_lines=MTK_SESSION_TAIL_LINES).run(timeout=timeout)
+            return_code = self.process.returncode
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+            return_code = -1
+            log_to_file_debug_globally(f"MtkSession: batch timed out after {timeout}s.", "ERROR")
+        except Exception as e_run:
+            log_to_file_debug_globally(f"MtkSession: batch failed: {e_run}", "ERROR")
+            log_to_file_debug_globally(traceback.format_exc(), "ERROR_TRACE")
+            return_code = -2
+        finally:
+            with self._lock:
+                self.process = None
+        if self.cancelled:
+            return_code = -1
+        tracker.finish(return_code, self.cancelled)
+        log_to_file_debug_globally(f"MtkSession: batch finished with code {return_code} in {time.monotonic() - started:.1f}s "
+                                   f"({sum(1 for task in tasks if task.ok)}/{len(tasks)} partitions ok).")
+        return return_code, [task.result() for task in tasks]
+
+    def cancel(self):
+        """Stops the running batch (safe from any thread). Partitions not finished yet are reported as failed."""
+        with self._lock:
+            self.cancelled = True
+            if self.process and self.process.poll() is None:
+                self.process.terminate()
+
+
+class _BatchTracker:
+    """Matches mtkclient output lines to the partitions of a batch, in the order mtkclient processes them."""
+
+    def __init__(self, action, tasks, on_result):
+        self.action = action
+        self.tasks = tasks
+        self.on_result = on_result
+        self.done_count = 0
+
+    def _pending(self):
+        return [task for task in self.tasks if task.ok is None]
+
+    def _resolve(self, task, ok, message):
+        if task is None or task.ok is not None:
+            return
+        task.ok, task.message = ok, message
+        self.done_count += 1
+        if self.on_result:
+            try:
+                self.on_result(task.result(), self.done_count, len(self.tasks))
+            except Exception as e_cb:
+                log_to_file_debug_globally(f"MtkSession: on_result callback failed: {e_cb}", "ERROR")
+
+    def _task_for_path(self, path):
+        path = path.strip().strip("'\"")
+        for task in self._pending():
+            if task.path and (task.path == path or os.path.basename(task.path) == os.path.basename(path)):
+                return task
+        return None
+
+    def _task_for_partition(self, partition):
+        for task in self._pending():
+            if task.partition == partition:
+                return task
+        return None
+
+    def feed(self, line):
+        missing = _PARTITION_MISSING_RE.search(line)
+        if missing:
+            self._resolve(self._task_for_partition(missing.group(1).strip(".,")), False, line)
+            return
+        if self.action == ACTION_READ:
+            match = _READ_DONE_RE.search(line)
+            if match:
+                self._resolve(self._task_for_path(match.group(1)), True, line)
+        elif self.action == ACTION_WRITE:
+            match = _WRITE_FAILED_RE.search(line) or _WRITE_DONE_RE.search(line)
+            if match:
+                self._resolve(self._task_for_path(match.group(1)), match.re is _WRITE_DONE_RE, line)
+        elif _ERASE_DONE_RE.search(line) or _ERASE_FAILED_RE.search(line): # The erase lines don't name the partition
+            pending = self._pending()
+            if pending:
+                self._resolve(pending[0], _ERASE_DONE_RE.search(line) is not None, line)
+
+    def finish(self, return_code, cancelled):
+        for task in self._pending():
+            if cancelled:
+                self._resolve(task, False, "Cancelled")
+            elif self.action == ACTION_READ:
+                written = bool(task.path) and os.path.isfile(task.path) and os.path.getsize(task.path) > 0
+                self._resolve(task, written and return_code == 0,
+                              "Output file written" if written else f"No output file (exit code {return_code})")
+            else:
+                self._resolve(task, return_code == 0, f"Exit code {return_code}")
+
+
+if __name__ == "__main__": # Self-check against a stand-in for mtkclient: python mtk_session.py
+    import tempfile
+    with tempfile.TemporaryDirectory() as temp_dir:
+        fake_mtk = os.path.join(temp_dir, "fake_mtk.py")
+        with open(fake_mtk, "w", encoding="utf-8") as f_fake:
+            f_fake.write("import sys\n"
+                         "action, parts = sys.argv[1], sys.argv[2].split(',')\n"
+                         "files = sys.argv[3].split(',') if action != 'e' else []\n"
+                         "print('Preloader - Handshake done')\n"
+                         "for i, part in enumerate(parts):\n"
+                         "    if part == 'missing':\n"
+                         "        print(\"Error: Couldn't detect partition: missing\")\n"
+                         "    elif action == 'r':\n"
+                         "        open(files[i], 'wb').write(b'x' * 16)\n"
+                         "        print(f'Dumped sector {i} with sector count 0x10 as {files[i]}.')\n"
+                         "    elif action == 'w':\n"
+                         "        print(f'Wrote {files[i]} to sector {i} with sector count 0x10.')\n"
+                         "    else:\n"
+                         "        print(f'Formatted sector {i} with sector count 0x10.')\n")
+        session = MtkSession([sys.executable, fake_mtk])
+        seen = []
+        read_tasks = [PartitionTask(name, os.path.join(temp_dir, f"{name}.bin")) for name in ("boot", "missing", "lk")]
+        code, results = session.run_batch(ACTION_READ, read_tasks, on_result=lambda result, done, total: seen.append((result["partition"], done, total)))
+        assert [result["ok"] for result in results] == [True, False, True], results
+        assert [entry[1] for entry in seen] == [1, 2, 3], seen
+        code, results = session.run_batch(ACTION_ERASE, [PartitionTask("nvram"), PartitionTask("nvdata")])
+        assert code == 0 and all(result["ok"] for result in results), results
+        print("MtkSession self-check OK")
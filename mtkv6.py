@@ -9,11 +9,25 @@ import threading
 import queue
 import datetime
 import re
+import shutil
+import tempfile
+import sqlite3
+from collections import deque
+from command_engine import StreamingOutput
+from mtk_session import MtkSession, PartitionTask, ACTION_READ, ACTION_WRITE # One mtkclient run per partition batch
+from scatter_parser import load_scatter # Typed partition table of a scatter file, cached by path/mtime/size
+from sparse_image import raw_to_sparse, sparse_to_raw, is_sparse_image, SPARSE_EXTENSION # Android sparse images for backups/restores
+from chunked_dump import compress_file, decompress_file, is_chunked_dump, CHUNKED_EXTENSION # Seekable compressed dumps
+from integrity_manifest import write_manifest, parse_device_id_line, MANIFEST_NAME # SHA-256/MD5 manifest of every read
+from gpt_index import read_gpt, format_size, GptError # GPT partition tables read from dumps, no device round-trip
+from dump_extract import extract_partitions # Kernel-side copies of single partitions out of a full dump
+from backup_store import BackupStore, BackupStoreError # Deduplicated, content-addressed store for partition backups
 
 
 PYTHON_EXEC = sys.executable
 # !!! IMPORTANT: Ensure this path is correct for your system and points to the mtk.py executable
 MTKCLIENT_PATH = "/home/ubuntu/mtkclient/mtk.py" # Example for Linux, adjust if necessary
+MTK_OUTPUT_TAIL_LINES = 5000 # Raw output lines kept per operation for the final summary
 
 # --- Placeholders & Constants ---
 class UltimateDeviceTool:
@@ -50,11 +64,20 @@ class MTKTab(ttk.Frame):
         self.preloader_file_var = tk.StringVar()
         self.scatter_file_var = tk.StringVar()
         self.partition_checkbox_vars = {} # Dictionary to store partition checkbox variables
+        self.scatter_table = None # scatter_parser.ScatterTable of the selected scatter file
+        self.gpt_index = None # gpt_index.GptIndex last read from a dump or GPT file
+        self.sparse_backup_var = tk.BooleanVar(value=False) # Store partition dumps as sparse images (.simg)
+        self.compress_backup_var = tk.BooleanVar(value=False) # Store partition dumps compressed (.cdump); wins over sparse
+        self.backup_store_var = tk.BooleanVar(value=False) # Partition backups go into the deduplicated store instead of staying in their folder
+        self._backup_store = None # backup_store.BackupStore, opened on first use
         self.mtk_process = None # To store the running mtkclient process
         self.output_queue = queue.Queue() # Queue for process output
         self.process_running = False # Flag to track if a process is running
+        self.gui_event_queue = queue.Queue() # Log lines / callables posted by background partition jobs, run on the Tk thread
+        self._job_cancel_event = None # Set by cancel_current_operation() while a partition job runs
+        self._job_session = None # MtkSession of the batch the job is running right now
 
-        self.current_operation_log_buffer = [] # Buffer for log messages of the current operation
+        self.current_operation_log_buffer = deque(maxlen=MTK_OUTPUT_TAIL_LINES) # Tail of the current operation's output
         self.detected_device_info = {} # To store detected device information
         self.current_action_name_for_log = "" # Name of the current operation for logging
 
@@ -108,6 +131,12 @@ class MTKTab(ttk.Frame):
         self._create_file_selector(group_files, self.labels.get("label_da_file", "DA File:"), self.da_file_var, width=55, btn_width=btn_width_short)
         self._create_file_selector(group_files, self.labels.get("label_auth_file", "Auth File:"), self.auth_file_var, width=55, btn_width=btn_width_short)
         self._create_file_selector(group_files, self.labels.get("label_preloader_file", "Preloader File:"), self.preloader_file_var, width=55, btn_width=btn_width_short)
+        tk.Checkbutton(group_files, text=self.labels.get("label_sparse_backups", "Save partition backups as sparse images (.simg)"),
+                       variable=self.sparse_backup_var, font=FONT, anchor="w").pack(fill=tk.X)
+        tk.Checkbutton(group_files, text=self.labels.get("label_compress_backups", "Compress partition backups (.cdump, seekable)"),
+                       variable=self.compress_backup_var, font=FONT, anchor="w").pack(fill=tk.X)
+        tk.Checkbutton(group_files, text=self.labels.get("label_backup_store", "Move partition backups into the deduplicated backup store"),
+                       variable=self.backup_store_var, font=FONT, anchor="w").pack(fill=tk.X)
 
         # --- Operations Columns ---
         ops_main_f = tk.Frame(scrollable_frame) # Using tk.Frame
@@ -122,6 +151,7 @@ class MTKTab(ttk.Frame):
         action_groups_col1 = [
             (self.labels.get("group_mtk_dump", "Dump Operations"), [
                 ("btn_mtk_read_full_dump", "Read Full Dump", self.action_mtk_read_full_dump),
+                ("btn_mtk_extract_from_dump", "Extract Partitions from Full Dump (Offline)", self.action_mtk_extract_from_dump),
                 ("btn_mtk_read_userdata", "Read Userdata", self.action_mtk_read_userdata),
                 ("btn_mtk_read_custom_dump", "Read Custom Partition", self.action_mtk_read_custom_dump),
                 ("btn_mtk_auto_boot_repair_dump", "Dump Boot Repair Files", self.action_mtk_auto_boot_repair_dump),
@@ -129,6 +159,7 @@ class MTKTab(ttk.Frame):
             ]),
             (self.labels.get("group_mtk_partitions", "Partition Operations"), [
                 ("btn_mtk_list_partitions", "List Partitions (GPT)", self.action_mtk_list_partitions),
+                ("btn_mtk_load_gpt_from_dump", "Partition Table from Dump File (Offline)", self.action_mtk_load_gpt_from_dump),
                 ("btn_mtk_backup_selected_partitions", "Backup Selected Partitions", self.action_mtk_backup_selected_partitions),
                 ("btn_mtk_backup_security_partitions", "Backup Security Partitions", self.action_mtk_backup_security_partitions),
                 ("btn_mtk_format_selected_partitions", "Format Selected Partitions", self.action_mtk_format_selected_partitions),
@@ -200,34 +231,32 @@ class MTKTab(ttk.Frame):
             self._clear_partition_list()
 
     def _parse_scatter_file(self, fpath):
+        """Loads the scatter file into self.scatter_table and returns its downloadable partitions."""
+        self.scatter_table = None
         parts = []
-        unique_parts = set()
         try:
-            with open(fpath, 'r', encoding='utf-8', errors='ignore') as f: content = f.read()
-            # Improved regex to handle variations and comments
-            matches = re.findall(r"^\s*partition_name:\s*(\w+)(?:.|\n)*?^\s*is_download:\s*true", content, re.IGNORECASE | re.MULTILINE)
-            for name in matches:
-                if name not in unique_parts:
-                    parts.append(name)
-                    unique_parts.add(name)
+            self.scatter_table = load_scatter(fpath)
+            parts = self.scatter_table.downloadable()
         except Exception as e: 
             self._log_gui_event(f"Error parsing Scatter file: {e}", "error")
         if not parts: 
             self._log_gui_event(f"No downloadable partitions found in {os.path.basename(fpath)}", "warning")
         else: 
-            self._log_gui_event(f"Partitions from {os.path.basename(fpath)}: {len(parts)} found", "info")
+            platform_name = self.scatter_table.platform
+            self._log_gui_event(f"Partitions from {os.path.basename(fpath)}: {len(parts)} found" + (f" ({platform_name})" if platform_name else ""), "info")
         return parts
 
     def _update_partition_list(self, scatter_fpath):
         self._clear_partition_list()
-        part_names = self._parse_scatter_file(scatter_fpath)
-        if not part_names: 
+        partitions = self._parse_scatter_file(scatter_fpath)
+        if not partitions: 
             tk.Label(self.partitions_list_frame, text=self.labels.get("no_partitions_found", "No downloadable partitions found."), font=FONT).pack()
         else:
-            for name in part_names:
+            for partition in partitions:
                 var = tk.BooleanVar(value=True)
-                self.partition_checkbox_vars[name] = var
-                tk.Checkbutton(self.partitions_list_frame, text=name, variable=var, font=FONT, anchor="w").pack(fill=tk.X)
+                self.partition_checkbox_vars[partition.name] = var
+                size_text = f", {partition.partition_size / (1024 * 1024):.1f} MB" if partition.partition_size else ""
+                tk.Checkbutton(self.partitions_list_frame, text=f"{partition.name}  ({partition.file_name}{size_text})", variable=var, font=FONT, anchor="w").pack(fill=tk.X)
 
     def _clear_partition_list(self):
         for w in self.partitions_list_frame.winfo_children(): w.destroy()
@@ -266,15 +295,13 @@ class MTKTab(ttk.Frame):
                     return True
         return False
 
-    def _enqueue_output(self, pipe, _tag_unused):
+    def _enqueue_output(self, process):
+        # Shared line-streaming engine: batches of (stream, line) land in output_queue
+        streamer = StreamingOutput(process, on_lines=self.output_queue.put, tail_lines=MTK_OUTPUT_TAIL_LINES)
         try:
-            with pipe:
-                for line_bytes in iter(pipe.readline, b''):
-                    line = line_bytes.decode("utf-8", errors="ignore").strip()
-                    self.output_queue.put(line)
-                    self._parse_mtk_output_for_device_info(line)
+            streamer.run()
         except Exception as e: 
-            self.output_queue.put(f"[[ERROR READING PIPE: {e}]]")
+            self.output_queue.put([("stdout", f"[[ERROR READING PIPE: {e}]]")])
         finally: 
             self.output_queue.put(None) # Signal end of stream
 
@@ -282,14 +309,27 @@ class MTKTab(ttk.Frame):
         stream_closed_count = 0
         try:
             while True: # Drain the queue
-                line = self.output_queue.get_nowait()
-                if line is None: # End of stream signal received
+                batch = self.output_queue.get_nowait()
+                if batch is None: # End of stream signal received
                     stream_closed_count +=1
                     continue
-                self.current_operation_log_buffer.append(line)
+                for _stream, line in batch:
+                    line = line.strip()
+                    self._parse_mtk_output_for_device_info(line)
+                    self.current_operation_log_buffer.append(line)
         except queue.Empty: 
             pass # Queue is empty, no problem
 
+        try:
+            while True: # Log lines and completion callbacks from a background partition job
+                event = self.gui_event_queue.get_nowait()
+                if callable(event):
+                    event()
+                else:
+                    self._log_operation_summary(*event)
+        except queue.Empty:
+            pass
+
         if self.process_running and self.mtk_process:
             # Condition changed to stream_closed_count >= 1 because stderr is merged into stdout
             if stream_closed_count >= 1 or self.mtk_process.poll() is not None: 
@@ -335,7 +375,7 @@ class MTKTab(ttk.Frame):
     def _operation_cleanup(self):
         self.process_running = False
         self.mtk_process = None
-        self.current_operation_log_buffer = []
+        self.current_operation_log_buffer = deque(maxlen=MTK_OUTPUT_TAIL_LINES)
         self.detected_device_info = {}
         if self.master_app.log_panel: self.master_app.log_panel.hide_progress()
         if hasattr(self.master_app, '_update_cancel_button_state'): self.master_app._update_cancel_button_state(enable=False)
@@ -344,7 +384,256 @@ class MTKTab(ttk.Frame):
             try: self.output_queue.get_nowait()
             except queue.Empty: break
 
-    def _run_mtk_command(self, command_args_list, action_name, is_forensic_key_dump=False, forensic_partitions=None):
+    def _mtk_common_options(self):
+        options = []
+        if self.da_file_var.get(): options.extend(["--loader", self.da_file_var.get()])
+        if self.auth_file_var.get(): options.extend(["--auth", self.auth_file_var.get()])
+        if self.preloader_file_var.get(): options.extend(["--preloader", self.preloader_file_var.get()])
+        return options
+
+    def _post_gui_event(self, message, tag="info"):
+        self.gui_event_queue.put((message, tag)) # Logged by _poll_output_queue on the Tk thread
+
+    def _start_partition_job(self, action_name, batches, final_message, had_errors=False, use_store=False):
+        """Runs [(action, [PartitionTask], verb), ...] on a background thread, one mtkclient session per batch.
+
+        Output lines and per-partition results reach the log panel as they happen, the progress bar
+        follows the partitions done, and cancel_current_operation() stops it between or during batches.
+        With use_store and the store option on, the dumps are moved into the backup store at the end.
+        Returns True when the job was started.
+        """
+        parent_window = self.master_app.master if self.master_app and hasattr(self.master_app, 'master') else self
+        if self.process_running:
+            messagebox.showwarning(self.labels.get("mtk_op_in_progress_title", "Operation in Progress"),
+                                   self.labels.get("mtk_op_in_progress_msg", "Another MTK operation is already running."),
+                                   parent=parent_window)
+            return False
+        batches = [batch for batch in batches if batch[1]]
+        if not batches:
+            self._finish_partition_job(action_name, [], False, final_message, had_errors)
+            return False
+        self.process_running = True
+        self._job_cancel_event = threading.Event()
+        if self.master_app.log_panel: self.master_app.log_panel.show_progress()
+        if hasattr(self.master_app, '_update_cancel_button_state'): self.master_app._update_cancel_button_state(enable=True)
+        # Tk variables are read here, on the Tk thread; the worker only gets plain values
+        store_label = action_name if use_store and self.backup_store_var.get() else None
+        threading.Thread(target=self._partition_job_worker, args=(action_name, batches, final_message, had_errors, self._mtk_common_options(),
+                                                                     self.sparse_backup_var.get(), self.compress_backup_var.get(), store_label),
+                         name="MtkPartitionJob", daemon=True).start()
+        return True
+
+    def _partition_job_worker(self, action_name, batches, final_message, had_errors, common_options, sparse_backups=False, compress_backups=False, store_label=None):
+        total = sum(len(tasks) for _action, tasks, _verb in batches)
+        all_results = []
+        read_results = [] # Final dump files, hashed into the folder's manifest at the end
+        scatter_table = self.scatter_table # Dumps are checked against its partition sizes
+        started = datetime.datetime.now().timestamp()
+        device_ids = dict(self.detected_device_info)
+        if store_label: # Raw dumps go into the store, which deduplicates them; no per-file packing
+            sparse_backups = compress_backups = False
+        def _on_line(line):
+            self._post_gui_event(f"    {line}", "raw_output")
+            device_id = parse_device_id_line(line)
+            if device_id:
+                device_ids.setdefault(*device_id)
+        for action, tasks, verb in batches:
+            if self._job_cancel_event.is_set():
+                break
+            self._post_gui_event(f"  {verb}: {', '.join(task.partition for task in tasks)}", "info")
+            session = MtkSession([PYTHON_EXEC, MTKCLIENT_PATH], common_options)
+            self._job_session = session
+            if self._job_cancel_event.is_set(): # Cancelled while the session was being set up
+                session.cancel()
+            done_before = len(all_results)
+            def _on_result(result, done_count, batch_total, verb=verb, done_before=done_before):
+                step = f"[{done_before + done_count}/{total}]"
+                if result["ok"]:
+                    self._post_gui_event(f"  {step} {verb} {result['partition']}: OK", "success")
+                else:
+                    self._post_gui_event(f"  {step} {verb} {result['partition']} failed: {result['message']}", "error")
+                self.gui_event_queue.put(lambda value=int((done_before + done_count) * 100 / total): self._set_job_progress(value))
+            expanded_dir = None
+            try:
+                if action == ACTION_WRITE: # mtkclient writes raw bytes; sparse and compressed images are expanded first
+                    expanded_dir = self._expand_sparse_images(tasks)
+                return_code, results = session.run_batch(action, tasks, on_line=_on_line, on_result=_on_result)
+                if return_code != 0 and not self._job_cancel_event.is_set():
+                    self._post_gui_event(f"  mtkclient exited with code {return_code}.", "warning")
+                if action == ACTION_READ and scatter_table is not None:
+                    results = [self._verify_dump_result(scatter_table, result) for result in results]
+                if action == ACTION_READ and compress_backups:
+                    results = [self._compress_dump_result(result) for result in results]
+                elif action == ACTION_READ and sparse_backups:
+                    results = [self._sparsify_dump_result(result) for result in results]
+                if action == ACTION_READ:
+                    read_results.extend(results)
+            except FileNotFoundError:
+                self._post_gui_event(f"  Error: '{PYTHON_EXEC}' or '{MTKCLIENT_PATH}' not found.", "error")
+                results = [dict(task.result(), ok=False) for task in tasks]
+                all_results.extend(results)
+                break
+            except Exception as e:
+                self._post_gui_event(f"  Exception during {verb.lower()} batch: {e}", "error")
+                results = [dict(task.result(), ok=False) for task in tasks]
+            finally:
+                if expanded_dir:
+                    shutil.rmtree(expanded_dir, ignore_errors=True)
+            all_results.extend(results)
+        self._job_session = None
+        if read_results and not self._job_cancel_event.is_set():
+            if not (store_label and self._move_dumps_to_store(read_results, store_label, device_ids)):
+                self._write_dump_manifests(read_results, device_ids, started)
+        cancelled = self._job_cancel_event.is_set()
+        self.gui_event_queue.put(lambda: self._finish_partition_job(action_name, all_results, cancelled, final_message, had_errors))
+
+    def _get_backup_store(self):
+        if self._backup_store is None:
+            self._backup_store = BackupStore()
+        return self._backup_store
+
+    def _move_dumps_to_store(self, results, label, device_ids):
+        """Adds the successful dumps to the backup store as one backup and deletes them from their folder.
+
+        Returns False (files untouched) when the store can't take them or the job was cancelled.
+        """
+        files = {os.path.abspath(result["path"]): result["partition"] for result in results if result["ok"] and result["path"]}
+        if not files:
+            return False
+        self._post_gui_event(f"  Adding {len(files)} dump(s) to the backup store...", "info")
+        try:
+            manifest = self._get_backup_store().add_backup(files, label=label, device=device_ids, cancel_event=self._job_cancel_event)
+        except (OSError, BackupStoreError, sqlite3.Error) as e:
+            self._post_gui_event(f"  Backup store unavailable, dumps kept in the folder: {e}", "warning")
+            return False
+        if manifest is None: # Cancelled
+            return False
+        for path in files:
+            try:
+                os.remove(path)
+            except OSError as e: # The backup is complete in the store; only the copy in the folder is left behind
+                self._post_gui_event(f"  {os.path.basename(path)} is in the backup store, but the raw file was kept: {e}", "warning")
+        stats = manifest["stats"]
+        self._post_gui_event(f"  Backup store: {manifest['id']} ({len(files)} file(s), {stats['logical_bytes'] / 1e6:.1f} MB, "
+                             f"{stats['stored_bytes'] / 1e6:.1f} MB new in {self._get_backup_store().root})", "success")
+        return True
+
+    def _write_dump_manifests(self, results, device_ids, started):
+        """Hashes the successful dumps (all cores) into a manifest.json per output folder."""
+        by_dir = {}
+        for result in results:
+            if result["ok"] and result["path"]:
+                by_dir.setdefault(os.path.dirname(os.path.abspath(result["path"])), []).append(result)
+        for output_dir, dir_results in by_dir.items():
+            paths = [os.path.abspath(result["path"]) for result in dir_results]
+            self._post_gui_event(f"  Hashing {len(paths)} dump(s) (SHA-256, MD5)...", "info")
+            try:
+                manifest = write_manifest(output_dir, paths, {os.path.abspath(result["path"]): result["partition"] for result in dir_results},
+                                          device=device_ids, started=started, cancel_event=self._job_cancel_event)
+            except OSError as e:
+                self._post_gui_event(f"  Could not write {MANIFEST_NAME} in {output_dir}: {e}", "warning")
+                continue
+            if manifest is not None:
+                self._post_gui_event(f"  Manifest: {os.path.join(output_dir, MANIFEST_NAME)} ({len(manifest['files'])} files)", "info")
+
+    def _expand_sparse_images(self, tasks):
+        """Points write tasks with sparse or compressed images at raw copies in a temp folder. Returns the folder, or None if none were packed."""
+        temp_dir = None
+        for task in tasks:
+            if not task.path:
+                continue
+            if is_sparse_image(task.path):
+                expand, kind = sparse_to_raw, "sparse image"
+            elif is_chunked_dump(task.path):
+                expand, kind = decompress_file, "compressed dump"
+            else:
+                continue
+            if temp_dir is None:
+                temp_dir = tempfile.mkdtemp(prefix="mtk_sparse_")
+            raw_path = os.path.join(temp_dir, f"{task.partition}.bin")
+            self._post_gui_event(f"  Expanding {kind} {os.path.basename(task.path)}...", "info")
+            if expand(task.path, raw_path, cancel_event=self._job_cancel_event) is None:
+                break # Cancelled; the session is cancelled too
+            task.path = raw_path
+        return temp_dir
+
+    def _sparsify_dump_result(self, result):
+        """Replaces a finished raw dump with a sparse image next to it; the raw file stays if conversion fails."""
+        if not result["ok"] or not result["path"]:
+            return result
+        sparse_path = os.path.splitext(result["path"])[0] + SPARSE_EXTENSION
+        try:
+            stats = raw_to_sparse(result["path"], sparse_path, cancel_event=self._job_cancel_event)
+        except OSError as e:
+            self._post_gui_event(f"  {result['partition']}: sparse conversion failed, raw dump kept: {e}", "warning")
+            return result
+        if stats is None: # Cancelled
+            return result
+        os.remove(result["path"])
+        self._post_gui_event(f"  {result['partition']}: sparse image {stats['raw_size'] / 1e6:.1f} MB -> {stats['sparse_size'] / 1e6:.1f} MB", "info")
+        return dict(result, path=sparse_path)
+
+    def _compress_dump_result(self, result):
+        """Replaces a finished raw dump with a chunked compressed dump next to it; the raw file stays if compression fails."""
+        if not result["ok"] or not result["path"]:
+            return result
+        container_path = os.path.splitext(result["path"])[0] + CHUNKED_EXTENSION
+        try:
+            stats = compress_file(result["path"], container_path, cancel_event=self._job_cancel_event)
+        except OSError as e:
+            self._post_gui_event(f"  {result['partition']}: compression failed, raw dump kept: {e}", "warning")
+            return result
+        if stats is None: # Cancelled
+            return result
+        os.remove(result["path"])
+        self._post_gui_event(f"  {result['partition']}: compressed {stats['raw_size'] / 1e6:.1f} MB -> {stats['compressed_size'] / 1e6:.1f} MB", "info")
+        return dict(result, path=container_path)
+
+    def _verify_dump_result(self, scatter_table, result):
+        """Marks a dump as failed when it is shorter than the partition size in the scatter file."""
+        if not result["ok"]:
+            return result
+        size_problem = scatter_table.check_dump_size(result["partition"], result["path"])
+        if not size_problem:
+            return result
+        self._post_gui_event(f"  Verify {result['partition']}: {size_problem}", "error")
+        return dict(result, ok=False, message=size_problem)
+
+    def _set_job_progress(self, value):
+        progress_bar = getattr(self.master_app.log_panel, "progress_bar", None) if self.master_app.log_panel else None
+        if progress_bar is not None and hasattr(progress_bar, "set_value"):
+            progress_bar.set_value(value)
+
+    def _finish_partition_job(self, action_name, results, cancelled, final_message, had_errors):
+        failed = [result["partition"] for result in results if not result["ok"]]
+        if cancelled:
+            self._log_operation_summary(f"{action_name} cancelled ({len(results) - len(failed)} partition(s) completed).", "warning")
+        else:
+            final_status_tag = "success"
+            if failed or had_errors:
+                final_message += " (with some errors)"
+                final_status_tag = "error" if failed else "warning"
+            self._log_operation_summary(final_message, final_status_tag)
+        if failed:
+            self._log_operation_summary(f"  Not completed: {', '.join(failed)}", "error")
+        self.process_running = False
+        self._job_cancel_event = None
+        if self.master_app.log_panel: self.master_app.log_panel.hide_progress()
+        if hasattr(self.master_app, '_update_cancel_button_state'): self.master_app._update_cancel_button_state(enable=False)
+
+    def cancel_current_operation(self):
+        """Stops the running MTK operation: a partition job (between or during its batches) or a single streamed command."""
+        if self._job_cancel_event is not None:
+            self._job_cancel_event.set()
+            session = self._job_session
+            if session is not None:
+                session.cancel()
+            self._log_gui_event("Cancelling MTK operation...", "warning")
+        elif self.process_running and self.mtk_process and self.mtk_process.poll() is None:
+            self.mtk_process.terminate() # _poll_output_queue sees the exit and finalizes the log
+            self._log_gui_event("Cancelling MTK operation...", "warning")
+
+    def _run_mtk_command(self, command_args_list, action_name, is_forensic_key_dump=False, forensic_partitions=None, use_store=False):
         parent_window = self.master_app.master if self.master_app and hasattr(self.master_app, 'master') else self
         if self.process_running:
             messagebox.showwarning(self.labels.get("mtk_op_in_progress_title", "Operation in Progress"), 
@@ -367,7 +656,7 @@ class MTKTab(ttk.Frame):
 
         if self.master_app.log_panel: self.master_app.log_panel.clear_log()
         self.current_action_name_for_log = action_name
-        self.current_operation_log_buffer = []
+        self.current_operation_log_buffer = deque(maxlen=MTK_OUTPUT_TAIL_LINES)
         self.detected_device_info = {}
         self._log_operation_summary(f"Starting: {action_name}", "operation_status")
         self._log_operation_summary("Waiting for MTK Port (Connect device in BROM/Preloader mode)...", "info")
@@ -380,29 +669,9 @@ class MTKTab(ttk.Frame):
                 self._log_gui_event("Key partition dump cancelled: No output folder.", "info")
                 return False
             self._log_gui_event(f"Dumping key partitions to: {output_dir}", "info")
-            success_all = True
-            # Note: These operations are synchronous (block UI)
-            for part_name in forensic_partitions:
-                self._log_gui_event(f"  Dumping: {part_name}", "info")
-                part_cmd_args_specific = ["r", part_name, os.path.join(output_dir, f"{part_name}.bin")]
-                current_full_cmd = list(base_cmd) + part_cmd_args_specific
-                if self.da_file_var.get(): current_full_cmd.extend(["--loader", self.da_file_var.get()])
-                if self.auth_file_var.get(): current_full_cmd.extend(["--auth", self.auth_file_var.get()])
-                if self.preloader_file_var.get(): current_full_cmd.extend(["--preloader", self.preloader_file_var.get()])
-                try:
-                    flags = subprocess.CREATE_NO_WINDOW if platform.system() == "Windows" else 0
-                    process = subprocess.run(current_full_cmd, capture_output=True, text=True, check=False, creationflags=flags, encoding='utf-8', errors='ignore')
-                    if process.stdout: self._log_gui_event(f"    [{part_name} STDOUT] {process.stdout.strip()}", "info")
-                    if process.stderr: self._log_gui_event(f"    [{part_name} STDERR] {process.stderr.strip()}", "warning")
-                    if process.returncode == 0: self._log_gui_event(f"  Successfully dumped {part_name}.", "success")
-                    else: 
-                        self._log_gui_event(f"  Failed to dump {part_name} (Code: {process.returncode}).", "error")
-                        success_all = False
-                except Exception as e: 
-                    self._log_gui_event(f"  Exception dumping {part_name}: {e}", "error")
-                    success_all = False
-            self._log_gui_event("Key partition dump sequence finished.", "success" if success_all else "warning")
-            return success_all
+            # Runs in the background; all partitions are read in one mtkclient session
+            tasks = [PartitionTask(part_name, os.path.join(output_dir, f"{part_name}.bin")) for part_name in forensic_partitions]
+            return self._start_partition_job(action_name, [(ACTION_READ, tasks, "Dump")], "Key partition dump sequence finished.", use_store=use_store)
 
         full_cmd = list(base_cmd) + command_args_list
         if self.da_file_var.get(): full_cmd.extend(["--loader", self.da_file_var.get()])
@@ -414,9 +683,9 @@ class MTKTab(ttk.Frame):
 
         try:
             flags = subprocess.CREATE_NO_WINDOW if platform.system() == "Windows" else 0
-            self.mtk_process = subprocess.Popen(full_cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, bufsize=1, universal_newlines=False, creationflags=flags)
+            self.mtk_process = subprocess.Popen(full_cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, encoding='utf-8', errors='ignore', creationflags=flags)
             self.process_running = True
-            threading.Thread(target=self._enqueue_output, args=(self.mtk_process.stdout, "merged_output"), daemon=True).start()
+            threading.Thread(target=self._enqueue_output, args=(self.mtk_process,), daemon=True).start()
             if self.master_app.log_panel: self.master_app.log_panel.show_progress()
             if hasattr(self.master_app, '_update_cancel_button_state'): self.master_app._update_cancel_button_state(enable=True)
             return True
@@ -454,8 +723,14 @@ class MTKTab(ttk.Frame):
             messagebox.showwarning("Warning", "No partitions selected to flash.", parent=parent_window)
             return
 
-        # Confirm before starting the potentially long, UI-blocking flash operation
-        confirm_msg = self.labels.get("mtk_confirm_action_msg_flash_selected", "Are you sure you want to flash the selected {count} partition(s)?\nThis operation will block the UI until completed.").format(count=len(selected_partitions))
+        if self.process_running:
+            messagebox.showwarning(self.labels.get("mtk_op_in_progress_title", "Operation in Progress"),
+                                   self.labels.get("mtk_op_in_progress_msg", "Another MTK operation is already running."),
+                                   parent=parent_window)
+            return
+
+        # Confirm before starting the potentially long flash operation
+        confirm_msg = self.labels.get("mtk_confirm_action_msg_flash_selected", "Are you sure you want to flash the selected {count} partition(s)?").format(count=len(selected_partitions))
         confirm_msg += "\n\n" + self.labels.get("mtk_warning_erase", "WARNING: This will write data to the device and may erase existing data!")
         if not messagebox.askokcancel(self.labels.get("mtk_confirm_action_title", "Confirm Action"), confirm_msg, icon=messagebox.WARNING, parent=parent_window):
             self._log_gui_event(f"Action '{action_name}' cancelled by user.", "info")
@@ -464,18 +739,13 @@ class MTKTab(ttk.Frame):
         if self.master_app.log_panel: self.master_app.log_panel.clear_log()
         self.current_action_name_for_log = action_name # Set operation name for logging
         self._log_operation_summary(f"Starting: {action_name} for partitions: {', '.join(selected_partitions)}", "operation_status")
-        self._log_operation_summary("Note: This operation will block the UI until all selected partitions are flashed.", "info")
-        if self.master_app.log_panel: self.master_app.log_panel.show_progress()
-
+        self._log_operation_summary("Running in the background. Cancel stops it between or during partitions.", "info")
 
-        scatter_dir = os.path.dirname(scatter_path)
-        base_cmd_prefix = [PYTHON_EXEC, MTKCLIENT_PATH]
-        common_opts = []
-        if self.da_file_var.get(): common_opts.extend(["--loader", self.da_file_var.get()])
-        if self.auth_file_var.get(): common_opts.extend(["--auth", self.auth_file_var.get()])
-        # Do not add --preloader here generally for 'w' command, mtkclient will handle if needed
-
-        success_all = True
+        try:
+            scatter_table = load_scatter(scatter_path) # Cached; re-read only if the file changed since it was browsed
+        except Exception as e:
+            self._log_gui_event(f"Error parsing Scatter file: {e}", "error")
+            return
         any_errors = False
 
         # Order flashing preloader first if selected
@@ -484,69 +754,23 @@ class MTKTab(ttk.Frame):
         else:
             partitions_to_flash_ordered = selected_partitions
 
+        tasks = []
         for part_name in partitions_to_flash_ordered:
-            self._log_gui_event(f"  Attempting to flash partition: {part_name}", "info")
-            
-            # Find partition image file (with common extensions)
-            image_file_path = None
-            possible_extensions = [".img", ".bin", ""] # Empty extension for files without extension
-            for ext in possible_extensions:
-                temp_path = os.path.join(scatter_dir, f"{part_name}{ext}")
-                if os.path.exists(temp_path):
-                    image_file_path = temp_path
-                    break
-            
-            if not image_file_path:
-                self._log_gui_event(f"    Image file for partition '{part_name}' not found in Scatter directory. Skipped.", "warning")
-                success_all = False # Consider it a partial failure
-                any_errors = True
+            image_file_path = scatter_table.image_path(part_name) # file_name from the scatter, next to the scatter file
+            if not image_file_path or not os.path.exists(image_file_path):
+                self._log_gui_event(f"    Image file for partition '{part_name}' ({os.path.basename(image_file_path or '') or 'none in scatter'}) not found in Scatter directory. Skipped.", "warning")
+                any_errors = True # Consider it a partial failure
                 continue
-
-            cmd_args_specific = ["w", part_name, image_file_path]
-            current_full_cmd = base_cmd_prefix + cmd_args_specific + common_opts
-            self._log_gui_event(f"    Executing: {' '.join(current_full_cmd)}", "debug")
-
-            try:
-                flags = subprocess.CREATE_NO_WINDOW if platform.system() == "Windows" else 0
-                # Synchronous operation (blocks UI)
-                process = subprocess.run(current_full_cmd, capture_output=True, text=True, check=False, creationflags=flags, encoding='utf-8', errors='ignore')
-                
-                # Log process output directly
-                if process.stdout:
-                    for line in process.stdout.strip().split('\n'):
-                        self._log_operation_summary(f"    [{part_name} STDOUT] {line}", "raw_output")
-                if process.stderr:
-                    for line in process.stderr.strip().split('\n'):
-                         self._log_operation_summary(f"    [{part_name} STDERR] {line}", "raw_output") # Could be actual errors
-
-                if process.returncode == 0:
-                    self._log_operation_summary(f"  Successfully flashed {part_name}.", "success")
-                else:
-                    self._log_operation_summary(f"  Failed to flash {part_name} (Code: {process.returncode}).", "error")
-                    success_all = False
-                    any_errors = True
-            except FileNotFoundError:
-                self._log_operation_summary(f"  Error: '{PYTHON_EXEC}' or '{MTKCLIENT_PATH}' not found.", "error")
-                success_all = False; any_errors = True; break # Stop operation if essential files not found
-            except Exception as e:
-                self._log_operation_summary(f"  Exception while flashing {part_name}: {e}", "error")
-                success_all = False
+            size_problem = scatter_table.check_image_size(part_name, image_file_path)
+            if size_problem:
+                self._log_gui_event(f"    {part_name}: {size_problem}. Skipped.", "error")
                 any_errors = True
-        
-        final_status_msg = "Flashing sequence completed."
-        final_status_tag = "success"
-        if not success_all:
-            final_status_msg += " (with some errors)"
-            final_status_tag = "warning"
-        if any_errors and not success_all: # If there was a complete failure
-             final_status_tag = "error"
-
+                continue
+            tasks.append(PartitionTask(part_name, image_file_path))
 
-        self._log_operation_summary(final_status_msg, final_status_tag)
-        if self.master_app.log_panel: self.master_app.log_panel.hide_progress()
-        # No _operation_cleanup here as it's not an asynchronous _run_mtk_command operation
-        # self.process_running should be reset if set elsewhere for this operation
-        # But since we're not using _run_mtk_command, no need to worry about self.process_running
+        # One write batch, in order (preloader first): one mtkclient session for the whole flash.
+        # --preloader is not passed for 'w', mtkclient handles it if needed.
+        self._start_partition_job(action_name, [(ACTION_WRITE, tasks, "Flash")], "Flashing sequence completed.", had_errors=any_errors)
 
     def action_mtk_read_full_dump(self):
         action_name = self.labels.get("btn_mtk_read_full_dump", "Read Full Dump")
@@ -558,6 +782,63 @@ class MTKTab(ttk.Frame):
         cmd_args = ["rf", output_file]
         self._run_mtk_command(cmd_args, action_name)
 
+    def action_mtk_extract_from_dump(self):
+        """Copies partitions out of an existing full dump using its GPT, instead of reading them from the device again."""
+        action_name = self.labels.get("btn_mtk_extract_from_dump", "Extract Partitions from Full Dump")
+        parent_window = self.master_app.master if self.master_app and hasattr(self.master_app, 'master') else self
+        if self.process_running:
+            messagebox.showwarning(self.labels.get("mtk_op_in_progress_title", "Operation in Progress"),
+                                   self.labels.get("mtk_op_in_progress_msg", "Another MTK operation is already running."),
+                                   parent=parent_window)
+            return
+        dump_file = filedialog.askopenfilename(title=self.labels.get("mtk_select_full_dump_file", "Select Full Dump File"),
+                                               filetypes=[("Dump files", "*.bin *.img *.cdump"), ("All files", "*.*")], parent=parent_window)
+        if not dump_file:
+            self._log_gui_event("Extract from dump cancelled.", "info")
+            return
+        if self.master_app.log_panel: self.master_app.log_panel.clear_log()
+        self._log_operation_summary(f"Starting: {action_name}", "operation_status")
+        self._log_gui_event(f"  Dump: {dump_file}", "info")
+        try:
+            index = read_gpt(dump_file)
+        except (GptError, OSError) as e:
+            self._log_gui_event(f"  Cannot read the dump's partition table: {e}", "error")
+            return
+        self._show_gpt_index(index)
+        selected = [name for name, var in self.partition_checkbox_vars.items() if var.get() and index.get(name)] # Scatter selection, if it matches the dump
+        partitions_text = simpledialog.askstring("Input", self.labels.get("mtk_extract_partitions_prompt", "Enter partition names to extract (comma-separated):"),
+                                                 initialvalue=", ".join(selected), parent=parent_window)
+        partitions = [name.strip() for name in (partitions_text or "").split(",") if name.strip()]
+        if not partitions:
+            self._log_gui_event("Extract from dump cancelled: No partitions entered.", "info")
+            return
+        output_dir = filedialog.askdirectory(title="Select Folder to Save Extracted Partitions", parent=parent_window)
+        if not output_dir:
+            self._log_gui_event("Extract from dump cancelled: No output folder.", "info")
+            return
+        self.process_running = True
+        self._job_cancel_event = threading.Event() # cancel_current_operation() stops the copy between chunks
+        if self.master_app.log_panel: self.master_app.log_panel.show_progress()
+        if hasattr(self.master_app, '_update_cancel_button_state'): self.master_app._update_cancel_button_state(enable=True)
+        threading.Thread(target=self._extract_job_worker, args=(action_name, dump_file, index, partitions, output_dir, self._job_cancel_event),
+                         name="MtkDumpExtract", daemon=True).start()
+
+    def _extract_job_worker(self, action_name, dump_file, index, partitions, output_dir, cancel_event):
+        def _progress(name, done, total):
+            self.gui_event_queue.put(lambda value=int(done * 100 / total) if total else 100: self._set_job_progress(value))
+        try:
+            results = extract_partitions(dump_file, partitions, output_dir, gpt=index, progress_callback=_progress, cancel_event=cancel_event)
+        except Exception as e:
+            self._post_gui_event(f"  Exception during extraction: {e}", "error")
+            results = [{"partition": name, "ok": False, "message": str(e)} for name in partitions]
+        for result in results:
+            if result["ok"]:
+                self._post_gui_event(f"  {result['partition']}: {format_size(result['size'])} -> {result['path']} ({result['seconds']:.2f}s)", "success")
+            else:
+                self._post_gui_event(f"  {result['partition']}: {result['message']}", "error")
+        cancelled = cancel_event.is_set()
+        self.gui_event_queue.put(lambda: self._finish_partition_job(action_name, results, cancelled, f"Partitions extracted to {output_dir}.", False))
+
     def action_mtk_read_userdata(self):
         action_name = self.labels.get("btn_mtk_read_userdata", "Read Userdata")
         parent_window = self.master_app.master if self.master_app and hasattr(self.master_app, 'master') else self
@@ -565,8 +846,15 @@ class MTKTab(ttk.Frame):
         if not output_file: 
             self._log_gui_event("Read Userdata cancelled.", "info")
             return
-        cmd_args = ["r", "userdata", output_file]
-        self._run_mtk_command(cmd_args, action_name)
+        if self.process_running:
+            messagebox.showwarning(self.labels.get("mtk_op_in_progress_title", "Operation in Progress"),
+                                   self.labels.get("mtk_op_in_progress_msg", "Another MTK operation is already running."),
+                                   parent=parent_window)
+            return
+        if self.master_app.log_panel: self.master_app.log_panel.clear_log()
+        self._log_operation_summary(f"Starting: {action_name}", "operation_status")
+        # A partition job, so the dump is size-checked and optionally stored as a sparse image
+        self._start_partition_job(action_name, [(ACTION_READ, [PartitionTask("userdata", output_file)], "Dump")], "Userdata dump finished.")
 
     def action_mtk_read_custom_dump(self):
         action_name = self.labels.get("btn_mtk_read_custom_dump", "Read Custom Partition")
@@ -586,7 +874,7 @@ class MTKTab(ttk.Frame):
         action_name = self.labels.get("btn_mtk_auto_boot_repair_dump", "Dump Boot Repair Files")
         boot_partitions = ["preloader", "lk", "lk2", "boot", "recovery", "tee1", "tee2", "scp1", "scp2", "sspm_1", "sspm_2", "md1img", "md3img", "spmfw", "mcupmfw", "gz1", "gz2"]
         self._log_gui_event(f"Attempting to dump common boot-related partitions: {', '.join(boot_partitions)}", "info")
-        # Note: This operation is synchronous (blocks UI) due to is_forensic_key_dump
+        # Runs as a background partition job (is_forensic_key_dump)
         self._run_mtk_command([], action_name, is_forensic_key_dump=True, forensic_partitions=boot_partitions)
 
     def action_mtk_write_dump(self):
@@ -608,6 +896,32 @@ class MTKTab(ttk.Frame):
         cmd_args = ["printgpt"]
         self._run_mtk_command(cmd_args, action_name)
 
+    def action_mtk_load_gpt_from_dump(self):
+        """Reads the partition table from a full dump, pgpt.bin/sgpt.bin or a saved GPT file, without the device."""
+        parent_window = self.master_app.master if self.master_app and hasattr(self.master_app, 'master') else self
+        source_file = filedialog.askopenfilename(title=self.labels.get("mtk_select_gpt_source_file", "Select Dump or GPT File"),
+                                                 filetypes=[("Binary files", "*.bin *.img"), ("All files", "*.*")], parent=parent_window)
+        if not source_file:
+            self._log_gui_event("Partition table read cancelled.", "info")
+            return
+        if self.master_app.log_panel: self.master_app.log_panel.clear_log()
+        self._log_operation_summary(f"Reading partition table from: {source_file}", "operation_status")
+        try:
+            self._show_gpt_index(read_gpt(source_file)) # Only the GPT sectors are read, even from a full dump
+        except (GptError, OSError) as e:
+            self._log_gui_event(f"  Cannot read the partition table: {e}", "error")
+
+    def _show_gpt_index(self, index):
+        """Logs the partitions of a GptIndex with their byte ranges and keeps it for later partition prompts."""
+        self.gpt_index = index
+        self._log_operation_summary(f"Partitions list retrieved ({len(index.partitions)} partitions, {index.sector_size}-byte sectors, {index.source} GPT):", "success")
+        for problem in index.problems:
+            self._log_gui_event(f"  GPT warning: {problem}", "warning")
+        for partition in index.partitions:
+            self._log_gui_event(f"  - {partition.name}: 0x{partition.start:X} - 0x{partition.end:X} ({format_size(partition.size)})", "info")
+        if not index.partitions:
+            self._log_gui_event("  The GPT lists no partitions.", "warning")
+
     def action_mtk_backup_selected_partitions(self):
         action_name = self.labels.get("btn_mtk_backup_selected_partitions", "Backup Selected Partitions")
         parent_window = self.master_app.master if self.master_app and hasattr(self.master_app, 'master') else self
@@ -617,18 +931,18 @@ class MTKTab(ttk.Frame):
             messagebox.showwarning("Warning", "No partitions selected for backup.", parent=parent_window)
             return
         self._log_gui_event(f"Attempting to backup selected partitions: {', '.join(selected_partitions)}", "info")
-        # Note: This operation is synchronous (blocks UI) due to is_forensic_key_dump
-        self._run_mtk_command([], action_name, is_forensic_key_dump=True, forensic_partitions=selected_partitions)
+        # Runs as a background partition job (is_forensic_key_dump); the dumps may go into the backup store
+        self._run_mtk_command([], action_name, is_forensic_key_dump=True, forensic_partitions=selected_partitions, use_store=True)
 
     def action_mtk_backup_security_partitions(self):
         action_name = self.labels.get("btn_mtk_backup_security_partitions", "Backup Security Partitions")
         security_partitions = ["proinfo", "nvram", "nvdata", "protect1", "protect2", "seccfg", "otp", "persist", "frp", "efuse"]
         self._log_gui_event(f"Attempting to backup common security partitions: {', '.join(security_partitions)}", "info")
-        # Note: This operation is synchronous (blocks UI) due to is_forensic_key_dump
-        self._run_mtk_command([], action_name, is_forensic_key_dump=True, forensic_partitions=security_partitions)
+        # Runs as a background partition job (is_forensic_key_dump); the dumps may go into the backup store
+        self._run_mtk_command([], action_name, is_forensic_key_dump=True, forensic_partitions=security_partitions, use_store=True)
 
-    def _perform_sync_partition_operations(self, action_name_key, action_verb_log, command_prefix_list, partitions_list, extra_confirm_msg_key=None):
-        """ Helper function to perform synchronous operations on multiple partitions (e.g., format, restore, erase) """
+    def _perform_partition_operations(self, action_name_key, action_verb_log, command_prefix_list, partitions_list, extra_confirm_msg_key=None):
+        """ Helper function to run an operation on multiple partitions (e.g., format, restore, erase) as a background job """
         action_name = self.labels.get(action_name_key, action_verb_log) # Default to action_verb_log if key not found
         parent_window = self.master_app.master if self.master_app and hasattr(self.master_app, 'master') else self
 
@@ -636,6 +950,11 @@ class MTKTab(ttk.Frame):
             self._log_gui_event(f"No partitions to perform '{action_name}'.", "warning")
             messagebox.showwarning("Warning", f"No partitions to perform '{action_name}'.", parent=parent_window)
             return
+        if self.process_running:
+            messagebox.showwarning(self.labels.get("mtk_op_in_progress_title", "Operation in Progress"),
+                                   self.labels.get("mtk_op_in_progress_msg", "Another MTK operation is already running."),
+                                   parent=parent_window)
+            return
 
         confirm_msg = self.labels.get("mtk_confirm_action_msg_generic_multi", "Are you sure you want to {action} the following {count} partition(s):\n{partitions_str}?").format(
             action=action_verb_log.lower(), 
@@ -651,83 +970,44 @@ class MTKTab(ttk.Frame):
 
         if self.master_app.log_panel: self.master_app.log_panel.clear_log()
         self._log_operation_summary(f"Starting: {action_name} on {', '.join(partitions_list)}", "operation_status")
-        self._log_operation_summary("Note: This operation will block the UI until completed.", "info")
-        if self.master_app.log_panel: self.master_app.log_panel.show_progress()
+        self._log_operation_summary("Running in the background. Cancel stops it between or during partitions.", "info")
 
-        base_cmd_prefix_exec = [PYTHON_EXEC, MTKCLIENT_PATH]
-        common_opts = []
-        if self.da_file_var.get(): common_opts.extend(["--loader", self.da_file_var.get()])
-        if self.auth_file_var.get(): common_opts.extend(["--auth", self.auth_file_var.get()])
-        if self.preloader_file_var.get(): common_opts.extend(["--preloader", self.preloader_file_var.get()])
-        
-        success_all = True
         any_errors = False
 
+        batch_action = command_prefix_list[0] # 'e' (erase) or 'w' (write)
+        tasks = []
         for part_name in partitions_list:
-            self._log_gui_event(f"  {action_verb_log} partition: {part_name}", "info")
-            
-            # Build command arguments specific to the partition
-            current_cmd_args = list(command_prefix_list) # Copy the list
-            if "{partition_name}" in current_cmd_args: # Replace placeholder if exists
-                current_cmd_args = [arg.replace("{partition_name}", part_name) for arg in current_cmd_args]
-            else: # Otherwise, assume partition name is the next argument
-                current_cmd_args.append(part_name)
-
-            # If operation is write (restore), we need the file path
-            if action_verb_log == "Restore": # Or any other indicator for write operation
-                input_dir = getattr(self, "_current_input_dir_for_restore", None) # Must be set before calling function
-                if not input_dir:
-                    self._log_operation_summary(f"  Error: Input directory for restore not set. Skipped.", "error")
-                    success_all = False; any_errors = True; continue
-                
-                backup_file = os.path.join(input_dir, f"{part_name}.bin")
-                if not os.path.exists(backup_file):
-                    backup_file = os.path.join(input_dir, f"{part_name}.img") # Try .img
-                    if not os.path.exists(backup_file):
-                        self._log_operation_summary(f"  Skipping {part_name}: Backup file (.bin or .img) not found in {input_dir}.", "warning")
-                        any_errors = True; continue # Not necessarily a complete failure
-                
-                # Add file path to command arguments (usually after partition name)
-                # Assumes command_prefix_list is something like ['w']
-                current_cmd_args.append(backup_file)
-                self._log_gui_event(f"    Restoring from: {os.path.basename(backup_file)}", "info")
-
-
-            full_cmd = base_cmd_prefix_exec + current_cmd_args + common_opts
-            self._log_gui_event(f"    Executing: {' '.join(full_cmd)}", "debug")
-
-            try:
-                flags = subprocess.CREATE_NO_WINDOW if platform.system() == "Windows" else 0
-                process = subprocess.run(full_cmd, capture_output=True, text=True, check=False, creationflags=flags, encoding='utf-8', errors='ignore')
-                if process.stdout:
-                    for line in process.stdout.strip().split('\n'): self._log_operation_summary(f"    [{part_name} STDOUT] {line}", "raw_output")
-                if process.stderr:
-                    for line in process.stderr.strip().split('\n'): self._log_operation_summary(f"    [{part_name} STDERR] {line}", "raw_output")
-                
-                if process.returncode == 0:
-                    self._log_operation_summary(f"  Successfully {action_verb_log.lower()}ed {part_name}.", "success")
-                else:
-                    self._log_operation_summary(f"  Failed to {action_verb_log.lower()} {part_name} (Code: {process.returncode}).", "error")
-                    success_all = False; any_errors = True
-            except FileNotFoundError:
-                self._log_operation_summary(f"  Error: '{PYTHON_EXEC}' or '{MTKCLIENT_PATH}' not found.", "error")
-                success_all = False; any_errors = True; break 
-            except Exception as e:
-                self._log_operation_summary(f"  Exception while {action_verb_log.lower()}ing {part_name}: {e}", "error")
-                success_all = False; any_errors = True
-        
-        final_status_msg = f"{action_verb_log} sequence completed."
-        final_status_tag = "success"
-        if not success_all: final_status_msg += " (with some errors)"; final_status_tag = "warning"
-        if any_errors and not success_all : final_status_tag = "error"
-
-        self._log_operation_summary(final_status_msg, final_status_tag)
-        if self.master_app.log_panel: self.master_app.log_panel.hide_progress()
+            if batch_action != ACTION_WRITE:
+                tasks.append(PartitionTask(part_name))
+                continue
+            input_dir = getattr(self, "_current_input_dir_for_restore", None) # Must be set before calling function
+            if not input_dir:
+                self._log_operation_summary(f"  Error: Input directory for restore not set. Skipped {part_name}.", "error")
+                any_errors = True; continue
+
+            candidates = [f"{part_name}.bin", f"{part_name}{SPARSE_EXTENSION}", f"{part_name}{CHUNKED_EXTENSION}"] # Names written by the backup actions
+            scatter_partition = self.scatter_table.get(part_name) if self.scatter_table else None
+            if scatter_partition is not None and scatter_partition.file_name:
+                candidates.append(scatter_partition.file_name) # Image name from the scatter file
+            backup_file = next((os.path.join(input_dir, name) for name in candidates if os.path.exists(os.path.join(input_dir, name))), None)
+            if not backup_file:
+                self._log_operation_summary(f"  Skipping {part_name}: Backup file ({' or '.join(candidates)}) not found in {input_dir}.", "warning")
+                any_errors = True; continue # Not necessarily a complete failure
+            size_problem = self.scatter_table.check_image_size(part_name, backup_file) if self.scatter_table else None
+            if size_problem:
+                self._log_operation_summary(f"  Skipping {part_name}: {size_problem}.", "error")
+                any_errors = True; continue
+            self._log_gui_event(f"    Restoring {part_name} from: {os.path.basename(backup_file)}", "info")
+            tasks.append(PartitionTask(part_name, backup_file))
+
+        # All partitions go through one mtkclient session on a background thread
+        self._start_partition_job(action_name, [(batch_action, tasks, action_verb_log)], f"{action_verb_log} sequence completed.",
+                                  had_errors=any_errors)
 
 
     def action_mtk_format_selected_partitions(self):
         selected_partitions = [name for name, var in self.partition_checkbox_vars.items() if var.get()]
-        self._perform_sync_partition_operations(
+        self._perform_partition_operations(
             action_name_key="btn_mtk_format_selected_partitions",
             action_verb_log="Format",
             command_prefix_list=["e"], # mtkclient command for format is 'e'
@@ -750,7 +1030,7 @@ class MTKTab(ttk.Frame):
         
         self._current_input_dir_for_restore = input_dir # Store for use in helper function
 
-        self._perform_sync_partition_operations(
+        self._perform_partition_operations(
             action_name_key="btn_mtk_restore_selected_partitions",
             action_verb_log="Restore",
             command_prefix_list=["w"], # mtkclient command for write is 'w'
@@ -762,7 +1042,7 @@ class MTKTab(ttk.Frame):
 
     def action_mtk_reset_nv_data(self):
         nv_partitions = ["nvram", "nvdata"]
-        self._perform_sync_partition_operations(
+        self._perform_partition_operations(
             action_name_key="btn_mtk_reset_nv_data",
             action_verb_log="Reset (Erase)",
             command_prefix_list=["e"], # Erase is 'e'
@@ -804,7 +1084,7 @@ class MTKTab(ttk.Frame):
 
     def action_mtk_wipe_data(self):
         partitions_to_wipe = ["userdata", "metadata"] # May need to add cache as well
-        self._perform_sync_partition_operations(
+        self._perform_partition_operations(
             action_name_key="btn_mtk_wipe_data",
             action_verb_log="Wipe",
             command_prefix_list=["e"],
@@ -881,6 +1161,9 @@ if __name__ == '__main__':
             self.labels = {
                 "group_mtk_firmware_flash": "Firmware Flashing",
                 "label_scatter_file": "Scatter File:",
+                "label_sparse_backups": "Save partition backups as sparse images (.simg)",
+                "label_compress_backups": "Compress partition backups (.cdump, seekable)",
+                "label_backup_store": "Move partition backups into the deduplicated backup store",
                 "btn_browse": "Browse...",
                 "label_partitions_to_flash": "Partitions to Flash:",
                 "btn_select_all": "All",
@@ -892,12 +1175,17 @@ if __name__ == '__main__':
                 "label_preloader_file": "Preloader File:",
                 "group_mtk_dump": "Dump Operations",
                 "btn_mtk_read_full_dump": "Read Full Dump",
+                "btn_mtk_extract_from_dump": "Extract Partitions from Full Dump (Offline)",
+                "mtk_select_full_dump_file": "Select Full Dump File",
+                "mtk_extract_partitions_prompt": "Enter partition names to extract (comma-separated):",
                 "btn_mtk_read_userdata": "Read Userdata",
                 "btn_mtk_read_custom_dump": "Read Custom Partition",
                 "btn_mtk_auto_boot_repair_dump": "Dump Boot Repair Files",
                 "btn_mtk_write_dump": "Write Partition",
                 "group_mtk_partitions": "Partition Operations",
                 "btn_mtk_list_partitions": "List Partitions (GPT)",
+                "btn_mtk_load_gpt_from_dump": "Partition Table from Dump File (Offline)",
+                "mtk_select_gpt_source_file": "Select Full Dump, pgpt.bin or GPT File",
                 "btn_mtk_backup_selected_partitions": "Backup Selected Partitions",
                 "btn_mtk_backup_security_partitions": "Backup Security Partitions",
                 "btn_mtk_format_selected_partitions": "Format Selected Partitions",
@@ -926,7 +1214,7 @@ if __name__ == '__main__':
                 "mtk_confirm_action_title": "Confirm Action",
                 "mtk_confirm_action_msg": "Are you sure you want to perform: {action_name}?",
                 "mtk_confirm_action_msg_flash": "Are you sure you want to flash: {action_name}? This will write to the device!",
-                "mtk_confirm_action_msg_flash_selected": "Are you sure you want to flash the selected {count} partition(s)?\nThis operation will block the UI until completed.",
+                "mtk_confirm_action_msg_flash_selected": "Are you sure you want to flash the selected {count} partition(s)?",
                 "mtk_warning_hw_dump": "WARNING: This is an advanced operation. It might read sensitive data or fail depending on device security. Proceed with caution.",
                 "mtk_warning_erase": "WARNING: This will erase data and cannot be undone!",
                 "mtk_warning_erase_all_data": "WARNING: This will erase all user data and metadata and cannot be undone!",
@@ -938,11 +1226,19 @@ if __name__ == '__main__':
             self.after = master_window.after # Using the main window's after function
 
         def _update_cancel_button_state(self, enable):
-            print(f"Cancel button state: {enable}")
+            self.cancel_button.config(state=tk.NORMAL if enable else tk.DISABLED)
+
+        def cancel_op(self):
+            if self.mtk_tab:
+                self.mtk_tab.cancel_current_operation()
 
     app = DummyMasterApp(root)
+    app.mtk_tab = None
+    app.cancel_button = tk.Button(root, text="Cancel Operation", state=tk.DISABLED, command=app.cancel_op)
+    app.cancel_button.pack(side=tk.BOTTOM, pady=5)
     notebook = ttk.Notebook(root)
     mtk_tab = MTKTab(notebook, app) # Pass app as master_app
+    app.mtk_tab = mtk_tab # The cancel button stops the tab's running operation
     notebook.add(mtk_tab, text='MTK')
     notebook.pack(expand=True, fill='both')
 
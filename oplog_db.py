@@ -0,0 +1,945 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Operation log database (operation_log.db) shared by the GUI scripts.
+
+Run it directly for incremental-vacuum and retention checks and a write-throughput benchmark:  python oplog_db.py [lines]
+"""
+
+import os
+import csv
+import sys
+import glob
+import gzip
+import json
+import time
+import queue
+import shutil
+import socket
+import sqlite3
+import tempfile
+import threading
+import traceback # For detailed error logging
+from datetime import datetime
+from pathlib import Path # For path operations
+
+from debug_log import log_to_file_debug_globally # Queued, rotating debug log shared by every module
+
+DB_BATCH_SIZE = 500        # Rows written per executemany/commit at most
+DB_FLUSH_INTERVAL = 0.25   # Seconds a queued row waits at most before it is committed
+DB_CLOSE_TIMEOUT = 10.0    # Seconds close() waits for the writer to drain the queue
+DB_READ_FLUSH_TIMEOUT = 0.05 # Seconds a GUI read waits for queued rows; after that it shows what is committed
+
+# Retention: rows older than LOG_RETENTION_DAYS, or beyond the newest LOG_RETENTION_MAX_ROWS, are moved
+# to gzipped per-month JSONL files in operation_log_archive/ next to the database (0 disables a limit).
+# Operations no kept log row points at, and sessions left without operations, follow them out.
+LOG_RETENTION_DAYS = int(os.environ.get("ULTIMATE_LOG_RETENTION_DAYS", "90"))
+LOG_RETENTION_MAX_ROWS = int(os.environ.get("ULTIMATE_LOG_RETENTION_ROWS", "2000000"))
+RETENTION_CHUNK_ROWS = 5000        # Rows archived and deleted per writer transaction
+RETENTION_INTERVAL = 6 * 3600      # Seconds between retention passes while the app runs
+INCREMENTAL_VACUUM_PAGES = 2000    # Free pages handed back to the file system after each chunk
+ARCHIVE_DIR_NAME = "operation_log_archive"
+_ARCHIVE_LOG_COLUMNS = ("id", "timestamp", "tag", "message", "operation_id")
+
+_MEMORY_DB_URI = "file:operation_log_memdb?mode=memory&cache=shared" # ":memory:" shared by the writer and reader connections
+
+SEARCH_LIMIT = 1000
+SEARCH_ORDER_RECENT = "recent" # Newest first
+SEARCH_ORDER_RANK = "rank"     # Best FTS5 match first (falls back to newest first without FTS5)
+
+# External-content FTS5 index over logs.message; the triggers keep it in step with inserts and deletes
+_FTS_TRIGGERS = {
+    "logs_fts_ai": "CREATE TRIGGER logs_fts_ai AFTER INSERT ON logs BEGIN "
+                   "INSERT INTO logs_fts(rowid, message) VALUES (new.id, new.message); END",
+    "logs_fts_ad": "CREATE TRIGGER logs_fts_ad AFTER DELETE ON logs BEGIN "
+                   "INSERT INTO logs_fts(logs_fts, rowid, message) VALUES ('delete', old.id, old.message); END",
+}
+
+
+LOG_PAGE_ROWS = 2000 # Rows per keyset page for exports and the log history viewer
+EXPORT_FORMAT_CSV = "csv"
+EXPORT_FORMAT_JSONL = "jsonl"
+EXPORT_COLUMNS = ("id", "timestamp", "tag", "message", "operation_id", "operation_name", "device_serial", "model")
+
+OP_STATUS_RUNNING = "running"
+OP_STATUS_OK = "ok"
+OP_STATUS_FAILED = "failed"       # Ran, non-zero return code
+OP_STATUS_CANCELLED = "cancelled"
+OP_STATUS_TIMEOUT = "timeout"
+OP_STATUS_ERROR = "error"         # Could not run (tool missing, exception)
+OP_STATUS_INTERRUPTED = "interrupted" # Still running when the app closed
+
+_SCHEMA_SQL = (
+    '''CREATE TABLE IF NOT EXISTS sessions
+       (id INTEGER PRIMARY KEY AUTOINCREMENT,
+        started_at TEXT,
+        ended_at TEXT,
+        host TEXT,
+        pid INTEGER,
+        script TEXT)''',
+    '''CREATE TABLE IF NOT EXISTS operations
+       (id INTEGER PRIMARY KEY AUTOINCREMENT,
+        session_id INTEGER REFERENCES sessions(id),
+        name TEXT,
+        command TEXT,
+        device_serial TEXT,
+        mode TEXT,
+        model TEXT,
+        started_at TEXT,
+        ended_at TEXT,
+        duration_ms INTEGER,
+        return_code INTEGER,
+        status TEXT,
+        error TEXT,
+        bytes_transferred INTEGER,
+        throughput REAL)''',
+    # Covering indexes: per-device and per-type history and duration stats are answered from the index alone
+    "CREATE INDEX IF NOT EXISTS idx_operations_serial ON operations(device_serial, started_at, name, status, duration_ms)",
+    "CREATE INDEX IF NOT EXISTS idx_operations_name ON operations(name, started_at, model, status, duration_ms)",
+    "CREATE INDEX IF NOT EXISTS idx_operations_started ON operations(started_at)",
+    "CREATE INDEX IF NOT EXISTS idx_operations_status ON operations(status, started_at)",
+    "CREATE INDEX IF NOT EXISTS idx_operations_session ON operations(session_id)", # Retention finds sessions without operations
+)
+
+
+class OperationRecord:
+    """One command run, as stored in the operations table. id is filled in by the writer thread."""
+
+    def __init__(self, name, command=None, device_serial=None, mode=None, model=None):
+        self.id = None
+        self.name = name
+        self.command = command
+        self.device_serial = device_serial
+        self.mode = mode
+        self.model = model
+        self.started_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        self.started_monotonic = time.monotonic()
+        self.status = OP_STATUS_RUNNING
+        self.duration_ms = None
+        self.bytes_transferred = None # Set from the progress parser's summary when the tool reported a transfer
+        self.throughput = None        # Bytes per second over the whole transfer
+
+
+def operation_status_for_result(result):
+    """Maps an execute_command_async result dict to an OP_STATUS_* value."""
+    error = result.get("error")
+    if error == "Cancelled":
+        return OP_STATUS_CANCELLED
+    if error == "TimeoutExpired":
+        return OP_STATUS_TIMEOUT
+    if error:
+        return OP_STATUS_ERROR
+    return OP_STATUS_OK if result.get("return_code") == 0 else OP_STATUS_FAILED
+
+
+def fts5_available():
+    """True when this Python's sqlite3 was built with FTS5."""
+    try:
+        probe = sqlite3.connect(":memory:")
+        try:
+            probe.execute("CREATE VIRTUAL TABLE fts5_probe USING fts5(x)")
+            return True
+        finally:
+            probe.close()
+    except sqlite3.Error:
+        return False
+
+
+def fts_query_for_term(term):
+    """Quotes a user search term as FTS5 phrases; the last word also matches as a prefix ("ABC12" finds "ABC123")."""
+    words = term.split()
+    if not words:
+        return None
+    phrases = ['"' + word.replace('"', '""') + '"' for word in words]
+    phrases[-1] += "*"
+    return " ".join(phrases)
+
+
+def incremental_vacuum(conn, pages=None):
+    """Hands up to pages (all when None) free pages back to the file system.
+
+    execute() steps the pragma once, which frees a single page; executescript() runs it to the end.
+    It commits any open transaction first.
+    """
+    conn.executescript(f"PRAGMA incremental_vacuum({int(pages)})" if pages else "PRAGMA incremental_vacuum")
+
+
+def _timestamp_bound(value, end_of_day=False):
+    """datetime / date / "YYYY-MM-DD[ HH:MM:SS]" -> the text format stored in logs.timestamp."""
+    if value is None:
+        return None
+    if hasattr(value, "strftime"):
+        if not hasattr(value, "hour"): # date: the whole day
+            return value.strftime("%Y-%m-%d") + (" 23:59:59" if end_of_day else " 00:00:00")
+        return value.strftime("%Y-%m-%d %H:%M:%S")
+    text = str(value).strip()
+    if len(text) == 10: # Date only
+        text += " 23:59:59" if end_of_day else " 00:00:00"
+    return text
+
+
+class _WriterTask:
+    """A function run on the writer thread between batches. flush() and close() wait on it."""
+
+    def __init__(self, func=None, stop=False):
+        self.func = func
+        self.stop = stop # Last task: the writer exits after it
+        self.done = threading.Event()
+        self.result = None
+
+
+class DBLogger:
+    """Log lines, sessions and operations in operation_log.db.
+
+    add() only queues the row; one writer thread owns the write connection and commits rows in
+    executemany batches (DB_BATCH_SIZE rows or DB_FLUSH_INTERVAL seconds, whichever comes first).
+    The database runs in WAL mode, so search()/all() read on their own connection without
+    waiting for the writer.
+    Each run of the app is a row in sessions; each command is a row in operations, and log lines
+    point at the operation they belong to (logs.operation_id).
+    """
+
+    def __init__(self, dbfile=None, tk_root=None, batch_size=DB_BATCH_SIZE, flush_interval=DB_FLUSH_INTERVAL,
+                 retention_days=LOG_RETENTION_DAYS, retention_max_rows=LOG_RETENTION_MAX_ROWS):
+        log_to_file_debug_globally("DBLogger __init__ started.")
+        if dbfile is None:
+            try:
+                # Use Path for robust path creation
+                base_dir = Path(sys.argv[0]).resolve().parent
+                dbfile_path = base_dir / "operation_log.db"
+                dbfile_path.parent.mkdir(parents=True, exist_ok=True)
+                dbfile_path.touch(exist_ok=True) # Creates if not exists, updates timestamp
+                dbfile = str(dbfile_path)
+                log_to_file_debug_globally(f"DBLogger: DB file path set to: {dbfile}")
+            except Exception as e_db_path1:
+                log_to_file_debug_globally(f"DBLogger: Failed to create DB at primary path {dbfile}: {e_db_path1}", "WARNING")
+                try:
+                    user_dir = Path.home()
+                    dbfile_fallback_path = user_dir / ".UltimatUnlockTool" / "operation_log.db"
+                    dbfile_fallback_path.parent.mkdir(parents=True, exist_ok=True)
+                    dbfile_fallback_path.touch(exist_ok=True)
+                    dbfile = str(dbfile_fallback_path)
+                    log_to_file_debug_globally(f"DBLogger: DB file path set to fallback: {dbfile}")
+                except Exception as e_db_path2:
+                    log_to_file_debug_globally(f"DBLogger: Failed to create DB at fallback path: {e_db_path2}", "ERROR")
+                    dbfile = ":memory:"
+                    log_to_file_debug_globally("DBLogger: Using in-memory database as last resort.")
+
+        self.dbfile = dbfile
+        self.tk_root = tk_root
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.conn = None # Read connection (search/all), guarded by _read_lock
+        self.cursor = None
+        self._read_lock = threading.Lock()
+        self._queue = queue.SimpleQueue()
+        self._writer_thread = None
+        self._closed = False
+        self.rows_written = 0
+        self.fts_enabled = False # Set by the writer once logs_fts exists and is in step with logs
+        self.session_id = None
+        self.retention_days = retention_days
+        self.retention_max_rows = retention_max_rows
+        self.archive_dir = None if self.dbfile == ":memory:" else os.path.join(os.path.dirname(os.path.abspath(self.dbfile)), ARCHIVE_DIR_NAME)
+        self._retention_timer = None
+
+        try:
+            write_conn = self._connect()
+            write_conn.execute("PRAGMA auto_vacuum=INCREMENTAL") # Takes effect on new databases; old ones are converted after their first prune
+            write_conn.execute("PRAGMA journal_mode=WAL") # Readers don't block the writer and vice versa
+            write_conn.execute("PRAGMA synchronous=NORMAL") # fsync at checkpoints, not per commit; safe with WAL
+            write_conn.execute('''CREATE TABLE IF NOT EXISTS logs
+                                (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                                 timestamp TEXT,
+                                 tag TEXT,
+                                 message TEXT)''')
+            write_conn.execute("CREATE INDEX IF NOT EXISTS idx_logs_timestamp ON logs(timestamp)") # Date filters
+            for schema_sql in _SCHEMA_SQL:
+                write_conn.execute(schema_sql)
+            if "operation_id" not in [row[1] for row in write_conn.execute("PRAGMA table_info(logs)")]: # Databases from before operations
+                write_conn.execute("ALTER TABLE logs ADD COLUMN operation_id INTEGER REFERENCES operations(id)")
+            write_conn.execute("CREATE INDEX IF NOT EXISTS idx_logs_operation ON logs(operation_id) WHERE operation_id IS NOT NULL")
+            operation_columns = [row[1] for row in write_conn.execute("PRAGMA table_info(operations)")]
+            for column, column_type in (("bytes_transferred", "INTEGER"), ("throughput", "REAL")): # Databases from before throughput
+                if column not in operation_columns:
+                    write_conn.execute(f"ALTER TABLE operations ADD COLUMN {column} {column_type}")
+            self.session_id = write_conn.execute("INSERT INTO sessions (started_at, host, pid, script) VALUES (?, ?, ?, ?)",
+                                                 (datetime.now().strftime("%Y-%m-%d %H:%M:%S"), socket.gethostname(),
+                                                  os.getpid(), os.path.basename(sys.argv[0]))).lastrowid
+            write_conn.commit()
+            self._queue.put(_WriterTask(self._ensure_fts_index)) # First writer task; may backfill a large old database
+            self.schedule_retention(0)
+            self.conn = self._connect()
+            self.cursor = self.conn.cursor()
+            self._writer_thread = threading.Thread(target=self._writer_loop, args=(write_conn,), name="DBLogger-writer", daemon=True)
+            self._writer_thread.start()
+            log_to_file_debug_globally("DBLogger: Database initialized/checked.")
+        except Exception as e_db_init:
+            log_to_file_debug_globally(f"DBLogger: Database initialization error: {e_db_init}", "ERROR")
+            if self.conn:
+                self.conn.close()
+            self.conn = None
+            self.cursor = None
+        log_to_file_debug_globally("DBLogger __init__ finished.")
+
+    def _connect(self):
+        if self.dbfile == ":memory:":
+            return sqlite3.connect(_MEMORY_DB_URI, uri=True, check_same_thread=False)
+        return sqlite3.connect(self.dbfile, check_same_thread=False)
+
+    def add(self, message, tag="info", operation=None):
+        """Queues one log line, optionally linked to an OperationRecord. Never blocks on disk."""
+        if not self.conn or self._closed:
+            log_to_file_debug_globally(f"DBLogger: Cannot add log, database not initialized. Message: {message}", "WARNING")
+            return
+        self._queue.put((datetime.now().strftime("%Y-%m-%d %H:%M:%S"), tag, message, operation))
+
+    def begin_operation(self, name, command=None, device_serial=None, mode=None, model=None):
+        """Returns an OperationRecord right away; the row is inserted by the writer, ahead of its log lines."""
+        record = OperationRecord(name, command, device_serial, mode, model)
+        if self.conn and not self._closed:
+            self._queue.put(_WriterTask(lambda write_conn: self._insert_operation(write_conn, record)))
+        return record
+
+    def end_operation(self, record, return_code=None, status=None, error=None):
+        if record is None or record.status != OP_STATUS_RUNNING:
+            return
+        record.duration_ms = int((time.monotonic() - record.started_monotonic) * 1000)
+        record.status = status or (OP_STATUS_OK if return_code == 0 else OP_STATUS_FAILED)
+        ended_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        if self.conn and not self._closed:
+            self._queue.put(_WriterTask(lambda write_conn: self._update_operation(write_conn, record, ended_at, return_code, error)))
+
+    def _insert_operation(self, write_conn, record):
+        command_text = " ".join(map(str, record.command)) if isinstance(record.command, (list, tuple)) else record.command
+        record.id = write_conn.execute(
+            "INSERT INTO operations (session_id, name, command, device_serial, mode, model, started_at, status) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (self.session_id, record.name, command_text, record.device_serial, record.mode, record.model,
+             record.started_at, OP_STATUS_RUNNING)).lastrowid
+        write_conn.commit()
+
+    def _update_operation(self, write_conn, record, ended_at, return_code, error):
+        if record.id is None:
+            return
+        write_conn.execute("UPDATE operations SET ended_at = ?, duration_ms = ?, return_code = ?, status = ?, error = ?, "
+                           "bytes_transferred = ?, throughput = ? WHERE id = ?",
+                           (ended_at, record.duration_ms, return_code, record.status, error,
+                            record.bytes_transferred, record.throughput, record.id))
+        write_conn.commit()
+
+    def flush(self, timeout=DB_CLOSE_TIMEOUT):
+        """Blocks until every row queued so far is committed. Returns False on timeout."""
+        if not self._writer_thread or not self._writer_thread.is_alive():
+            return False
+        task = _WriterTask()
+        self._queue.put(task)
+        return task.done.wait(timeout)
+
+    def _writer_loop(self, write_conn):
+        pending = []
+        deadline = None
+        running = True
+        while running:
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+            if isinstance(item, tuple):
+                pending.append(item)
+                if deadline is None:
+                    deadline = time.monotonic() + self.flush_interval
+                if len(pending) < self.batch_size:
+                    continue
+            # Batch full, interval elapsed, or a task (flush/close) that must see every earlier row
+            if pending:
+                self._write_batch(write_conn, pending)
+                pending = []
+            deadline = None
+            if isinstance(item, _WriterTask):
+                if item.func is not None:
+                    try:
+                        item.result = item.func(write_conn)
+                    except Exception as e_task:
+                        log_to_file_debug_globally(f"DBLogger: Writer task failed: {e_task}", "ERROR")
+                        log_to_file_debug_globally(traceback.format_exc(), "ERROR_TRACE")
+                running = not item.stop
+                item.done.set()
+        write_conn.close()
+
+    def _write_batch(self, write_conn, rows):
+        try:
+            write_conn.executemany("INSERT INTO logs (timestamp, tag, message, operation_id) VALUES (?, ?, ?, ?)",
+                                   [(timestamp, tag, message, operation.id if operation is not None else None)
+                                    for timestamp, tag, message, operation in rows])
+            write_conn.commit()
+            self.rows_written += len(rows)
+        except Exception as e_add:
+            log_to_file_debug_globally(f"DBLogger: Error adding {len(rows)} log rows: {e_add}", "ERROR")
+            try:
+                write_conn.rollback()
+            except sqlite3.Error:
+                pass
+
+    def _ensure_fts_index(self, write_conn):
+        """Writer task: creates logs_fts and its triggers, backfilling rows logged before (or without) the index.
+
+        Without FTS5 the triggers are dropped, otherwise every INSERT would fail with "no such module".
+        The index is rebuilt whenever the triggers had to be (re)created, so it never misses rows.
+        """
+        existing_triggers = {row[0] for row in write_conn.execute(
+            "SELECT name FROM sqlite_master WHERE type='trigger' AND name IN (%s)" % ",".join("?" * len(_FTS_TRIGGERS)), list(_FTS_TRIGGERS))}
+        if not fts5_available():
+            for trigger_name in existing_triggers:
+                write_conn.execute(f"DROP TRIGGER IF EXISTS {trigger_name}")
+            write_conn.commit()
+            log_to_file_debug_globally("DBLogger: SQLite has no FTS5, search uses LIKE scans.", "WARNING")
+            return
+        write_conn.execute("CREATE VIRTUAL TABLE IF NOT EXISTS logs_fts USING fts5(message, content='logs', content_rowid='id')")
+        if existing_triggers != set(_FTS_TRIGGERS):
+            started = time.monotonic()
+            for trigger_name, trigger_sql in _FTS_TRIGGERS.items():
+                if trigger_name not in existing_triggers:
+                    write_conn.execute(trigger_sql)
+            write_conn.execute("INSERT INTO logs_fts(logs_fts) VALUES ('rebuild')") # One-time backfill from logs
+            write_conn.commit()
+            log_to_file_debug_globally(f"DBLogger: Full-text index built in {time.monotonic() - started:.1f}s.")
+        self.fts_enabled = True
+
+    def search(self, term, tag=None, since=None, until=None, order=SEARCH_ORDER_RECENT, limit=SEARCH_LIMIT, include_archives=False):
+        """Log rows (timestamp, tag, message) whose message contains term, optionally filtered by tag and date range.
+
+        Uses the FTS5 index (word/prefix match, ranked or newest first) when available,
+        otherwise a LIKE scan. An empty term just applies the filters. include_archives tops
+        the result up from the archived months when the live table has fewer than limit rows.
+        """
+        rows = self._search_live(term, tag, since, until, order, limit)
+        if include_archives and len(rows) < limit:
+            rows += self.search_archives(term, tag, since, until, limit - len(rows))
+        return rows
+
+    def _search_live(self, term, tag, since, until, order, limit):
+        if not self.conn or not self.cursor:
+            log_to_file_debug_globally(f"DBLogger: Cannot search, database not initialized. Term: {term}", "WARNING")
+            return []
+
+        self.flush(timeout=DB_READ_FLUSH_TIMEOUT) # Include lines logged a moment ago
+        filters, params = [], []
+        if tag:
+            filters.append("logs.tag = ?")
+            params.append(tag)
+        if since is not None:
+            filters.append("logs.timestamp >= ?")
+            params.append(_timestamp_bound(since))
+        if until is not None:
+            filters.append("logs.timestamp <= ?")
+            params.append(_timestamp_bound(until, end_of_day=True))
+
+        fts_query = fts_query_for_term(term or "")
+        if fts_query and self.fts_enabled:
+            order_by = "logs_fts.rank" if order == SEARCH_ORDER_RANK else "logs.id DESC"
+            sql = ("SELECT logs.timestamp, logs.tag, logs.message FROM logs_fts JOIN logs ON logs.id = logs_fts.rowid "
+                   f"WHERE logs_fts MATCH ?{''.join(' AND ' + f for f in filters)} ORDER BY {order_by} LIMIT ?")
+            try:
+                with self._read_lock:
+                    self.cursor.execute(sql, [fts_query] + params + [limit])
+                    return self.cursor.fetchall()
+            except sqlite3.Error as e_fts:
+                log_to_file_debug_globally(f"DBLogger: FTS search failed ({e_fts}), falling back to LIKE. Term: {term}", "WARNING")
+
+        if term:
+            filters.insert(0, "logs.message LIKE ?")
+            params.insert(0, f"%{term}%")
+        where_clause = f"WHERE {' AND '.join(filters)} " if filters else ""
+        try:
+            with self._read_lock:
+                self.cursor.execute(f"SELECT timestamp, tag, message FROM logs {where_clause}ORDER BY id DESC LIMIT ?", params + [limit])
+                return self.cursor.fetchall()
+        except Exception as e_search:
+            log_to_file_debug_globally(f"DBLogger: Error searching logs: {e_search}. Term: {term}", "ERROR")
+            return []
+
+    def all(self, limit=1000):
+        if not self.conn or not self.cursor:
+            log_to_file_debug_globally("DBLogger: Cannot fetch all, database not initialized.", "WARNING")
+            return []
+
+        self.flush(timeout=DB_READ_FLUSH_TIMEOUT)
+        try:
+            with self._read_lock:
+                self.cursor.execute("SELECT timestamp, tag, message FROM logs ORDER BY id DESC LIMIT ?", (limit,))
+                return self.cursor.fetchall()
+        except Exception as e_all:
+            log_to_file_debug_globally(f"DBLogger: Error fetching all logs: {e_all}", "ERROR")
+            return []
+
+    def operation_history(self, device_serial=None, name=None, status=None, since=None, until=None, limit=200):
+        """Most recent operations as dicts, filtered by device, operation name (prefix), status and start date."""
+        filters, params = [], []
+        if device_serial:
+            filters.append("device_serial = ?")
+            params.append(device_serial)
+        if name:
+            filters.append("name >= ? AND name < ?") # Prefix match that can use idx_operations_name
+            params.extend((name, name + "\uffff"))
+        if status:
+            filters.append("status = ?")
+            params.append(status)
+        if since is not None:
+            filters.append("started_at >= ?")
+            params.append(_timestamp_bound(since))
+        if until is not None:
+            filters.append("started_at <= ?")
+            params.append(_timestamp_bound(until, end_of_day=True))
+        where_clause = f"WHERE {' AND '.join(filters)} " if filters else ""
+        return self._read_dicts(f"SELECT * FROM operations {where_clause}ORDER BY started_at DESC, id DESC LIMIT ?", params + [limit])
+
+    def operation_stats(self, name=None, since=None, until=None, group_by="model"):
+        """Count, success count, average/max duration and average/min throughput per model, device_serial, mode or name.
+
+        A device or model whose avg_rate (bytes/s) sits well below the others points at a slow cable or hub.
+        """
+        if group_by not in ("model", "device_serial", "mode", "name"):
+            raise ValueError(f"Unsupported group_by: {group_by}")
+        filters, params = ["status != ?"], [OP_STATUS_RUNNING]
+        if name:
+            filters.append("name >= ? AND name < ?")
+            params.extend((name, name + "\uffff"))
+        if since is not None:
+            filters.append("started_at >= ?")
+            params.append(_timestamp_bound(since))
+        if until is not None:
+            filters.append("started_at <= ?")
+            params.append(_timestamp_bound(until, end_of_day=True))
+        return self._read_dicts(
+            f"SELECT {group_by} AS grp, COUNT(*) AS runs, SUM(status = '{OP_STATUS_OK}') AS succeeded, "
+            f"AVG(CASE WHEN status = '{OP_STATUS_OK}' THEN duration_ms END) AS avg_ms, MAX(duration_ms) AS max_ms, "
+            f"AVG(throughput) AS avg_rate, MIN(throughput) AS min_rate "
+            f"FROM operations WHERE {' AND '.join(filters)} GROUP BY {group_by} ORDER BY runs DESC", params)
+
+    def operation_logs(self, operation_id, limit=10000):
+        """Log rows (timestamp, tag, message) of one operation, oldest first."""
+        self.flush(timeout=DB_READ_FLUSH_TIMEOUT)
+        try:
+            with self._read_lock:
+                self.cursor.execute("SELECT timestamp, tag, message FROM logs WHERE operation_id = ? ORDER BY id LIMIT ?", (operation_id, limit))
+                return self.cursor.fetchall()
+        except Exception as e_logs:
+            log_to_file_debug_globally(f"DBLogger: Error reading logs of operation {operation_id}: {e_logs}", "ERROR")
+            return []
+
+    def _log_filters(self, term=None, tag=None, since=None, until=None, device_serial=None, operation_id=None, operation_name=None):
+        """WHERE terms and parameters shared by log_page() and iter_log_rows()."""
+        filters, params = [], []
+        if term:
+            fts_query = fts_query_for_term(term)
+            if fts_query and self.fts_enabled:
+                filters.append("logs.id IN (SELECT rowid FROM logs_fts WHERE logs_fts MATCH ?)")
+                params.append(fts_query)
+            else:
+                filters.append("logs.message LIKE ?")
+                params.append(f"%{term}%")
+        if tag:
+            filters.append("logs.tag = ?")
+            params.append(tag)
+        if since is not None:
+            filters.append("logs.timestamp >= ?")
+            params.append(_timestamp_bound(since))
+        if until is not None:
+            filters.append("logs.timestamp <= ?")
+            params.append(_timestamp_bound(until, end_of_day=True))
+        if operation_id is not None:
+            filters.append("logs.operation_id = ?")
+            params.append(operation_id)
+        if device_serial or operation_name: # Through idx_operations_serial / _name, then idx_logs_operation
+            op_filters, op_params = [], []
+            if device_serial:
+                op_filters.append("device_serial = ?")
+                op_params.append(device_serial)
+            if operation_name:
+                op_filters.append("name >= ? AND name < ?")
+                op_params.extend((operation_name, operation_name + "\uffff"))
+            filters.append(f"logs.operation_id IN (SELECT id FROM operations WHERE {' AND '.join(op_filters)})")
+            params.extend(op_params)
+        return filters, params
+
+    def _log_page_sql(self, filters, newest_first):
+        where_clause = " AND ".join(filters + ["logs.id < ?" if newest_first else "logs.id > ?"])
+        return ("SELECT logs.id, logs.timestamp, logs.tag, logs.message, logs.operation_id, "
+                "operations.name, operations.device_serial, operations.model "
+                f"FROM logs LEFT JOIN operations ON operations.id = logs.operation_id WHERE {where_clause} "
+                f"ORDER BY logs.id {'DESC' if newest_first else 'ASC'} LIMIT ?")
+
+    def log_page(self, before_id=None, limit=LOG_PAGE_ROWS, **filters):
+        """One page of log rows, newest first, with ids below before_id (None: from the newest row).
+
+        Rows are tuples in EXPORT_COLUMNS order. Pass the last row's id as before_id for the next page;
+        the id seek keeps every page as cheap as the first, however deep the viewer scrolls.
+        Filters are those of iter_log_rows().
+        """
+        if not self.conn or not self.cursor:
+            return []
+        self.flush(timeout=DB_READ_FLUSH_TIMEOUT)
+        where_filters, params = self._log_filters(**filters)
+        try:
+            with self._read_lock:
+                self.cursor.execute(self._log_page_sql(where_filters, newest_first=True),
+                                    params + [before_id if before_id is not None else sys.maxsize, limit])
+                return self.cursor.fetchall()
+        except Exception as e_page:
+            log_to_file_debug_globally(f"DBLogger: Error reading log page before id {before_id}: {e_page}", "ERROR")
+            return []
+
+    def iter_log_rows(self, term=None, tag=None, since=None, until=None, device_serial=None, operation_id=None,
+                      operation_name=None, page_size=LOG_PAGE_ROWS):
+        """Yields every matching log row, oldest first, as a tuple in EXPORT_COLUMNS order.
+
+        Reads page by page (WHERE id > last id) on a connection of its own, so memory stays at one page,
+        the GUI's read cursor isn't held and no read transaction stays open between pages.
+        device_serial / operation_name (prefix) select rows through the operations they belong to.
+        """
+        if self.conn is None:
+            return
+        self.flush()
+        where_filters, params = self._log_filters(term, tag, since, until, device_serial, operation_id, operation_name)
+        sql = self._log_page_sql(where_filters, newest_first=False)
+        page_conn = self._connect()
+        try:
+            last_id = 0
+            while True:
+                rows = page_conn.execute(sql, params + [last_id, page_size]).fetchall()
+                yield from rows
+                if len(rows) < page_size:
+                    break
+                last_id = rows[-1][0]
+        finally:
+            page_conn.close()
+
+    def export_logs(self, path, export_format=EXPORT_FORMAT_CSV, progress_callback=None, cancel_event=None, **filters):
+        """Streams matching log rows (oldest first) to a CSV or JSONL file. Returns the number of rows written.
+
+        progress_callback(rows_written) is called after every page; setting cancel_event stops the export
+        and leaves the rows written so far in the file. Filters are those of iter_log_rows().
+        """
+        if export_format not in (EXPORT_FORMAT_CSV, EXPORT_FORMAT_JSONL):
+            raise ValueError(f"Unsupported export format: {export_format}")
+        page_size = filters.pop("page_size", LOG_PAGE_ROWS)
+        rows_written = 0
+        started = time.monotonic()
+        with open(path, "w", encoding="utf-8", newline="") as f_out:
+            csv_writer = None
+            if export_format == EXPORT_FORMAT_CSV:
+                csv_writer = csv.writer(f_out)
+                csv_writer.writerow(EXPORT_COLUMNS)
+            for row in self.iter_log_rows(page_size=page_size, **filters):
+                if csv_writer is not None:
+                    csv_writer.writerow(row)
+                else:
+                    f_out.write(json.dumps(dict(zip(EXPORT_COLUMNS, row)), ensure_ascii=False) + "\n")
+                rows_written += 1
+                if rows_written % page_size == 0:
+                    if progress_callback:
+                        progress_callback(rows_written)
+                    if cancel_event is not None and cancel_event.is_set():
+                        log_to_file_debug_globally(f"DBLogger: Export to {path} cancelled after {rows_written} rows.", "WARNING")
+                        break
+        if progress_callback:
+            progress_callback(rows_written)
+        log_to_file_debug_globally(f"DBLogger: Exported {rows_written} log rows to {path} ({export_format}) in {time.monotonic() - started:.1f}s.")
+        return rows_written
+
+    def _read_dicts(self, sql, params):
+        if not self.conn or not self.cursor:
+            return []
+        self.flush(timeout=DB_READ_FLUSH_TIMEOUT)
+        try:
+            with self._read_lock:
+                self.cursor.execute(sql, params)
+                columns = [column[0] for column in self.cursor.description]
+                return [dict(zip(columns, row)) for row in self.cursor.fetchall()]
+        except Exception as e_read:
+            log_to_file_debug_globally(f"DBLogger: Error reading operations: {e_read}", "ERROR")
+            return []
+
+    def schedule_retention(self, delay=RETENTION_INTERVAL):
+        """Queues a retention pass on the writer thread after delay seconds, then every RETENTION_INTERVAL."""
+        if self.archive_dir is None or not (self.retention_days or self.retention_max_rows):
+            return
+        def _queue_pass():
+            if self._closed:
+                return
+            self._queue.put(_WriterTask(self._retention_step))
+            self.schedule_retention(RETENTION_INTERVAL)
+        if delay <= 0:
+            _queue_pass()
+            return
+        self._retention_timer = threading.Timer(delay, _queue_pass)
+        self._retention_timer.daemon = True
+        self._retention_timer.start()
+
+    def _retention_cutoff_id(self, write_conn):
+        """Highest logs.id that is past the age or row-count limit, or None."""
+        cutoff_id = None
+        if self.retention_days:
+            cutoff_time = datetime.fromtimestamp(time.time() - self.retention_days * 86400).strftime("%Y-%m-%d %H:%M:%S")
+            cutoff_id = write_conn.execute("SELECT MAX(id) FROM logs WHERE timestamp < ?", (cutoff_time,)).fetchone()[0]
+        if self.retention_max_rows:
+            row = write_conn.execute("SELECT id FROM logs ORDER BY id DESC LIMIT 1 OFFSET ?", (self.retention_max_rows,)).fetchone()
+            if row and (cutoff_id is None or row[0] > cutoff_id):
+                cutoff_id = row[0]
+        return cutoff_id
+
+    def _retention_step(self, write_conn, cutoff_id=None):
+        """Writer task: archives and deletes one chunk of expired rows in its own transaction.
+
+        Re-queues itself while expired rows remain, so log lines added meanwhile are written between
+        chunks instead of waiting for the whole pass. Expired operations and sessions follow, then an
+        incremental vacuum ends the pass.
+        """
+        if cutoff_id is None:
+            cutoff_id = self._retention_cutoff_id(write_conn)
+            if cutoff_id is None:
+                self._retention_operations_step(write_conn, self._retention_operations_cutoff(write_conn), pruned=False)
+                return
+        rows = write_conn.execute("SELECT id, timestamp, tag, message, operation_id FROM logs WHERE id <= ? ORDER BY id LIMIT ?",
+                                  (cutoff_id, RETENTION_CHUNK_ROWS)).fetchall()
+        if not rows:
+            self._retention_operations_step(write_conn, self._retention_operations_cutoff(write_conn), pruned=True)
+            return
+        self._archive_rows("logs", _ARCHIVE_LOG_COLUMNS, rows, "timestamp") # On disk before the delete commits; a crash in between only duplicates archived rows
+        write_conn.execute("DELETE FROM logs WHERE id <= ?", (rows[-1][0],))
+        write_conn.commit()
+        incremental_vacuum(write_conn, INCREMENTAL_VACUUM_PAGES)
+        log_to_file_debug_globally(f"DBLogger: Archived {len(rows)} log rows up to id {rows[-1][0]}.", "DEBUG")
+        self._queue.put(_WriterTask(lambda conn: self._retention_step(conn, cutoff_id)))
+
+    def _retention_operations_cutoff(self, write_conn):
+        """Operations that ended before this time lose their row once no log row points at them, or None.
+
+        The age limit, or with a row limit the oldest log row still kept: older operations have had their lines archived.
+        """
+        cutoff_time = None
+        if self.retention_days:
+            cutoff_time = datetime.fromtimestamp(time.time() - self.retention_days * 86400).strftime("%Y-%m-%d %H:%M:%S")
+        if self.retention_max_rows:
+            row = write_conn.execute("SELECT timestamp FROM logs ORDER BY id LIMIT 1").fetchone()
+            if row and row[0] and (cutoff_time is None or row[0] > cutoff_time):
+                cutoff_time = row[0]
+        return cutoff_time
+
+    def _retention_operations_step(self, write_conn, cutoff_time, pruned, after_id=0):
+        """Writer task: archives and deletes one chunk of expired operations, and the sessions that leaves
+        without operations, in one transaction. Runs once the log rows are done; the pass ends here."""
+        if cutoff_time is None:
+            self._finish_retention(write_conn, pruned)
+            return
+        cursor = write_conn.execute(
+            "SELECT * FROM operations WHERE id > ? AND session_id IS NOT ? AND COALESCE(ended_at, started_at) < ? "
+            "AND NOT EXISTS (SELECT 1 FROM logs WHERE logs.operation_id = operations.id) ORDER BY id LIMIT ?",
+            (after_id, self.session_id, cutoff_time, RETENTION_CHUNK_ROWS))
+        operation_rows = cursor.fetchall()
+        if operation_rows:
+            self._archive_rows("operations", [column[0] for column in cursor.description], operation_rows, "started_at")
+            write_conn.executemany("DELETE FROM operations WHERE id = ?", [(row[0],) for row in operation_rows])
+        cursor = write_conn.execute( # Sees the deletes above: same connection, same transaction
+            "SELECT * FROM sessions WHERE id IS NOT ? AND COALESCE(ended_at, started_at) < ? "
+            "AND NOT EXISTS (SELECT 1 FROM operations WHERE operations.session_id = sessions.id) ORDER BY id LIMIT ?",
+            (self.session_id, cutoff_time, RETENTION_CHUNK_ROWS))
+        session_rows = cursor.fetchall()
+        if session_rows:
+            self._archive_rows("sessions", [column[0] for column in cursor.description], session_rows, "started_at")
+            write_conn.executemany("DELETE FROM sessions WHERE id = ?", [(row[0],) for row in session_rows])
+        write_conn.commit()
+        if not operation_rows and not session_rows:
+            self._finish_retention(write_conn, pruned)
+            return
+        incremental_vacuum(write_conn, INCREMENTAL_VACUUM_PAGES)
+        log_to_file_debug_globally(f"DBLogger: Archived {len(operation_rows)} operations and {len(session_rows)} sessions.", "DEBUG")
+        last_id = operation_rows[-1][0] if operation_rows else after_id
+        self._queue.put(_WriterTask(lambda conn: self._retention_operations_step(conn, cutoff_time, True, last_id)))
+
+    def _archive_rows(self, table, columns, rows, time_column):
+        """Appends rows of table to <table>-YYYY-MM.jsonl.gz by the month of time_column (each call adds one gzip member per month file)."""
+        os.makedirs(self.archive_dir, exist_ok=True)
+        by_month = {}
+        for row in rows:
+            record = dict(zip(columns, row))
+            month = (record[time_column] or "0000-00")[:7]
+            by_month.setdefault(month, []).append(json.dumps(record, ensure_ascii=False))
+        for month, lines in by_month.items():
+            with gzip.open(os.path.join(self.archive_dir, f"{table}-{month}.jsonl.gz"), "at", encoding="utf-8") as f_archive:
+                f_archive.write("\n".join(lines) + "\n")
+
+    def _finish_retention(self, write_conn, pruned):
+        if write_conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2: # Database from before incremental vacuum
+            if not pruned:
+                return # Convert right after a prune, when the file is as small as it will get
+            started = time.monotonic()
+            write_conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+            write_conn.execute("VACUUM") # One-time rewrite; afterwards freed pages are released in small steps
+            log_to_file_debug_globally(f"DBLogger: Switched to incremental vacuum in {time.monotonic() - started:.1f}s.")
+        else:
+            incremental_vacuum(write_conn)
+        write_conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    def search_archives(self, term, tag=None, since=None, until=None, limit=SEARCH_LIMIT):
+        """Substring search over the archived months in the date range, newest month first.
+
+        Rows come back as (timestamp, tag, message) like search(). Reads the gzip files on demand.
+        """
+        if not self.archive_dir or not os.path.isdir(self.archive_dir):
+            return []
+        since_text, until_text = _timestamp_bound(since), _timestamp_bound(until, end_of_day=True)
+        term_lower = (term or "").lower()
+        results = []
+        for archive_path in sorted(glob.glob(os.path.join(self.archive_dir, "logs-*.jsonl.gz")), reverse=True):
+            month = os.path.basename(archive_path)[5:12]
+            if (since_text and month < since_text[:7]) or (until_text and month > until_text[:7]):
+                continue
+            month_rows = []
+            try:
+                with gzip.open(archive_path, "rt", encoding="utf-8") as f_archive:
+                    for line in f_archive:
+                        if term_lower and term_lower not in line.lower(): # Cheap pre-filter before json.loads
+                            continue
+                        row = json.loads(line)
+                        if term_lower and term_lower not in (row.get("message") or "").lower():
+                            continue
+                        if tag and row.get("tag") != tag:
+                            continue
+                        if (since_text and row["timestamp"] < since_text) or (until_text and row["timestamp"] > until_text):
+                            continue
+                        month_rows.append((row["timestamp"], row["tag"], row["message"]))
+            except (OSError, EOFError, ValueError) as e_archive:
+                log_to_file_debug_globally(f"DBLogger: Error reading archive {archive_path}: {e_archive}", "ERROR")
+            results.extend(reversed(month_rows)) # Newest first within the month too
+            if len(results) >= limit:
+                break
+        return results[:limit]
+
+    def _end_session(self, write_conn):
+        ended_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        write_conn.execute("UPDATE operations SET status = ?, ended_at = ? WHERE session_id = ? AND status = ?",
+                           (OP_STATUS_INTERRUPTED, ended_at, self.session_id, OP_STATUS_RUNNING))
+        write_conn.execute("UPDATE sessions SET ended_at = ? WHERE id = ?", (ended_at, self.session_id))
+        write_conn.commit()
+
+    def close(self):
+        """Writes everything still queued, stops the writer and closes both connections."""
+        if self._closed:
+            return
+        self._closed = True
+        if self._retention_timer is not None:
+            self._retention_timer.cancel()
+        if self._writer_thread and self._writer_thread.is_alive():
+            stop_task = _WriterTask(self._end_session, stop=True) # Queued after every add() so far, nothing is lost
+            self._queue.put(stop_task)
+            if not stop_task.done.wait(DB_CLOSE_TIMEOUT):
+                log_to_file_debug_globally("DBLogger: Writer did not finish within the close timeout.", "WARNING")
+            self._writer_thread.join(DB_CLOSE_TIMEOUT)
+        if self.conn:
+            try:
+                self.conn.close()
+                log_to_file_debug_globally(f"DBLogger: Database connection closed ({self.rows_written} rows written this session).")
+            except Exception as e_close:
+                log_to_file_debug_globally(f"DBLogger: Error closing database: {e_close}", "ERROR")
+
+
+def _check_incremental_vacuum(pages=500):
+    """incremental_vacuum() must free about `pages` pages per call, not one."""
+    work_dir = tempfile.mkdtemp(prefix="oplog_vacuum_")
+    try:
+        conn = sqlite3.connect(os.path.join(work_dir, "vacuum.db"))
+        conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        conn.execute("CREATE TABLE logs (id INTEGER PRIMARY KEY, message TEXT)")
+        conn.executemany("INSERT INTO logs (message) VALUES (?)", [("x" * 1000,)] * 5000)
+        conn.commit()
+        conn.execute("DELETE FROM logs")
+        conn.commit()
+        free_before = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        incremental_vacuum(conn, pages)
+        free_after = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        assert free_before - free_after >= pages * 0.9, (free_before, free_after)
+        incremental_vacuum(conn)
+        assert conn.execute("PRAGMA freelist_count").fetchone()[0] == 0
+        conn.close()
+        print(f"incremental_vacuum({pages}): freelist {free_before} -> {free_after} pages")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def _check_retention():
+    """Expired logs, the operations they leave unreferenced and sessions without operations end up in the archive."""
+    work_dir = tempfile.mkdtemp(prefix="oplog_retention_")
+    try:
+        db_logger = DBLogger(os.path.join(work_dir, "retention.db"), retention_days=30, retention_max_rows=0)
+        db_logger.flush()
+        conn = sqlite3.connect(db_logger.dbfile)
+        old, recent = "2000-01-02 10:00:00", datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        old_session = conn.execute("INSERT INTO sessions (started_at, ended_at) VALUES (?, ?)", (old, old)).lastrowid
+        kept_session = conn.execute("INSERT INTO sessions (started_at, ended_at) VALUES (?, ?)", (old, old)).lastrowid
+        old_operation = conn.execute("INSERT INTO operations (session_id, name, started_at, ended_at, status) VALUES (?, ?, ?, ?, ?)",
+                                     (old_session, "old", old, old, OP_STATUS_OK)).lastrowid
+        kept_operation = conn.execute("INSERT INTO operations (session_id, name, started_at, ended_at, status) VALUES (?, ?, ?, ?, ?)",
+                                      (kept_session, "kept", old, old, OP_STATUS_OK)).lastrowid
+        conn.executemany("INSERT INTO logs (timestamp, tag, message, operation_id) VALUES (?, ?, ?, ?)",
+                         [(old, "info", f"old line {i}", old_operation) for i in range(3)] + [(recent, "info", "recent line", kept_operation)])
+        conn.commit()
+        db_logger._queue.put(_WriterTask(db_logger._retention_step))
+        for _ in range(10): # Each chunk re-queues the next one behind the flush
+            db_logger.flush()
+        assert [row[0] for row in conn.execute("SELECT id FROM operations")] == [kept_operation]
+        assert {row[0] for row in conn.execute("SELECT id FROM sessions")} == {kept_session, db_logger.session_id}
+        assert conn.execute("SELECT COUNT(*) FROM logs").fetchone()[0] == 1
+        conn.close()
+        archived = {}
+        for table in ("logs", "operations", "sessions"):
+            with gzip.open(os.path.join(db_logger.archive_dir, f"{table}-2000-01.jsonl.gz"), "rt", encoding="utf-8") as f_archive:
+                archived[table] = [json.loads(line)["id"] for line in f_archive]
+        db_logger.close()
+        assert len(archived["logs"]) == 3 and archived["operations"] == [old_operation] and archived["sessions"] == [old_session], archived
+        print("retention: logs, operations and sessions archived")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def _benchmark(line_count=20000):
+    """Lines/second of the old per-line INSERT+commit path against the batched WAL writer."""
+    work_dir = tempfile.mkdtemp(prefix="oplog_bench_")
+    try:
+        lines = [f"[{i}] Reading partition boot 0x{i * 4096:08x} ({i % 100}%)" for i in range(line_count)]
+
+        old_path = os.path.join(work_dir, "old.db")
+        conn = sqlite3.connect(old_path, check_same_thread=False)
+        cursor = conn.cursor()
+        cursor.execute("CREATE TABLE IF NOT EXISTS logs (id INTEGER PRIMARY KEY AUTOINCREMENT, timestamp TEXT, tag TEXT, message TEXT)")
+        conn.commit()
+        started = time.perf_counter()
+        for line in lines: # What DBLogger.add used to do on the Tk thread
+            cursor.execute("INSERT INTO logs (timestamp, tag, message) VALUES (?, ?, ?)",
+                           (datetime.now().strftime("%Y-%m-%d %H:%M:%S"), "info", line))
+            conn.commit()
+        old_seconds = time.perf_counter() - started
+        conn.close()
+
+        db_logger = DBLogger(os.path.join(work_dir, "new.db"))
+        started = time.perf_counter()
+        for line in lines:
+            db_logger.add(line, "info")
+        caller_seconds = time.perf_counter() - started # Time the GUI thread spends in add()
+        db_logger.flush(timeout=600)
+        new_seconds = time.perf_counter() - started
+        assert db_logger.rows_written == line_count, db_logger.rows_written
+        db_logger.close()
+
+        print(f"{line_count} lines")
+        print(f"  per-line commit : {line_count / old_seconds:12,.0f} lines/s  ({old_seconds:.2f} s)")
+        print(f"  batched writer  : {line_count / new_seconds:12,.0f} lines/s  ({new_seconds:.2f} s until committed)")
+        print(f"  add() on caller : {line_count / caller_seconds:12,.0f} lines/s  ({caller_seconds * 1e6 / line_count:.1f} us per line)")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    _check_incremental_vacuum()
+    _check_retention()
+    _benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Turns streamed mtkclient / adb / fastboot output into bytes done, total, rate and ETA.
+
+One parser per tool; parser_for_command() picks it from the command line. Parsers are fed one
+output line at a time (from the streaming thread) and return a ProgressSample whenever a line
+moved the transfer forward.
+"""
+
+import os
+import re
+import time
+from collections import deque
+
+RATE_WINDOW_SECONDS = 5.0 # Rate is measured over this sliding window, so a stall shows up quickly
+MTK_SECTOR_SIZE = 512     # mtkclient reports positions in sectors
+
+_MTK_PROGRESS_RE = re.compile(r"Progress:.*?(\d+(?:\.\d+)?)%\s*(\w[\w ]*?)?\s*\(Sector 0x([0-9a-fA-F]+) of 0x([0-9a-fA-F]+)")
+_MTK_PERCENT_RE = re.compile(r"Progress:.*?(\d+(?:\.\d+)?)%")
+_ADB_PERCENT_RE = re.compile(r"^\[\s*(\d+)%\]\s*(.*)$")
+_ADB_SUMMARY_RE = re.compile(r"(\d+) bytes in (\d+(?:\.\d+)?)s")
+_FASTBOOT_SENDING_RE = re.compile(r"Sending(?: sparse)? '([^']+)'(?: (\d+)/(\d+))? \((\d+) KB\)")
+_FASTBOOT_OKAY_RE = re.compile(r"OKAY \[\s*(\d+(?:\.\d+)?)s\]")
+
+
+class ProgressSample:
+    """Where a transfer stands. bytes_total, percent, rate (bytes/s) and eta (s) are None when unknown."""
+
+    def __init__(self, bytes_done, bytes_total=None, percent=None, rate=None, eta=None, label=""):
+        self.bytes_done = bytes_done
+        self.bytes_total = bytes_total
+        self.percent = percent
+        self.rate = rate
+        self.eta = eta
+        self.label = label
+
+    def status_text(self):
+        """"45% · 120.5/512.0 MB · 23.4 MB/s · ETA 0:17", leaving out what isn't known."""
+        parts = []
+        if self.label:
+            parts.append(self.label)
+        if self.percent is not None:
+            parts.append(f"{self.percent:.0f}%")
+        if self.bytes_total:
+            parts.append(f"{self.bytes_done / 1e6:.1f}/{self.bytes_total / 1e6:.1f} MB")
+        elif self.bytes_done:
+            parts.append(f"{self.bytes_done / 1e6:.1f} MB")
+        if self.rate:
+            parts.append(format_rate(self.rate))
+        if self.eta is not None:
+            parts.append(f"ETA {format_eta(self.eta)}")
+        return " · ".join(parts)
+
+
+def format_rate(bytes_per_second):
+    return f"{bytes_per_second / 1e6:.1f} MB/s"
+
+
+def format_eta(seconds):
+    seconds = int(max(0, seconds))
+    hours, rest = divmod(seconds, 3600)
+    return f"{hours}:{rest // 60:02d}:{rest % 60:02d}" if hours else f"{rest // 60}:{rest % 60:02d}"
+
+
+class ProgressParser:
+    """Base parser. Subclasses override parse_line(line) -> (bytes_done, bytes_total, percent, label) or None.
+
+    bytes_done is cumulative over the whole command (several partitions or files add up), so the
+    rate, ETA and the final summary() cover everything the command transferred.
+    """
+
+    tool = ""
+
+    def __init__(self):
+        self.bytes_done = 0
+        self.bytes_total = None
+        self.started = None
+        self.last_sample = None
+        self._window = deque() # (monotonic time, bytes_done)
+
+    def parse_line(self, line):
+        """(bytes_done, bytes_total, percent, label) when line moved the transfer forward, else None.
+
+        Overridden per tool; the base parser recognises no progress lines.
+        """
+        return None
+
+    def feed(self, line):
+        parsed = self.parse_line(line)
+        if parsed is None:
+            return None
+        bytes_done, bytes_total, percent, label = parsed
+        now = time.monotonic()
+        if self.started is None:
+            self.started = now
+        self.bytes_done = max(self.bytes_done, bytes_done)
+        if bytes_total:
+            self.bytes_total = bytes_total
+        if percent is None and self.bytes_total:
+            percent = min(100.0, self.bytes_done * 100.0 / self.bytes_total)
+        self._window.append((now, self.bytes_done))
+        while len(self._window) > 2 and now - self._window[0][0] > RATE_WINDOW_SECONDS:
+            self._window.popleft()
+        rate = None
+        window_seconds = now - self._window[0][0]
+        if window_seconds > 0.2:
+            rate = (self.bytes_done - self._window[0][1]) / window_seconds
+        eta = None
+        if rate and self.bytes_total and self.bytes_total > self.bytes_done:
+            eta = (self.bytes_total - self.bytes_done) / rate
+        self.last_sample = ProgressSample(self.bytes_done, self.bytes_total, percent, rate, eta, label)
+        return self.last_sample
+
+    def summary(self):
+        """{"bytes", "seconds", "rate"} for the whole command, or None when nothing was transferred."""
+        if self.started is None or not self.bytes_done:
+            return None
+        seconds = max(time.monotonic() - self.started, 0.001)
+        return {"bytes": self.bytes_done, "seconds": seconds, "rate": self.bytes_done / seconds}
+
+
+class MtkclientProgressParser(ProgressParser):
+    """mtkclient: "Progress: |████----| 45.2% Read (Sector 0x1A2B of 0x4000, ) 12.34 MB/s".
+
+    Sector positions restart for every partition of a batch; finished partitions are carried over.
+    """
+
+    tool = "mtk"
+
+    def __init__(self):
+        super().__init__()
+        self._finished_bytes = 0 # Partitions already completed in this command
+        self._current_total = 0
+        self._current_pos = 0
+
+    def parse_line(self, line):
+        match = _MTK_PROGRESS_RE.search(line)
+        if not match:
+            percent_match = _MTK_PERCENT_RE.search(line)
+            return (self.bytes_done, None, float(percent_match.group(1)), "") if percent_match else None
+        percent, verb = float(match.group(1)), (match.group(2) or "").strip()
+        pos = int(match.group(3), 16) * MTK_SECTOR_SIZE
+        total = int(match.group(4), 16) * MTK_SECTOR_SIZE
+        if total != self._current_total or pos < self._current_pos: # Next partition
+            self._finished_bytes += self._current_total if self._current_total and self._current_pos else 0
+            self._current_total = total
+        self._current_pos = pos
+        return self._finished_bytes + pos, self._finished_bytes + total, percent, verb
+
+
+class AdbProgressParser(ProgressParser):
+    """adb push/pull/sideload: "[ 45%] /sdcard/file" while running, "... (104857600 bytes in 2.840s)" at the end."""
+
+    tool = "adb"
+
+    def parse_line(self, line):
+        line = line.strip()
+        summary = _ADB_SUMMARY_RE.search(line)
+        if summary:
+            total = int(summary.group(1))
+            self.started = time.monotonic() - float(summary.group(2)) # adb measured the transfer itself
+            return total, total, 100.0, ""
+        match = _ADB_PERCENT_RE.match(line)
+        if match:
+            return self.bytes_done, None, float(match.group(1)), os.path.basename(match.group(2).strip())
+        return None
+
+
+class FastbootProgressParser(ProgressParser):
+    """fastboot flash: "Sending [sparse] 'boot_a' [2/4] (65536 KB)   OKAY [  1.482s]" (the OKAY may come on its own line)."""
+
+    tool = "fastboot"
+
+    def __init__(self):
+        super().__init__()
+        self._sending_bytes = 0
+        self._label = ""
+
+    def parse_line(self, line):
+        total = None
+        sending = _FASTBOOT_SENDING_RE.search(line)
+        if sending:
+            self._label = sending.group(1)
+            self._sending_bytes = int(sending.group(4)) * 1024
+            if sending.group(2): # Sparse chunk i/n: the total is about n chunks of this size
+                chunk_index, chunk_count = int(sending.group(2)), int(sending.group(3))
+                total = self.bytes_done + self._sending_bytes * (chunk_count - chunk_index + 1)
+            if not _FASTBOOT_OKAY_RE.search(line):
+                return self.bytes_done, total, None, self._label
+        if self._sending_bytes and _FASTBOOT_OKAY_RE.search(line):
+            done = self.bytes_done + self._sending_bytes
+            self._sending_bytes = 0
+            total = total or self.bytes_total # A chunk and its OKAY on one line: the total comes from this line
+            return done, total if total and total >= done else None, None, self._label
+        return None
+
+
+_ADB_TRANSFER_COMMANDS = ("push", "pull", "sideload", "install", "install-multiple", "restore", "backup")
+
+
+def parser_for_command(command_list):
+    """A fresh parser for this command's tool, or None when its output carries no progress."""
+    if not isinstance(command_list, (list, tuple)) or not command_list:
+        return None
+    tool_name = os.path.basename(str(command_list[0])).lower()
+    args = [str(part) for part in command_list[1:]]
+    if tool_name.startswith("python") and args and os.path.basename(args[0]).lower().startswith("mtk"): # python mtk.py ...
+        return MtkclientProgressParser()
+    if tool_name.startswith("mtk"):
+        return MtkclientProgressParser()
+    if tool_name.startswith("fastboot"):
+        return FastbootProgressParser()
+    if tool_name.startswith("adb") and any(arg in _ADB_TRANSFER_COMMANDS for arg in args):
+        return AdbProgressParser()
+    return None
@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""MTK scatter files (MTxxxx_Android_scatter.txt) as a typed partition table.
+
+The file is read once, line by line: every "- partition_index:" entry becomes a ScatterPartition
+with its file name, region, start addresses, size and download flag, so flashing, backup and
+verification use what the scatter says instead of guessing image names. Parsed tables are
+cached by path, mtime and size.
+"""
+
+import os
+import threading
+
+from debug_log import log_to_file_debug_globally # Queued, rotating debug log shared by every module
+
+SCATTER_CACHE_ENTRIES = 16 # Parsed scatter files kept in memory
+NO_IMAGE_FILE = "NONE"     # file_name of partitions that have no image in the firmware package
+
+_INT_FIELDS = ("linear_start_addr", "physical_start_addr", "partition_size")
+
+_cache = {} # abspath -> (mtime_ns, size, ScatterTable)
+_cache_lock = threading.Lock()
+
+
+def _to_int(value):
+    try:
+        return int(value, 0)
+    except (TypeError, ValueError):
+        return None
+
+
+def _to_bool(value):
+    return str(value).strip().lower() == "true"
+
+
+class ScatterPartition:
+    """One scatter entry. Addresses and size are ints (None when missing); file_name is None without an image."""
+
+    def __init__(self, name, index=None, file_name=None, region="", storage="", linear_start_addr=None,
+                 physical_start_addr=None, partition_size=None, is_download=False, type="", operation_type="",
+                 is_reserved=False):
+        self.name = name
+        self.index = index
+        self.file_name = file_name if file_name and file_name.upper() != NO_IMAGE_FILE else None
+        self.region = region
+        self.storage = storage
+        self.linear_start_addr = linear_start_addr
+        self.physical_start_addr = physical_start_addr
+        self.partition_size = partition_size
+        self.is_download = is_download
+        self.type = type
+        self.operation_type = operation_type
+        self.is_reserved = is_reserved
+
+    @classmethod
+    def from_fields(cls, fields):
+        """Builds a partition from the raw "key: value" strings of one entry."""
+        values = {key: _to_int(fields.get(key)) for key in _INT_FIELDS}
+        return cls(fields.get("partition_name", ""), index=fields.get("partition_index"), file_name=fields.get("file_name"),
+                   region=fields.get("region", ""), storage=fields.get("storage", ""),
+                   is_download=_to_bool(fields.get("is_download")), type=fields.get("type", ""),
+                   operation_type=fields.get("operation_type", ""), is_reserved=_to_bool(fields.get("is_reserved")), **values)
+
+    def as_dict(self):
+        return dict(vars(self))
+
+    def __repr__(self):
+        return f"ScatterPartition({self.name!r}, file_name={self.file_name!r}, size={self.partition_size!r}, is_download={self.is_download})"
+
+
+class ScatterTable:
+    """The partitions of one scatter file, in file order, plus its general info (platform, project, storage...)."""
+
+    def __init__(self, path, partitions, info=None):
+        self.path = path
+        self.directory = os.path.dirname(os.path.abspath(path))
+        self.partitions = partitions
+        self.info = info or {}
+        self._by_name = {}
+        for partition in partitions:
+            self._by_name.setdefault(partition.name.lower(), partition)
+
+    @property
+    def platform(self):
+        return self.info.get("platform", "")
+
+    def get(self, name):
+        """The partition called name (case-insensitive), or None."""
+        return self._by_name.get(str(name).lower())
+
+    def downloadable(self):
+        """Partitions the scatter marks for download and that have an image file, without duplicate names."""
+        seen = set()
+        result = []
+        for partition in self.partitions:
+            if partition.is_download and partition.file_name and partition.name.lower() not in seen:
+                seen.add(partition.name.lower())
+                result.append(partition)
+        return result
+
+    def image_path(self, name):
+        """Full path of the partition's image next to the scatter file, or None when the scatter names none."""
+        partition = self.get(name)
+        if partition is None or not partition.file_name:
+            return None
+        return os.path.join(self.directory, partition.file_name)
+
+    def check_image_size(self, name, path):
+        """None when the file at path fits the partition, else a message. Unknown sizes are not checked."""
+        partition = self.get(name)
+        if partition is None or not partition.partition_size:
+            return None
+        try:
+            file_size = os.path.getsize(path)
+        except OSError as e_stat:
+            return f"Cannot read {os.path.basename(path)}: {e_stat}"
+        if file_size > partition.partition_size:
+            return f"{os.path.basename(path)} is {file_size} bytes, larger than the {partition.partition_size} byte partition"
+        return None
+
+    def check_dump_size(self, name, path):
+        """None when a dump of the partition has the size the scatter gives for it, else a message."""
+        partition = self.get(name)
+        if partition is None or not partition.partition_size:
+            return None
+        try:
+            file_size = os.path.getsize(path)
+        except OSError as e_stat:
+            return f"Cannot read {os.path.basename(path)}: {e_stat}"
+        if file_size < partition.partition_size:
+            return f"{os.path.basename(path)} is {file_size} bytes, the scatter expects {partition.partition_size} (truncated dump?)"
+        return None
+
+
+def parse_scatter_lines(lines, path=""):
+    """Single pass over the lines of a scatter file. Returns a ScatterTable."""
+    partitions = []
+    info = {}
+    fields = None # "key: value" pairs of the partition entry being read
+
+    for raw_line in lines:
+        stripped = raw_line.split("#", 1)[0].strip()
+        if not stripped:
+            continue
+        if stripped.startswith("- "): # New entry: "- partition_index: SYS0" or "- general: MTK_PLATFORM_CFG"
+            if fields is not None:
+                partitions.append(ScatterPartition.from_fields(fields))
+            key, _, value = stripped[2:].partition(":")
+            key, value = key.strip(), value.strip()
+            fields = {key: value} if key == "partition_index" else None
+            if fields is None and key != "general" and value: # "- config_version: V1.1.2" inside the info list
+                info[key] = value
+            continue
+        key, sep, value = stripped.partition(":")
+        if not sep:
+            continue
+        key, value = key.strip(), value.strip()
+        if fields is not None:
+            fields[key] = value
+        elif value:
+            info.setdefault(key, value)
+    if fields is not None:
+        partitions.append(ScatterPartition.from_fields(fields))
+    return ScatterTable(path, partitions, info)
+
+
+def load_scatter(path):
+    """Parsed ScatterTable for the file at path, reused until the file's mtime or size changes.
+
+    Raises OSError when the file can't be read.
+    """
+    abs_path = os.path.abspath(path)
+    stat = os.stat(abs_path)
+    with _cache_lock:
+        cached = _cache.get(abs_path)
+        if cached and cached[0] == stat.st_mtime_ns and cached[1] == stat.st_size:
+            return cached[2]
+    with open(abs_path, "r", encoding="utf-8", errors="ignore") as f_scatter:
+        table = parse_scatter_lines(f_scatter, abs_path)
+    log_to_file_debug_globally(f"Scatter: {len(table.partitions)} partitions ({len(table.downloadable())} downloadable) "
+                               f"in {os.path.basename(abs_path)}, platform {table.platform or 'unknown'}.")
+    with _cache_lock:
+        _cache[abs_path] = (stat.st_mtime_ns, stat.st_size, table)
+        while len(_cache) > SCATTER_CACHE_ENTRIES:
+            _cache.pop(next(iter(_cache)))
+    return table
+
+
+def clear_scatter_cache():
+    with _cache_lock:
+        _cache.clear()
@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Android sparse images (the img2simg / fastboot format) for partition backups and restores.
+
+raw_to_sparse() streams a raw dump into a sparse image: blocks that repeat one 4-byte value
+(zeros above all) become FILL chunks, everything else RAW chunks, so a mostly empty userdata
+or super backup costs what is actually in it. sparse_to_raw() streams it back; zero runs are
+skipped with seek, which leaves holes instead of writing gigabytes of zeros. fastboot takes
+the sparse file as it is; mtkclient needs the raw file.
+
+Zero detection compares whole read buffers, then single blocks, against prebuilt zero bytes,
+which runs as memcmp in C, so conversion keeps up with the disk without numpy.
+"""
+
+import os
+import struct
+import traceback # For detailed error logging
+
+from debug_log import log_to_file_debug_globally # Queued, rotating debug log shared by every module
+
+SPARSE_MAGIC = 0xED26FF3A
+SPARSE_EXTENSION = ".simg"
+CHUNK_TYPE_RAW = 0xCAC1
+CHUNK_TYPE_FILL = 0xCAC2
+CHUNK_TYPE_DONT_CARE = 0xCAC3
+CHUNK_TYPE_CRC32 = 0xCAC4
+
+DEFAULT_BLOCK_SIZE = 4096
+READ_BUFFER_BYTES = 4 * 1024 * 1024  # Raw input read per step
+MAX_RAW_CHUNK_BYTES = 16 * 1024 * 1024 # A RAW run is split into chunks of at most this size
+
+# magic, major, minor, file_hdr_sz, chunk_hdr_sz, blk_sz, total_blks, total_chunks, image_checksum
+_FILE_HEADER = struct.Struct("<IHHHHIIII")
+# chunk_type, reserved, chunk_sz (blocks), total_sz (bytes, header included)
+_CHUNK_HEADER = struct.Struct("<HHII")
+_ZERO_BUFFER = bytes(READ_BUFFER_BYTES)
+
+
+class SparseImageError(Exception):
+    """The file is not a valid Android sparse image."""
+
+
+def is_sparse_image(path):
+    """True when the file starts with the sparse image magic."""
+    try:
+        with open(path, "rb") as f_image:
+            head = f_image.read(4)
+    except OSError:
+        return False
+    return len(head) == 4 and struct.unpack("<I", head)[0] == SPARSE_MAGIC
+
+
+class _SparseWriter:
+    """Merges classified blocks into runs and writes them as chunks. The file header is written last."""
+
+    def __init__(self, f_out, block_size):
+        self.f_out = f_out
+        self.block_size = block_size
+        self.chunk_count = 0
+        self.block_count = 0
+        self.stats = {CHUNK_TYPE_RAW: 0, CHUNK_TYPE_FILL: 0, CHUNK_TYPE_DONT_CARE: 0} # Blocks per chunk type
+        self._kind = None
+        self._fill = None
+        self._blocks = 0
+        self._raw = []
+        f_out.write(b"\x00" * _FILE_HEADER.size) # Placeholder until the totals are known
+
+    def add(self, kind, blocks, payload=None):
+        """Appends blocks of one kind: RAW with their bytes, FILL with the 4-byte value, DONT_CARE without payload."""
+        if kind != self._kind or (kind == CHUNK_TYPE_FILL and payload != self._fill):
+            self._flush()
+            self._kind, self._fill = kind, payload if kind == CHUNK_TYPE_FILL else None
+        self._blocks += blocks
+        if kind == CHUNK_TYPE_RAW:
+            self._raw.append(payload)
+            if self._blocks * self.block_size >= MAX_RAW_CHUNK_BYTES:
+                self._flush()
+
+    def _flush(self):
+        if not self._blocks:
+            return
+        if self._kind == CHUNK_TYPE_RAW:
+            self.f_out.write(_CHUNK_HEADER.pack(CHUNK_TYPE_RAW, 0, self._blocks, _CHUNK_HEADER.size + self._blocks * self.block_size))
+            self.f_out.writelines(self._raw)
+            self._raw = []
+        elif self._kind == CHUNK_TYPE_FILL:
+            self.f_out.write(_CHUNK_HEADER.pack(CHUNK_TYPE_FILL, 0, self._blocks, _CHUNK_HEADER.size + 4) + self._fill)
+        else:
+            self.f_out.write(_CHUNK_HEADER.pack(CHUNK_TYPE_DONT_CARE, 0, self._blocks, _CHUNK_HEADER.size))
+        self.stats[self._kind] += self._blocks
+        self.chunk_count += 1
+        self.block_count += self._blocks
+        self._blocks = 0
+
+    def close(self):
+        self._flush()
+        self.f_out.seek(0)
+        self.f_out.write(_FILE_HEADER.pack(SPARSE_MAGIC, 1, 0, _FILE_HEADER.size, _CHUNK_HEADER.size, self.block_size,
+                                           self.block_count, self.chunk_count, 0))
+
+
+def raw_to_sparse(raw_path, sparse_path, block_size=DEFAULT_BLOCK_SIZE, zero_as_dont_care=False,
+                  progress_callback=None, cancel_event=None):
+    """Converts a raw image to a sparse image. Returns a stats dict, or None when cancelled.
+
+    Zero blocks become FILL chunks, so the restore writes exactly the original bytes; with
+    zero_as_dont_care they become DONT_CARE (smaller, but only right when the target is erased
+    first). An input that doesn't end on a block boundary is padded with zeros.
+    progress_callback(bytes_done, raw_size) is called after every read.
+    """
+    raw_size = os.path.getsize(raw_path)
+    zero_block = _ZERO_BUFFER[:block_size]
+    words_per_block = block_size // 4
+    zero_kind = CHUNK_TYPE_DONT_CARE if zero_as_dont_care else CHUNK_TYPE_FILL
+    zero_fill = None if zero_as_dont_care else b"\x00" * 4
+    done = 0
+    with open(raw_path, "rb") as f_raw, open(sparse_path, "wb") as f_sparse:
+        writer = _SparseWriter(f_sparse, block_size)
+        while True:
+            if cancel_event is not None and cancel_event.is_set():
+                break
+            buffer = f_raw.read(READ_BUFFER_BYTES - READ_BUFFER_BYTES % block_size)
+            if not buffer:
+                break
+            done += len(buffer)
+            if len(buffer) % block_size:
+                buffer += bytes(block_size - len(buffer) % block_size)
+            blocks = len(buffer) // block_size
+            if buffer == _ZERO_BUFFER[:len(buffer)]: # Whole read is empty: one comparison for 1024 blocks
+                writer.add(zero_kind, blocks, zero_fill)
+            else:
+                for offset in range(0, len(buffer), block_size):
+                    block = buffer[offset:offset + block_size]
+                    if block == zero_block:
+                        writer.add(zero_kind, 1, zero_fill)
+                        continue
+                    head = block[:4]
+                    if block[-4:] == head and block[4:8] == head and block == head * words_per_block:
+                        writer.add(CHUNK_TYPE_FILL, 1, head)
+                    else:
+                        writer.add(CHUNK_TYPE_RAW, 1, block)
+            if progress_callback:
+                progress_callback(done, raw_size)
+        writer.close()
+    if cancel_event is not None and cancel_event.is_set():
+        os.remove(sparse_path)
+        return None
+    stats = {"raw_size": raw_size, "sparse_size": os.path.getsize(sparse_path), "chunks": writer.chunk_count,
+             "raw_blocks": writer.stats[CHUNK_TYPE_RAW], "fill_blocks": writer.stats[CHUNK_TYPE_FILL],
+             "dont_care_blocks": writer.stats[CHUNK_TYPE_DONT_CARE]}
+    log_to_file_debug_globally(f"Sparse: {os.path.basename(raw_path)} {raw_size} -> {stats['sparse_size']} bytes in {stats['chunks']} chunks.")
+    return stats
+
+
+def iter_raw_data(sparse_path):
+    """Streams a sparse image as (offset, length, data) in output order.
+
+    data is None for zeros and DONT_CARE ranges (nothing to write), else at most
+    READ_BUFFER_BYTES of bytes. Raises SparseImageError for files that aren't sparse images.
+    """
+    with open(sparse_path, "rb") as f_sparse:
+        header = f_sparse.read(_FILE_HEADER.size)
+        if len(header) < _FILE_HEADER.size:
+            raise SparseImageError(f"{os.path.basename(sparse_path)}: file is too short")
+        magic, major, _minor, file_hdr_sz, chunk_hdr_sz, block_size, total_blocks, total_chunks, _checksum = _FILE_HEADER.unpack(header)
+        if magic != SPARSE_MAGIC or major != 1 or block_size % 4:
+            raise SparseImageError(f"{os.path.basename(sparse_path)}: not an Android sparse image")
+        f_sparse.seek(file_hdr_sz) # Headers may be longer in newer versions
+        offset = 0
+        for chunk_index in range(total_chunks):
+            chunk_header = f_sparse.read(chunk_hdr_sz)
+            if len(chunk_header) < _CHUNK_HEADER.size:
+                raise SparseImageError(f"{os.path.basename(sparse_path)}: cut off at chunk {chunk_index}")
+            chunk_type, _reserved, chunk_blocks, total_size = _CHUNK_HEADER.unpack_from(chunk_header)
+            length = chunk_blocks * block_size
+            if chunk_type == CHUNK_TYPE_RAW:
+                remaining = length
+                while remaining:
+                    data = f_sparse.read(min(remaining, READ_BUFFER_BYTES))
+                    if not data:
+                        raise SparseImageError(f"{os.path.basename(sparse_path)}: RAW chunk {chunk_index} is cut off")
+                    yield offset, len(data), data
+                    offset += len(data)
+                    remaining -= len(data)
+                continue
+            if chunk_type == CHUNK_TYPE_FILL:
+                pattern = f_sparse.read(4)
+                if pattern == b"\x00" * 4:
+                    yield offset, length, None
+                else:
+                    piece = pattern * (min(length, READ_BUFFER_BYTES) // 4)
+                    for piece_offset in range(0, length, len(piece)):
+                        piece_length = min(len(piece), length - piece_offset)
+                        yield offset + piece_offset, piece_length, piece[:piece_length]
+            elif chunk_type == CHUNK_TYPE_DONT_CARE:
+                yield offset, length, None
+            elif chunk_type == CHUNK_TYPE_CRC32:
+                f_sparse.seek(total_size - chunk_hdr_sz, os.SEEK_CUR)
+                continue
+            else:
+                raise SparseImageError(f"{os.path.basename(sparse_path)}: unknown chunk type 0x{chunk_type:04X}")
+            offset += length
+        if offset != total_blocks * block_size:
+            raise SparseImageError(f"{os.path.basename(sparse_path)}: chunks cover {offset} bytes, header says {total_blocks * block_size}")
+
+
+def sparse_to_raw(sparse_path, raw_path, progress_callback=None, cancel_event=None):
+    """Expands a sparse image to a raw file. Returns the raw size, or None when cancelled.
+
+    Zero ranges are seeked over, so on most filesystems they take no space in the output.
+    progress_callback(bytes_done, total) is called per piece.
+    """
+    total = None
+    try:
+        with open(raw_path, "wb") as f_raw:
+            with open(sparse_path, "rb") as f_sparse:
+                header = _FILE_HEADER.unpack(f_sparse.read(_FILE_HEADER.size))
+            total = header[5] * header[6] # blk_sz * total_blks
+            for offset, length, data in iter_raw_data(sparse_path):
+                if cancel_event is not None and cancel_event.is_set():
+                    break
+                if data is not None:
+                    f_raw.seek(offset)
+                    f_raw.write(data)
+                if progress_callback:
+                    progress_callback(offset + length, total)
+            f_raw.truncate(total) # Trailing zero range
+    except (SparseImageError, struct.error) as e_sparse:
+        log_to_file_debug_globally(f"Sparse: expanding {sparse_path} failed: {e_sparse}", "ERROR")
+        log_to_file_debug_globally(traceback.format_exc(), "ERROR_TRACE")
+        if os.path.exists(raw_path):
+            os.remove(raw_path)
+        raise SparseImageError(str(e_sparse)) from e_sparse
+    if cancel_event is not None and cancel_event.is_set():
+        os.remove(raw_path)
+        return None
+    return total